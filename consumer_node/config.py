@@ -167,7 +167,8 @@ class Config:
                 "workers": 5,
                 "prefetch_count": 100,
                 "batch_size": 200,
-                "batch_timeout": 1.0
+                "batch_timeout": 1.0,
+                "copy_threshold": 500
             },
             "database": {
                 "host": "localhost",
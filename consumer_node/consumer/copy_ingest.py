@@ -0,0 +1,110 @@
+"""
+COPY-based bulk upsert for the consumer
+Used instead of multi-row INSERT ... VALUES for large batches (e.g. catch-up after a RabbitMQ outage)
+
+A multi-row pg_insert(...).values([...]) binds one parameter per column per row, so a large
+batch means a huge parameter list and an expensive statement compile. Here the rows are
+streamed with asyncpg copy_records_to_table (binary COPY) into a staging table and merged
+with a single INSERT ... SELECT ... ON CONFLICT DO UPDATE.
+
+The staging table is a TEMP table created inside the transaction with ON COMMIT DROP:
+temp tables are not WAL-logged (same as UNLOGGED) and, being transaction scoped, work
+behind PgBouncer transaction pooling.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import JSON, Table
+from sqlalchemy.dialects.postgresql import JSONB
+
+from .sqlalchemy_base import get_engine
+
+logger = logging.getLogger(__name__)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _row_to_record(row: Dict[str, Any], columns: Sequence[str], json_columns: frozenset) -> tuple:
+    """Build a COPY record tuple; JSON/JSONB values are sent as text (asyncpg codec expects str)."""
+    record = []
+    for col in columns:
+        value = row.get(col)
+        if col in json_columns and value is not None and not isinstance(value, str):
+            value = json.dumps(value)
+        record.append(value)
+    return tuple(record)
+
+
+async def copy_upsert(
+    table: Table,
+    rows: List[Dict[str, Any]],
+    conflict_columns: Sequence[str] = ('imei', 'gps_time'),
+    update_exclude: Sequence[str] = (),
+    returning: Sequence[str] = (),
+) -> Any:
+    """
+    Upsert rows into table via COPY into a staging table and one INSERT ... SELECT merge.
+
+    Rows must already be unique on conflict_columns (ON CONFLICT cannot update a row twice).
+
+    Args:
+        table: Target table (e.g. TrackData.__table__)
+        rows: Column value dicts; all rows must have the same keys
+        conflict_columns: Conflict target (primary key of the hypertable)
+        update_exclude: Columns not updated on conflict (conflict columns are never updated)
+        returning: Optional columns to return for the inserted/updated rows
+
+    Returns:
+        List of asyncpg Records if returning is given, otherwise number of rows merged
+    """
+    if not rows:
+        return [] if returning else 0
+
+    present = rows[0].keys()
+    columns = [col.name for col in table.columns if col.name in present]
+    json_columns = frozenset(
+        col.name for col in table.columns if isinstance(col.type, (JSON, JSONB))
+    )
+    skip_update = set(conflict_columns) | set(update_exclude)
+
+    stage = _quote(f"_copy_stage_{table.name}")
+    target = _quote(table.name)
+    column_list = ', '.join(_quote(col) for col in columns)
+    update_list = ', '.join(
+        f"{_quote(col)} = EXCLUDED.{_quote(col)}" for col in columns if col not in skip_update
+    )
+    merge_sql = (
+        f"INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {stage} "
+        f"ON CONFLICT ({', '.join(_quote(col) for col in conflict_columns)}) "
+        + (f"DO UPDATE SET {update_list}" if update_list else "DO NOTHING")
+    )
+    if returning:
+        merge_sql += f" RETURNING {', '.join(_quote(col) for col in returning)}"
+
+    records = [_row_to_record(row, columns, json_columns) for row in rows]
+
+    async with get_engine().connect() as conn:
+        raw = await conn.get_raw_connection()
+        pg_conn = raw.driver_connection
+        async with pg_conn.transaction():
+            await pg_conn.execute(
+                f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS "
+                f"SELECT {column_list} FROM {target} WITH NO DATA"
+            )
+            await pg_conn.copy_records_to_table(
+                f"_copy_stage_{table.name}", records=records, columns=columns
+            )
+            if returning:
+                return await pg_conn.fetch(merge_sql)
+            status = await pg_conn.execute(merge_sql)
+    logger.debug(f"COPY upsert into {table.name}: {len(records)} rows ({status})")
+
+    # Status is "INSERT 0 <rows>"
+    try:
+        return int(status.rsplit(' ', 1)[-1])
+    except (ValueError, AttributeError):
+        return len(records)
+
@@ -4,20 +4,29 @@ Prevents processing duplicate messages using message ID tracking
 Hybrid approach: In-memory cache (L1) + PostgreSQL (L2) for persistence
 """
 import asyncio
+import hashlib
 import logging
+import math
 import socket
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Set, Any
+from typing import Optional, Set, Any, Awaitable, Callable, Dict, List
 from collections import OrderedDict
 
-from sqlalchemy import select, delete, text
+from sqlalchemy import select, delete, text, bindparam, String
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy.dialects.postgresql import insert as pg_insert, JSONB
+from sqlalchemy.dialects.postgresql import insert as pg_insert, ARRAY, JSONB
 
+from config import ServerParams
 from .sqlalchemy_base import get_session, Base
 
 logger = logging.getLogger(__name__)
 
+# Coalesced L2 lookup: one round trip for all message IDs checked concurrently
+_LOOKUP_PROCESSED_SQL = text(
+    "SELECT message_id FROM processed_message_ids WHERE message_id = ANY(:ids)"
+).bindparams(bindparam('ids', type_=ARRAY(String)))
+
 
 class ProcessedMessage(Base):
     """
@@ -209,13 +218,132 @@ async def get_invalid_records(
         return []
 
 
+class _BloomFilter:
+    """
+    Bloom filter over message IDs for fast negatives.
+
+    Two generations are kept and rotated every TTL, so an ID stays in the filter for
+    at least ttl_seconds and old IDs age out without deletions.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        error_rate = min(max(error_rate, 1e-6), 0.5)
+        self._size = max(1024, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._current = bytearray((self._size + 7) // 8)
+        self._previous: Optional[bytearray] = None
+
+    def _positions(self, message_id: str) -> List[int]:
+        # Double hashing (Kirsch-Mitzenmacher) from one 128-bit digest
+        digest = hashlib.blake2b(message_id.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        size = self._size
+        return [(h1 + i * h2) % size for i in range(self._hashes)]
+
+    def add(self, message_id: str) -> None:
+        bits = self._current
+        for pos in self._positions(message_id):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def might_contain(self, message_id: str) -> bool:
+        positions = self._positions(message_id)
+        for bits in (self._current, self._previous):
+            if bits is not None and all(bits[pos >> 3] & (1 << (pos & 7)) for pos in positions):
+                return True
+        return False
+
+    def rotate(self) -> None:
+        self._previous = self._current
+        self._current = bytearray(len(self._current))
+
+    def clear(self) -> None:
+        self._current = bytearray(len(self._current))
+        self._previous = None
+
+
+class _BatchCoalescer:
+    """
+    Coalesces concurrent per-message calls into one batched database operation.
+
+    Callers submit a message ID and await its result; pending IDs are flushed together
+    after window_seconds, or as soon as max_batch IDs are pending. Concurrent submits of
+    the same ID share one result.
+    """
+
+    def __init__(self, run_batch: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+                 max_batch: int = 500, window_seconds: float = 0.001):
+        self._run_batch = run_batch
+        self._max_batch = max(1, max_batch)
+        self._window = max(0.0, window_seconds)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.Task] = None
+        self.batches = 0
+
+    async def submit(self, message_id: str) -> Any:
+        future = self._pending.get(message_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[message_id] = future
+            if len(self._pending) >= self._max_batch:
+                asyncio.create_task(self._flush(self._take()))
+            elif self._timer is None or self._timer.done():
+                self._timer = asyncio.create_task(self._flush_after_window())
+        return await asyncio.shield(future)
+
+    def _take(self) -> Dict[str, asyncio.Future]:
+        batch = self._pending
+        self._pending = {}
+        return batch
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self._window)
+        self._timer = None
+        await self._flush(self._take())
+
+    async def _flush(self, batch: Dict[str, asyncio.Future]):
+        if not batch:
+            return
+        self.batches += 1
+        try:
+            results = await self._run_batch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for message_id, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(message_id))
+
+
 class MessageDeduplicator:
     """
-    In-memory message deduplication cache with TTL.
+    Message deduplication with TTL: in-memory L1 cache + PostgreSQL L2.
     Tracks processed message IDs to prevent duplicate processing.
+
+    L1 is keyed by the hashed message ID and split into shards (each an LRU OrderedDict
+    bounded to max_size / shards), so lookups need no lock and expiry/eviction work is
+    per shard. L2 lookups and writes from concurrent consumers are coalesced into one
+    "message_id = ANY($1)" query / one multi-row INSERT per batch. An optional Bloom filter
+    answers "never seen" without touching L2; it only knows IDs this process has seen (plus
+    those loaded by warm_bloom_filter), so enable it only when this process is the sole
+    writer of processed_message_ids for its queues.
     """
     
-    def __init__(self, ttl_seconds: int = 3600, max_size: int = 100000, use_database: bool = True):
+    def __init__(
+        self,
+        ttl_seconds: int = 3600,
+        max_size: int = 100000,
+        use_database: bool = True,
+        shards: int = 16,
+        use_bloom_filter: bool = False,
+        bloom_capacity: int = 1000000,
+        bloom_error_rate: float = 0.001,
+        l2_batch_size: int = 500,
+        l2_batch_window: float = 0.001,
+    ):
         """
         Initialize message deduplicator.
         
@@ -223,18 +351,56 @@ class MessageDeduplicator:
             ttl_seconds: Time-to-live for message IDs (default: 1 hour)
             max_size: Maximum number of message IDs to track in memory (default: 100k)
             use_database: Whether to use PostgreSQL for persistence (default: True)
+            shards: Number of L1 cache shards
+            use_bloom_filter: Skip L2 lookups for IDs the Bloom filter has never seen
+            bloom_capacity: Expected number of IDs per TTL (Bloom filter sizing)
+            bloom_error_rate: Bloom filter false positive rate
+            l2_batch_size: Maximum message IDs per coalesced L2 query/insert
+            l2_batch_window: Seconds to wait for more IDs before running a coalesced L2 query/insert
         """
         self.ttl_seconds = ttl_seconds
         self.max_size = max_size
         self.use_database = use_database
-        self._processed: OrderedDict[str, datetime] = OrderedDict()  # L1 cache (in-memory)
-        self._lock = asyncio.Lock()
+        self._shard_count = max(1, shards)
+        self._shard_max_size = max(1, max_size // self._shard_count)
+        self._shards: List[OrderedDict] = [OrderedDict() for _ in range(self._shard_count)]  # L1 cache (in-memory)
+        self._bloom: Optional[_BloomFilter] = (
+            _BloomFilter(bloom_capacity, bloom_error_rate) if use_bloom_filter else None
+        )
+        self._bloom_rotated_at = time.monotonic()
+        self._lookups = _BatchCoalescer(self._lookup_batch, l2_batch_size, l2_batch_window)
+        self._writes = _BatchCoalescer(self._insert_batch, l2_batch_size, l2_batch_window)
         self._hits = 0
         self._misses = 0
         self._db_hits = 0  # Database cache hits
         self._db_misses = 0  # Database cache misses
+        self._bloom_negatives = 0  # L2 lookups skipped by the Bloom filter
         self._cleanup_task: Optional[asyncio.Task] = None
-        
+
+    def _shard(self, key: int) -> OrderedDict:
+        return self._shards[key % self._shard_count]
+
+    def _l1_contains(self, key: int) -> bool:
+        shard = self._shard(key)
+        added_at = shard.get(key)
+        if added_at is None:
+            return False
+        if time.monotonic() - added_at > self.ttl_seconds:
+            shard.pop(key, None)
+            return False
+        return True
+
+    def _l1_add(self, key: int) -> None:
+        shard = self._shard(key)
+        shard[key] = time.monotonic()
+        shard.move_to_end(key)
+        # Enforce max size (per shard)
+        if len(shard) > self._shard_max_size:
+            shard.popitem(last=False)
+
+    def _l1_size(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
     async def check_duplicate(self, message_id: str) -> bool:
         """
         Check if message ID has been processed before (READ-ONLY).
@@ -247,54 +413,44 @@ class MessageDeduplicator:
         Returns:
             True if message is duplicate, False otherwise
         """
-        async with self._lock:
-            # Step 1: Check in-memory cache (L1) - fast path
-            if message_id in self._processed:
-                self._hits += 1
-                logger.debug(f"Duplicate message detected (L1 cache): {message_id}")
-                return True
-            
-            # Step 2: Check database (L2) - persistent storage
-            if self.use_database:
-                try:
-                    async with get_session() as session:
-                        # Check if message_id exists in database
-                        stmt = select(ProcessedMessage).where(
-                            ProcessedMessage.message_id == message_id
-                        )
-                        result = await session.execute(stmt)
-                        existing = result.scalar_one_or_none()
-                        
-                        if existing:
-                            # Found in database - add to L1 cache and return duplicate
-                            self._processed[message_id] = datetime.now(timezone.utc)
-                            self._db_hits += 1
-                            self._hits += 1
-                            logger.debug(f"Duplicate message detected (L2 database): {message_id}")
-                            
-                            # Enforce max size
-                            if len(self._processed) > self.max_size:
-                                self._processed.popitem(last=False)
-                            
-                            return True
-                        else:
-                            self._db_misses += 1
-                except (ConnectionError, OSError, TimeoutError, asyncio.TimeoutError) as e:
-                    # Connection errors are expected - don't log full traceback
-                    import socket
-                    if isinstance(e, (socket.gaierror, socket.herror)):
-                        logger.debug(f"Database check failed (DNS/host resolution): {e}. Falling back to in-memory cache.")
-                    else:
-                        logger.debug(f"Database check failed (connection error): {e}. Falling back to in-memory cache.")
-                    # Continue with in-memory cache only
-                except Exception as e:
-                    # Other database errors - log with traceback
-                    logger.warning(f"Database check failed for message_id {message_id}: {e}. Falling back to in-memory cache.", exc_info=True)
-                    # Continue with in-memory cache only
-            
-            # Not a duplicate (yet) - don't mark as processed until DB write succeeds
-            self._misses += 1
-            return False
+        key = hash(message_id)
+
+        # Step 1: Check in-memory cache (L1) - fast path
+        if self._l1_contains(key):
+            self._hits += 1
+            logger.debug(f"Duplicate message detected (L1 cache): {message_id}")
+            return True
+
+        # Step 2: Check database (L2) - persistent storage, batched with concurrent checks
+        if self.use_database:
+            if self._bloom is not None and not self._bloom.might_contain(message_id):
+                self._bloom_negatives += 1
+                self._misses += 1
+                return False
+            try:
+                if await self._lookups.submit(message_id):
+                    # Found in database - add to L1 cache and return duplicate
+                    self._l1_add(key)
+                    self._db_hits += 1
+                    self._hits += 1
+                    logger.debug(f"Duplicate message detected (L2 database): {message_id}")
+                    return True
+                self._db_misses += 1
+            except (ConnectionError, OSError, TimeoutError, asyncio.TimeoutError) as e:
+                # Connection errors are expected - don't log full traceback
+                if isinstance(e, (socket.gaierror, socket.herror)):
+                    logger.debug(f"Database check failed (DNS/host resolution): {e}. Falling back to in-memory cache.")
+                else:
+                    logger.debug(f"Database check failed (connection error): {e}. Falling back to in-memory cache.")
+                # Continue with in-memory cache only
+            except Exception as e:
+                # Other database errors - log with traceback
+                logger.warning(f"Database check failed for message_id {message_id}: {e}. Falling back to in-memory cache.", exc_info=True)
+                # Continue with in-memory cache only
+
+        # Not a duplicate (yet) - don't mark as processed until DB write succeeds
+        self._misses += 1
+        return False
     
     async def is_duplicate(self, message_id: str) -> bool:
         """
@@ -303,54 +459,49 @@ class MessageDeduplicator:
         Kept for backward compatibility.
         """
         return await self.check_duplicate(message_id)
-    
-    async def _add_to_database(self, message_id: str):
-        """Add message_id to database (async background task)"""
-        try:
-            async with get_session() as session:
-                table = ProcessedMessage.__table__
-                # Naive UTC for TIMESTAMP WITHOUT TIME ZONE (asyncpg rejects offset-aware datetimes)
-                stmt = pg_insert(table).values(
-                    message_id=message_id,
-                    processed_at=datetime.now(timezone.utc).replace(tzinfo=None)
-                )
-                # Use ON CONFLICT DO NOTHING to handle race conditions
-                stmt = stmt.on_conflict_do_nothing(index_elements=['message_id'])
-                result = await session.execute(stmt)
-                await session.commit()
-                logger.debug(f"Successfully added message_id {message_id} to database")
-        except (ConnectionError, OSError, TimeoutError, asyncio.TimeoutError) as e:
-            # Connection errors are expected - don't log full traceback
-            if isinstance(e, (socket.gaierror, socket.herror)):
-                logger.debug(f"Failed to add message_id {message_id} to database (DNS/host resolution): {e}")
-            else:
-                logger.debug(f"Failed to add message_id {message_id} to database (connection error): {e}")
-            raise  # Re-raise so caller knows it failed
-        except Exception as e:
-            # Other database errors - log with traceback
-            logger.error(f"✗ Failed to add message_id {message_id} to database: {e}", exc_info=True)
-            raise  # Re-raise so caller knows it failed
-    
+
+    async def _lookup_batch(self, message_ids: List[str]) -> Dict[str, bool]:
+        """Look up a batch of message IDs in L2 with one query."""
+        async with get_session() as session:
+            result = await session.execute(_LOOKUP_PROCESSED_SQL, {'ids': message_ids})
+            found = {row[0] for row in result}
+        return {message_id: message_id in found for message_id in message_ids}
+
+    async def _insert_batch(self, message_ids: List[str]) -> Dict[str, bool]:
+        """Insert a batch of message IDs into L2 with one statement."""
+        # Naive UTC for TIMESTAMP WITHOUT TIME ZONE (asyncpg rejects offset-aware datetimes)
+        processed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        async with get_session() as session:
+            stmt = pg_insert(ProcessedMessage.__table__).values([
+                {'message_id': message_id, 'processed_at': processed_at}
+                for message_id in message_ids
+            ])
+            # Use ON CONFLICT DO NOTHING to handle race conditions
+            stmt = stmt.on_conflict_do_nothing(index_elements=['message_id'])
+            await session.execute(stmt)
+            await session.commit()
+        logger.debug(f"Added {len(message_ids)} message_ids to database")
+        return {message_id: True for message_id in message_ids}
+
     async def mark_processed(self, message_id: str):
         """
         Mark a message as processed AFTER successful database write.
         This should be called only after the handler successfully writes to database.
+        The L2 insert is batched with concurrent mark_processed calls.
         
         Args:
             message_id: Unique message identifier
         """
-        async with self._lock:
-            # Add to in-memory cache
-            self._processed[message_id] = datetime.now(timezone.utc)
-            
-            # Enforce max size
-            if len(self._processed) > self.max_size:
-                self._processed.popitem(last=False)
+        key = hash(message_id)
+        # Add to in-memory cache
+        self._l1_add(key)
+        if self._bloom is not None:
+            self._bloom.add(message_id)
         
         # Add to database (await to ensure it completes)
         if self.use_database:
             try:
-                await self._add_to_database(message_id)
+                await self._writes.submit(message_id)
             except (ConnectionError, OSError, TimeoutError, asyncio.TimeoutError) as e:
                 # Connection errors are expected - don't log full traceback
                 if isinstance(e, (socket.gaierror, socket.herror)):
@@ -358,30 +509,65 @@ class MessageDeduplicator:
                 else:
                     logger.debug(f"Failed to add message_id {message_id} to database (connection error): {e}")
                 # Remove from cache if database write fails
-                async with self._lock:
-                    self._processed.pop(message_id, None)
+                self._shard(key).pop(key, None)
                 raise  # Re-raise to indicate failure
             except Exception as e:
                 # Other database errors - log with traceback
                 logger.error(f"Failed to add message_id {message_id} to database: {e}", exc_info=True)
                 # Remove from cache if database write fails
-                async with self._lock:
-                    self._processed.pop(message_id, None)
+                self._shard(key).pop(key, None)
                 raise  # Re-raise to indicate failure
     
     async def _cleanup_expired(self):
-        """Remove expired message IDs from in-memory cache"""
-        now = datetime.now(timezone.utc)
-        expired_keys = [
-            msg_id for msg_id, timestamp in self._processed.items()
-            if (now - timestamp).total_seconds() > self.ttl_seconds
-        ]
+        """Remove expired message IDs from in-memory cache and age the Bloom filter"""
+        now = time.monotonic()
+        removed = 0
+        for shard in self._shards:
+            # Shards are in insertion order, so expired entries are at the front
+            while shard:
+                key, added_at = next(iter(shard.items()))
+                if now - added_at <= self.ttl_seconds:
+                    break
+                shard.popitem(last=False)
+                removed += 1
+            await asyncio.sleep(0)  # Yield between shards
+        
+        if removed:
+            logger.debug(f"Cleaned up {removed} expired message IDs from L1 cache")
+
+        if self._bloom is not None and now - self._bloom_rotated_at >= self.ttl_seconds:
+            self._bloom.rotate()
+            self._bloom_rotated_at = now
+            logger.debug("Rotated message deduplication Bloom filter")
+
+    async def warm_bloom_filter(self) -> int:
+        """
+        Load message IDs processed within the TTL from the database into the Bloom filter.
+        Call at startup, before consuming, so Bloom negatives are valid after a restart.
         
-        for key in expired_keys:
-            self._processed.pop(key, None)
+        Returns:
+            Number of message IDs loaded
+        """
+        if self._bloom is None or not self.use_database:
+            return 0
         
-        if expired_keys:
-            logger.debug(f"Cleaned up {len(expired_keys)} expired message IDs from L1 cache")
+        loaded = 0
+        try:
+            # Naive UTC for TIMESTAMP WITHOUT TIME ZONE (asyncpg rejects aware in WHERE too)
+            cutoff_time = (datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)).replace(tzinfo=None)
+            async with get_session() as session:
+                result = await session.stream(
+                    select(ProcessedMessage.message_id).where(ProcessedMessage.processed_at >= cutoff_time)
+                )
+                async for row in result:
+                    self._bloom.add(row[0])
+                    loaded += 1
+            logger.info(f"Loaded {loaded} message IDs into deduplication Bloom filter")
+        except Exception as e:
+            # Without the full history Bloom negatives are unsafe - fall back to L2 lookups
+            logger.warning(f"Failed to warm deduplication Bloom filter, disabling it: {e}")
+            self._bloom = None
+        return loaded
     
     async def cleanup_database(self):
         """Remove expired message IDs from database"""
@@ -418,6 +604,7 @@ class MessageDeduplicator:
             while True:
                 try:
                     await asyncio.sleep(interval_seconds)
+                    await self._cleanup_expired()
                     await self.cleanup_database()
                 except asyncio.CancelledError:
                     break
@@ -440,10 +627,13 @@ class MessageDeduplicator:
     def get_stats(self) -> dict:
         """Get deduplication statistics"""
         total = self._hits + self._misses
+        l1_cache_size = self._l1_size()
         hit_rate = (self._hits / total * 100) if total > 0 else 0.0
         
         stats = {
-            'l1_cache_size': len(self._processed),
+            'l1_cache_size': l1_cache_size,
+            'cache_size': l1_cache_size,
+            'l1_shards': self._shard_count,
             'hits': self._hits,
             'misses': self._misses,
             'hit_rate': round(hit_rate, 2),
@@ -457,7 +647,11 @@ class MessageDeduplicator:
             stats.update({
                 'db_hits': self._db_hits,
                 'db_misses': self._db_misses,
-                'db_hit_rate': round(db_hit_rate, 2)
+                'db_hit_rate': round(db_hit_rate, 2),
+                'db_lookup_batches': self._lookups.batches,
+                'db_write_batches': self._writes.batches,
+                'bloom_filter': self._bloom is not None,
+                'bloom_negatives': self._bloom_negatives
             })
         
         return stats
@@ -469,13 +663,16 @@ class MessageDeduplicator:
         Args:
             clear_database: If True, also clear database table (default: False)
         """
-        async with self._lock:
-            self._processed.clear()
-            self._hits = 0
-            self._misses = 0
-            self._db_hits = 0
-            self._db_misses = 0
-            logger.info("Message deduplication L1 cache cleared")
+        for shard in self._shards:
+            shard.clear()
+        if self._bloom is not None:
+            self._bloom.clear()
+        self._hits = 0
+        self._misses = 0
+        self._db_hits = 0
+        self._db_misses = 0
+        self._bloom_negatives = 0
+        logger.info("Message deduplication L1 cache cleared")
         
         if clear_database and self.use_database:
             try:
@@ -498,5 +695,14 @@ def get_deduplicator() -> MessageDeduplicator:
     if _deduplicator is None:
         # TTL: 1 hour (messages older than 1 hour can be reprocessed safely)
         # Max size: 100k message IDs (covers ~1 hour of high-volume traffic)
-        _deduplicator = MessageDeduplicator(ttl_seconds=3600, max_size=100000)
+        _deduplicator = MessageDeduplicator(
+            ttl_seconds=ServerParams.get_int('deduplication.ttl_seconds', 3600),
+            max_size=ServerParams.get_int('deduplication.max_size', 100000),
+            shards=ServerParams.get_int('deduplication.shards', 16),
+            use_bloom_filter=ServerParams.get_bool('deduplication.bloom_filter', False),
+            bloom_capacity=ServerParams.get_int('deduplication.bloom_capacity', 1000000),
+            bloom_error_rate=ServerParams.get_float('deduplication.bloom_error_rate', 0.001),
+            l2_batch_size=ServerParams.get_int('deduplication.l2_batch_size', 500),
+            l2_batch_window=ServerParams.get_int('deduplication.l2_batch_window_ms', 1) / 1000.0,
+        )
     return _deduplicator
@@ -4,7 +4,7 @@ All operations use SQLAlchemy Core for optimal performance
 """
 import asyncio
 import socket
-from sqlalchemy import Column, BigInteger, DateTime, Float, Integer, String, Text, Time, JSON, Boolean, func, text
+from sqlalchemy import Column, BigInteger, DateTime, Float, Integer, String, Text, Time, JSON, Boolean, func, or_, text
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
 from typing import Dict, Any, Optional, List
@@ -15,6 +15,7 @@ import logging
 from .sqlalchemy_base import Base, get_session, get_resilient_session, is_connection_error, record_failure, record_success
 from sqlalchemy.ext.asyncio import AsyncSession
 from .circuit_breaker import get_db_write_circuit_breaker, CircuitBreakerOpenError
+from .copy_ingest import copy_upsert
 
 logger = logging.getLogger(__name__)
 
@@ -174,6 +175,92 @@ def parse_numeric_field(record: Dict[str, Any], field: str, field_type: type = f
         return default
 
 
+def _deduplicate_batch(batch_values: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Keep the last row per (imei, gps_time) to avoid
+    "ON CONFLICT DO UPDATE command cannot affect row a second time".
+    """
+    seen_keys = {}
+    for values in batch_values:
+        key = (values['imei'], values['gps_time'])
+        seen_keys[key] = values  # Overwrites duplicates, keeping last
+    
+    deduplicated_values = list(seen_keys.values())
+    duplicates_removed = len(batch_values) - len(deduplicated_values)
+    
+    if duplicates_removed > 0:
+        logger.debug(f"Removed {duplicates_removed} duplicate records from batch (same imei+gps_time)")
+    return deduplicated_values
+
+
+async def _bulk_upsert(
+    table,
+    deduplicated_values: List[Dict[str, Any]],
+    use_copy: bool,
+    stats: Dict[str, int],
+    failed_rows: int
+) -> None:
+    """
+    Upsert rows unique on (imei, gps_time) with one multi-row INSERT ... ON CONFLICT DO UPDATE,
+    or with copy_upsert when use_copy is set. Connection errors are retried with backoff.
+    Adds the rows to stats['success'], or failed_rows to stats['failed'] if the write fails.
+    """
+    # Retry logic for transient connection errors
+    max_retries = 3
+    last_error = None
+
+    for attempt in range(max_retries + 1):
+        try:
+            if use_copy:
+                await copy_upsert(table, deduplicated_values, ('imei', 'gps_time'))
+                stats['success'] += len(deduplicated_values)
+                record_success()
+                break
+            async with get_resilient_session() as session:
+                try:
+                    stmt = pg_insert(table).values(deduplicated_values)
+
+                    update_dict = {
+                        col.name: text(f'EXCLUDED.{col.name}')
+                        for col in table.columns
+                        if col.name not in ('imei', 'gps_time')
+                    }
+
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=['imei', 'gps_time'],
+                        set_=update_dict
+                    )
+
+                    await session.execute(stmt)
+                    await session.commit()
+
+                    stats['success'] += len(deduplicated_values)
+                    record_success()  # Track successful operation
+                    break  # Success - exit retry loop
+                except Exception as db_error:
+                    await session.rollback()
+                    raise db_error
+        except Exception as e:
+            last_error = e
+
+            if is_connection_error(e):
+                record_failure()  # Track failure for engine reconnection
+
+                if attempt < max_retries:
+                    delay = 1.0 * (2 ** attempt)  # Exponential backoff
+                    logger.warning(
+                        f"Database connection error in batch (attempt {attempt + 1}/{max_retries + 1}): {e}. "
+                        f"Retrying in {delay:.1f}s..."
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+
+            # Either not a connection error, or all retries exhausted
+            logger.error(f"Error processing batch: {e}", exc_info=True)
+            stats['failed'] += failed_rows
+            break
+
+
 class TrackData(Base):
     """Main tracking data table with composite primary key (imei, gps_time)"""
     __tablename__ = "trackdata"
@@ -368,16 +455,25 @@ class TrackData(Base):
     async def create_from_records_batch(
         cls, 
         records: List[Dict[str, Any]], 
-        batch_size: int = 200  
+        batch_size: int = 200,
+        parsed_out: Optional[List[Dict[str, Any]]] = None,
+        copy_threshold: int = 0
     ) -> Dict[str, int]:
         """
         Process multiple records in batches using SQLAlchemy Core for optimal performance.
-        Uses bulk INSERT ... ON CONFLICT DO UPDATE for efficient upserts.
+        Uses bulk INSERT ... ON CONFLICT DO UPDATE for efficient upserts, or COPY into a
+        staging table plus one merge (copy_ingest.copy_upsert) when copy_threshold or more
+        records are passed (BatchAccumulator grows batches to that size while the queue is
+        backlogged).
         Protected by circuit breaker for fault tolerance.
         
         Args:
             records: List of record dictionaries to process
             batch_size: Number of records to process per batch
+            parsed_out: Optional list that receives the parsed column values of every valid
+                record (e.g. for LastStatus.upsert_batch), so records are parsed only once
+            copy_threshold: Number of records at or above which the whole call is written as one
+                COPY batch regardless of batch_size (0 = never)
             
         Returns:
             Dict with 'success', 'failed' statistics
@@ -401,6 +497,10 @@ class TrackData(Base):
             # Get table reference for Core operations
             table = cls.__table__
             
+            # A burst of copy_threshold records or more is written as one COPY batch
+            if copy_threshold > 0 and len(records) >= copy_threshold:
+                batch_size = len(records)
+            
             # Process records in batches
             for i in range(0, len(records), batch_size):
                 batch = records[i:i + batch_size]
@@ -425,6 +525,8 @@ class TrackData(Base):
                             **defaults
                         }
                         batch_values.append(values)
+                        if parsed_out is not None:
+                            parsed_out.append(values)
                         
                     except Exception as e:
                         logger.warning(
@@ -434,68 +536,8 @@ class TrackData(Base):
                 
                 # Bulk insert/update using Core with retry on connection errors
                 if batch_values:
-                    # IMPORTANT: Deduplicate records within batch to avoid
-                    # "ON CONFLICT DO UPDATE command cannot affect row a second time"
-                    seen_keys = {}
-                    for values in batch_values:
-                        key = (values['imei'], values['gps_time'])
-                        seen_keys[key] = values  # Overwrites duplicates, keeping last
-                    
-                    deduplicated_values = list(seen_keys.values())
-                    duplicates_removed = len(batch_values) - len(deduplicated_values)
-                    
-                    if duplicates_removed > 0:
-                        logger.debug(f"Removed {duplicates_removed} duplicate records from batch (same imei+gps_time)")
-                    
-                    # Retry logic for transient connection errors
-                    max_retries = 3
-                    last_error = None
-                    
-                    for attempt in range(max_retries + 1):
-                        try:
-                            async with get_resilient_session() as session:
-                                try:
-                                    stmt = pg_insert(table).values(deduplicated_values)
-                                    
-                                    update_dict = {
-                                        col.name: text(f'EXCLUDED.{col.name}')
-                                        for col in table.columns
-                                        if col.name not in ('imei', 'gps_time')
-                                    }
-                                    
-                                    stmt = stmt.on_conflict_do_update(
-                                        index_elements=['imei', 'gps_time'],
-                                        set_=update_dict
-                                    )
-                                    
-                                    await session.execute(stmt)
-                                    await session.commit()
-                                    
-                                    stats['success'] += len(deduplicated_values)
-                                    record_success()  # Track successful operation
-                                    break  # Success - exit retry loop
-                                except Exception as db_error:
-                                    await session.rollback()
-                                    raise db_error
-                        except Exception as e:
-                            last_error = e
-                            
-                            if is_connection_error(e):
-                                record_failure()  # Track failure for engine reconnection
-                                
-                                if attempt < max_retries:
-                                    delay = 1.0 * (2 ** attempt)  # Exponential backoff
-                                    logger.warning(
-                                        f"Database connection error in batch (attempt {attempt + 1}/{max_retries + 1}): {e}. "
-                                        f"Retrying in {delay:.1f}s..."
-                                    )
-                                    await asyncio.sleep(delay)
-                                    continue
-                            
-                            # Either not a connection error, or all retries exhausted
-                            logger.error(f"Error processing batch: {e}", exc_info=True)
-                            stats['failed'] += len(batch_values)
-                            break
+                    use_copy = copy_threshold > 0 and len(batch) >= copy_threshold
+                    await _bulk_upsert(table, _deduplicate_batch(batch_values), use_copy, stats, len(batch_values))
 
             return stats
         
@@ -680,46 +722,48 @@ class Event(Base):
     distance: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
 
     @classmethod
-    async def create_from_record(cls, record: Dict[str, Any]) -> Optional['Event']:
-        """Create or update Event instance from record dictionary"""
+    def _parse_record_values(cls, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Column values for one event record, or None if the IMEI is invalid."""
+        imei_str = record.get('imei', 'UNKNOWN')
         try:
-            imei_str = record.get('imei', 'UNKNOWN')
-            try:
-                imei_int = int(imei_str) if imei_str != 'UNKNOWN' else 0
-            except (ValueError, TypeError):
-                logger.warning(f"Invalid IMEI format in record: {imei_str}")
-                return None
+            imei_int = int(imei_str) if imei_str != 'UNKNOWN' else 0
+        except (ValueError, TypeError):
+            logger.warning(f"Invalid IMEI format in record: {imei_str}")
+            return None
 
-            # Parse datetime fields using shared utility
-            server_time = parse_datetime_field(record, 'server_time')
-            gps_time = parse_datetime_field(record, 'gps_time', default=server_time)
-            # Bind naive UTC for TIMESTAMP WITHOUT TIME ZONE (asyncpg rejects aware datetimes)
-            server_time_naive = _to_naive_utc(server_time)
-            gps_time_naive = _to_naive_utc(gps_time)
+        # Parse datetime fields using shared utility
+        server_time = parse_datetime_field(record, 'server_time')
+        gps_time = parse_datetime_field(record, 'gps_time', default=server_time)
 
-            defaults = {
-                'server_time': server_time_naive,
-                'latitude': record.get('latitude', 0.0),
-                'longitude': record.get('longitude', 0.0),
-                'altitude': record.get('altitude', 0),
-                'angle': record.get('angle', 0),
-                'satellites': record.get('satellites', 0),
-                'speed': record.get('speed', 0),
-                'status': record.get('status', DEFAULT_STATUS),
-                'vendor': record.get('vendor', 'teltonika'),
-                'photo_url': record.get('photo_url'),
-                'video_url': record.get('video_url'),
-                'is_valid': record.get('is_valid', IS_VALID_TRUE),
-                'reference_id': parse_numeric_field(record, 'reference_id', int),
-                'distance': parse_numeric_field(record, 'distance', float)
-            }
+        # Bind naive UTC for TIMESTAMP WITHOUT TIME ZONE (asyncpg rejects aware datetimes)
+        return {
+            'imei': imei_int,
+            'gps_time': _to_naive_utc(gps_time),
+            'server_time': _to_naive_utc(server_time),
+            'latitude': record.get('latitude', 0.0),
+            'longitude': record.get('longitude', 0.0),
+            'altitude': record.get('altitude', 0),
+            'angle': record.get('angle', 0),
+            'satellites': record.get('satellites', 0),
+            'speed': record.get('speed', 0),
+            'status': record.get('status', DEFAULT_STATUS),
+            'vendor': record.get('vendor', 'teltonika'),
+            'photo_url': record.get('photo_url'),
+            'video_url': record.get('video_url'),
+            'is_valid': record.get('is_valid', IS_VALID_TRUE),
+            'reference_id': parse_numeric_field(record, 'reference_id', int),
+            'distance': parse_numeric_field(record, 'distance', float)
+        }
 
-            # Build values dict for Core insert
-            values = {
-                'imei': imei_int,
-                'gps_time': gps_time_naive,
-                **defaults
-            }
+    @classmethod
+    async def create_from_record(cls, record: Dict[str, Any]) -> Optional['Event']:
+        """Create or update Event instance from record dictionary"""
+        try:
+            values = cls._parse_record_values(record)
+            if values is None:
+                return None
+            imei_int = values['imei']
+            gps_time_naive = values['gps_time']
 
             # Use PostgreSQL-specific insert with ON CONFLICT DO UPDATE
             table = cls.__table__
@@ -761,7 +805,6 @@ class Event(Base):
             )
             return None
 
-
 class UnitIOMapping(Base):
     """Unit IO Mapping table"""
     __tablename__ = "unit_io_mapping"
@@ -786,6 +829,19 @@ class UnitIOMapping(Base):
     updateddate: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
+# LastStatus columns written by the consumer (metric engine state columns are never updated here)
+LASTSTATUS_CONSUMER_COLUMNS = frozenset({
+    'gps_time', 'server_time', 'latitude', 'longitude', 'altitude', 'angle',
+    'satellites', 'speed', 'reference_id', 'distance', 'vendor', 'updateddate',
+    'status', 'ignition', 'driver_seatbelt', 'passenger_seatbelt', 'door_status',
+    'passenger_seat', 'main_battery', 'battery_voltage', 'fuel',
+    'dallas_temperature_1', 'dallas_temperature_2', 'dallas_temperature_3', 'dallas_temperature_4',
+    'ble_temperature_1', 'ble_temperature_2', 'ble_temperature_3', 'ble_temperature_4',
+    'ble_humidity_1', 'ble_humidity_2', 'ble_humidity_3', 'ble_humidity_4',
+    'green_driving_value', 'dynamic_io', 'is_valid',
+})
+
+
 class LastStatus(Base):
     """laststatus table - stores latest status/position for each device.
     Consumer owns: position + trackdata mirror columns. Metric engine owns state columns only."""
@@ -950,24 +1006,13 @@ class LastStatus(Base):
                 'is_valid': is_valid,
             }
             table = cls.__table__
-            # Columns to update on conflict (consumer-owned only; exclude metric engine state columns)
-            consumer_columns = {
-                'gps_time', 'server_time', 'latitude', 'longitude', 'altitude', 'angle',
-                'satellites', 'speed', 'reference_id', 'distance', 'vendor', 'updateddate',
-                'status', 'ignition', 'driver_seatbelt', 'passenger_seatbelt', 'door_status',
-                'passenger_seat', 'main_battery', 'battery_voltage', 'fuel',
-                'dallas_temperature_1', 'dallas_temperature_2', 'dallas_temperature_3', 'dallas_temperature_4',
-                'ble_temperature_1', 'ble_temperature_2', 'ble_temperature_3', 'ble_temperature_4',
-                'ble_humidity_1', 'ble_humidity_2', 'ble_humidity_3', 'ble_humidity_4',
-                'green_driving_value', 'dynamic_io', 'is_valid',
-            }
             async with get_session() as session:
                 try:
                     stmt = pg_insert(table).values(values)
                     update_dict = {
                         col.name: text(f'EXCLUDED.{col.name}')
                         for col in table.columns
-                        if col.name != 'imei' and col.name in consumer_columns
+                        if col.name != 'imei' and col.name in LASTSTATUS_CONSUMER_COLUMNS
                     }
                     update_dict['updateddate'] = func.now()
                     stmt = stmt.on_conflict_do_update(index_elements=['imei'], set_=update_dict)
@@ -992,6 +1037,84 @@ class LastStatus(Base):
             )
 
 
+    @classmethod
+    async def upsert_batch(cls, parsed_records: List[Dict[str, Any]]) -> int:
+        """
+        Update or insert last status for a batch of records with a single statement.
+
+        The batch is reduced to the newest record per IMEI (by gps_time) and written with one
+        multi-row INSERT ... ON CONFLICT (imei) DO UPDATE. The update only applies when the
+        incoming gps_time is not older than the stored one, so out-of-order records never
+        move a device's last status backwards (same gps_time still applies, e.g. over the
+        minimal row the metric engine inserts for a new device).
+
+        Args:
+            parsed_records: Column value dicts as built by TrackData._parse_record_data
+                (imei, gps_time and the trackdata columns; naive UTC datetimes)
+
+        Returns:
+            Number of IMEIs sent to the database (0 on error)
+        """
+        newest: Dict[int, Dict[str, Any]] = {}
+        for values in parsed_records:
+            imei = values.get('imei')
+            if not imei:
+                continue
+            current = newest.get(imei)
+            if current is None or current['gps_time'] is None or (
+                values['gps_time'] is not None and values['gps_time'] >= current['gps_time']
+            ):
+                newest[imei] = values
+
+        if not newest:
+            return 0
+
+        rows = []
+        for imei, values in newest.items():
+            row = {
+                col: values.get(col)
+                for col in LASTSTATUS_CONSUMER_COLUMNS
+                if col != 'updateddate'
+            }
+            row['imei'] = imei
+            # Coerce columns the trackdata parse leaves as received
+            row['distance'] = _to_optional_float(row['distance'])
+            row['is_valid'] = _to_optional_int(row['is_valid'])
+            rows.append(row)
+
+        try:
+            table = cls.__table__
+            async with get_session() as session:
+                try:
+                    stmt = pg_insert(table).values(rows)
+                    update_dict = {
+                        col.name: stmt.excluded[col.name]
+                        for col in table.columns
+                        if col.name != 'imei' and col.name in LASTSTATUS_CONSUMER_COLUMNS
+                    }
+                    update_dict['updateddate'] = func.now()
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=['imei'],
+                        set_=update_dict,
+                        where=or_(table.c.gps_time.is_(None), stmt.excluded.gps_time >= table.c.gps_time),
+                    )
+                    await session.execute(stmt)
+                    await session.commit()
+                    return len(rows)
+                except Exception as db_error:
+                    await session.rollback()
+                    raise db_error
+        except (ConnectionError, OSError, TimeoutError, asyncio.TimeoutError) as e:
+            # Connection errors are expected - don't log full traceback
+            if isinstance(e, (socket.gaierror, socket.herror)):
+                logger.debug(f"Could not update LastStatus batch (DNS/host resolution): imeis={len(rows)}, error={e}")
+            else:
+                logger.debug(f"Could not update LastStatus batch (connection error): imeis={len(rows)}, error={e}")
+        except Exception as e:
+            logger.warning(f"Could not update LastStatus batch: imeis={len(rows)}, error={e}", exc_info=True)
+        return 0
+
+
 class LocationReference(Base):
     """Location reference table (POI/landmarks)"""
     __tablename__ = "location_reference"
@@ -15,24 +15,17 @@ from .message_deduplicator import get_deduplicator, increment_retry_count, clear
 
 logger = logging.getLogger(__name__)
 
-
-def _opt_bool(record: Dict[str, Any], key: str):
-    """Parse optional boolean from record (bool, int 0/1, str true/false)."""
-    val = record.get(key)
-    if val is None:
-        return None
-    if isinstance(val, bool):
-        return val
-    if isinstance(val, int):
-        return bool(val)
-    if isinstance(val, str):
-        return val.lower() in ('true', '1', 'yes', 'on')
-    return None
+# How often consumers of batched queues read the queue depth (BatchAccumulator.note_backlog)
+BACKLOG_CHECK_INTERVAL = 5.0
 
 
 class BatchAccumulator:
     """
     Accumulates messages and processes them in batches for better performance.
+    
+    Batches flush at batch_size records. While the queue holds a backlog of at least
+    copy_threshold ready messages (reported by the consumers through note_backlog), they grow
+    to copy_threshold records instead, so catch-up bursts are written with COPY ingest.
     """
     
     def __init__(
@@ -41,6 +34,7 @@ class BatchAccumulator:
         batch_timeout: float = 2.0,
         use_orm: bool = True,
         queue_name: Optional[str] = None,
+        copy_threshold: int = 0,
     ):
         """
         Initialize batch accumulator.
@@ -50,11 +44,14 @@ class BatchAccumulator:
             batch_timeout: Maximum time (seconds) to wait before flushing batch
             use_orm: Whether to use ORM method (with fallback to raw SQL)
             queue_name: Queue name for Prometheus metrics (e.g. trackdata_queue)
+            copy_threshold: Batch size at or above which COPY ingest is used (0 = disabled)
         """
         self.batch_size = batch_size
         self.batch_timeout = batch_timeout
         self.use_orm = use_orm
         self.queue_name = queue_name
+        self.copy_threshold = copy_threshold
+        self.backlog = 0  # Ready messages in the queue at the last check
         self.buffer: deque = deque()
         self.last_flush_time = asyncio.get_event_loop().time()
         self._flush_task: Optional[asyncio.Task] = None
@@ -64,9 +61,20 @@ class BatchAccumulator:
             'total_failed': 0,
             'batches_processed': 0,
             'orm_count': 0,
-            'raw_sql_count': 0
+            'raw_sql_count': 0,
+            'copy_batches': 0
         }
     
+    def note_backlog(self, ready_messages: int):
+        """Record the queue depth (ready messages) reported by a consumer."""
+        self.backlog = ready_messages
+    
+    def _flush_size(self) -> int:
+        """batch_size, or copy_threshold while the queue is backlogged (catch-up goes through COPY)."""
+        if self.copy_threshold > self.batch_size and self.backlog >= self.copy_threshold:
+            return self.copy_threshold
+        return self.batch_size
+    
     async def add(self, record: Dict[str, Any], model_class):
         """
         Add a record to the batch. Flushes automatically when batch is full.
@@ -83,7 +91,7 @@ class BatchAccumulator:
                 self._flush_task = asyncio.create_task(self._timeout_flush(model_class))
             
             # Flush if batch is full
-            if len(self.buffer) >= self.batch_size:
+            if len(self.buffer) >= self._flush_size():
                 await self._flush(model_class)
     
     async def _timeout_flush(self, model_class):
@@ -116,108 +124,19 @@ class BatchAccumulator:
         
         # Process batch
         try:
+            parsed_records: List[Dict[str, Any]] = []
             stats = await model_class.create_from_records_batch(
                 batch,
-                batch_size=self.batch_size
+                batch_size=self.batch_size,
+                parsed_out=parsed_records,
+                copy_threshold=self.copy_threshold
             )
             
-            # Update LastStatus for all records in batch
+            # Update LastStatus for all records in batch (newest record per IMEI, one statement)
             # This ensures laststatus table is updated even with batch processing
             try:
                 from consumer.models import LastStatus
-                from datetime import datetime, timezone
-                from dateutil import parser
-
-                def _ensure_utc(dt):
-                    if dt.tzinfo is None:
-                        return dt.replace(tzinfo=timezone.utc)
-                    return dt.astimezone(timezone.utc)
-
-                # Update LastStatus for each record in the batch
-                for record in batch:
-                    try:
-                        imei_str = record.get('imei', 'UNKNOWN')
-                        if imei_str == 'UNKNOWN':
-                            continue
-                        
-                        imei_int = int(imei_str)
-                        
-                        # Parse timestamps (ensure UTC for consistency)
-                        gps_time_str = record.get('gps_time', '')
-                        if isinstance(gps_time_str, str):
-                            try:
-                                gps_time = _ensure_utc(parser.parse(gps_time_str))
-                            except (ValueError, TypeError, AttributeError):
-                                gps_time = datetime.now(timezone.utc)
-                        elif isinstance(gps_time_str, datetime):
-                            gps_time = _ensure_utc(gps_time_str)
-                        else:
-                            gps_time = datetime.now(timezone.utc)
-                        
-                        server_time_str = record.get('server_time', '')
-                        if isinstance(server_time_str, str):
-                            try:
-                                server_time = _ensure_utc(parser.parse(server_time_str))
-                            except (ValueError, TypeError, AttributeError):
-                                server_time = datetime.now(timezone.utc)
-                        elif isinstance(server_time_str, datetime):
-                            server_time = _ensure_utc(server_time_str)
-                        else:
-                            server_time = datetime.now(timezone.utc)
-                        
-                        # Parse dynamic_io for laststatus (consumer-owned trackdata mirror)
-                        dio = record.get('dynamic_io')
-                        if isinstance(dio, str):
-                            try:
-                                dio = json.loads(dio) if dio else {}
-                            except (json.JSONDecodeError, TypeError):
-                                dio = {}
-                        elif not isinstance(dio, dict):
-                            dio = {}
-
-                        # Update LastStatus (consumer-owned columns only; do not update metric engine state columns)
-                        await LastStatus.upsert(
-                            imei=imei_int,
-                            gps_time=gps_time,
-                            server_time=server_time,
-                            latitude=record.get('latitude', 0.0),
-                            longitude=record.get('longitude', 0.0),
-                            altitude=record.get('altitude', 0),
-                            angle=record.get('angle', 0),
-                            satellites=record.get('satellites', 0),
-                            speed=record.get('speed', 0),
-                            reference_id=record.get('reference_id'),
-                            distance=record.get('distance'),
-                            vendor=record.get('vendor', 'teltonika'),
-                            status=record.get('status'),
-                            ignition=_opt_bool(record, 'ignition'),
-                            driver_seatbelt=_opt_bool(record, 'driver_seatbelt'),
-                            passenger_seatbelt=_opt_bool(record, 'passenger_seatbelt'),
-                            door_status=_opt_bool(record, 'door_status'),
-                            passenger_seat=record.get('passenger_seat'),
-                            main_battery=record.get('main_battery'),
-                            battery_voltage=record.get('battery_voltage'),
-                            fuel=record.get('fuel'),
-                            dallas_temperature_1=record.get('dallas_temperature_1'),
-                            dallas_temperature_2=record.get('dallas_temperature_2'),
-                            dallas_temperature_3=record.get('dallas_temperature_3'),
-                            dallas_temperature_4=record.get('dallas_temperature_4'),
-                            ble_temperature_1=record.get('ble_temperature_1'),
-                            ble_temperature_2=record.get('ble_temperature_2'),
-                            ble_temperature_3=record.get('ble_temperature_3'),
-                            ble_temperature_4=record.get('ble_temperature_4'),
-                            ble_humidity_1=record.get('ble_humidity_1'),
-                            ble_humidity_2=record.get('ble_humidity_2'),
-                            ble_humidity_3=record.get('ble_humidity_3'),
-                            ble_humidity_4=record.get('ble_humidity_4'),
-                            green_driving_value=record.get('green_driving_value'),
-                            dynamic_io=dio,
-                            is_valid=record.get('is_valid'),
-                        )
-                    except Exception as e:
-                        logger.debug(f"Error updating LastStatus for record: {e}")
-                        # Don't fail the batch if LastStatus update fails
-                        continue
+                await LastStatus.upsert_batch(parsed_records)
             except Exception as e:
                 logger.warning(f"Error updating LastStatus for batch: {e}", exc_info=True)
                 # Don't fail the batch if LastStatus update fails
@@ -226,6 +145,8 @@ class BatchAccumulator:
             self._stats['total_processed'] += stats['success']
             self._stats['total_failed'] += stats['failed']
             self._stats['batches_processed'] += 1
+            if self.copy_threshold > 0 and len(batch) >= self.copy_threshold:
+                self._stats['copy_batches'] += 1
 
             if self.queue_name:
                 try:
@@ -725,9 +646,21 @@ class RabbitMQConsumer:
                 future = asyncio.Future()
                 
                 # Set up a task to check _consuming periodically and cancel future when needed
+                batch = getattr(self.handler, '_batch', None)
+                
                 async def check_consuming():
+                    next_backlog_check = 0.0
                     while self._consuming:
                         await asyncio.sleep(1)
+                        # Batched queues: report the queue depth so the accumulator can switch to COPY-sized batches
+                        now = asyncio.get_event_loop().time()
+                        if batch is not None and batch.copy_threshold > 0 and now >= next_backlog_check:
+                            next_backlog_check = now + BACKLOG_CHECK_INTERVAL
+                            try:
+                                declare_ok = await self.queue.declare()
+                                batch.note_backlog(declare_ok.message_count)
+                            except Exception as e:
+                                logger.debug(f"[{self.queue_name}] Queue depth check failed: {e}")
                         # Also check if connection is still alive
                         if self.connection and self.connection.is_closed:
                             logger.warning(f"[{self.queue_name}] Connection closed during consumption, will reconnect...")
@@ -820,12 +753,14 @@ async def create_database_consumer(workers: int = 5) -> list[RabbitMQConsumer]:
     consumer_config = config.get('consumer', {})
     batch_size = int(consumer_config.get('batch_size', 200))  
     batch_timeout = float(consumer_config.get('batch_timeout', 2.0))
+    copy_threshold = int(consumer_config.get('copy_threshold', 0))
     
     # Create shared batch accumulator for trackdata (SQLAlchemy handles composite keys natively)
     trackdata_batch = BatchAccumulator(
         batch_size=batch_size,
         batch_timeout=batch_timeout,
         queue_name="trackdata_queue",
+        copy_threshold=copy_threshold,
     )
     
     async def handle_trackdata(message: Dict[str, Any]):
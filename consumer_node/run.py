@@ -62,6 +62,7 @@ async def main():
         # Start deduplication cleanup task
         try:
             deduplicator = get_deduplicator()
+            await deduplicator.warm_bloom_filter()  # No-op unless deduplication.bloom_filter is enabled
             await deduplicator.start_cleanup_task(interval_seconds=300)  # Cleanup every 5 minutes
             logger.info("✓ Message deduplication cleanup task started")
         except Exception as e:
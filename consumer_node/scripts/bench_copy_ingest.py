@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Trackdata ingest benchmark: multi-row INSERT ... ON CONFLICT vs COPY + staging merge.
+
+Writes synthetic parser records into a scratch copy of the trackdata table
+(bench_ingest_trackdata, created with LIKE trackdata and dropped afterwards) and
+reports rows/sec for both paths, for fresh inserts and for re-delivered rows that
+hit ON CONFLICT DO UPDATE. Uses the database from config.json.
+
+The INSERT path is split into statements of at most 32767 bind parameters (the
+PostgreSQL protocol limit), as a large batch would have to be.
+
+Usage (from consumer_node, with the database reachable):
+  python scripts/bench_copy_ingest.py
+  python scripts/bench_copy_ingest.py --rows 20000 --batch-sizes 200,1000,5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# Allow importing consumer/config when run from repo root or consumer_node
+_consumer_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _consumer_root not in sys.path:
+    sys.path.insert(0, _consumer_root)
+
+from sqlalchemy import MetaData, text  # noqa: E402
+from sqlalchemy.dialects.postgresql import insert as pg_insert  # noqa: E402
+
+from consumer.copy_ingest import copy_upsert  # noqa: E402
+from consumer.models import TrackData  # noqa: E402
+from consumer.sqlalchemy_base import close_sqlalchemy, get_session, init_sqlalchemy  # noqa: E402
+
+SCRATCH_TABLE = "bench_ingest_trackdata"
+MAX_BIND_PARAMS = 32767
+
+
+def build_records(count: int, imeis: int) -> list:
+    """Synthetic parser records, unique per (imei, gps_time), parsed like the consumer does."""
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    now = datetime.now(timezone.utc).isoformat()
+    rows = []
+    for i in range(count):
+        record = {
+            'imei': str(356307042440000 + i % imeis),
+            'gps_time': (start + timedelta(seconds=i // imeis)).isoformat(),
+            'server_time': now,
+            'latitude': 24.8 + rng.random(),
+            'longitude': 67.0 + rng.random(),
+            'altitude': rng.randint(0, 200),
+            'angle': rng.randint(0, 359),
+            'satellites': rng.randint(4, 14),
+            'speed': rng.randint(0, 120),
+            'status': 'Normal',
+            'ignition': 1,
+            'main_battery': '12.600',
+            'fuel': str(rng.randint(10, 90)),
+            'dynamic_io': '{"io_66": 12600, "io_67": 4100}',
+            'is_valid': 1,
+        }
+        parsed = TrackData._parse_record_data(record)
+        rows.append({'imei': parsed['imei'], 'gps_time': parsed['gps_time'], **parsed['defaults']})
+    return rows
+
+
+async def insert_values(table, rows: list) -> None:
+    """Current path: pg_insert(...).values(rows).on_conflict_do_update, chunked by bind limit."""
+    per_statement = max(1, MAX_BIND_PARAMS // len(rows[0]))
+    update_dict = {
+        col.name: text(f'EXCLUDED.{col.name}')
+        for col in table.columns
+        if col.name in rows[0] and col.name not in ('imei', 'gps_time')
+    }
+    async with get_session() as session:
+        for i in range(0, len(rows), per_statement):
+            stmt = pg_insert(table).values(rows[i:i + per_statement])
+            stmt = stmt.on_conflict_do_update(index_elements=['imei', 'gps_time'], set_=update_dict)
+            await session.execute(stmt)
+        await session.commit()
+
+
+async def insert_copy(table, rows: list) -> None:
+    await copy_upsert(table, rows, ('imei', 'gps_time'))
+
+
+async def run_path(func, table, rows: list, batch_size: int) -> float:
+    """Write all rows in batches of batch_size; return rows/sec."""
+    started = time.perf_counter()
+    for i in range(0, len(rows), batch_size):
+        await func(table, rows[i:i + batch_size])
+    elapsed = time.perf_counter() - started
+    return len(rows) / elapsed if elapsed > 0 else float('inf')
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark trackdata INSERT vs COPY ingest")
+    parser.add_argument("--rows", type=int, default=10000, help="Records written per run")
+    parser.add_argument("--imeis", type=int, default=500, help="Distinct IMEIs in the synthetic data")
+    parser.add_argument("--batch-sizes", default="200,1000,5000", help="Comma-separated batch sizes")
+    args = parser.parse_args()
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',') if size.strip()]
+    rows = build_records(args.rows, args.imeis)
+    table = TrackData.__table__.to_metadata(MetaData(), name=SCRATCH_TABLE)
+
+    await init_sqlalchemy(retry=False)
+    try:
+        async with get_session() as session:
+            await session.execute(text(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}"))
+            await session.execute(text(
+                f"CREATE TABLE {SCRATCH_TABLE} (LIKE trackdata INCLUDING DEFAULTS INCLUDING INDEXES)"
+            ))
+            await session.commit()
+
+        print(f"{args.rows} rows, {args.imeis} IMEIs, {len(rows[0])} columns")
+        print(f"{'batch':>7}  {'path':<7}  {'insert rows/s':>14}  {'conflict rows/s':>16}")
+        for batch_size in batch_sizes:
+            for name, func in (("values", insert_values), ("copy", insert_copy)):
+                async with get_session() as session:
+                    await session.execute(text(f"TRUNCATE {SCRATCH_TABLE}"))
+                    await session.commit()
+                fresh = await run_path(func, table, rows, batch_size)
+                # Same rows again: every row takes the ON CONFLICT DO UPDATE branch
+                conflict = await run_path(func, table, rows, batch_size)
+                print(f"{batch_size:>7}  {name:<7}  {fresh:>14,.0f}  {conflict:>16,.0f}")
+    finally:
+        try:
+            async with get_session() as session:
+                await session.execute(text(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}"))
+                await session.commit()
+        finally:
+            await close_sqlalchemy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -454,6 +454,35 @@ CREATE INDEX IF NOT EXISTS idx_unit_io_mapping_imei_io_id ON unit_io_mapping (im
 CREATE INDEX IF NOT EXISTS idx_unit_io_mapping_target ON unit_io_mapping (target);
 CREATE INDEX IF NOT EXISTS idx_unit_io_mapping_is_alarm ON unit_io_mapping (is_alarm);
 
+-- Unit IO mapping change notifications: parser nodes LISTEN io_mapping_change and reload the
+-- cached mappings of that IMEI on its next packet. Identical payloads are delivered once per
+-- transaction, so bulk edits of one tracker (apply-template, copy) send a single notification.
+CREATE OR REPLACE FUNCTION notify_unit_io_mapping_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('io_mapping_change', TG_TABLE_NAME || ':');
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('io_mapping_change', TG_TABLE_NAME || ':' || OLD.imei::TEXT);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('io_mapping_change', TG_TABLE_NAME || ':' || NEW.imei::TEXT);
+    END IF;
+    IF TG_OP = 'DELETE' THEN RETURN OLD; END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS tr_unit_io_mapping_change ON unit_io_mapping;
+CREATE TRIGGER tr_unit_io_mapping_change
+    AFTER INSERT OR UPDATE OR DELETE ON unit_io_mapping
+    FOR EACH ROW EXECUTE PROCEDURE notify_unit_io_mapping_change();
+DROP TRIGGER IF EXISTS tr_unit_io_mapping_truncate ON unit_io_mapping;
+CREATE TRIGGER tr_unit_io_mapping_truncate
+    AFTER TRUNCATE ON unit_io_mapping
+    FOR EACH STATEMENT EXECUTE PROCEDURE notify_unit_io_mapping_change();
+
 -- Device IO Mapping Templates table (default IO mappings per device type)
 -- When a tracker is registered, it can inherit IO mappings from its device type
 CREATE TABLE IF NOT EXISTS device_io_mapping (
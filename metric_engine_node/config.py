@@ -93,9 +93,39 @@ class Config:
                 "enabled": True,
                 "shadow_mode": False,
                 "recalculation_batch_size": 500,
+                "recalculation_workers": 3,
+                "recalculation_progress_interval_sec": 10.0,
+                "recalculation_batch_calculators": True,
+                "config_snapshot_enabled": True,
+                "config_snapshot_refresh_sec": 300.0,
+                "config_snapshot_poll_sec": 30.0,
+                "geocode_cache_max_entries": 100000,
+                "geocode_cache_ttl_sec": 86400.0,
+                "geocode_negative_ttl_sec": 300.0,
+                "geocode_write_batch_size": 500,
+                "geocode_write_flush_sec": 5.0,
                 "recalculation_poll_interval_sec": 60.0,
                 "scheduled_refresh_interval_sec": 86400.0,
                 "scheduled_refresh_initial_delay_sec": 300.0,
+                "state_cache_enabled": True,
+                "state_cache_flush_interval_sec": 1.0,
+                "state_cache_max_dirty": 200,
+                "state_cache_max_entries": 100000,
+                "tracker_cache_ttl_sec": 300.0,
+                "fence_index_enabled": True,
+                "fence_index_ttl_sec": 300.0,
+                "calibration_cache_ttl_sec": 300.0,
+                "road_tile_cache_enabled": True,
+                "road_tile_cache_max_tiles": 5000,
+                "road_tile_cache_ttl_sec": 3600.0,
+                "windowed_consumption": True,
+                "window_concurrency": 8,
+                "pending_memory_max": 1000,
+                "pending_spill_dir": "data/metric_engine/pending_writes",
+                "pending_segment_max_items": 10000,
+                "pending_spill_max_mb": 1024,
+                "pending_flush_batch_size": 500,
+                "pending_backpressure_items": 50000,
             },
             "logging": {
                 "log_file": "logs/metric_engine.log",
@@ -0,0 +1,191 @@
+"""
+Per-IMEI recalculation session (plan § 9B.2).
+Reference data (config, tracker row, client fence index, calibration curve) is loaded once when
+the IMEI starts instead of per record. Records then buffer their output here: state updates are
+coalesced, metric_events / trip distance / stoppage rows are collected, and everything is written
+at each trackdata chunk boundary by db.write_buffered_chunk (one transaction per chunk).
+
+Trip start/end (_trip_action) is written through after flushing the buffer: the trip row and
+current_trip_id must exist before later records of the chunk reference them.
+
+precompute runs the batch-capable calculators (calculate_batch) once over a page of records; the
+pipeline then runs only the other calculators per record and merges both in registry order.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .calculators.base import CalculatorResult, RecordFrame
+from .db import get_pool, update_laststatus_state, write_buffered_chunk
+
+logger = logging.getLogger(__name__)
+
+
+class BackfillSession:
+    """Reference data and buffered writes for one IMEI being recalculated."""
+
+    def __init__(self, imei: int):
+        self.imei = imei
+        self.tracker: Optional[Dict[str, Any]] = None
+        self._updates: Dict[str, Any] = {}
+        self._gps_time: Optional[datetime] = None
+        self._insert_gps_time: Optional[datetime] = None
+        self._insert_if_missing: Optional[Dict[str, Any]] = None
+        self._vehicle_states: List[Tuple[datetime, Any]] = []
+        self._events: List[Dict[str, Any]] = []
+        self._trip_distances: Dict[int, Tuple[float, datetime]] = {}
+        self._stoppages: List[Dict[str, Any]] = []
+
+    async def preload(self) -> None:
+        """Load config, tracker, fences and calibration curve once; calculators then hit the caches."""
+        from .config_resolution import get_config_cached
+        from .pipeline import _get_tracker
+        from .calculators.geofence.fence_index import get_fence_index
+        from .calibration_cache import get_calibration_cache
+
+        await get_config_cached(self.imei)
+        self.tracker = await _get_tracker(self.imei)
+        try:
+            fence_index = get_fence_index()
+            if fence_index is not None:
+                pool = await get_pool()
+                async with pool.acquire() as conn:
+                    await fence_index.get_for_imei(conn, self.imei)
+            vehicle_id = self.tracker.get("vehicle_id") if self.tracker else None
+            if vehicle_id is not None:
+                await get_calibration_cache().get_curve(vehicle_id)
+        except Exception as e:
+            logger.debug("Backfill preload failed for imei=%s: %s", self.imei, e)
+
+    async def precompute(
+        self, records: List[Dict[str, Any]], state: Dict[str, Any]
+    ) -> List[Optional[Dict[str, CalculatorResult]]]:
+        """Batch calculator results per record (name -> result) for a page in gps_time order.
+        state is the running state before the page; None for records the pipeline will not
+        calculate (invalid or stale), and for all records when batching is disabled."""
+        from config import Config
+        from .config_resolution import get_config_cached
+        from .pipeline import _parse_gps_time, _validate_record
+        from .calculators.registry import get_applicable_calculators, run_calculators_batch
+
+        out: List[Optional[Dict[str, CalculatorResult]]] = [None] * len(records)
+        if Config.get_metric_engine_config().get("recalculation_batch_calculators") is False:
+            return out
+        config = await get_config_cached(self.imei)
+        calculators = [
+            c for c in get_applicable_calculators(self.imei, self.tracker, config) if c.supports_batch
+        ]
+        if not calculators:
+            return out
+        # Same skips as process_record; rows are strictly increasing in gps_time, so only the
+        # running state's last time can make a row stale
+        prev_gps = state.get("last_processed_gps_time") or state.get("gps_time")
+        if prev_gps is not None and not isinstance(prev_gps, datetime):
+            return out
+        rows: List[int] = []
+        gps_times: List[datetime] = []
+        for i, record in enumerate(records):
+            if _validate_record(record, self.imei):
+                continue
+            gps_time = _parse_gps_time(record)
+            if prev_gps is not None and gps_time.timestamp() <= prev_gps.timestamp():
+                continue
+            rows.append(i)
+            gps_times.append(gps_time)
+        if not rows:
+            return out
+        frame = RecordFrame(
+            self.imei,
+            [records[i] for i in rows],
+            gps_times,
+            dict(state),
+            config,
+            vehicle_id=self.tracker.get("vehicle_id") if self.tracker else None,
+        )
+        batch = await run_calculators_batch(calculators, frame)
+        if not batch:
+            return out
+        for j, i in enumerate(rows):
+            out[i] = {name: results[j] for name, results in batch.items()}
+        return out
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._updates or self._events or self._trip_distances or self._stoppages)
+
+    async def add_record(
+        self,
+        state_updates: Dict[str, Any],
+        previous_state: Dict[str, Any],
+        events: List[Dict[str, Any]],
+        stoppage_log_entries: List[Dict[str, Any]],
+        gps_time: datetime,
+        distance_km: Optional[float],
+        trip_id: Optional[int],
+        insert_if_missing: Optional[Dict[str, Any]],
+    ) -> None:
+        """Buffer one record's output (same writes, in the same order, as the live pipeline)."""
+        if state_updates:
+            if state_updates.get("_trip_action"):
+                await self.flush()
+                await update_laststatus_state(
+                    self.imei, state_updates, gps_time=gps_time, insert_if_missing=insert_if_missing
+                )
+            else:
+                self._updates.update(state_updates)
+                self._gps_time = gps_time
+                if state_updates.get("vehicle_state") is not None:
+                    self._vehicle_states.append((gps_time, state_updates["vehicle_state"]))
+                if insert_if_missing and self._insert_if_missing is None:
+                    self._insert_gps_time = gps_time
+                    self._insert_if_missing = insert_if_missing
+
+        if trip_id and distance_km:
+            total, _ = self._trip_distances.get(trip_id, (0.0, gps_time))
+            self._trip_distances[trip_id] = (total + distance_km, gps_time)
+
+        for entry in stoppage_log_entries or []:
+            if entry.get("trip_id") and entry.get("start_time") and entry.get("end_time"):
+                self._stoppages.append(dict(entry))
+
+        # Same condition as the pipeline: checked after the state write consumed _trip_action
+        if state_updates.get("_trip_action") == "end" and previous_state.get("stoppage_start_time") and previous_state.get("current_trip_id"):
+            from dateutil import parser as date_parser
+            st = previous_state.get("stoppage_start_time")
+            st = date_parser.parse(str(st)) if isinstance(st, str) else st
+            self._stoppages.append({
+                "trip_id": previous_state.get("current_trip_id"),
+                "stoppage_type": "Stop",
+                "start_time": st,
+                "end_time": gps_time,
+                "latitude": previous_state.get("stoppage_start_lat"),
+                "longitude": previous_state.get("stoppage_start_lon"),
+                "inside_fence_id": None,
+            })
+
+        if events:
+            self._events.extend(events)
+
+    async def flush(self) -> None:
+        """Write buffered state, history, trip distance, stoppages and events in one transaction."""
+        if not self.pending:
+            return
+        updates = dict(self._updates)
+        if updates and self._gps_time is not None:
+            updates["last_processed_gps_time"] = self._gps_time
+        state = {
+            "imei": self.imei,
+            "updates": updates,
+            "insert_gps_time": self._insert_gps_time,
+            "insert_if_missing": self._insert_if_missing,
+            "vehicle_states": self._vehicle_states,
+        }
+        await write_buffered_chunk([state] if updates else [], self._events, self._trip_distances, self._stoppages)
+        self._updates = {}
+        self._gps_time = None
+        self._insert_gps_time = None
+        self._insert_if_missing = None
+        self._vehicle_states = []
+        self._events = []
+        self._trip_distances = {}
+        self._stoppages = []
@@ -1,12 +1,19 @@
 """
 Calculator base class and context (plan § 7.3).
 Context: current record, previous state, config, tracker capabilities.
+Calculators declare the state keys they set (outputs) and the same-record keys they read from
+other calculators (inputs); registry.run_calculators orders them into stages from that.
+Calculators with supports_batch also implement calculate_batch over a RecordFrame (consecutive
+records of one IMEI as NumPy columns); recalculation runs them once per page (registry.run_calculators_batch).
 """
+import asyncio
 import logging
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +32,18 @@ class CalculatorContext:
     period_start: Optional[datetime] = None
     period_end: Optional[datetime] = None
     vehicle_id: Optional[int] = None  # from tracker; used e.g. for calibration lookup (Phase 3)
+    # Results of calculators already run for this record, by name (inputs are guaranteed to be here)
+    results: Dict[str, "CalculatorResult"] = field(default_factory=dict)
+    # Lookups shared by calculators for this record (see calculators/lookups.py)
+    memo: Dict[Any, "asyncio.Future"] = field(default_factory=dict)
+
+    async def memoized(self, key: Any, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Run loader once per context for key; concurrent callers await the same call."""
+        fut = self.memo.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(loader())
+            self.memo[key] = fut
+        return await asyncio.shield(fut)
 
 
 @dataclass
@@ -42,6 +61,167 @@ class CalculatorResult:
         return self
 
 
+def as_utc(value: Any) -> Any:
+    """State timestamp (datetime, or string as read back from the DB) as an aware datetime (naive = UTC)."""
+    if isinstance(value, str):
+        from dateutil import parser
+        value = parser.parse(value)
+    if isinstance(value, datetime) and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+# Shared by the rows of RecordFrame.empty_results that produce nothing; never modified
+_EMPTY_RESULT = CalculatorResult()
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def epoch_us(value: Any) -> int:
+    """State timestamp as integer microseconds since the epoch (exact, so durations match timedelta)."""
+    return (as_utc(value) - _EPOCH) // _MICROSECOND
+
+
+def episode_bounds(active: np.ndarray, active_before: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows where a carried episode (overspeed, idling, out of range) starts and ends.
+    active_before: an episode is open before the first row (its start time is in previous_state).
+    Returns (starts, ends): active rows after an inactive one, inactive rows after an active one."""
+    before = np.empty_like(active)
+    if len(active):
+        before[0] = active_before
+        before[1:] = active[:-1]
+    return active & ~before, ~active & before
+
+
+def episode_start_rows(starts: np.ndarray) -> np.ndarray:
+    """Row that started the episode of each row (last start at or before it); -1 before the first start."""
+    rows = np.where(starts, np.arange(len(starts)), -1)
+    return np.maximum.accumulate(rows) if len(rows) else rows
+
+
+class RecordFrame:
+    """Consecutive records of one IMEI in gps_time order, read as NumPy columns by calculate_batch.
+
+    previous_state is the carried state before the first row. State set by other batch calculators
+    (run earlier, in registry order) is read per row with state_before(key).
+    """
+
+    def __init__(
+        self,
+        imei: int,
+        records: List[Dict[str, Any]],
+        gps_time: List[datetime],
+        previous_state: Dict[str, Any],
+        config: Dict[str, str],
+        vehicle_id: Optional[int] = None,
+    ):
+        self.imei = imei
+        self.records = records
+        self.gps_time = gps_time
+        self.previous_state = previous_state
+        self.config = config
+        self.vehicle_id = vehicle_id
+        self._columns: Dict[Any, Any] = {}
+        self._results: List[List["CalculatorResult"]] = []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def column(self, name: str) -> List[Any]:
+        """Raw values of one record field."""
+        col = self._columns.get(name)
+        if col is None:
+            col = [r.get(name) for r in self.records]
+            self._columns[name] = col
+        return col
+
+    def numbers(self, name: str, missing: float = 0.0, lenient: bool = False) -> np.ndarray:
+        """Field as a float64 array, None -> missing. Values float() rejects raise ValueError, or
+        with lenient become missing (as sensor COALESCE skips them)."""
+        key = ("#", name, missing, lenient)
+        arr = self._columns.get(key)
+        if arr is None:
+            values = [missing if v is None else v for v in self.column(name)]
+            try:
+                arr = np.array(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                if not lenient:
+                    raise
+                arr = np.array([_float_or(v, missing) for v in values], dtype=np.float64)
+            self._columns[key] = arr
+        return arr
+
+    def integers(self, name: str) -> np.ndarray:
+        """Field as int64 array with int(v or 0) semantics (speed)."""
+        key = ("int", name)
+        arr = self._columns.get(key)
+        if arr is None:
+            arr = np.trunc(self.numbers(name)).astype(np.int64)
+            self._columns[key] = arr
+        return arr
+
+    def coalesce(self, names: Sequence[str]) -> np.ndarray:
+        """First numeric value of names per row (NaN if none), like a COALESCE of sensor columns."""
+        out = np.full(len(self.records), np.nan)
+        for name in names:
+            values = self.numbers(name, np.nan, lenient=True)
+            out = np.where(np.isnan(out), values, out)
+        return out
+
+    def time_us(self) -> np.ndarray:
+        """gps_time as int64 microseconds since the epoch."""
+        arr = self._columns.get("$time_us")
+        if arr is None:
+            arr = np.fromiter((epoch_us(t) for t in self.gps_time), dtype=np.int64, count=len(self.gps_time))
+            self._columns["$time_us"] = arr
+        return arr
+
+    def derived(self, name: str, fn: Callable[[Dict[str, Any]], Any], dtype: Any = bool) -> np.ndarray:
+        """fn(record) per row as an array, computed once per frame (e.g. parsed ignition, shared by calculators)."""
+        key = "$" + name
+        arr = self._columns.get(key)
+        if arr is None:
+            arr = np.fromiter((fn(r) for r in self.records), dtype=dtype, count=len(self.records))
+            self._columns[key] = arr
+        return arr
+
+    def add_results(self, results: List["CalculatorResult"]) -> None:
+        self._results.append(results)
+
+    def state_before(self, key: str) -> List[Any]:
+        """Value of a state key before each row: previous_state plus updates of batch calculators run so far."""
+        value = self.previous_state.get(key)
+        out = []
+        for i in range(len(self.records)):
+            out.append(value)
+            for results in self._results:
+                updates = results[i].state_updates
+                if key in updates:
+                    value = updates[key]
+        return out
+
+    def empty_results(self) -> List["CalculatorResult"]:
+        """One result per row, all the same read-only empty result; calculate_batch fills in the rows
+        that change through result_at."""
+        return [_EMPTY_RESULT] * len(self.records)
+
+
+def result_at(results: List[CalculatorResult], row: int) -> CalculatorResult:
+    """Writable result of a row from RecordFrame.empty_results (a new one replaces the shared empty result)."""
+    result = results[row]
+    if result is _EMPTY_RESULT:
+        result = results[row] = CalculatorResult()
+    return result
+
+
+def _float_or(value: Any, missing: float) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return missing
+
+
 class BaseCalculator(ABC):
     """Base for all calculators. Category: core | sensor | violation | geofence | trip. Plan § 9.3: formula_version for backfill/versioning."""
 
@@ -51,6 +231,12 @@ class BaseCalculator(ABC):
     requires_config: List[str] = []
     trigger: str = "realtime"
     formula_version: str = "1.0.0"
+    # State keys this calculator may set; None = unknown (runs alone, in registry order)
+    outputs: Optional[Tuple[str, ...]] = None
+    # State keys set by other calculators for the same record that this one reads from ctx.results
+    inputs: Tuple[str, ...] = ()
+    # True if calculate_batch is implemented
+    supports_batch: bool = False
 
     def applies_to(self, tracker: Optional[Dict], config: Dict[str, str]) -> bool:
         """Return True if this calculator should run for this tracker."""
@@ -65,3 +251,9 @@ class BaseCalculator(ABC):
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
         """Compute and return state updates + events."""
         pass
+
+    async def calculate_batch(self, imei: int, frame: RecordFrame) -> List[CalculatorResult]:
+        """One result per frame row, the same as calculate() on each record in turn with state carried.
+        Own state is carried from frame.previous_state; state read across rows must only be set by
+        this calculator or by batch calculators earlier in registry order (frame.state_before)."""
+        raise NotImplementedError
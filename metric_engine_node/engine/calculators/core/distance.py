@@ -4,9 +4,11 @@ Filter: speed < MAX_SPEED_FILTER, point_distance < 10 km, speed > 0.
 """
 import math
 import logging
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+import numpy as np
+
+from ..base import BaseCalculator, CalculatorContext, CalculatorResult, RecordFrame, result_at
 
 logger = logging.getLogger(__name__)
 
@@ -26,12 +28,23 @@ def haversine_km(
     return EARTH_RADIUS_KM * c
 
 
+def haversine_km_array(
+    lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray
+) -> np.ndarray:
+    """haversine_km over arrays (NaN where a coordinate is NaN)."""
+    lat1, lon1, lat2, lon2 = np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+
 class DistanceCalculator(BaseCalculator):
     """Point-to-point distance; filter GPS errors."""
 
     name = "distance"
     category = "core"
+    outputs = ("last_distance_km",)
     requires_config = ["MAX_SPEED_FILTER"]
+    supports_batch = True
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
         record = ctx.record
@@ -48,3 +61,17 @@ class DistanceCalculator(BaseCalculator):
         if speed <= 0 or speed >= max_speed or dist_km >= MAX_POINT_DISTANCE_KM:
             return CalculatorResult()
         return CalculatorResult(state_updates={"last_distance_km": dist_km})
+
+    async def calculate_batch(self, imei: int, frame: RecordFrame) -> List[CalculatorResult]:
+        max_speed = int(frame.config.get("MAX_SPEED_FILTER", "150"))
+        speeds = frame.integers("speed")
+        # Previous position is state (not carried by the pipeline between records, as in calculate)
+        prev_lats = np.array(frame.state_before("latitude"), dtype=np.float64)
+        prev_lons = np.array(frame.state_before("longitude"), dtype=np.float64)
+        dist_km = haversine_km_array(prev_lats, prev_lons, frame.numbers("latitude"), frame.numbers("longitude"))
+        # NaN (no previous position) fails every comparison
+        keep = (speeds > 0) & (speeds < max_speed) & (dist_km < MAX_POINT_DISTANCE_KM)
+        results = frame.empty_results()
+        for i in np.flatnonzero(keep):
+            result_at(results, i).state_updates["last_distance_km"] = float(dist_km[i])
+        return results
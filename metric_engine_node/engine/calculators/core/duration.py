@@ -3,9 +3,11 @@ Duration calculator: idle start time when ignition on + speed=0 (METRICS_SPEC §
 Updates idle_start_time in laststatus when entering idle.
 """
 import logging
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+import numpy as np
+
+from ..base import BaseCalculator, CalculatorContext, CalculatorResult, RecordFrame, episode_bounds, result_at
 from ..core.vehicle_state import _parse_ignition
 
 logger = logging.getLogger(__name__)
@@ -16,7 +18,9 @@ class DurationCalculator(BaseCalculator):
 
     name = "duration"
     category = "core"
+    outputs = ("idle_start_time",)
     requires_config = ["IDLE_THRESHOLD"]
+    supports_batch = True
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
         record = ctx.record
@@ -32,3 +36,14 @@ class DurationCalculator(BaseCalculator):
             if prev.get("idle_start_time"):
                 state_updates["idle_start_time"] = None
         return CalculatorResult(state_updates=state_updates)
+
+    async def calculate_batch(self, imei: int, frame: RecordFrame) -> List[CalculatorResult]:
+        idle = frame.derived("ignition", _parse_ignition) & (frame.integers("speed") == 0)
+        # idle_start_time is set entering idle and cleared leaving it
+        starts, ends = episode_bounds(idle, bool(frame.previous_state.get("idle_start_time")))
+        results = frame.empty_results()
+        for i in np.flatnonzero(starts):
+            result_at(results, i).state_updates["idle_start_time"] = frame.gps_time[i]
+        for i in np.flatnonzero(ends):
+            result_at(results, i).state_updates["idle_start_time"] = None
+        return results
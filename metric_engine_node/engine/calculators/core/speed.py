@@ -3,7 +3,9 @@ Speed calculator (METRICS_SPEC § 2). Current record speed; max filter.
 No state/events for core speed; used by violation calculator.
 """
 import logging
-from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+from typing import List
+
+from ..base import BaseCalculator, CalculatorContext, CalculatorResult, RecordFrame
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +15,12 @@ class SpeedCalculator(BaseCalculator):
 
     name = "speed"
     category = "core"
+    outputs = ()
     requires_config = ["MAX_SPEED_FILTER"]
+    supports_batch = True
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
         return CalculatorResult()
+
+    async def calculate_batch(self, imei: int, frame: RecordFrame) -> List[CalculatorResult]:
+        return frame.empty_results()
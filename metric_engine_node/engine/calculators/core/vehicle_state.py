@@ -36,6 +36,7 @@ class VehicleStateCalculator(BaseCalculator):
 
     name = "vehicle_state"
     category = "core"
+    outputs = ("vehicle_state",)
     requires_config = ["NR_THRESHOLD", "IDLE_THRESHOLD"]
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
@@ -1,11 +1,14 @@
 """
 Soft fence calculator (plan § 5): PostGIS containment, fence entry/exit -> metric_events.
 Requires fence table with polygon (geometry). Updates current_fence_ids in laststatus.
+Containment runs against the in-process fence index (fence_index.py) when enabled; fences it
+cannot represent, and the disabled case, use the per-fence PostGIS query.
 """
 import logging
 from typing import Any, Dict, List, Optional, Set
 
 from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+from .fence_index import get_fence_index
 
 logger = logging.getLogger(__name__)
 
@@ -63,6 +66,7 @@ class FenceCalculator(BaseCalculator):
 
     name = "fence"
     category = "geofence"
+    outputs = ("current_fence_ids",)
     requires_config = []
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
@@ -80,48 +84,70 @@ class FenceCalculator(BaseCalculator):
         if isinstance(prev_fence_ids, str):
             prev_fence_ids = []
         prev_set = set(prev_fence_ids) if isinstance(prev_fence_ids, (list, tuple)) else set()
-        fences = await _get_fences_for_imei(ctx.imei)
-        if not fences:
-            return CalculatorResult()
+        fence_index = get_fence_index()
+        fences = None
+        if fence_index is None:
+            fences = await _get_fences_for_imei(ctx.imei)
+            if not fences:
+                return CalculatorResult()
         try:
             from engine.db import get_pool
-            pool = await get_pool()
-            async with pool.acquire() as conn:
-                inside_now = set()
-                for f in fences:
-                    fid = f.get("fence_id")
-                    if fid is None:
-                        continue
-                    buffer_m = int(f.get("buffer_distance") or 50)
-                    was_inside = fid in prev_set
-                    if await _point_in_fence_with_hysteresis(conn, fid, lat, lon, buffer_m, was_inside):
-                        inside_now.add(fid)
-                entered = inside_now - prev_set
-                exited = prev_set - inside_now
-                state_updates = {"current_fence_ids": list(inside_now) if inside_now else None}
-                events = []
-                gps_time = ctx.gps_time
-                for fid in entered:
-                    events.append({
-                        "imei": ctx.imei,
-                        "gps_time": gps_time,
-                        "event_category": "Fence",
-                        "event_type": "Fence_Enter",
-                        "fence_id": fid,
-                        "latitude": lat,
-                        "longitude": lon,
-                    })
-                for fid in exited:
-                    events.append({
-                        "imei": ctx.imei,
-                        "gps_time": gps_time,
-                        "event_category": "Fence",
-                        "event_type": "Fence_Exit",
-                        "fence_id": fid,
-                        "latitude": lat,
-                        "longitude": lon,
-                    })
-                return CalculatorResult(state_updates=state_updates, events=events)
+            inside_now = set()
+            if fence_index is not None:
+                # Cached, TTL-valid index: polygon fences need no connection
+                found, client_index = fence_index.get_cached(ctx.imei)
+                if not found:
+                    pool = await get_pool()
+                    async with pool.acquire() as conn:
+                        client_index = await fence_index.get_for_imei(conn, ctx.imei)
+                if client_index is None or not client_index.fences:
+                    return CalculatorResult()
+                for f in client_index.candidates(lon, lat):
+                    if f.is_inside(lon, lat, f.fence_id in prev_set):
+                        inside_now.add(f.fence_id)
+                if client_index.db_only:
+                    pool = await get_pool()
+                    async with pool.acquire() as conn:
+                        for f in client_index.db_only:
+                            if await _point_in_fence_with_hysteresis(conn, f.fence_id, lat, lon, f.buffer_m, f.fence_id in prev_set):
+                                inside_now.add(f.fence_id)
+            else:
+                pool = await get_pool()
+                async with pool.acquire() as conn:
+                    for f in fences:
+                        fid = f.get("fence_id")
+                        if fid is None:
+                            continue
+                        buffer_m = int(f.get("buffer_distance") or 50)
+                        was_inside = fid in prev_set
+                        if await _point_in_fence_with_hysteresis(conn, fid, lat, lon, buffer_m, was_inside):
+                            inside_now.add(fid)
+            entered = inside_now - prev_set
+            exited = prev_set - inside_now
+            state_updates = {"current_fence_ids": list(inside_now) if inside_now else None}
+            events = []
+            gps_time = ctx.gps_time
+            for fid in entered:
+                events.append({
+                    "imei": ctx.imei,
+                    "gps_time": gps_time,
+                    "event_category": "Fence",
+                    "event_type": "Fence_Enter",
+                    "fence_id": fid,
+                    "latitude": lat,
+                    "longitude": lon,
+                })
+            for fid in exited:
+                events.append({
+                    "imei": ctx.imei,
+                    "gps_time": gps_time,
+                    "event_category": "Fence",
+                    "event_type": "Fence_Exit",
+                    "fence_id": fid,
+                    "latitude": lat,
+                    "longitude": lon,
+                })
+            return CalculatorResult(state_updates=state_updates, events=events)
         except Exception as e:
             logger.warning("FenceCalculator failed: %s", e)
             return CalculatorResult()
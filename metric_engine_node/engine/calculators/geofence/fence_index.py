@@ -0,0 +1,242 @@
+"""
+In-process geofence index for FenceCalculator (plan § 5).
+Fence polygons are loaded once per client (ST_AsGeoJSON) and indexed on a lon/lat grid by
+bounding box (expanded by buffer_distance). Containment and hysteresis-buffer tests run in
+process instead of one ST_Contains / ST_DWithin query per fence.
+
+Parity with PostGIS (scripts/check_fence_index_parity.py):
+- inside: ST_Contains(polygon, point) -> planar ray casting on lon/lat with holes (points exactly
+  on the boundary are not compared; ST_Contains excludes them, ray casting may not).
+- in_buffer: ST_DWithin(point::geography, polygon::geography, buffer_m) -> distance to the
+  polygon edges in a local tangent plane using WGS84 radii of curvature at the point (sub-metre
+  difference for fence-sized buffers).
+Fences whose geometry is not a (Multi)Polygon keep the per-fence PostGIS query.
+
+Invalidation: fence INSERT/UPDATE/DELETE fires pg_notify('config_change', 'fence:<id>')
+(tr_fence_change); recalculation_worker.run_listener_loop calls invalidate_fence_index().
+Entries also expire after fence_index_ttl_sec as a fallback when LISTEN is not connected.
+"""
+import json
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ...geo import polyline_distance_m, radii
+
+logger = logging.getLogger(__name__)
+
+# Grid cell size in degrees (~5.5 km of latitude)
+GRID_CELL_DEG = 0.05
+# Fences spanning more cells than this are kept in a per-client list checked by bbox only
+MAX_CELLS_PER_FENCE = 400
+
+Ring = List[Tuple[float, float]]  # [(lon, lat), ...]
+
+
+def _point_in_ring(lon: float, lat: float, ring: Ring) -> bool:
+    """Even-odd ray casting (ring may or may not repeat the first point)."""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > lat) != (yj > lat):
+            x_cross = xi + (lat - yi) * (xj - xi) / (yj - yi)
+            if lon < x_cross:
+                inside = not inside
+        j = i
+    return inside
+
+
+class IndexedFence:
+    """One fence: polygons as rings (first ring = shell, rest = holes) and expanded bbox."""
+
+    __slots__ = ("fence_id", "buffer_m", "polygons", "bbox", "db_only")
+
+    def __init__(self, fence_id: int, buffer_m: int, polygons: List[List[Ring]], db_only: bool = False):
+        self.fence_id = fence_id
+        self.buffer_m = buffer_m
+        self.polygons = polygons
+        self.db_only = db_only
+        self.bbox: Optional[Tuple[float, float, float, float]] = None
+        if polygons:
+            lons = [p[0] for poly in polygons for p in poly[0]]
+            lats = [p[1] for poly in polygons for p in poly[0]]
+            # Expand by buffer (+10% margin) so hysteresis candidates are not filtered out;
+            # radii at the latitude farthest from the equator give the widest longitude margin
+            lon_m, lat_m = radii(min(max(abs(min(lats)), abs(max(lats))), 89.0))
+            margin = buffer_m * 1.1
+            dlat = math.degrees(margin / lat_m)
+            dlon = math.degrees(margin / max(lon_m, 1.0))
+            self.bbox = (min(lons) - dlon, min(lats) - dlat, max(lons) + dlon, max(lats) + dlat)
+
+    def contains(self, lon: float, lat: float) -> bool:
+        """ST_Contains(polygon, point) for (Multi)Polygon."""
+        for poly in self.polygons:
+            if _point_in_ring(lon, lat, poly[0]) and not any(_point_in_ring(lon, lat, hole) for hole in poly[1:]):
+                return True
+        return False
+
+    def distance_m(self, lon: float, lat: float) -> float:
+        """Distance in metres from point to the polygon boundary (0 if inside)."""
+        if self.contains(lon, lat):
+            return 0.0
+        return polyline_distance_m(lon, lat, [ring for poly in self.polygons for ring in poly], closed=True)
+
+    def is_inside(self, lon: float, lat: float, was_inside: bool) -> bool:
+        """Hysteresis: ST_Contains OR (was_inside AND ST_DWithin(buffer_m)) (same as _point_in_fence_with_hysteresis)."""
+        if self.contains(lon, lat):
+            return True
+        return was_inside and self.distance_m(lon, lat) <= self.buffer_m
+
+
+def _polygons_from_geojson(geojson: Optional[str]) -> Optional[List[List[Ring]]]:
+    """Polygon / MultiPolygon coordinates -> list of polygons (list of rings); None for other types."""
+    if not geojson:
+        return None
+    try:
+        geom = json.loads(geojson)
+    except (TypeError, ValueError):
+        return None
+    kind = geom.get("type")
+    coords = geom.get("coordinates") or []
+    if kind == "Polygon":
+        polys = [coords]
+    elif kind == "MultiPolygon":
+        polys = coords
+    else:
+        return None
+    out = []
+    for poly in polys:
+        rings = [[(float(p[0]), float(p[1])) for p in ring] for ring in poly if ring]
+        if rings:
+            out.append(rings)
+    return out or None
+
+
+class ClientFenceIndex:
+    """Fences of one client on a GRID_CELL_DEG grid."""
+
+    def __init__(self, fences: Sequence[IndexedFence]):
+        self.fences = list(fences)
+        self._grid: Dict[Tuple[int, int], List[IndexedFence]] = {}
+        self._large: List[IndexedFence] = []
+        self.db_only = [f for f in self.fences if f.db_only]
+        for f in self.fences:
+            if f.db_only or f.bbox is None:
+                continue
+            x0, y0 = int(math.floor(f.bbox[0] / GRID_CELL_DEG)), int(math.floor(f.bbox[1] / GRID_CELL_DEG))
+            x1, y1 = int(math.floor(f.bbox[2] / GRID_CELL_DEG)), int(math.floor(f.bbox[3] / GRID_CELL_DEG))
+            if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_CELLS_PER_FENCE:
+                self._large.append(f)
+                continue
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    self._grid.setdefault((x, y), []).append(f)
+
+    def candidates(self, lon: float, lat: float) -> List[IndexedFence]:
+        """Fences whose (buffer-expanded) bbox contains the point."""
+        cell = (int(math.floor(lon / GRID_CELL_DEG)), int(math.floor(lat / GRID_CELL_DEG)))
+        out = []
+        for f in self._grid.get(cell, ()):
+            b = f.bbox
+            if b[0] <= lon <= b[2] and b[1] <= lat <= b[3]:
+                out.append(f)
+        for f in self._large:
+            b = f.bbox
+            if b[0] <= lon <= b[2] and b[1] <= lat <= b[3]:
+                out.append(f)
+        return out
+
+
+class FenceIndex:
+    """Process-local cache: imei -> client_id and client_id -> ClientFenceIndex, with TTL."""
+
+    def __init__(self, ttl_sec: float = 300.0):
+        self.ttl_sec = ttl_sec
+        self._client_of_imei: Dict[int, Tuple[Optional[int], float]] = {}
+        self._clients: Dict[int, Tuple[ClientFenceIndex, float]] = {}
+        self.loads = 0
+
+    def invalidate_all(self) -> None:
+        self._clients.clear()
+        self._client_of_imei.clear()
+
+    def get_cached(self, imei: int) -> Tuple[bool, Optional[ClientFenceIndex]]:
+        """(True, index) when the imei's client and its index are cached and within TTL, else (False, None)."""
+        now = time.monotonic()
+        cached = self._client_of_imei.get(imei)
+        if cached is None or now - cached[1] >= self.ttl_sec:
+            return False, None
+        client_id = cached[0]
+        if client_id is None:
+            return True, None
+        entry = self._clients.get(client_id)
+        if entry is None or now - entry[1] >= self.ttl_sec:
+            return False, None
+        return True, entry[0]
+
+    async def get_for_imei(self, conn, imei: int) -> Optional[ClientFenceIndex]:
+        """Index of the imei's client fences (None if the imei has no client)."""
+        now = time.monotonic()
+        cached = self._client_of_imei.get(imei)
+        if cached is not None and now - cached[1] < self.ttl_sec:
+            client_id = cached[0]
+        else:
+            client_id = await conn.fetchval(
+                "SELECT v.client_id FROM tracker t JOIN vehicle v ON v.vehicle_id = t.vehicle_id WHERE t.imei = $1",
+                imei,
+            )
+            self._client_of_imei[imei] = (client_id, now)
+        if client_id is None:
+            return None
+        entry = self._clients.get(client_id)
+        if entry is not None and now - entry[1] < self.ttl_sec:
+            return entry[0]
+        index = await self._load_client(conn, client_id)
+        self._clients[client_id] = (index, now)
+        return index
+
+    async def _load_client(self, conn, client_id: int) -> ClientFenceIndex:
+        rows = await conn.fetch(
+            """
+            SELECT fence_id, COALESCE(buffer_distance, 50) AS buffer_distance, ST_AsGeoJSON(polygon) AS geojson
+            FROM fence
+            WHERE client_id = $1 AND polygon IS NOT NULL
+            """,
+            client_id,
+        )
+        fences = []
+        for r in rows:
+            buffer_m = int(r["buffer_distance"] or 50)
+            polygons = _polygons_from_geojson(r["geojson"])
+            if polygons is None:
+                fences.append(IndexedFence(r["fence_id"], buffer_m, [], db_only=True))
+            else:
+                fences.append(IndexedFence(r["fence_id"], buffer_m, polygons))
+        self.loads += 1
+        logger.debug("Fence index loaded client_id=%s fences=%s", client_id, len(fences))
+        return ClientFenceIndex(fences)
+
+
+_fence_index: Optional[FenceIndex] = None
+
+
+def get_fence_index() -> Optional[FenceIndex]:
+    """Process-wide fence index, or None when metric_engine.fence_index_enabled is false."""
+    global _fence_index
+    if _fence_index is None:
+        from config import Config
+        me_cfg = Config.get_metric_engine_config()
+        if me_cfg.get("fence_index_enabled") is False:
+            return None
+        _fence_index = FenceIndex(ttl_sec=float(me_cfg.get("fence_index_ttl_sec", 300.0)))
+    return _fence_index
+
+
+def invalidate_fence_index() -> None:
+    """Drop all cached fences (called on fence change notifications)."""
+    if _fence_index is not None:
+        _fence_index.invalidate_all()
+        logger.info("Fence index invalidated")
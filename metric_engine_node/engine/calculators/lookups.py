@@ -0,0 +1,51 @@
+"""
+Lookups shared by calculators, memoized once per CalculatorContext (one record).
+Trip calculators ask for the same vehicle_id, active trips and fence membership; the first caller
+runs the query, the others (also when running concurrently) reuse its result.
+"""
+from typing import Any, Dict, List, Optional
+
+from .base import CalculatorContext
+
+
+async def _query_vehicle_id(imei: int) -> Optional[int]:
+    try:
+        from engine.db import get_pool
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow("SELECT vehicle_id FROM tracker WHERE imei = $1", imei)
+            return row["vehicle_id"] if row else None
+    except Exception:
+        return None
+
+
+async def get_vehicle_id(ctx: CalculatorContext) -> Optional[int]:
+    """vehicle_id from the tracker row loaded by the pipeline, else tracker.vehicle_id by imei."""
+    if ctx.vehicle_id is not None:
+        return ctx.vehicle_id
+    return await ctx.memoized("vehicle_id", lambda: _query_vehicle_id(ctx.imei))
+
+
+async def point_in_fence(ctx: CalculatorContext, fence_id: int, lat: float, lon: float) -> bool:
+    from engine.db import point_in_fence_simple
+    return await ctx.memoized(("in_fence", fence_id, lat, lon), lambda: point_in_fence_simple(fence_id, lat, lon))
+
+
+async def active_fence_wise_trips(ctx: CalculatorContext, vehicle_id: int) -> List[Dict[str, Any]]:
+    from engine.db import get_active_fence_wise_trips
+    return await ctx.memoized(("active_fence_wise_trips", vehicle_id), lambda: get_active_fence_wise_trips(vehicle_id))
+
+
+async def active_round_trips(ctx: CalculatorContext, vehicle_id: int) -> List[Dict[str, Any]]:
+    from engine.db import get_active_round_trips
+    return await ctx.memoized(("active_round_trips", vehicle_id), lambda: get_active_round_trips(vehicle_id))
+
+
+async def active_route_trip(ctx: CalculatorContext, vehicle_id: int) -> Optional[Dict[str, Any]]:
+    from engine.db import get_active_route_trip
+    return await ctx.memoized(("active_route_trip", vehicle_id), lambda: get_active_route_trip(vehicle_id))
+
+
+async def route_assignment(ctx: CalculatorContext, vehicle_id: int) -> Optional[Dict[str, Any]]:
+    from engine.db import get_route_assignment_for_vehicle
+    return await ctx.memoized(("route_assignment", vehicle_id), lambda: get_route_assignment_for_vehicle(vehicle_id))
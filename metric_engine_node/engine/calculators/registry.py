@@ -1,14 +1,24 @@
 """
 Calculator registry: discover and run applicable calculators (plan § 7.4).
 Auto-discovers BaseCalculator subclasses in calculators subpackages (core, sensor, violations, trip, geofence).
+
+run_calculators builds a DAG from declared outputs / inputs and runs it in stages; calculators in
+a stage run concurrently. Calculators that set the same state key keep registry order (later
+result wins on merge, as when everything ran one after another); a calculator reading another's
+output runs after it; calculators with undeclared outputs run alone. Results are merged in
+registry order, so state updates and event order do not depend on scheduling.
+
+run_calculators_batch runs calculate_batch of batch-capable calculators over a page of records
+(recalculation); their per-record results are then passed to run_calculators as precomputed.
 """
+import asyncio
 import importlib
 import logging
 import pkgutil
 import time
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
 
-from .base import BaseCalculator, CalculatorContext, CalculatorResult
+from .base import BaseCalculator, CalculatorContext, CalculatorResult, RecordFrame
 
 logger = logging.getLogger(__name__)
 
@@ -39,11 +49,84 @@ def get_applicable_calculators(
     return applicable
 
 
-async def run_calculators(
-    calculators: List[BaseCalculator],
-    ctx: CalculatorContext,
-) -> CalculatorResult:
-    """Run calculators in order; merge state updates and events. One failure skips that calc only. Plan § 9.3: tag events with formula_version."""
+# Stages per applicable calculator list (by names); the registry is fixed after register_all
+_plan_cache: Dict[Tuple[str, ...], List[List[int]]] = {}
+
+
+def build_plan(calculators: List[BaseCalculator]) -> List[List[int]]:
+    """Group calculator indexes into stages; every dependency of a calculator is in an earlier stage."""
+    n = len(calculators)
+    deps: List[Set[int]] = [set() for _ in range(n)]
+    for j, cj in enumerate(calculators):
+        for i, ci in enumerate(calculators):
+            if i == j:
+                continue
+            if ci.outputs is None or cj.outputs is None:
+                # Undeclared outputs: keep registry order with everything
+                if i < j:
+                    deps[j].add(i)
+            elif i < j and set(ci.outputs) & set(cj.outputs):
+                deps[j].add(i)
+            elif set(cj.inputs) & set(ci.outputs):
+                deps[j].add(i)
+    stage_of: List[Optional[int]] = [None] * n
+    remaining = set(range(n))
+    stage = 0
+    while remaining:
+        ready = sorted(k for k in remaining if all(stage_of[d] is not None and stage_of[d] < stage for d in deps[k]))
+        if not ready:
+            logger.warning(
+                "Calculator dependency cycle among %s; running them in registry order",
+                [calculators[k].name for k in sorted(remaining)],
+            )
+            ready = [min(remaining)]
+        for k in ready:
+            stage_of[k] = stage
+        remaining.difference_update(ready)
+        stage += 1
+    plan: List[List[int]] = [[] for _ in range(stage)]
+    for k in range(n):
+        plan[stage_of[k]].append(k)
+    return plan
+
+
+def _get_plan(calculators: List[BaseCalculator]) -> List[List[int]]:
+    key = tuple(c.name for c in calculators)
+    plan = _plan_cache.get(key)
+    if plan is None:
+        plan = build_plan(calculators)
+        _plan_cache[key] = plan
+        logger.debug("Calculator plan %s", [[calculators[k].name for k in st] for st in plan])
+    return plan
+
+
+async def _run_one(calc: BaseCalculator, ctx: CalculatorContext, stage: int, metrics: Dict[str, Any]) -> Optional[CalculatorResult]:
+    """Run one calculator; None on failure (one failure skips that calc only)."""
+    try:
+        if metrics.get("invocations") is not None:
+            metrics["invocations"].labels(calculator=calc.name).inc()
+        t0 = time.perf_counter()
+        result = await calc.calculate(ctx)
+        duration = time.perf_counter() - t0
+        if metrics.get("duration") is not None:
+            metrics["duration"].labels(calculator=calc.name, stage=str(stage)).observe(duration)
+        if metrics.get("events") is not None and result.events:
+            metrics["events"].labels(calculator=calc.name).inc(len(result.events))
+        version = getattr(calc, "formula_version", "1.0.0")
+        for ev in result.events:
+            ev.setdefault("formula_version", version)
+        return result
+    except Exception as e:
+        logger.warning("Calculator %s failed: %s", calc.name, e, exc_info=True)
+        if metrics.get("errors") is not None:
+            try:
+                metrics["errors"].labels(calculator=calc.name).inc()
+            except Exception:
+                pass
+        return None
+
+
+def _calculator_metrics() -> Dict[str, Any]:
     try:
         from metrics import (
             metric_engine_calculator_errors_total,
@@ -51,36 +134,91 @@ async def run_calculators(
             metric_engine_calculator_duration_seconds,
             metric_engine_calculator_events_emitted_total,
         )
+        return {
+            "errors": metric_engine_calculator_errors_total,
+            "invocations": metric_engine_calculator_invocations_total,
+            "duration": metric_engine_calculator_duration_seconds,
+            "events": metric_engine_calculator_events_emitted_total,
+        }
     except Exception:
-        metric_engine_calculator_errors_total = None
-        metric_engine_calculator_invocations_total = None
-        metric_engine_calculator_duration_seconds = None
-        metric_engine_calculator_events_emitted_total = None
+        return {}
+
+
+async def run_calculators(
+    calculators: List[BaseCalculator],
+    ctx: CalculatorContext,
+    precomputed: Optional[Dict[str, CalculatorResult]] = None,
+) -> CalculatorResult:
+    """Run calculators stage by stage (concurrently within a stage); merge state updates and events in registry order.
+    Calculators in precomputed (name -> result from run_calculators_batch) are not run again.
+    One failure skips that calc only. Plan § 9.3: tag events with formula_version."""
+    metrics = _calculator_metrics()
+    precomputed = precomputed or {}
+
+    results: List[Optional[CalculatorResult]] = [None] * len(calculators)
+    for k, calc in enumerate(calculators):
+        if calc.name in precomputed:
+            results[k] = precomputed[calc.name]
+            ctx.results[calc.name] = results[k]
+    for stage, indexes in enumerate(_get_plan(calculators)):
+        indexes = [k for k in indexes if calculators[k].name not in precomputed]
+        if not indexes:
+            continue
+        if len(indexes) == 1:
+            stage_results = [await _run_one(calculators[indexes[0]], ctx, stage, metrics)]
+        else:
+            stage_results = await asyncio.gather(*(_run_one(calculators[k], ctx, stage, metrics) for k in indexes))
+        for k, result in zip(indexes, stage_results):
+            results[k] = result
+            if result is not None:
+                ctx.results[calculators[k].name] = result
 
     merged = CalculatorResult()
+    for result in results:
+        if result is not None:
+            merged.merge(result)
+    return merged
+
+
+async def run_calculators_batch(
+    calculators: List[BaseCalculator],
+    frame: RecordFrame,
+) -> Dict[str, List[CalculatorResult]]:
+    """Run calculate_batch of each calculator over the frame, in registry order; name -> one result per row.
+    After a failure the remaining calculators are left out (run per record), since later batch
+    calculators may read state the failed one sets (frame.state_before)."""
+    metrics = _calculator_metrics()
+    out: Dict[str, List[CalculatorResult]] = {}
     for calc in calculators:
         try:
-            if metric_engine_calculator_invocations_total is not None:
-                metric_engine_calculator_invocations_total.labels(calculator=calc.name).inc()
             t0 = time.perf_counter()
-            result = await calc.calculate(ctx)
+            results = await calc.calculate_batch(frame.imei, frame)
             duration = time.perf_counter() - t0
-            if metric_engine_calculator_duration_seconds is not None:
-                metric_engine_calculator_duration_seconds.labels(calculator=calc.name).observe(duration)
-            if metric_engine_calculator_events_emitted_total is not None and result.events:
-                metric_engine_calculator_events_emitted_total.labels(calculator=calc.name).inc(len(result.events))
-            version = getattr(calc, "formula_version", "1.0.0")
-            for ev in result.events:
-                ev.setdefault("formula_version", version)
-            merged.merge(result)
+            if len(results) != len(frame):
+                raise ValueError("calculate_batch returned %d results for %d rows" % (len(results), len(frame)))
         except Exception as e:
-            logger.warning("Calculator %s failed: %s", calc.name, e, exc_info=True)
-            if metric_engine_calculator_errors_total is not None:
+            logger.warning("Batch calculator %s failed, running per record: %s", calc.name, e, exc_info=True)
+            if metrics.get("errors") is not None:
                 try:
-                    metric_engine_calculator_errors_total.labels(calculator=calc.name).inc()
+                    metrics["errors"].labels(calculator=calc.name).inc()
                 except Exception:
                     pass
-    return merged
+            break
+        version = getattr(calc, "formula_version", "1.0.0")
+        events = 0
+        for result in results:
+            for ev in result.events:
+                ev.setdefault("formula_version", version)
+            events += len(result.events)
+        if metrics.get("invocations") is not None:
+            metrics["invocations"].labels(calculator=calc.name).inc(len(frame))
+        if metrics.get("duration") is not None:
+            metrics["duration"].labels(calculator=calc.name, stage="batch").observe(duration)
+        if metrics.get("events") is not None and events:
+            metrics["events"].labels(calculator=calc.name).inc(events)
+        frame.add_results(results)
+        out[calc.name] = results
+    return out
 
 
 def _discover_calculator_classes() -> List[Type[BaseCalculator]]:
@@ -1,27 +1,84 @@
 """
 Fuel calculator (METRICS_SPEC): fill/theft detection via delta vs FILL_THRESHOLD/THEFT_THRESHOLD.
 Phase 3: calibration table integration — raw fuel -> liters for consumption reporting (metadata).
+calculate_batch (recalculation) converts the page's fuel column with one calibration lookup.
 """
 import logging
-from typing import Any, Dict, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
 
 from ...event_types import (
     EVENT_CATEGORY_FUEL,
     EVENT_TYPE_FUEL_FILL,
     EVENT_TYPE_FUEL_THEFT,
 )
-from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+from ..base import BaseCalculator, CalculatorContext, CalculatorResult, RecordFrame, result_at
 
 logger = logging.getLogger(__name__)
 
 
+def _parse_fuel(value: Any) -> Optional[float]:
+    """Fuel reading as float; None when missing, not numeric or NaN."""
+    if value is None:
+        return None
+    try:
+        fuel = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if fuel != fuel else fuel
+
+
+def _thresholds(config: Dict[str, str]) -> Tuple[float, float]:
+    """FILL_THRESHOLD, THEFT_THRESHOLD."""
+    return float(config.get("FILL_THRESHOLD", "5")), float(config.get("THEFT_THRESHOLD", "5"))
+
+
+def _fuel_event(
+    imei: int,
+    gps_time: datetime,
+    delta: float,
+    fill_threshold: float,
+    theft_threshold: float,
+    lat: Any,
+    lon: Any,
+    fuel_liters: Optional[float],
+    prev_liters: Optional[float],
+) -> Dict[str, Any]:
+    """Fill event for delta >= fill_threshold, otherwise theft; calibrated liters go to metadata."""
+    fill = delta >= fill_threshold
+    ev: Dict[str, Any] = {
+        "imei": imei,
+        "gps_time": gps_time,
+        "event_category": EVENT_CATEGORY_FUEL,
+        "event_type": EVENT_TYPE_FUEL_FILL if fill else EVENT_TYPE_FUEL_THEFT,
+        "event_value": delta if fill else -delta,
+        "threshold_value": fill_threshold if fill else theft_threshold,
+        "severity": "Low" if fill else "High",
+        "latitude": float(lat) if lat is not None else None,
+        "longitude": float(lon) if lon is not None else None,
+    }
+    meta: Dict[str, Any] = {}
+    if fuel_liters is not None:
+        meta["fuel_liters"] = round(fuel_liters, 4)
+        if prev_liters is not None:
+            liters_delta = fuel_liters - prev_liters if fill else prev_liters - fuel_liters
+            meta["delta_liters"] = round(liters_delta, 4)
+    if meta:
+        ev["metadata"] = meta
+    return ev
+
+
 class FuelCalculator(BaseCalculator):
     """Fuel fill/theft detection: delta vs threshold -> metric_events. Uses calibration for liters when available."""
 
     name = "fuel"
     category = "sensor"
+    outputs = ("prev_fuel_level",)
     requires_sensors = ["has_fuel_sensor"]
     requires_config = ["FILL_THRESHOLD", "THEFT_THRESHOLD"]
+    supports_batch = True
 
     def applies_to(self, tracker: Optional[Dict], config: Dict[str, str]) -> bool:
         if tracker and not tracker.get("has_fuel_sensor", False):
@@ -30,23 +87,11 @@ class FuelCalculator(BaseCalculator):
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
         record = ctx.record
-        prev = ctx.previous_state
-        config = ctx.config
-        fuel = record.get("fuel")
+        fuel = _parse_fuel(record.get("fuel"))
         if fuel is None:
             return CalculatorResult()
-        try:
-            fuel = float(fuel)
-        except (TypeError, ValueError):
-            return CalculatorResult()
-        prev_fuel = prev.get("prev_fuel_level")
-        if prev_fuel is not None:
-            try:
-                prev_fuel = float(prev_fuel)
-            except (TypeError, ValueError):
-                prev_fuel = None
-        fill_threshold = float(config.get("FILL_THRESHOLD", "5"))
-        theft_threshold = float(config.get("THEFT_THRESHOLD", "5"))
+        prev_fuel = _parse_fuel(ctx.previous_state.get("prev_fuel_level"))
+        fill_threshold, theft_threshold = _thresholds(ctx.config)
         gps_time = ctx.gps_time
         lat = record.get("latitude")
         lon = record.get("longitude")
@@ -59,55 +104,48 @@ class FuelCalculator(BaseCalculator):
         vehicle_id = getattr(ctx, "vehicle_id", None)
         if vehicle_id is not None:
             try:
-                from ...db import get_fuel_liters_from_calibration
-                fuel_liters = await get_fuel_liters_from_calibration(vehicle_id, fuel)
-                if prev_fuel is not None:
-                    prev_liters = await get_fuel_liters_from_calibration(vehicle_id, prev_fuel)
+                from ...db import get_fuel_liters_from_calibration_batch
+                fuel_liters, prev_liters = await get_fuel_liters_from_calibration_batch(
+                    vehicle_id, [fuel, prev_fuel]
+                )
             except Exception as e:
                 logger.debug("calibration lookup failed: %s", e)
 
-        def _metadata() -> Dict[str, Any]:
-            m: Dict[str, Any] = {}
-            if fuel_liters is not None:
-                m["fuel_liters"] = round(fuel_liters, 4)
-            return m
-
         if prev_fuel is not None:
             delta = fuel - prev_fuel
-            if delta >= fill_threshold:
-                ev: Dict[str, Any] = {
-                    "imei": ctx.imei,
-                    "gps_time": gps_time,
-                    "event_category": EVENT_CATEGORY_FUEL,
-                    "event_type": EVENT_TYPE_FUEL_FILL,
-                    "event_value": delta,
-                    "threshold_value": fill_threshold,
-                    "severity": "Low",
-                    "latitude": float(lat) if lat is not None else None,
-                    "longitude": float(lon) if lon is not None else None,
-                }
-                meta = _metadata()
-                if prev_liters is not None and fuel_liters is not None:
-                    meta["delta_liters"] = round(fuel_liters - prev_liters, 4)
-                if meta:
-                    ev["metadata"] = meta
-                events.append(ev)
-            elif delta <= -theft_threshold:
-                ev = {
-                    "imei": ctx.imei,
-                    "gps_time": gps_time,
-                    "event_category": EVENT_CATEGORY_FUEL,
-                    "event_type": EVENT_TYPE_FUEL_THEFT,
-                    "event_value": -delta,
-                    "threshold_value": theft_threshold,
-                    "severity": "High",
-                    "latitude": float(lat) if lat is not None else None,
-                    "longitude": float(lon) if lon is not None else None,
-                }
-                meta = _metadata()
-                if prev_liters is not None and fuel_liters is not None:
-                    meta["delta_liters"] = round(prev_liters - fuel_liters, 4)
-                if meta:
-                    ev["metadata"] = meta
-                events.append(ev)
+            if delta >= fill_threshold or delta <= -theft_threshold:
+                events.append(_fuel_event(
+                    ctx.imei, gps_time, delta, fill_threshold, theft_threshold, lat, lon, fuel_liters, prev_liters
+                ))
         return CalculatorResult(state_updates=state_updates, events=events)
+
+    async def calculate_batch(self, imei: int, frame: RecordFrame) -> List[CalculatorResult]:
+        fill_threshold, theft_threshold = _thresholds(frame.config)
+        # Rows without a reading change nothing; deltas run over the rows with one
+        values = frame.numbers("fuel", np.nan, lenient=True)
+        rows = np.flatnonzero(~np.isnan(values))
+        values = values[rows]
+        first_prev = _parse_fuel(frame.previous_state.get("prev_fuel_level"))
+        prevs = np.concatenate(([np.nan if first_prev is None else first_prev], values))
+        deltas = values - prevs[:-1]  # NaN without a previous reading: no event
+        fills = deltas >= fill_threshold
+        thefts = ~fills & (deltas <= -theft_threshold)
+
+        results = frame.empty_results()
+        if frame.vehicle_id is not None:
+            # The whole fuel column (and the carried previous reading) in one calibration lookup
+            from ...db import get_fuel_liters_from_calibration_batch
+            liters = await get_fuel_liters_from_calibration_batch(frame.vehicle_id, prevs)
+        else:
+            liters = [None] * len(prevs)
+        lats = frame.column("latitude")
+        lons = frame.column("longitude")
+        for k in np.flatnonzero(fills | thefts):
+            i = rows[k]
+            result_at(results, i).events.append(_fuel_event(
+                imei, frame.gps_time[i], float(deltas[k]), fill_threshold, theft_threshold,
+                lats[i], lons[i], liters[k + 1], liters[k],
+            ))
+        for k, i in enumerate(rows):
+            result_at(results, i).state_updates["prev_fuel_level"] = float(values[k])
+        return results
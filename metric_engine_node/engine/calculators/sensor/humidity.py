@@ -3,17 +3,32 @@ Humidity calculator (plan § Phase 3). Violation when outside HUMIDITY_MIN/HUMID
 Uses ble_humidity_1-4 from trackdata/laststatus.
 """
 import logging
-from datetime import timezone
-from typing import Any, Dict, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+import numpy as np
+
+from ..base import (
+    BaseCalculator,
+    CalculatorContext,
+    CalculatorResult,
+    RecordFrame,
+    as_utc,
+    episode_bounds,
+    episode_start_rows,
+    epoch_us,
+    result_at,
+)
 
 logger = logging.getLogger(__name__)
 
 
+HUMIDITY_KEYS = ("ble_humidity_1", "ble_humidity_2", "ble_humidity_3", "ble_humidity_4")
+
+
 def _get_humidity(record: Dict[str, Any]) -> Optional[float]:
     """COALESCE ble_humidity_1..4."""
-    for key in ("ble_humidity_1", "ble_humidity_2", "ble_humidity_3", "ble_humidity_4"):
+    for key in HUMIDITY_KEYS:
         v = record.get(key)
         if v is not None:
             try:
@@ -23,13 +38,24 @@ def _get_humidity(record: Dict[str, Any]) -> Optional[float]:
     return None
 
 
+def _limits(config: Dict[str, str]) -> Tuple[float, float, int]:
+    """HUMIDITY_MIN, HUMIDITY_MAX, SENSOR_DURATION_THRESHOLD (seconds)."""
+    return (
+        float(config.get("HUMIDITY_MIN", "0")),
+        float(config.get("HUMIDITY_MAX", "100")),
+        int(config.get("SENSOR_DURATION_THRESHOLD", "300")),
+    )
+
+
 class HumidityCalculator(BaseCalculator):
     """Humidity violation: outside range for min duration -> metric_events (event_category=Sensor, event_type=Humidity_High/Low)."""
 
     name = "humidity"
     category = "sensor"
+    outputs = ("humidity_violation_start", "last_violation_time", "last_violation_type")
     requires_sensors = ["has_humidity_sensor"]
     requires_config = ["HUMIDITY_MIN", "HUMIDITY_MAX", "SENSOR_DURATION_THRESHOLD"]
+    supports_batch = True
 
     def applies_to(self, tracker: Optional[Dict], config: Dict[str, str]) -> bool:
         if tracker and not tracker.get("has_humidity_sensor", False):
@@ -37,16 +63,66 @@ class HumidityCalculator(BaseCalculator):
         return True
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
-        record = ctx.record
-        prev = ctx.previous_state
-        config = ctx.config
+        return self._evaluate(ctx.imei, ctx.record, ctx.gps_time, ctx.previous_state, _limits(ctx.config))
+
+    async def calculate_batch(self, imei: int, frame: RecordFrame) -> List[CalculatorResult]:
+        low, high, min_duration_sec = _limits(frame.config)
+        # Rows without a reading change nothing; the episode runs over the rows with one
+        values = frame.coalesce(HUMIDITY_KEYS)
+        rows = np.flatnonzero(~np.isnan(values))
+        values = values[rows]
+        outside = ~((low <= values) & (values <= high))
+        prev_start = frame.previous_state.get("humidity_violation_start")
+        starts, ends = episode_bounds(outside, prev_start is not None)
+        start_rows = episode_start_rows(starts)
+        times = frame.time_us()[rows]
+        start_us = times[start_rows] if len(times) else times
+        if prev_start is not None:
+            start_us = np.where(start_rows >= 0, start_us, epoch_us(prev_start))
+        duration_sec = (times - start_us) // 1_000_000
+        violations = outside & ~starts & (duration_sec >= min_duration_sec)
+
+        results = frame.empty_results()
+        lats = frame.column("latitude")
+        lons = frame.column("longitude")
+        for k in np.flatnonzero(starts):
+            result_at(results, rows[k]).state_updates["humidity_violation_start"] = frame.gps_time[rows[k]]
+        for k in np.flatnonzero(ends):
+            result_at(results, rows[k]).state_updates["humidity_violation_start"] = None
+        for k in np.flatnonzero(violations):
+            i = rows[k]
+            value = float(values[k])
+            gps_time = frame.gps_time[i]
+            event_type = "Humidity_High" if value > high else "Humidity_Low"
+            result = result_at(results, i)
+            result.events.append({
+                "imei": imei,
+                "gps_time": gps_time,
+                "event_category": "Sensor",
+                "event_type": event_type,
+                "event_value": value,
+                "threshold_value": high if value > high else low,
+                "duration_sec": int(duration_sec[k]),
+                "severity": "Medium",
+                "latitude": float(lats[i]) if lats[i] is not None else None,
+                "longitude": float(lons[i]) if lons[i] is not None else None,
+            })
+            result.state_updates["last_violation_time"] = gps_time
+            result.state_updates["last_violation_type"] = event_type
+        return results
+
+    def _evaluate(
+        self,
+        imei: int,
+        record: Dict[str, Any],
+        gps_time: datetime,
+        prev: Dict[str, Any],
+        limits: Tuple[float, float, int],
+    ) -> CalculatorResult:
         humidity = _get_humidity(record)
         if humidity is None:
             return CalculatorResult()
-        h_min = float(config.get("HUMIDITY_MIN", "0"))
-        h_max = float(config.get("HUMIDITY_MAX", "100"))
-        min_duration_sec = int(config.get("SENSOR_DURATION_THRESHOLD", "300"))
-        gps_time = ctx.gps_time
+        h_min, h_max, min_duration_sec = limits
         lat = record.get("latitude")
         lon = record.get("longitude")
         state_updates = {}
@@ -57,17 +133,13 @@ class HumidityCalculator(BaseCalculator):
             if prev_start is None:
                 state_updates["humidity_violation_start"] = gps_time
             else:
-                if isinstance(prev_start, str):
-                    from dateutil import parser
-                    prev_start = parser.parse(prev_start)
-                if prev_start.tzinfo is None:
-                    prev_start = prev_start.replace(tzinfo=timezone.utc)
-                gps_utc = gps_time if gps_time.tzinfo else gps_time.replace(tzinfo=timezone.utc)
+                prev_start = as_utc(prev_start)
+                gps_utc = as_utc(gps_time)
                 duration_sec = int((gps_utc - prev_start).total_seconds())
                 if duration_sec >= min_duration_sec:
                     event_type = "Humidity_High" if humidity > h_max else "Humidity_Low"
                     events.append({
-                        "imei": ctx.imei,
+                        "imei": imei,
                         "gps_time": gps_time,
                         "event_category": "Sensor",
                         "event_type": event_type,
@@ -2,20 +2,35 @@
 Temperature calculator (METRICS_SPEC § 2.1). Violation when outside TEMP_MIN/TEMP_MAX for SENSOR_DURATION_THRESHOLD.
 """
 import logging
-from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+import numpy as np
+
+from ..base import (
+    BaseCalculator,
+    CalculatorContext,
+    CalculatorResult,
+    RecordFrame,
+    as_utc,
+    episode_bounds,
+    episode_start_rows,
+    epoch_us,
+    result_at,
+)
 
 logger = logging.getLogger(__name__)
 
 
+TEMP_KEYS = (
+    "dallas_temperature_1", "dallas_temperature_2", "dallas_temperature_3", "dallas_temperature_4",
+    "ble_temperature_1", "ble_temperature_2", "ble_temperature_3", "ble_temperature_4",
+)
+
+
 def _get_temp(record: Dict[str, Any]) -> Optional[float]:
     """COALESCE dallas_temperature_1..4, ble_temperature_1..4."""
-    for key in (
-        "dallas_temperature_1", "dallas_temperature_2", "dallas_temperature_3", "dallas_temperature_4",
-        "ble_temperature_1", "ble_temperature_2", "ble_temperature_3", "ble_temperature_4",
-    ):
+    for key in TEMP_KEYS:
         v = record.get(key)
         if v is not None:
             try:
@@ -25,13 +40,29 @@ def _get_temp(record: Dict[str, Any]) -> Optional[float]:
     return None
 
 
+def _limits(config: Dict[str, str]) -> Tuple[float, float, int]:
+    """TEMP_MIN, TEMP_MAX, SENSOR_DURATION_THRESHOLD (seconds)."""
+    return (
+        float(config.get("TEMP_MIN", "-25")),
+        float(config.get("TEMP_MAX", "25")),
+        int(config.get("SENSOR_DURATION_THRESHOLD", "300")),
+    )
+
+
 class TemperatureCalculator(BaseCalculator):
     """Temperature violation: outside range for min duration -> metric_events."""
 
     name = "temperature"
     category = "sensor"
+    outputs = (
+        "temp_violation_start",
+        "prev_temp_value",
+        "last_violation_time",
+        "last_violation_type",
+    )
     requires_sensors = ["has_temp_sensor"]
     requires_config = ["TEMP_MIN", "TEMP_MAX", "SENSOR_DURATION_THRESHOLD"]
+    supports_batch = True
 
     def applies_to(self, tracker: Optional[Dict], config: Dict[str, str]) -> bool:
         if tracker and not tracker.get("has_temp_sensor", False):
@@ -39,16 +70,68 @@ class TemperatureCalculator(BaseCalculator):
         return True
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
-        record = ctx.record
-        prev = ctx.previous_state
-        config = ctx.config
+        return self._evaluate(ctx.imei, ctx.record, ctx.gps_time, ctx.previous_state, _limits(ctx.config))
+
+    async def calculate_batch(self, imei: int, frame: RecordFrame) -> List[CalculatorResult]:
+        low, high, min_duration_sec = _limits(frame.config)
+        # Rows without a reading change nothing; the episode runs over the rows with one
+        values = frame.coalesce(TEMP_KEYS)
+        rows = np.flatnonzero(~np.isnan(values))
+        values = values[rows]
+        outside = ~((low <= values) & (values <= high))
+        prev_start = frame.previous_state.get("temp_violation_start")
+        starts, ends = episode_bounds(outside, prev_start is not None)
+        start_rows = episode_start_rows(starts)
+        times = frame.time_us()[rows]
+        start_us = times[start_rows] if len(times) else times
+        if prev_start is not None:
+            start_us = np.where(start_rows >= 0, start_us, epoch_us(prev_start))
+        duration_sec = (times - start_us) // 1_000_000
+        violations = outside & ~starts & (duration_sec >= min_duration_sec)
+
+        results = frame.empty_results()
+        lats = frame.column("latitude")
+        lons = frame.column("longitude")
+        for k in np.flatnonzero(starts):
+            result_at(results, rows[k]).state_updates["temp_violation_start"] = frame.gps_time[rows[k]]
+        for k in np.flatnonzero(ends):
+            result_at(results, rows[k]).state_updates["temp_violation_start"] = None
+        for k in np.flatnonzero(violations):
+            i = rows[k]
+            value = float(values[k])
+            gps_time = as_utc(frame.gps_time[i])
+            event_type = "Temp_High" if value > high else "Temp_Low"
+            result = result_at(results, i)
+            result.events.append({
+                "imei": imei,
+                "gps_time": gps_time,
+                "event_category": "Sensor",
+                "event_type": event_type,
+                "event_value": value,
+                "threshold_value": high if value > high else low,
+                "duration_sec": int(duration_sec[k]),
+                "severity": "Medium",
+                "latitude": float(lats[i]) if lats[i] is not None else None,
+                "longitude": float(lons[i]) if lons[i] is not None else None,
+            })
+            result.state_updates["last_violation_time"] = gps_time
+            result.state_updates["last_violation_type"] = event_type
+        for k, i in enumerate(rows):
+            result_at(results, i).state_updates["prev_temp_value"] = float(values[k])
+        return results
+
+    def _evaluate(
+        self,
+        imei: int,
+        record: Dict[str, Any],
+        gps_time: datetime,
+        prev: Dict[str, Any],
+        limits: Tuple[float, float, int],
+    ) -> CalculatorResult:
         temp = _get_temp(record)
         if temp is None:
             return CalculatorResult()
-        temp_min = float(config.get("TEMP_MIN", "-25"))
-        temp_max = float(config.get("TEMP_MAX", "25"))
-        min_duration_sec = int(config.get("SENSOR_DURATION_THRESHOLD", "300"))
-        gps_time = ctx.gps_time
+        temp_min, temp_max, min_duration_sec = limits
         lat = record.get("latitude")
         lon = record.get("longitude")
         state_updates = {}
@@ -59,18 +142,13 @@ class TemperatureCalculator(BaseCalculator):
             if prev_start is None:
                 state_updates["temp_violation_start"] = gps_time
             else:
-                if isinstance(prev_start, str):
-                    from dateutil import parser
-                    prev_start = parser.parse(prev_start)
-                if prev_start.tzinfo is None:
-                    prev_start = prev_start.replace(tzinfo=timezone.utc)
-                if gps_time.tzinfo is None:
-                    gps_time = gps_time.replace(tzinfo=timezone.utc)
+                prev_start = as_utc(prev_start)
+                gps_time = as_utc(gps_time)
                 duration_sec = int((gps_time - prev_start).total_seconds())
                 if duration_sec >= min_duration_sec:
                     event_type = "Temp_High" if temp > temp_max else "Temp_Low"
                     events.append({
-                        "imei": ctx.imei,
+                        "imei": imei,
                         "gps_time": gps_time,
                         "event_category": "Sensor",
                         "event_type": event_type,
@@ -7,26 +7,17 @@ import logging
 from typing import Any, Dict, List
 
 from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+from ..lookups import active_fence_wise_trips, get_vehicle_id, point_in_fence
 
 logger = logging.getLogger(__name__)
 
 
-async def _get_vehicle_id(imei: int):
-    try:
-        from engine.db import get_pool
-        pool = await get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT vehicle_id FROM tracker WHERE imei = $1", imei)
-            return row["vehicle_id"] if row else None
-    except Exception:
-        return None
-
-
 class FenceWiseTripCalculator(BaseCalculator):
     """Monitor Fence-Wise trips: exit origin -> enter destination -> complete."""
 
     name = "fence_wise_trip"
     category = "trip"
+    outputs = ("trip_in_progress", "current_trip_id")
     requires_config = []
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
@@ -46,9 +37,9 @@ class FenceWiseTripCalculator(BaseCalculator):
             prev_set = set(int(x) for x in prev_fence_ids if x is not None)
         else:
             prev_set = set()
-        from engine.db import get_active_fence_wise_trips, point_in_fence_simple, update_fence_wise_trip, complete_trip
-        vehicle_id = await _get_vehicle_id(ctx.imei)
-        trips = await get_active_fence_wise_trips(vehicle_id) if vehicle_id else []
+        from engine.db import update_fence_wise_trip, complete_trip
+        vehicle_id = await get_vehicle_id(ctx)
+        trips = await active_fence_wise_trips(ctx, vehicle_id) if vehicle_id else []
         state_updates = {}
         for tr in trips:
             trip_id = tr.get("trip_id")
@@ -59,8 +50,8 @@ class FenceWiseTripCalculator(BaseCalculator):
             if not origin_id or not dest_id:
                 continue
             was_in_origin = origin_id in prev_set
-            is_in_origin = await point_in_fence_simple(origin_id, lat, lon)
-            is_in_dest = await point_in_fence_simple(dest_id, lat, lon)
+            is_in_origin = await point_in_fence(ctx, origin_id, lat, lon)
+            is_in_dest = await point_in_fence(ctx, dest_id, lat, lon)
             if source_exit is None and was_in_origin and not is_in_origin:
                 await update_fence_wise_trip(trip_id, source_exit_time=gps_time)
             if dest_arrival is None and is_in_dest:
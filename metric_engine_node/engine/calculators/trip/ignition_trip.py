@@ -23,6 +23,17 @@ class IgnitionTripCalculator(BaseCalculator):
 
     name = "ignition_trip"
     category = "trip"
+    outputs = (
+        "trip_in_progress",
+        "current_trip_id",
+        "_trip_action",
+        "_trip_start_time",
+        "_trip_start_lat",
+        "_trip_start_lon",
+        "_trip_end_time",
+        "_trip_end_lat",
+        "_trip_end_lon",
+    )
     requires_config = []
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
@@ -7,26 +7,17 @@ from datetime import timezone
 from typing import Any, Dict
 
 from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+from ..lookups import active_round_trips, get_vehicle_id, point_in_fence
 
 logger = logging.getLogger(__name__)
 
 
-async def _get_vehicle_id(imei: int):
-    try:
-        from engine.db import get_pool
-        pool = await get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT vehicle_id FROM tracker WHERE imei = $1", imei)
-            return row["vehicle_id"] if row else None
-    except Exception:
-        return None
-
-
 class RoundTripCalculator(BaseCalculator):
     """Create Round-Trip from upload_sheet when start time reached; monitor destination; complete with time_compliance."""
 
     name = "round_trip"
     category = "trip"
+    outputs = ("trip_in_progress", "current_trip_id")
     requires_config = ["TIME_COMPLIANCE_THRESHOLD", "TRIP_END_DELAY"]
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
@@ -46,13 +37,11 @@ class RoundTripCalculator(BaseCalculator):
         from engine.db import (
             get_pending_upload_sheet_trip,
             create_round_trip_from_upload,
-            get_active_round_trips,
-            point_in_fence_simple,
             update_round_trip,
             complete_trip,
         )
 
-        vehicle_id = await _get_vehicle_id(ctx.imei)
+        vehicle_id = await get_vehicle_id(ctx)
         state_updates = {}
 
         # 1) Pending upload_sheet: create trip (Round-Trip) + extension
@@ -73,7 +62,7 @@ class RoundTripCalculator(BaseCalculator):
                     return CalculatorResult(state_updates=state_updates)
 
         # 2) Active round trips: monitor destination fence
-        trips = await get_active_round_trips(vehicle_id) if vehicle_id else []
+        trips = await active_round_trips(ctx, vehicle_id) if vehicle_id else []
         prev_fence_ids = set()
         for x in (prev.get("current_fence_ids") or []) or []:
             if x is not None:
@@ -86,7 +75,7 @@ class RoundTripCalculator(BaseCalculator):
             dest_exit = tr.get("destination_exit_time")
             if not planned_fence_id:
                 continue
-            in_dest = await point_in_fence_simple(planned_fence_id, lat, lon)
+            in_dest = await point_in_fence(ctx, planned_fence_id, lat, lon)
             was_in_dest = planned_fence_id in prev_fence_ids
 
             if dest_arrival is None and in_dest:
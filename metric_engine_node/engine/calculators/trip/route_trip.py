@@ -6,26 +6,17 @@ import logging
 from typing import Any, Dict
 
 from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+from ..lookups import active_route_trip, get_vehicle_id, route_assignment
 
 logger = logging.getLogger(__name__)
 
 
-async def _get_vehicle_id(imei: int):
-    try:
-        from engine.db import get_pool
-        pool = await get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT vehicle_id FROM tracker WHERE imei = $1", imei)
-            return row["vehicle_id"] if row else None
-    except Exception:
-        return None
-
-
 class RouteTripCalculator(BaseCalculator):
     """Create Route-Based trip when vehicle on assigned route; complete when off route."""
 
     name = "route_trip"
     category = "trip"
+    outputs = ("trip_in_progress", "current_trip_id")
     requires_config = ["DEVIATION_THRESHOLD"]
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
@@ -43,19 +34,17 @@ class RouteTripCalculator(BaseCalculator):
             return CalculatorResult()
 
         from engine.db import (
-            get_route_assignment_for_vehicle,
             point_on_route,
             create_route_trip,
-            get_active_route_trip,
             complete_trip,
             update_route_trip_deviation,
         )
 
-        vehicle_id = await _get_vehicle_id(ctx.imei)
+        vehicle_id = await get_vehicle_id(ctx)
         state_updates = {}
         threshold_km = float(config.get("DEVIATION_THRESHOLD", "3.5"))
 
-        assignment = await get_route_assignment_for_vehicle(vehicle_id) if vehicle_id else None
+        assignment = await route_assignment(ctx, vehicle_id) if vehicle_id else None
         if not assignment:
             return CalculatorResult()
 
@@ -64,7 +53,7 @@ class RouteTripCalculator(BaseCalculator):
             return CalculatorResult()
 
         on_route = await point_on_route(route_id, lat, lon, threshold_km)
-        current_route_trip = await get_active_route_trip(vehicle_id) if vehicle_id else None
+        current_route_trip = await active_route_trip(ctx, vehicle_id) if vehicle_id else None
 
         if on_route:
             if not current_route_trip:
@@ -16,6 +16,7 @@ class StoppageCalculator(BaseCalculator):
 
     name = "stoppage"
     category = "trip"
+    outputs = ("stoppage_start_time", "stoppage_start_lat", "stoppage_start_lon")
     requires_config = ["STOP_THRESHOLD"]
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
@@ -34,6 +34,7 @@ class DrivingTimeViolationCalculator(BaseCalculator):
 
     name = "driving_time_violation"
     category = "violation"
+    outputs = ("driving_session_start", "driving_session_distance", "rest_start_time")
     requires_config = [
         "MAX_DRIVING_HOURS", "MAX_DRIVING_DISTANCE", "REST_DURATION", "MIN_REST_DURATION",
         "NIGHT_START", "NIGHT_END",
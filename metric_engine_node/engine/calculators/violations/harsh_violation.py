@@ -3,9 +3,12 @@ Harsh driving violation calculator (plan § Phase 4).
 Detects Harsh_Brake, Harsh_Accel, Harsh_Corner from trackdata.status or green_driving_value.
 """
 import logging
-from typing import Any, Dict, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
-from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+import numpy as np
+
+from ..base import BaseCalculator, CalculatorContext, CalculatorResult, RecordFrame
 
 logger = logging.getLogger(__name__)
 
@@ -20,19 +23,30 @@ class HarshViolationCalculator(BaseCalculator):
 
     name = "harsh_violation"
     category = "violation"
+    outputs = ()
     requires_config = ["HARSH_SPEED_DROP_THRESHOLD", "HARSH_SPEED_INCREASE_THRESHOLD", "HARSH_TIME_WINDOW"]
+    supports_batch = True
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
-        record = ctx.record
-        config = ctx.config
-        gps_time = ctx.gps_time
+        return self._evaluate(ctx.imei, ctx.record, ctx.gps_time, ctx.config)
+
+    async def calculate_batch(self, imei: int, frame: RecordFrame) -> List[CalculatorResult]:
+        statuses = np.char.lower(np.array([s or "" for s in frame.column("status")], dtype=str))
+        harsh = np.char.find(statuses, "harsh") >= 0
+        results = frame.empty_results()
+        # Only rows mentioning a harsh event are evaluated in full
+        for i in np.flatnonzero(harsh):
+            results[i] = self._evaluate(imei, frame.records[i], frame.gps_time[i], frame.config)
+        return results
+
+    def _evaluate(self, imei: int, record: Dict[str, Any], gps_time: datetime, config: Dict[str, str]) -> CalculatorResult:
         lat = record.get("latitude")
         lon = record.get("longitude")
         events = []
 
         if _status_contains(record, "Harsh Braking"):
             events.append({
-                "imei": ctx.imei,
+                "imei": imei,
                 "gps_time": gps_time,
                 "event_category": "Harsh",
                 "event_type": "Harsh_Brake",
@@ -44,7 +58,7 @@ class HarshViolationCalculator(BaseCalculator):
             })
         if _status_contains(record, "Harsh Acceleration"):
             events.append({
-                "imei": ctx.imei,
+                "imei": imei,
                 "gps_time": gps_time,
                 "event_category": "Harsh",
                 "event_type": "Harsh_Accel",
@@ -56,7 +70,7 @@ class HarshViolationCalculator(BaseCalculator):
             })
         if _status_contains(record, "Harsh Cornering"):
             events.append({
-                "imei": ctx.imei,
+                "imei": imei,
                 "gps_time": gps_time,
                 "event_category": "Harsh",
                 "event_type": "Harsh_Corner",
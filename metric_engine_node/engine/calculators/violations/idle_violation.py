@@ -3,10 +3,12 @@ Idle violation: idle duration > IDLE_MAX (plan, METRICS_SPEC).
 Emit Idle_Violation when idle period exceeds threshold.
 """
 import logging
-from datetime import datetime, timezone
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, List
 
-from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+import numpy as np
+
+from ..base import BaseCalculator, CalculatorContext, CalculatorResult, RecordFrame, as_utc, epoch_us, result_at
 from ..core.vehicle_state import _parse_ignition
 
 logger = logging.getLogger(__name__)
@@ -17,33 +19,76 @@ class IdleViolationCalculator(BaseCalculator):
 
     name = "idle_violation"
     category = "violation"
+    outputs = ("last_violation_time", "last_violation_type")
     requires_config = ["IDLE_THRESHOLD", "IDLE_MAX"]
+    supports_batch = True
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
-        record = ctx.record
-        prev = ctx.previous_state
-        config = ctx.config
-        idle_max_sec = int(config.get("IDLE_MAX", "600"))
-        ignition = _parse_ignition(record)
+        idle_max_sec = int(ctx.config.get("IDLE_MAX", "600"))
+        return self._evaluate(
+            ctx.imei, ctx.record, ctx.gps_time, _parse_ignition(ctx.record),
+            ctx.previous_state.get("idle_start_time"), idle_max_sec,
+        )
+
+    async def calculate_batch(self, imei: int, frame: RecordFrame) -> List[CalculatorResult]:
+        idle_max_sec = int(frame.config.get("IDLE_MAX", "600"))
+        # idle_start_time is set by DurationCalculator (batch, earlier in registry order)
+        idle_starts = frame.state_before("idle_start_time")
+        idle = frame.derived("ignition", _parse_ignition) & (frame.integers("speed") == 0)
+        idle &= np.fromiter((bool(v) for v in idle_starts), dtype=bool, count=len(frame))
+        rows = np.flatnonzero(idle)
+        # Rows of one idle period share its idle_start_time: convert each distinct value once
+        start_us: Dict[Any, int] = {}
+        for i in rows:
+            if idle_starts[i] not in start_us:
+                start_us[idle_starts[i]] = epoch_us(idle_starts[i])
+        starts = np.array([start_us[idle_starts[i]] for i in rows], dtype=np.int64)
+        duration_sec = (frame.time_us()[rows] - starts) // 1_000_000
+        violations = duration_sec >= idle_max_sec
+        results = frame.empty_results()
+        lats = frame.column("latitude")
+        lons = frame.column("longitude")
+        for i, duration in zip(rows[violations], duration_sec[violations]):
+            gps_time = as_utc(frame.gps_time[i])
+            duration = int(duration)
+            result = result_at(results, i)
+            result.events.append({
+                "imei": imei,
+                "gps_time": gps_time,
+                "event_category": "Idle",
+                "event_type": "Idle_Violation",
+                "event_value": float(duration),
+                "threshold_value": float(idle_max_sec),
+                "duration_sec": duration,
+                "severity": "Low",
+                "latitude": float(lats[i]) if lats[i] is not None else None,
+                "longitude": float(lons[i]) if lons[i] is not None else None,
+            })
+            result.state_updates["last_violation_time"] = gps_time
+            result.state_updates["last_violation_type"] = "Idle_Violation"
+        return results
+
+    def _evaluate(
+        self,
+        imei: int,
+        record: Dict[str, Any],
+        gps_time: datetime,
+        ignition: bool,
+        idle_start: Any,
+        idle_max_sec: int,
+    ) -> CalculatorResult:
         speed = int(record.get("speed") or 0)
-        gps_time = ctx.gps_time
         lat = record.get("latitude")
         lon = record.get("longitude")
         state_updates = {}
         events = []
-        idle_start = prev.get("idle_start_time")
         if ignition and speed == 0 and idle_start:
-            if isinstance(idle_start, str):
-                from dateutil import parser
-                idle_start = parser.parse(idle_start)
-            if idle_start.tzinfo is None:
-                idle_start = idle_start.replace(tzinfo=timezone.utc)
-            if gps_time.tzinfo is None:
-                gps_time = gps_time.replace(tzinfo=timezone.utc)
+            idle_start = as_utc(idle_start)
+            gps_time = as_utc(gps_time)
             duration_sec = int((gps_time - idle_start).total_seconds())
             if duration_sec >= idle_max_sec:
                 events.append({
-                    "imei": ctx.imei,
+                    "imei": imei,
                     "gps_time": gps_time,
                     "event_category": "Idle",
                     "event_type": "Idle_Violation",
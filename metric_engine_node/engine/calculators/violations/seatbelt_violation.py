@@ -33,6 +33,12 @@ class SeatbeltViolationCalculator(BaseCalculator):
 
     name = "seatbelt_violation"
     category = "violation"
+    outputs = (
+        "seatbelt_unbuckled_start",
+        "seatbelt_unbuckled_distance",
+        "last_violation_time",
+        "last_violation_type",
+    )
     requires_sensors = ["has_seatbelt_sensor"]
     requires_config = [
         "SEATBELT_SPEED_THRESHOLD", "SEATBELT_MIN_DURATION", "SEATBELT_MIN_DISTANCE", "SEATBELT_DELAY_THRESHOLD"
@@ -3,14 +3,26 @@ Speed violation calculator (METRICS_SPEC, plan § 4).
 Overspeed when speed > limit for MIN_DURATION. By road type (road table) or config fallback.
 """
 import logging
-from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
 
 from ...event_types import (
     EVENT_CATEGORY_SPEED,
     EVENT_TYPE_OVERSPEED,
 )
-from ..base import BaseCalculator, CalculatorContext, CalculatorResult
+from ..base import (
+    BaseCalculator,
+    CalculatorContext,
+    CalculatorResult,
+    RecordFrame,
+    as_utc,
+    episode_bounds,
+    episode_start_rows,
+    epoch_us,
+    result_at,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +33,19 @@ ROAD_TYPE_TO_CONFIG = {
 }
 
 
+async def _road_info(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """road_type / speed_limit at the record position (road tile cache), or None."""
+    lat = record.get("latitude")
+    lon = record.get("longitude")
+    if lat is None or lon is None:
+        return None
+    try:
+        from engine.road_cache import get_road_speed_limit_cached
+        return await get_road_speed_limit_cached(float(lat), float(lon), record.get("geohash_6"))
+    except (TypeError, ValueError):
+        return None
+
+
 def _get_speed_limit_from_config(config: Dict[str, str], road_type: Optional[str]) -> int:
     """Limit by road_type (Intracity/Highway/Motorway) or max of all config limits."""
     key = ROAD_TYPE_TO_CONFIG.get(road_type) if road_type else None
@@ -35,34 +60,128 @@ def _get_speed_limit_from_config(config: Dict[str, str], road_type: Optional[str
     return max(city, highway, motorway)
 
 
+def _limit_and_road_type(config: Dict[str, str], road_info: Optional[Dict[str, Any]]) -> Tuple[int, Optional[str]]:
+    """Speed limit at a position: road speed_limit, else config limit for its road_type."""
+    road_type = str(road_info["road_type"]) if road_info and road_info.get("road_type") is not None else None
+    if road_info and road_info.get("speed_limit") is not None:
+        return int(road_info["speed_limit"]), road_type
+    return _get_speed_limit_from_config(config, road_type), road_type
+
+
+def _episode_max(values: np.ndarray, starts: np.ndarray, seed: int) -> np.ndarray:
+    """Running max of values within each episode (restarted at starts); rows before the first
+    start continue an episode whose max so far is seed."""
+    if not len(values):
+        return values
+    values = values.copy()
+    values[0] = max(int(values[0]), seed) if not starts[0] else values[0]
+    # Offset each episode above the previous ones so one cumulative max never crosses episodes
+    low = int(values.min())
+    span = int(values.max()) - low + 1
+    offset = np.cumsum(starts) * span
+    return np.maximum.accumulate(values - low + offset) - offset + low
+
+
 class SpeedViolationCalculator(BaseCalculator):
     """Overspeed: speed > limit for MIN_DURATION -> metric_events."""
 
     name = "speed_violation"
     category = "violation"
+    outputs = (
+        "speeding_start_time",
+        "speeding_max_speed",
+        "last_violation_time",
+        "last_violation_type",
+    )
     requires_config = ["SPEED_LIMIT_CITY", "MIN_DURATION_SPEED"]
+    supports_batch = True
 
     async def calculate(self, ctx: CalculatorContext) -> CalculatorResult:
         record = ctx.record
-        prev = ctx.previous_state
-        config = ctx.config
+        road_info = await _road_info(record)
+        return self._evaluate(ctx.imei, record, ctx.gps_time, ctx.previous_state, ctx.config, road_info)
+
+    async def calculate_batch(self, imei: int, frame: RecordFrame) -> List[CalculatorResult]:
+        config = frame.config
+        # Parked / idle rows repeat the same position: one road lookup per position
+        position_of: Dict[Tuple[Any, Any], int] = {}
+        first_rows: List[int] = []
+        rows_position = np.empty(len(frame), dtype=np.intp)
+        for i, position in enumerate(zip(frame.column("latitude"), frame.column("longitude"))):
+            index = position_of.get(position)
+            if index is None:
+                index = position_of[position] = len(first_rows)
+                first_rows.append(i)
+            rows_position[i] = index
+        limits_by_position = []
+        road_types = []
+        for i in first_rows:
+            limit, road_type = _limit_and_road_type(config, await _road_info(frame.records[i]))
+            limits_by_position.append(limit)
+            road_types.append(road_type)
+        limits = np.array(limits_by_position, dtype=np.int64)[rows_position]
+
+        speeds = frame.integers("speed")
+        over = speeds > limits
+        prev_start = frame.previous_state.get("speeding_start_time")
+        starts, ends = episode_bounds(over, prev_start is not None)
+        # Episode start time per row, duration since it and the episode's max speed so far
+        start_rows = episode_start_rows(starts)
+        times = frame.time_us()
+        start_us = times[start_rows] if len(times) else times
+        if prev_start is not None:
+            start_us = np.where(start_rows >= 0, start_us, epoch_us(prev_start))
+        duration_sec = (times - start_us) // 1_000_000
+        max_speeds = _episode_max(speeds, starts, int(frame.previous_state.get("speeding_max_speed") or 0))
+        min_duration_sec = int(config.get("MIN_DURATION_SPEED", "30"))
+        violations = over & ~starts & (duration_sec >= min_duration_sec)
+
+        results = frame.empty_results()
+        for i in np.flatnonzero(starts):
+            result_at(results, i).state_updates.update(speeding_start_time=frame.gps_time[i], speeding_max_speed=int(speeds[i]))
+        for i in np.flatnonzero(over & ~starts):
+            result_at(results, i).state_updates["speeding_max_speed"] = int(max_speeds[i])
+        for i in np.flatnonzero(ends):
+            result_at(results, i).state_updates.update(speeding_start_time=None, speeding_max_speed=None)
+        lats = frame.column("latitude")
+        lons = frame.column("longitude")
+        for i in np.flatnonzero(violations):
+            gps_time = as_utc(frame.gps_time[i])
+            road_type = road_types[rows_position[i]]
+            ev = {
+                "imei": imei,
+                "gps_time": gps_time,
+                "event_category": EVENT_CATEGORY_SPEED,
+                "event_type": EVENT_TYPE_OVERSPEED,
+                "event_value": float(speeds[i]),
+                "threshold_value": float(limits[i]),
+                "duration_sec": int(duration_sec[i]),
+                "severity": "Medium",
+                "latitude": float(lats[i]) if lats[i] is not None else None,
+                "longitude": float(lons[i]) if lons[i] is not None else None,
+            }
+            if road_type:
+                ev["metadata"] = {"road_type": str(road_type)}
+            result = result_at(results, i)
+            result.events.append(ev)
+            result.state_updates["last_violation_time"] = gps_time
+            result.state_updates["last_violation_type"] = EVENT_TYPE_OVERSPEED
+        return results
+
+    def _evaluate(
+        self,
+        imei: int,
+        record: Dict[str, Any],
+        gps_time: datetime,
+        prev: Dict[str, Any],
+        config: Dict[str, str],
+        road_info: Optional[Dict[str, Any]],
+    ) -> CalculatorResult:
         lat = record.get("latitude")
         lon = record.get("longitude")
-        road_info = None
-        if lat is not None and lon is not None:
-            try:
-                from engine.db import get_road_speed_limit
-                road_info = await get_road_speed_limit(float(lat), float(lon))
-            except (TypeError, ValueError):
-                pass
-        road_type = str(road_info["road_type"]) if road_info and road_info.get("road_type") is not None else None
-        if road_info and road_info.get("speed_limit") is not None:
-            limit = int(road_info["speed_limit"])
-        else:
-            limit = _get_speed_limit_from_config(config, road_type)
+        limit, road_type = _limit_and_road_type(config, road_info)
         min_duration_sec = int(config.get("MIN_DURATION_SPEED", "30"))
         speed = int(record.get("speed") or 0)
-        gps_time = ctx.gps_time
         state_updates = {}
         events = []
         if speed > limit:
@@ -72,18 +191,13 @@ class SpeedViolationCalculator(BaseCalculator):
                 state_updates["speeding_start_time"] = gps_time
                 state_updates["speeding_max_speed"] = speed
             else:
-                if isinstance(prev_start, str):
-                    from dateutil import parser
-                    prev_start = parser.parse(prev_start)
-                if prev_start.tzinfo is None:
-                    prev_start = prev_start.replace(tzinfo=timezone.utc)
-                if gps_time.tzinfo is None:
-                    gps_time = gps_time.replace(tzinfo=timezone.utc)
+                prev_start = as_utc(prev_start)
+                gps_time = as_utc(gps_time)
                 duration_sec = int((gps_time - prev_start).total_seconds())
                 state_updates["speeding_max_speed"] = max(prev_max, speed)
                 if duration_sec >= min_duration_sec:
                     ev = {
-                        "imei": ctx.imei,
+                        "imei": imei,
                         "gps_time": gps_time,
                         "event_category": EVENT_CATEGORY_SPEED,
                         "event_type": EVENT_TYPE_OVERSPEED,
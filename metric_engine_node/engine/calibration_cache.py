@@ -0,0 +1,148 @@
+"""
+Fuel calibration curve cache (plan § 9B.2, Phase 3 calibration integration).
+calibration rows (raw_value_min, raw_value_max, calibrated_liters, ordered by sequence) are
+loaded once per vehicle into a CalibrationCurve: NumPy arrays of segment bounds plus cumulative
+liters at each segment start, queried for a whole column of raw values with np.searchsorted +
+linear interpolation (to_liters_array).
+
+Lookup semantics match the original linear walk: the first segment (by sequence) with
+raw_value_min <= raw <= raw_value_max wins, its liters are interpolated across the segment and
+added to the liters of all earlier segments; raw values outside every segment give None.
+Curves whose segments are not ascending and non-overlapping in sequence order keep the
+linear walk.
+
+Invalidation: calibration INSERT/UPDATE/DELETE fires pg_notify('config_change',
+'calibration:<vehicle_id>') (tr_calibration_change); recalculation_worker.run_listener_loop
+calls invalidate_calibration(vehicle_id). Curves also expire after calibration_cache_ttl_sec.
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Plan § 2.6: refresh cached reference data every 5 minutes when no notification arrives
+CALIBRATION_CACHE_TTL_SEC = 300.0
+
+
+class CalibrationCurve:
+    """Piecewise-linear raw -> liters curve for one vehicle."""
+
+    __slots__ = ("mins", "maxs", "liters", "cumulative", "spans", "sorted")
+
+    def __init__(self, segments: Sequence[Tuple[float, float, float]]):
+        """segments: (raw_value_min, raw_value_max, calibrated_liters) in sequence order."""
+        self.mins = np.array([float(s[0]) for s in segments], dtype=np.float64)
+        self.maxs = np.array([float(s[1]) for s in segments], dtype=np.float64)
+        self.liters = np.array([float(s[2]) for s in segments], dtype=np.float64)
+        # Liters accumulated before each segment (summed in sequence order)
+        cumulative: List[float] = []
+        total = 0.0
+        for seg_liters in self.liters.tolist():
+            cumulative.append(total)
+            total += seg_liters
+        self.cumulative = np.array(cumulative, dtype=np.float64)
+        self.spans = self.maxs - self.mins
+        self.sorted = bool(
+            np.all(self.mins <= self.maxs) and np.all(self.maxs[:-1] <= self.mins[1:])
+        )
+
+    def to_liters_array(self, raws: Any) -> np.ndarray:
+        """Liters per raw sensor value as a float64 array; NaN where the raw value is None / NaN
+        or outside the calibrated range."""
+        if isinstance(raws, np.ndarray):
+            raws = raws.astype(np.float64, copy=False)
+        else:
+            raws = np.array([np.nan if v is None else v for v in raws], dtype=np.float64)
+        n = len(self.mins)
+        if n == 0 or len(raws) == 0:
+            return np.full(len(raws), np.nan)
+        if self.sorted:
+            # maxs ascends, so the first segment with max >= raw is the only candidate; it wins
+            # on a shared breakpoint (prev max == this min). NaN sorts past the last segment.
+            seg = np.searchsorted(self.maxs, raws, side="left")
+            found = seg < n
+            seg = np.minimum(seg, n - 1)
+            found &= self.mins[seg] <= raws
+        else:
+            # Overlapping / unordered segments: first match in sequence order
+            seg = np.zeros(len(raws), dtype=np.intp)
+            found = np.zeros(len(raws), dtype=bool)
+            for i in range(n):
+                match = ~found & (self.mins[i] <= raws) & (raws <= self.maxs[i])
+                seg[match] = i
+                found |= match
+        spans = self.spans[seg]
+        flat = spans <= 0
+        # Zero-width segment: all of its liters
+        fraction = (raws - self.mins[seg]) / np.where(flat, 1.0, spans) * self.liters[seg]
+        values = self.cumulative[seg] + np.where(flat, self.liters[seg], fraction)
+        return np.where(found, values, np.nan)
+
+    def to_liters_many(self, raws: Sequence[Optional[float]]) -> List[Optional[float]]:
+        """Liters per raw value, None when outside the calibrated range."""
+        return [None if v != v else v for v in self.to_liters_array(raws).tolist()]
+
+    def to_liters(self, raw: Optional[float]) -> Optional[float]:
+        """Liters for a raw sensor value, or None when outside the calibrated range."""
+        return self.to_liters_many([raw])[0]
+
+
+class CalibrationCache:
+    """vehicle_id -> CalibrationCurve (None when the vehicle has no calibration rows), with TTL."""
+
+    def __init__(self, ttl_sec: float = CALIBRATION_CACHE_TTL_SEC):
+        self.ttl_sec = ttl_sec
+        self._curves: Dict[int, Tuple[Optional[CalibrationCurve], float]] = {}
+        self.loads = 0
+
+    async def get_curve(self, vehicle_id: int) -> Optional[CalibrationCurve]:
+        cached = self._curves.get(vehicle_id)
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < self.ttl_sec:
+            return cached[0]
+        from .db import get_pool
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT raw_value_min, raw_value_max, calibrated_liters
+                FROM calibration
+                WHERE vehicle_id = $1
+                ORDER BY sequence, id
+                """,
+                vehicle_id,
+            )
+        curve = CalibrationCurve(
+            [(r["raw_value_min"], r["raw_value_max"], r["calibrated_liters"]) for r in rows]
+        ) if rows else None
+        self._curves[vehicle_id] = (curve, now)
+        self.loads += 1
+        return curve
+
+    def invalidate(self, vehicle_id: Optional[int] = None) -> None:
+        """Drop one vehicle's curve, or all curves when vehicle_id is None."""
+        if vehicle_id is None:
+            self._curves.clear()
+        else:
+            self._curves.pop(vehicle_id, None)
+
+
+_calibration_cache: Optional[CalibrationCache] = None
+
+
+def get_calibration_cache() -> CalibrationCache:
+    global _calibration_cache
+    if _calibration_cache is None:
+        from config import Config
+        ttl = float(Config.get_metric_engine_config().get("calibration_cache_ttl_sec", CALIBRATION_CACHE_TTL_SEC))
+        _calibration_cache = CalibrationCache(ttl_sec=ttl)
+    return _calibration_cache
+
+
+def invalidate_calibration(vehicle_id: Optional[int] = None) -> None:
+    """Called on calibration change notifications (vehicle_id from the 'calibration:<vehicle_id>' payload)."""
+    if _calibration_cache is not None:
+        _calibration_cache.invalidate(vehicle_id)
@@ -3,6 +3,8 @@ Config resolution: tracker_config → client_config → system_config (system de
 Resolution order: per IMEI override → client config → system default → emergency default.
 Plan § 2.6: cache config (refresh every 5 min). Batch resolution to avoid N+1 queries.
 Plan § 2.5B: config key set derived from DB (system_config); fallback to CONFIG_KEYS when DB unavailable.
+get_config_cached resolves from the shared config snapshot (engine/config_snapshot.py) unless
+metric_engine.config_snapshot_enabled is false, then per IMEI (get_config_bulk + TTL cache).
 """
 import asyncio
 import logging
@@ -270,8 +272,12 @@ async def get_config_bulk(imei: int, keys: Optional[List[str]] = None, pool=None
 async def get_config_cached(imei: int) -> Dict[str, str]:
     """
     Resolve config for imei with in-memory cache (plan § 2.6: refresh every 5 min).
-    Uses get_config_bulk for batch resolution.
+    Uses the config snapshot when enabled, else get_config_bulk per IMEI.
     """
+    from .config_snapshot import get_config_snapshot_service
+    service = get_config_snapshot_service()
+    if service is not None:
+        return await service.get_config(imei)
     now = time.monotonic()
     async with _config_cache_lock:
         entry = _config_cache.get(imei)
@@ -0,0 +1,359 @@
+"""
+Config snapshot (plan § 2.6): system_config, client_config and tracker_config for all IMEIs,
+loaded in bulk and resolved in process (tracker → client → system → emergency default, same
+result as config_resolution.get_config_bulk).
+
+A ConfigSnapshot is never modified after it is published; changes build a new snapshot
+(copy-on-write per client / tracker) and swap the reference, so readers take no lock. When the
+snapshot is older than config_snapshot_refresh_sec, callers keep getting it while one background
+task reloads it (no stampede when the TTL expires).
+
+Incremental refresh: tr_client_config_change / tr_tracker_config_change notify 'client_config:<id>'
+and 'tracker_config:<imei>' on config_change; recalculation_worker.run_listener_loop calls
+apply_config_change() and only that client / tracker is reloaded. config_change_log is polled every
+config_snapshot_poll_sec as a fallback when LISTEN is not connected. system_config has no change
+trigger and is picked up by the periodic full reload.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config_resolution import CONFIG_KEYS, EMERGENCY_DEFAULTS
+
+logger = logging.getLogger(__name__)
+
+# Retry interval when the first load fails (emergency defaults are served meanwhile)
+FAILED_LOAD_RETRY_SEC = 30.0
+
+
+def _layer(rows: Iterable[Any], keys: frozenset) -> Dict[str, str]:
+    return {r["config_key"]: r["config_value"] for r in rows if r["config_key"] in keys}
+
+
+class ConfigSnapshot:
+    """Immutable layered config: system (over emergency defaults), client_id -> overrides, imei -> overrides."""
+
+    __slots__ = ("keys", "base", "clients", "trackers", "client_of_imei", "loaded_at", "change_id", "_resolved")
+
+    def __init__(
+        self,
+        keys: List[str],
+        base: Dict[str, str],
+        clients: Dict[int, Dict[str, str]],
+        trackers: Dict[int, Dict[str, str]],
+        client_of_imei: Dict[int, Optional[int]],
+        loaded_at: float,
+        change_id: int,
+    ):
+        self.keys = keys
+        self.base = base
+        self.clients = clients
+        self.trackers = trackers
+        self.client_of_imei = client_of_imei
+        self.loaded_at = loaded_at
+        self.change_id = change_id
+        # imei -> resolved config; only a cache, dropped with the snapshot
+        self._resolved: Dict[int, Dict[str, str]] = {}
+
+    def resolve(self, imei: int, client_id: Optional[int], cache: bool = True) -> Dict[str, str]:
+        """Config for imei (copy); client_id from client_of_imei or looked up by the caller."""
+        cfg = self._resolved.get(imei) if cache else None
+        if cfg is None:
+            cfg = dict(self.base)
+            if client_id is not None:
+                cfg.update(self.clients.get(client_id, ()))
+            cfg.update(self.trackers.get(imei, ()))
+            for k, v in cfg.items():
+                if v == "" and k in EMERGENCY_DEFAULTS:
+                    cfg[k] = EMERGENCY_DEFAULTS[k]
+            if cache:
+                self._resolved[imei] = cfg
+        return dict(cfg)
+
+    def replace(
+        self,
+        clients: Optional[Dict[int, Dict[str, str]]] = None,
+        trackers: Optional[Dict[int, Dict[str, str]]] = None,
+        change_id: Optional[int] = None,
+    ) -> "ConfigSnapshot":
+        """New snapshot with some layers replaced (same keys, base and load time)."""
+        return ConfigSnapshot(
+            self.keys,
+            self.base,
+            self.clients if clients is None else clients,
+            self.trackers if trackers is None else trackers,
+            self.client_of_imei,
+            self.loaded_at,
+            self.change_id if change_id is None else change_id,
+        )
+
+
+class ConfigSnapshotService:
+    """Holds the current ConfigSnapshot; single-flight full reload, incremental updates, change-log polling."""
+
+    def __init__(self, refresh_sec: float = 300.0, poll_sec: float = 30.0):
+        self.refresh_sec = refresh_sec
+        self.poll_sec = poll_sec
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._reload_task: Optional[asyncio.Future] = None
+        self._poll_task: Optional[asyncio.Future] = None
+        self._last_poll = 0.0
+        # Trackers added after the last full reload: imei -> client_id (None = no client)
+        self._extra_clients: Dict[int, Optional[int]] = {}
+        self._client_lookups: Dict[int, asyncio.Future] = {}
+        # Serialises snapshot swaps (full reload vs incremental); readers never take it
+        self._swap_lock = asyncio.Lock()
+        self.reloads = 0
+        self.incremental_updates = 0
+
+    async def get_config(self, imei: int) -> Dict[str, str]:
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = await self._reload_once()
+        else:
+            now = time.monotonic()
+            if now - snapshot.loaded_at >= self.refresh_sec:
+                self._start_reload()
+            elif now - self._last_poll >= self.poll_sec:
+                self._start_poll()
+        client_id = snapshot.client_of_imei.get(imei, _MISSING)
+        if client_id is _MISSING:
+            if not snapshot.clients:
+                return snapshot.resolve(imei, None)
+            # Tracker added after the load: not memoized in the snapshot
+            return snapshot.resolve(imei, await self._client_of_new_imei(imei), cache=False)
+        return snapshot.resolve(imei, client_id)
+
+    def _start_reload(self) -> None:
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.ensure_future(self._reload())
+
+    def _start_poll(self) -> None:
+        self._last_poll = time.monotonic()
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.ensure_future(self.poll_changes())
+
+    async def _reload_once(self) -> ConfigSnapshot:
+        """First load: all callers wait for the same reload."""
+        self._start_reload()
+        await asyncio.shield(self._reload_task)
+        return self._snapshot
+
+    async def _reload(self) -> None:
+        """Full reload; on failure keep the current snapshot (or serve emergency defaults until retry)."""
+        try:
+            snapshot = await self._load()
+        except Exception as e:
+            logger.warning("Config snapshot load failed: %s", e)
+            if self._snapshot is None:
+                keys = list(CONFIG_KEYS)
+                self._snapshot = ConfigSnapshot(
+                    keys, {k: EMERGENCY_DEFAULTS.get(k, "") for k in keys}, {}, {}, {},
+                    time.monotonic() - self.refresh_sec + FAILED_LOAD_RETRY_SEC, 0,
+                )
+            else:
+                # Keep serving it; retry after another interval instead of on every call
+                retry = self._snapshot.replace()
+                retry.loaded_at = time.monotonic()
+                self._snapshot = retry
+            return
+        async with self._swap_lock:
+            self._snapshot = snapshot
+            self._extra_clients = {}
+            self._last_poll = time.monotonic()
+        self.reloads += 1
+        logger.info(
+            "Config snapshot loaded: %s keys, %s clients, %s trackers with overrides, %s IMEIs",
+            len(snapshot.keys), len(snapshot.clients), len(snapshot.trackers), len(snapshot.client_of_imei),
+        )
+
+    async def _load(self) -> ConfigSnapshot:
+        from .db import get_pool
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            # Watermark first: changes committed during the load are applied again by the next poll
+            change_id = await conn.fetchval("SELECT COALESCE(MAX(id), 0) FROM config_change_log")
+            system_rows = await conn.fetch("SELECT config_key, config_value FROM system_config")
+            client_rows = await conn.fetch("SELECT client_id, config_key, config_value FROM client_config")
+            tracker_rows = await conn.fetch("SELECT imei, config_key, config_value FROM tracker_config")
+            imei_rows = await conn.fetch(
+                "SELECT t.imei, v.client_id FROM tracker t LEFT JOIN vehicle v ON v.vehicle_id = t.vehicle_id"
+            )
+        # Plan § 2.5B: key set is what system_config defines (built-in list when empty)
+        keys = sorted({r["config_key"] for r in system_rows}) or list(CONFIG_KEYS)
+        key_set = frozenset(keys)
+        base = {k: EMERGENCY_DEFAULTS.get(k, "") for k in keys}
+        base.update(_layer(system_rows, key_set))
+        clients: Dict[int, Dict[str, str]] = {}
+        for r in client_rows:
+            if r["config_key"] in key_set:
+                clients.setdefault(r["client_id"], {})[r["config_key"]] = r["config_value"]
+        trackers: Dict[int, Dict[str, str]] = {}
+        for r in tracker_rows:
+            if r["config_key"] in key_set:
+                trackers.setdefault(r["imei"], {})[r["config_key"]] = r["config_value"]
+        client_of_imei = {r["imei"]: r["client_id"] for r in imei_rows}
+        return ConfigSnapshot(keys, base, clients, trackers, client_of_imei, time.monotonic(), int(change_id or 0))
+
+    async def _client_of_new_imei(self, imei: int) -> Optional[int]:
+        """client_id of a tracker not in the snapshot (one query per IMEI until the next full reload)."""
+        if imei in self._extra_clients:
+            return self._extra_clients[imei]
+        fut = self._client_lookups.get(imei)
+        if fut is None:
+            fut = asyncio.ensure_future(self._query_client(imei))
+            self._client_lookups[imei] = fut
+        try:
+            return await asyncio.shield(fut)
+        finally:
+            if fut.done():
+                self._client_lookups.pop(imei, None)
+
+    async def _query_client(self, imei: int) -> Optional[int]:
+        try:
+            from .db import get_pool
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                client_id = await conn.fetchval(
+                    "SELECT v.client_id FROM tracker t JOIN vehicle v ON v.vehicle_id = t.vehicle_id WHERE t.imei = $1",
+                    imei,
+                )
+        except Exception as e:
+            # Not cached: retried on the next record
+            logger.debug("Config snapshot client lookup failed for imei=%s: %s", imei, e)
+            return None
+        self._extra_clients[imei] = client_id
+        return client_id
+
+    async def apply_changes(self, changes: Iterable[Tuple[str, Any]], change_id: Optional[int] = None) -> None:
+        """Reload the config rows of changed clients / trackers ((table_name, record_key) pairs) and swap."""
+        client_ids, imeis, system = set(), set(), False
+        for table, key in changes:
+            try:
+                if table == "client_config":
+                    client_ids.add(int(key))
+                elif table == "tracker_config":
+                    imeis.add(int(key))
+                elif table == "system_config":
+                    system = True
+            except (TypeError, ValueError):
+                continue
+        if self._snapshot is None:
+            return
+        if system:
+            self._start_reload()
+            return
+        if not client_ids and not imeis:
+            if change_id is not None:
+                async with self._swap_lock:
+                    if change_id > self._snapshot.change_id:
+                        self._snapshot = self._snapshot.replace(change_id=change_id)
+            return
+        from .db import get_pool
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            client_rows = await conn.fetch(
+                "SELECT client_id, config_key, config_value FROM client_config WHERE client_id = ANY($1::int[])",
+                list(client_ids),
+            ) if client_ids else []
+            tracker_rows = await conn.fetch(
+                "SELECT imei, config_key, config_value FROM tracker_config WHERE imei = ANY($1::bigint[])",
+                list(imeis),
+            ) if imeis else []
+        async with self._swap_lock:
+            snapshot = self._snapshot
+            key_set = frozenset(snapshot.keys)
+            clients = snapshot.clients
+            if client_ids:
+                clients = dict(clients)
+                for cid in client_ids:
+                    clients.pop(cid, None)
+                for r in client_rows:
+                    if r["config_key"] in key_set:
+                        clients.setdefault(r["client_id"], {})[r["config_key"]] = r["config_value"]
+            trackers = snapshot.trackers
+            if imeis:
+                trackers = dict(trackers)
+                for imei in imeis:
+                    trackers.pop(imei, None)
+                for r in tracker_rows:
+                    if r["config_key"] in key_set:
+                        trackers.setdefault(r["imei"], {})[r["config_key"]] = r["config_value"]
+            new_id = snapshot.change_id if change_id is None else max(snapshot.change_id, change_id)
+            self._snapshot = snapshot.replace(clients=clients, trackers=trackers, change_id=new_id)
+        self.incremental_updates += 1
+        logger.debug("Config snapshot updated: clients=%s trackers=%s", sorted(client_ids), sorted(imeis))
+
+    async def poll_changes(self) -> None:
+        """Apply config_change_log rows after the snapshot watermark (fallback for missed notifications)."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return
+        try:
+            from .db import get_pool
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    SELECT id, table_name, record_key FROM config_change_log
+                    WHERE id > $1 AND table_name IN ('client_config', 'tracker_config', 'system_config')
+                    ORDER BY id
+                    LIMIT 1000
+                    """,
+                    snapshot.change_id,
+                )
+            if rows:
+                await self.apply_changes(((r["table_name"], r["record_key"]) for r in rows), change_id=rows[-1]["id"])
+        except Exception as e:
+            logger.warning("Config snapshot change poll failed: %s", e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "loaded": snapshot is not None,
+            "age_sec": (time.monotonic() - snapshot.loaded_at) if snapshot else None,
+            "clients": len(snapshot.clients) if snapshot else 0,
+            "trackers": len(snapshot.trackers) if snapshot else 0,
+            "reloads": self.reloads,
+            "incremental_updates": self.incremental_updates,
+        }
+
+
+_MISSING = object()
+_service: Optional[ConfigSnapshotService] = None
+
+
+def get_config_snapshot_service() -> Optional[ConfigSnapshotService]:
+    """Process-wide config snapshot, or None when metric_engine.config_snapshot_enabled is false."""
+    global _service
+    if _service is None:
+        from config import Config
+        me_cfg = Config.get_metric_engine_config()
+        if me_cfg.get("config_snapshot_enabled") is False:
+            return None
+        _service = ConfigSnapshotService(
+            refresh_sec=float(me_cfg.get("config_snapshot_refresh_sec", 300.0)),
+            poll_sec=float(me_cfg.get("config_snapshot_poll_sec", 30.0)),
+        )
+    return _service
+
+
+def apply_config_change(payload: str) -> None:
+    """config_change notification ('client_config:<id>' / 'tracker_config:<imei>'): reload that scope."""
+    if _service is None or not payload:
+        return
+    table, _, key = payload.partition(":")
+    fut = asyncio.ensure_future(_service.apply_changes([(table, key)]))
+    fut.add_done_callback(_log_failure)
+
+
+def poll_config_changes() -> None:
+    """Catch up from config_change_log (e.g. after the LISTEN connection was re-established)."""
+    if _service is not None:
+        _service._start_poll()
+
+
+def _log_failure(fut: asyncio.Future) -> None:
+    if not fut.cancelled() and fut.exception() is not None:
+        logger.warning("Config snapshot update failed: %s", fut.exception())
@@ -6,7 +6,7 @@ Circuit breaker wraps all DB operations (plan § 2.9).
 import json
 import logging
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from .circuit_breaker import db_circuit_breaker, CircuitBreakerOpenError
 
@@ -102,13 +102,16 @@ async def _read_laststatus_state_impl(imei: int) -> Dict[str, Any]:
         return dict(row)
 
 
-async def read_laststatus_state(imei: int) -> Dict[str, Any]:
-    """Read metric-engine state + position for context. Returns dict of column -> value."""
+async def read_laststatus_state(imei: int, raise_errors: bool = False) -> Dict[str, Any]:
+    """Read metric-engine state + position for context. Returns dict of column -> value.
+    raise_errors=True re-raises DB errors instead of returning {} (state cache must not cache a failed read)."""
     try:
         return await db_circuit_breaker.call(_read_laststatus_state_impl, imei)
     except CircuitBreakerOpenError:
         raise
     except Exception as e:
+        if raise_errors:
+            raise
         logger.warning("read_laststatus_state failed for imei=%s: %s", imei, e)
         return {}
 
@@ -183,6 +186,55 @@ async def handle_trip_actions(imei: int, updates: Dict[str, Any]) -> Dict[str, A
     return dict(updates)
 
 
+async def _apply_laststatus_updates(
+    conn,
+    imei: int,
+    updates: Dict[str, Any],
+    gps_time: Optional[datetime],
+    insert_if_missing: Optional[Dict[str, Any]],
+) -> bool:
+    """UPDATE state columns on conn; INSERT a minimal row when missing and insert_if_missing given. False if nothing to set."""
+    allowed = set(STATE_COLUMNS)
+    set_parts = []
+    args = []
+    i = 1
+    for k, v in updates.items():
+        if k not in allowed:
+            continue
+        if v is None:
+            set_parts.append(f'"{k}" = NULL')
+        else:
+            set_parts.append(f'"{k}" = ${i}')
+            args.append(v)
+            i += 1
+    if not set_parts:
+        return False
+    args.append(imei)
+    q = f"UPDATE laststatus SET {', '.join(set_parts)} WHERE imei = ${i}"
+    result = await conn.execute(q, *args)
+    # Plan § 2.1: if no row (new device), INSERT minimal position + state when insert_if_missing provided
+    # asyncpg execute returns e.g. "UPDATE 1" or "UPDATE 0"
+    rows_affected = result.strip().split()[-1] if result else "0"
+    if rows_affected == "0" and insert_if_missing:
+        lat = insert_if_missing.get("latitude")
+        lon = insert_if_missing.get("longitude")
+        ts = gps_time or datetime.now(timezone.utc)
+        cols = ["imei", "gps_time", "latitude", "longitude"]
+        vals = [imei, ts, lat, lon]
+        for k, v in updates.items():
+            if k not in allowed:
+                continue
+            cols.append(f'"{k}"')
+            vals.append(v)
+        placeholders = ", ".join(f"${n}" for n in range(1, len(vals) + 1))
+        col_list = ", ".join(cols)
+        await conn.execute(
+            f"INSERT INTO laststatus ({col_list}) VALUES ({placeholders})",
+            *vals,
+        )
+    return True
+
+
 async def _update_laststatus_state_impl(
     imei: int,
     updates: Dict[str, Any],
@@ -204,44 +256,8 @@ async def _update_laststatus_state_impl(
                 "SELECT vehicle_state FROM laststatus WHERE imei = $1", imei
             )
             previous_state = row["vehicle_state"] if row else None
-        allowed = set(STATE_COLUMNS)
-        set_parts = []
-        args = []
-        i = 1
-        for k, v in updates.items():
-            if k not in allowed:
-                continue
-            if v is None:
-                set_parts.append(f'"{k}" = NULL')
-            else:
-                set_parts.append(f'"{k}" = ${i}')
-                args.append(v)
-                i += 1
-        if not set_parts:
+        if not await _apply_laststatus_updates(conn, imei, updates, gps_time, insert_if_missing):
             return
-        args.append(imei)
-        q = f"UPDATE laststatus SET {', '.join(set_parts)} WHERE imei = ${i}"
-        result = await conn.execute(q, *args)
-        # Plan § 2.1: if no row (new device), INSERT minimal position + state when insert_if_missing provided
-        # asyncpg execute returns e.g. "UPDATE 1" or "UPDATE 0"
-        rows_affected = result.strip().split()[-1] if result else "0"
-        if rows_affected == "0" and insert_if_missing:
-            lat = insert_if_missing.get("latitude")
-            lon = insert_if_missing.get("longitude")
-            ts = gps_time or datetime.now(timezone.utc)
-            cols = ["imei", "gps_time", "latitude", "longitude"]
-            vals = [imei, ts, lat, lon]
-            for k, v in updates.items():
-                if k not in allowed:
-                    continue
-                cols.append(f'"{k}"')
-                vals.append(v)
-            placeholders = ", ".join(f"${n}" for n in range(1, len(vals) + 1))
-            col_list = ", ".join(cols)
-            await conn.execute(
-                f"INSERT INTO laststatus ({col_list}) VALUES ({placeholders})",
-                *vals,
-            )
         # Plan § 6.3: log vehicle_state transition to laststatus_history
         if new_vehicle_state is not None and new_vehicle_state != previous_state:
             ts = gps_time or datetime.now(timezone.utc)
@@ -275,6 +291,101 @@ async def update_laststatus_state(
         logger.warning("update_laststatus_state failed for imei=%s: %s", imei, e)
 
 
+# Rows per multi-row upsert statement (27 columns/row stays well below the 32767 bind limit)
+LASTSTATUS_BATCH_CHUNK = 500
+
+
+async def _write_laststatus_state_batch_impl(
+    rows: List[Dict[str, Any]],
+    history: List[Dict[str, Any]],
+) -> List[int]:
+    """
+    Write coalesced state for many IMEIs in one transaction (state cache write-behind).
+
+    Each row: imei, state (column -> value), expected_gps_time (last_processed_gps_time the cache
+    last saw in the DB) and, for new devices, insert_if_missing with gps_time/latitude/longitude
+    for the minimal row (plan § 2.1; without it a missing row is not created). Rows whose DB
+    last_processed_gps_time moved past both the expected value and our own are owned by another
+    instance: they are skipped and returned.
+    """
+    if not rows:
+        return []
+    pool = await _get_pool_raw()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            current = await conn.fetch(
+                "SELECT imei, last_processed_gps_time FROM laststatus WHERE imei = ANY($1::bigint[]) FOR UPDATE",
+                [r["imei"] for r in rows],
+            )
+            db_gps = {rec["imei"]: rec["last_processed_gps_time"] for rec in current}
+            lost: List[int] = []
+            owned: List[Dict[str, Any]] = []
+            for r in rows:
+                in_db = db_gps.get(r["imei"])
+                ours = r["state"].get("last_processed_gps_time")
+                if (
+                    in_db is not None
+                    and in_db != r.get("expected_gps_time")
+                    and (ours is None or in_db >= ours)
+                ):
+                    lost.append(r["imei"])
+                elif r["imei"] in db_gps or r.get("insert_if_missing"):
+                    owned.append(r)
+
+            state_cols = STATE_COLUMNS
+            cols = ["imei", "gps_time", "latitude", "longitude"] + state_cols
+            col_list = ", ".join(f'"{c}"' for c in cols)
+            set_list = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in state_cols)
+            for start in range(0, len(owned), LASTSTATUS_BATCH_CHUNK):
+                chunk = owned[start:start + LASTSTATUS_BATCH_CHUNK]
+                args: List[Any] = []
+                values = []
+                for r in chunk:
+                    base = len(args)
+                    values.append("(" + ", ".join(f"${base + n}" for n in range(1, len(cols) + 1)) + ")")
+                    args.extend([
+                        r["imei"],
+                        r.get("gps_time") or datetime.now(timezone.utc),
+                        r.get("latitude"),
+                        r.get("longitude"),
+                    ])
+                    args.extend(r["state"].get(c) for c in state_cols)
+                await conn.execute(
+                    f"INSERT INTO laststatus ({col_list}) VALUES {', '.join(values)} "
+                    f"ON CONFLICT (imei) DO UPDATE SET {set_list}",
+                    *args,
+                )
+
+            # Plan § 6.3: vehicle_state transitions (one row per imei/gps_time; last one wins)
+            lost_set = set(lost)
+            transitions = {}
+            for h in history:
+                if h["imei"] in lost_set:
+                    continue
+                transitions[(h["imei"], h["gps_time"])] = h
+            if transitions:
+                await conn.executemany(
+                    """
+                    INSERT INTO laststatus_history (imei, gps_time, vehicle_state, previous_state)
+                    VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (imei, gps_time) DO UPDATE SET vehicle_state = EXCLUDED.vehicle_state, previous_state = EXCLUDED.previous_state
+                    """,
+                    [
+                        (h["imei"], h["gps_time"], h["vehicle_state"], h["previous_state"])
+                        for h in transitions.values()
+                    ],
+                )
+    return lost
+
+
+async def write_laststatus_state_batch(
+    rows: List[Dict[str, Any]],
+    history: List[Dict[str, Any]],
+) -> List[int]:
+    """Batched state upsert for the state cache; returns IMEIs skipped because another instance owns them. Raises on failure."""
+    return await db_circuit_breaker.call(_write_laststatus_state_batch_impl, rows, history)
+
+
 def _metric_event_metadata(ev: Dict[str, Any]) -> str:
     """Plan § 6.3: include imei and gps_time in metadata for trackdata join."""
     meta = dict(ev.get("metadata") or {})
@@ -286,34 +397,40 @@ def _metric_event_metadata(ev: Dict[str, Any]) -> str:
     return json.dumps(meta)
 
 
+_METRIC_EVENT_INSERT_SQL = """
+    INSERT INTO metric_events (
+        imei, gps_time, event_category, event_type,
+        event_value, threshold_value, duration_sec, severity,
+        fence_id, trip_id, latitude, longitude, metadata, formula_version, created_at
+    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15)
+"""
+
+
+def _metric_event_args(ev: Dict[str, Any], created_at: datetime) -> tuple:
+    return (
+        ev.get("imei"),
+        ev.get("gps_time"),
+        ev.get("event_category"),
+        ev.get("event_type"),
+        ev.get("event_value"),
+        ev.get("threshold_value"),
+        ev.get("duration_sec"),
+        ev.get("severity"),
+        ev.get("fence_id"),
+        ev.get("trip_id"),
+        ev.get("latitude"),
+        ev.get("longitude"),
+        _metric_event_metadata(ev),
+        ev.get("formula_version") or "1.0.0",
+        created_at,
+    )
+
+
 async def _insert_metric_events_impl(events: List[Dict[str, Any]]) -> None:
     pool = await _get_pool_raw()
+    now = datetime.now(timezone.utc)
     async with pool.acquire() as conn:
-        for ev in events:
-            await conn.execute(
-                """
-                INSERT INTO metric_events (
-                    imei, gps_time, event_category, event_type,
-                    event_value, threshold_value, duration_sec, severity,
-                    fence_id, trip_id, latitude, longitude, metadata, formula_version, created_at
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15)
-                """,
-                ev.get("imei"),
-                ev.get("gps_time"),
-                ev.get("event_category"),
-                ev.get("event_type"),
-                ev.get("event_value"),
-                ev.get("threshold_value"),
-                ev.get("duration_sec"),
-                ev.get("severity"),
-                ev.get("fence_id"),
-                ev.get("trip_id"),
-                ev.get("latitude"),
-                ev.get("longitude"),
-                _metric_event_metadata(ev),
-                ev.get("formula_version") or "1.0.0",
-                datetime.now(timezone.utc),
-            )
+        await conn.executemany(_METRIC_EVENT_INSERT_SQL, [_metric_event_args(ev, now) for ev in events])
 
 
 async def insert_metric_events(events: List[Dict[str, Any]]) -> None:
@@ -328,6 +445,104 @@ async def insert_metric_events(events: List[Dict[str, Any]]) -> None:
         logger.warning("insert_metric_events failed: %s", e)
 
 
+async def _write_buffered_chunk_impl(
+    states: List[Dict[str, Any]],
+    events: List[Dict[str, Any]],
+    trip_distances: Dict[int, Tuple[float, datetime]],
+    stoppages: List[Dict[str, Any]],
+) -> None:
+    pool = await _get_pool_raw()
+    now = datetime.now(timezone.utc)
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            previous_states: Dict[int, Any] = {}
+            history_imeis = [st["imei"] for st in states if st.get("vehicle_states")]
+            if history_imeis:
+                rows = await conn.fetch(
+                    "SELECT imei, vehicle_state FROM laststatus WHERE imei = ANY($1::bigint[]) FOR UPDATE",
+                    history_imeis,
+                )
+                previous_states = {r["imei"]: r["vehicle_state"] for r in rows}
+            history = []
+            for st in states:
+                imei = st["imei"]
+                if not st.get("updates"):
+                    continue
+                if not await _apply_laststatus_updates(
+                    conn, imei, st["updates"], st.get("insert_gps_time"), st.get("insert_if_missing")
+                ):
+                    continue
+                # Plan § 6.3: one laststatus_history row per vehicle_state transition in the chunk
+                previous_state = previous_states.get(imei)
+                for ts, vehicle_state in st.get("vehicle_states") or []:
+                    if vehicle_state != previous_state:
+                        history.append((imei, ts, vehicle_state, previous_state))
+                        previous_state = vehicle_state
+            if history:
+                await conn.executemany(
+                    """
+                    INSERT INTO laststatus_history (imei, gps_time, vehicle_state, previous_state)
+                    VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (imei, gps_time) DO UPDATE SET vehicle_state = EXCLUDED.vehicle_state, previous_state = EXCLUDED.previous_state
+                    """,
+                    history,
+                )
+            if trip_distances:
+                await conn.executemany(
+                    """
+                    UPDATE trip SET
+                        total_distance_km = COALESCE(total_distance_km, 0) + $1,
+                        total_duration_sec = EXTRACT(EPOCH FROM ($2 - trip_start_time))::INTEGER,
+                        updated_at = NOW()
+                    WHERE trip_id = $3 AND trip_status = 'Ongoing'
+                    """,
+                    [(km, last_gps, trip_id) for trip_id, (km, last_gps) in trip_distances.items()],
+                )
+            if stoppages:
+                await conn.executemany(
+                    """
+                    INSERT INTO trip_stoppage_log (trip_id, stoppage_type, start_time, end_time, duration_sec, latitude, longitude, inside_fence_id)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                    """,
+                    [
+                        (
+                            e["trip_id"],
+                            e.get("stoppage_type") or "Stop",
+                            e["start_time"],
+                            e["end_time"],
+                            int((e["end_time"] - e["start_time"]).total_seconds()),
+                            e.get("latitude"),
+                            e.get("longitude"),
+                            e.get("inside_fence_id"),
+                        )
+                        for e in stoppages
+                    ],
+                )
+            if events:
+                await conn.executemany(_METRIC_EVENT_INSERT_SQL, [_metric_event_args(ev, now) for ev in events])
+
+
+async def write_buffered_chunk(
+    states: List[Dict[str, Any]],
+    events: List[Dict[str, Any]],
+    trip_distances: Dict[int, Tuple[float, datetime]],
+    stoppages: List[Dict[str, Any]],
+) -> None:
+    """
+    Write buffered output of many records in one transaction (recalculation chunks, plan § 9B.2;
+    pending_writes replay, plan § 2.6).
+
+    states: per IMEI {imei, updates (coalesced, last_processed_gps_time included), insert_gps_time /
+    insert_if_missing (minimal row for a new device, first record), vehicle_states ((gps_time,
+    vehicle_state) per record in order, for laststatus_history)};
+    trip_distances: trip_id -> (distance_km summed over the chunk, last gps_time).
+    Errors are raised so the caller can keep the chunk instead of dropping it.
+    """
+    if not (states or events or trip_distances or stoppages):
+        return
+    await db_circuit_breaker.call(_write_buffered_chunk_impl, states, events, trip_distances, stoppages)
+
+
 # --- Message retry tracking (plan § 2.6: bounded retries, DLQ after max, persist so restarts do not reset) ---
 
 async def get_message_retry_count(message_signature: str) -> int:
@@ -416,6 +631,45 @@ async def mark_message_processed(message_signature: str) -> None:
         logger.warning("mark_message_processed failed: %s", e)
 
 
+async def get_processed_message_signatures(signatures: List[str]) -> set:
+    """Windowed consumption: which of signatures were already processed (one ANY query)."""
+    if not signatures:
+        return set()
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT message_signature FROM metric_engine_processed_messages WHERE message_signature = ANY($1::varchar[])",
+                signatures,
+            )
+            return {r["message_signature"] for r in rows}
+    except Exception as e:
+        logger.debug("get_processed_message_signatures failed: %s", e)
+        return set()
+
+
+async def mark_messages_processed(signatures: List[str]) -> None:
+    """Windowed consumption: clear retry counts and record all signatures as processed in one statement."""
+    if not signatures:
+        return
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                WITH cleared AS (
+                    DELETE FROM metric_engine_message_retries WHERE message_signature = ANY($1::varchar[])
+                )
+                INSERT INTO metric_engine_processed_messages (message_signature, processed_at)
+                SELECT DISTINCT s, NOW() FROM unnest($1::varchar[]) AS s
+                ON CONFLICT (message_signature) DO UPDATE SET processed_at = NOW()
+                """,
+                signatures,
+            )
+    except Exception as e:
+        logger.warning("mark_messages_processed failed: %s", e)
+
+
 async def cleanup_old_processed_messages(max_age_days: int = 7) -> int:
     """Delete processed-message rows older than max_age_days. Returns rows deleted."""
     try:
@@ -522,43 +776,35 @@ async def get_fuel_liters_from_calibration(
     """
     Convert raw fuel sensor value to liters using calibration table (piecewise linear).
     Returns None if vehicle_id is None, no calibration rows, or raw_value out of range.
+    The vehicle's curve is cached (engine/calibration_cache.py).
     """
     if vehicle_id is None:
         return None
     try:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
-            rows = await conn.fetch(
-                """
-                SELECT raw_value_min, raw_value_max, calibrated_liters, sequence
-                FROM calibration
-                WHERE vehicle_id = $1
-                ORDER BY sequence
-                """,
-                vehicle_id,
-            )
-        if not rows:
-            return None
-        # Find segment containing raw_value
-        prev_cumulative = 0.0
-        for row in rows:
-            rmin = float(row["raw_value_min"])
-            rmax = float(row["raw_value_max"])
-            seg_liters = float(row["calibrated_liters"])
-            if rmin <= raw_value <= rmax:
-                span = rmax - rmin
-                if span <= 0:
-                    return prev_cumulative + seg_liters
-                frac = (raw_value - rmin) / span
-                return prev_cumulative + frac * seg_liters
-            # This segment ends at rmax; cumulative liters at end of segment
-            prev_cumulative += seg_liters
-        return None
+        from .calibration_cache import get_calibration_cache
+        curve = await get_calibration_cache().get_curve(vehicle_id)
+        return curve.to_liters(raw_value) if curve is not None else None
     except Exception as e:
         logger.debug("get_fuel_liters_from_calibration failed: %s", e)
         return None
 
 
+async def get_fuel_liters_from_calibration_batch(
+    vehicle_id: Optional[int], raw_values: Sequence[Optional[float]]
+) -> List[Optional[float]]:
+    """Convert many raw fuel values (list or NumPy array, e.g. a page's fuel column) for one vehicle
+    with a single curve lookup (vectorized, CalibrationCurve.to_liters_array)."""
+    if vehicle_id is None or len(raw_values) == 0:
+        return [None] * len(raw_values)
+    try:
+        from .calibration_cache import get_calibration_cache
+        curve = await get_calibration_cache().get_curve(vehicle_id)
+        return curve.to_liters_many(raw_values) if curve is not None else [None] * len(raw_values)
+    except Exception as e:
+        logger.debug("get_fuel_liters_from_calibration_batch failed: %s", e)
+        return [None] * len(raw_values)
+
+
 async def _update_trip_accumulation_impl(
     trip_id: int, distance_km: float, gps_time: datetime
 ) -> None:
@@ -617,9 +863,8 @@ async def update_trip_fuel_consumed_for_vehicle(vehicle_id: int) -> int:
                 """,
                 vehicle_id,
             )
-            updated = 0
+            fuel_pairs = []
             for t in trips:
-                trip_id = t["trip_id"]
                 start_ts = t["trip_start_time"]
                 end_ts = t["trip_end_time"]
                 start_fuel = await conn.fetchval(
@@ -635,17 +880,22 @@ async def update_trip_fuel_consumed_for_vehicle(vehicle_id: int) -> int:
                     end_ts,
                 )
                 if start_fuel is not None and end_fuel is not None:
-                    start_liters = await get_fuel_liters_from_calibration(vehicle_id, float(start_fuel))
-                    end_liters = await get_fuel_liters_from_calibration(vehicle_id, float(end_fuel))
-                    if start_liters is not None and end_liters is not None:
-                        consumed = max(0.0, float(start_liters) - float(end_liters))
-                        await conn.execute(
-                            "UPDATE trip SET fuel_consumed = $1, updated_at = NOW() WHERE trip_id = $2",
-                            consumed,
-                            trip_id,
-                        )
-                        updated += 1
-            return updated
+                    fuel_pairs.append((t["trip_id"], float(start_fuel), float(end_fuel)))
+            # One calibration conversion for all trip start/end values
+            liters = await get_fuel_liters_from_calibration_batch(
+                vehicle_id, [v for _, start, end in fuel_pairs for v in (start, end)]
+            )
+            updates = []
+            for n, (trip_id, _, _) in enumerate(fuel_pairs):
+                start_liters, end_liters = liters[2 * n], liters[2 * n + 1]
+                if start_liters is not None and end_liters is not None:
+                    updates.append((max(0.0, float(start_liters) - float(end_liters)), trip_id))
+            if updates:
+                await conn.executemany(
+                    "UPDATE trip SET fuel_consumed = $1, updated_at = NOW() WHERE trip_id = $2",
+                    updates,
+                )
+            return len(updates)
     except Exception as e:
         logger.warning("update_trip_fuel_consumed_for_vehicle failed vehicle_id=%s: %s", vehicle_id, e)
         return 0
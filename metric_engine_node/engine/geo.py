@@ -0,0 +1,115 @@
+"""
+Small geometry helpers for in-process spatial checks (fence index, road tile cache).
+Distances use a local tangent plane at the query point with WGS84 radii of curvature, which is
+within a fraction of a metre of PostGIS geography distances at fence / road-width scale.
+Geohash encoding matches PostGIS ST_GeoHash (used for trackdata.geohash_6).
+"""
+import math
+from typing import List, Sequence, Tuple
+
+# WGS84 (PostGIS geography default spheroid)
+WGS84_A = 6378137.0
+WGS84_E2 = 6.69437999014e-3
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_GEOHASH_INDEX = {c: i for i, c in enumerate(_GEOHASH_BASE32)}
+
+
+def radii(lat: float) -> Tuple[float, float]:
+    """Metres per radian of (longitude, latitude) at lat (prime vertical * cos, meridional radius)."""
+    phi = math.radians(lat)
+    s = math.sin(phi)
+    w = 1.0 - WGS84_E2 * s * s
+    n = WGS84_A / math.sqrt(w)
+    m = WGS84_A * (1.0 - WGS84_E2) / (w * math.sqrt(w))
+    return n * math.cos(phi), m
+
+
+def segment_distance_sq(px: float, py: float, ax: float, ay: float, bx: float, by: float) -> float:
+    """Squared planar distance from (px, py) to segment a-b."""
+    dx, dy = bx - ax, by - ay
+    if dx == 0.0 and dy == 0.0:
+        return (px - ax) ** 2 + (py - ay) ** 2
+    t = ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)
+    t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+    cx, cy = ax + t * dx, ay + t * dy
+    return (px - cx) ** 2 + (py - cy) ** 2
+
+
+def polyline_distance_m(lon: float, lat: float, lines: Sequence[Sequence[Tuple[float, float]]], closed: bool = False) -> float:
+    """Distance in metres from (lon, lat) to the nearest segment of lines ([(lon, lat), ...] each)."""
+    lon_m, lat_m = radii(lat)
+    kx, ky = math.radians(1.0) * lon_m, math.radians(1.0) * lat_m
+    best = float("inf")
+    for line in lines:
+        n = len(line)
+        if n == 1:
+            ax, ay = line[0]
+            best = min(best, ((ax - lon) * kx) ** 2 + ((ay - lat) * ky) ** 2)
+            continue
+        for i in range(0 if closed else 1, n):
+            ax, ay = line[i - 1]
+            bx, by = line[i]
+            d = segment_distance_sq(0.0, 0.0, (ax - lon) * kx, (ay - lat) * ky, (bx - lon) * kx, (by - lat) * ky)
+            if d < best:
+                best = d
+    return math.sqrt(best)
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 6) -> str:
+    """Standard geohash (same cells as ST_GeoHash)."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars: List[str] = []
+    bits = 0
+    ch = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = (ch << 1) | 1
+                lon_lo = mid
+            else:
+                ch <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_BASE32[ch])
+            bits = 0
+            ch = 0
+    return "".join(chars)
+
+
+def geohash_bbox(geohash: str) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _GEOHASH_INDEX[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lon_lo, lat_lo, lon_hi, lat_hi
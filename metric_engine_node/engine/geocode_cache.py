@@ -1,14 +1,44 @@
 """
 Geocode cache: read/write reverse geocoding results (plan § 6.3 Group 8, METRIC_CATALOG).
 Used for location labels in reports; optional integration with external reverse-geocode API.
+
+Two tiers:
+- in-process LRU keyed by the rounded coordinates packed into one int (precision, lat, lon);
+  misses are cached for geocode_negative_ttl_sec so unknown points do not hit the DB every time
+- geocode_cache table, read in batches by get_many (one unnest join per batch of points)
+Writes (set_geocode) go to the LRU at once and are upserted in bulk every
+geocode_write_flush_sec or geocode_write_batch_size rows (write-behind; flush_geocode_writes()
+on shutdown). Lookups and DB time are exported as metric_engine_geocode_* metrics.
 """
+import asyncio
 import logging
-from typing import Any, Awaitable, Callable, Dict, Optional
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 
 logger = logging.getLogger(__name__)
 
 # Default rounding precision: ~11 m (4 decimal places), or use 3 for ~111 m
 DEFAULT_LAT_LON_PRECISION = 4
+# Packed keys hold lon in 32 bits and lat in 28 bits: up to 6 decimals
+MAX_PACKED_PRECISION = 6
+
+_GET_MANY_SQL = """
+SELECT u.i, g.city, g.address, g.country, g.cached_at
+FROM unnest($1::float8[], $2::float8[]) WITH ORDINALITY AS u(lat, lng, i)
+JOIN geocode_cache g ON g.lat_rounded = u.lat AND g.lng_rounded = u.lng
+"""
+
+_UPSERT_SQL = """
+INSERT INTO geocode_cache (lat_rounded, lng_rounded, city, address, country, cached_at)
+SELECT u.lat, u.lng, u.city, u.address, u.country, u.cached_at
+FROM unnest($1::float8[], $2::float8[], $3::text[], $4::text[], $5::text[], $6::timestamptz[])
+     AS u(lat, lng, city, address, country, cached_at)
+ON CONFLICT (lat_rounded, lng_rounded)
+DO UPDATE SET city = EXCLUDED.city, address = EXCLUDED.address,
+              country = EXCLUDED.country, cached_at = EXCLUDED.cached_at
+"""
 
 
 def _round_coord(coord: float, precision: int = DEFAULT_LAT_LON_PRECISION) -> float:
@@ -18,6 +48,253 @@ def _round_coord(coord: float, precision: int = DEFAULT_LAT_LON_PRECISION) -> fl
     return round(float(coord), precision)
 
 
+def pack_key(lat_r: float, lon_r: float, precision: int) -> int:
+    """Rounded (lat, lon) at precision as one non-negative int64: precision | lat | lon."""
+    if not 0 <= precision <= MAX_PACKED_PRECISION:
+        raise ValueError("geocode precision must be 0..%d" % MAX_PACKED_PRECISION)
+    scale = 10 ** precision
+    lat_q = int(round(lat_r * scale)) + 90 * scale
+    lon_q = int(round(lon_r * scale)) + 180 * scale
+    return (precision << 60) | (lat_q << 32) | lon_q
+
+
+def _metric(name: str):
+    try:
+        import metrics
+        return getattr(metrics, name)
+    except Exception:
+        return None
+
+
+class GeocodeCache:
+    """In-process LRU over geocode_cache with batched reads and write-behind bulk upserts."""
+
+    def __init__(
+        self,
+        max_entries: int = 100000,
+        ttl_sec: float = 86400.0,
+        negative_ttl_sec: float = 300.0,
+        write_batch_size: int = 500,
+        write_flush_sec: float = 5.0,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_sec = ttl_sec
+        self.negative_ttl_sec = negative_ttl_sec
+        self.write_batch_size = max(1, write_batch_size)
+        self.write_flush_sec = write_flush_sec
+        # key -> (result or None for a known miss, expires_at)
+        self._lru: "OrderedDict[int, Tuple[Optional[Dict[str, Any]], float]]" = OrderedDict()
+        # key -> row to upsert (latest write wins)
+        self._pending: Dict[int, Tuple[float, float, Optional[str], Optional[str], Optional[str], datetime]] = {}
+        self._flush_task: Optional[asyncio.Future] = None
+        self._flush_lock = asyncio.Lock()
+        self._write_pool = None
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _get_local(self, key: int, now: float) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        entry = self._lru.get(key)
+        if entry is None:
+            return False, None
+        if now >= entry[1]:
+            del self._lru[key]
+            return False, None
+        self._lru.move_to_end(key)
+        return True, entry[0]
+
+    def _put_local(self, key: int, result: Optional[Dict[str, Any]], now: float) -> None:
+        ttl = self.ttl_sec if result is not None else self.negative_ttl_sec
+        self._lru[key] = (result, now + ttl)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def get_many(
+        self,
+        points: Sequence[Tuple[float, float]],
+        precision: int = DEFAULT_LAT_LON_PRECISION,
+        pool=None,
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Cached reverse-geocode result (city, address, country, cached_at) per (lat, lon), None if unknown."""
+        t0 = time.perf_counter()
+        now = time.monotonic()
+        out: List[Optional[Dict[str, Any]]] = [None] * len(points)
+        # key -> (lat_r, lon_r, indexes into points) for LRU misses
+        wanted: Dict[int, Tuple[float, float, List[int]]] = {}
+        hits = 0
+        for i, (lat, lon) in enumerate(points):
+            lat_r = _round_coord(lat, precision)
+            lon_r = _round_coord(lon, precision)
+            key = pack_key(lat_r, lon_r, precision)
+            found, result = self._get_local(key, now)
+            if found:
+                if result is not None:
+                    hits += 1
+                    out[i] = dict(result)
+            elif key in wanted:
+                wanted[key][2].append(i)
+            else:
+                wanted[key] = (lat_r, lon_r, [i])
+        db_hits = 0
+        if wanted:
+            rows = await self._read_db([(w[0], w[1]) for w in wanted.values()], pool)
+            if rows is not None:
+                now = time.monotonic()
+                keys = list(wanted)
+                from_db = {keys[r["i"] - 1]: r for r in rows}
+                for key, (_, _, indexes) in wanted.items():
+                    if key in self._pending:
+                        # Written while the read was in flight: the local entry is newer
+                        result = self._lru.get(key, (None, 0.0))[0]
+                    elif key in from_db:
+                        r = from_db[key]
+                        result = {
+                            "city": r["city"],
+                            "address": r["address"],
+                            "country": r["country"],
+                            "cached_at": r["cached_at"],
+                        }
+                        self._put_local(key, result, now)
+                    else:
+                        result = None
+                        self._put_local(key, None, now)
+                    if result is not None:
+                        db_hits += len(indexes)
+                        for i in indexes:
+                            out[i] = dict(result)
+        misses = len(points) - hits - db_hits
+        self.hits += hits
+        self.db_hits += db_hits
+        self.misses += misses
+        lookups = _metric("metric_engine_geocode_lookups_total")
+        if lookups is not None:
+            if hits:
+                lookups.labels(result="memory").inc(hits)
+            if db_hits:
+                lookups.labels(result="db").inc(db_hits)
+            if misses:
+                lookups.labels(result="miss").inc(misses)
+        duration = _metric("metric_engine_geocode_duration_seconds")
+        if duration is not None:
+            duration.labels(op="get_many").observe(time.perf_counter() - t0)
+        return out
+
+    async def _read_db(self, coords: List[Tuple[float, float]], pool) -> Optional[List[Any]]:
+        """Rows (i = 1-based index into coords) of geocode_cache for coords; None on failure."""
+        try:
+            if pool is None:
+                from .db import get_pool
+                pool = await get_pool()
+            t0 = time.perf_counter()
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(_GET_MANY_SQL, [c[0] for c in coords], [c[1] for c in coords])
+            duration = _metric("metric_engine_geocode_duration_seconds")
+            if duration is not None:
+                duration.labels(op="db_read").observe(time.perf_counter() - t0)
+            return rows
+        except Exception as e:
+            logger.debug("geocode get_many failed: %s", e)
+            return None
+
+    async def set(
+        self,
+        lat: float,
+        lon: float,
+        city: Optional[str],
+        address: Optional[str],
+        country: Optional[str],
+        precision: int = DEFAULT_LAT_LON_PRECISION,
+        pool=None,
+    ) -> None:
+        """Store a result: visible to lookups at once, upserted with the next bulk write."""
+        lat_r = _round_coord(lat, precision)
+        lon_r = _round_coord(lon, precision)
+        key = pack_key(lat_r, lon_r, precision)
+        cached_at = datetime.now(timezone.utc)
+        self._put_local(
+            key,
+            {"city": city or None, "address": address or None, "country": country or None, "cached_at": cached_at},
+            time.monotonic(),
+        )
+        self._pending[key] = (lat_r, lon_r, city or None, address or None, country or None, cached_at)
+        if pool is not None:
+            self._write_pool = pool
+        if len(self._pending) >= self.write_batch_size:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.write_flush_sec)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Upsert pending writes in one statement; on failure they stay pending for the next flush."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch = self._pending
+            self._pending = {}
+            rows = list(batch.values())
+            try:
+                pool = self._write_pool
+                if pool is None:
+                    from .db import get_pool
+                    pool = await get_pool()
+                t0 = time.perf_counter()
+                async with pool.acquire() as conn:
+                    await conn.execute(_UPSERT_SQL, *[[r[c] for r in rows] for c in range(6)])
+                duration = _metric("metric_engine_geocode_duration_seconds")
+                if duration is not None:
+                    duration.labels(op="db_write").observe(time.perf_counter() - t0)
+            except Exception as e:
+                logger.warning("geocode bulk upsert of %s rows failed: %s", len(rows), e)
+                # Newer writes for the same key win over the failed batch
+                for key, row in batch.items():
+                    self._pending.setdefault(key, row)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._lru),
+            "pending_writes": len(self._pending),
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+        }
+
+
+_geocode_cache: Optional[GeocodeCache] = None
+
+
+def get_geocode_cache() -> GeocodeCache:
+    """Process-wide geocode cache (metric_engine.geocode_* settings)."""
+    global _geocode_cache
+    if _geocode_cache is None:
+        from config import Config
+        me_cfg = Config.get_metric_engine_config()
+        _geocode_cache = GeocodeCache(
+            max_entries=int(me_cfg.get("geocode_cache_max_entries", 100000)),
+            ttl_sec=float(me_cfg.get("geocode_cache_ttl_sec", 86400.0)),
+            negative_ttl_sec=float(me_cfg.get("geocode_negative_ttl_sec", 300.0)),
+            write_batch_size=int(me_cfg.get("geocode_write_batch_size", 500)),
+            write_flush_sec=float(me_cfg.get("geocode_write_flush_sec", 5.0)),
+        )
+    return _geocode_cache
+
+
+async def get_many(
+    points: Sequence[Tuple[float, float]],
+    precision: int = DEFAULT_LAT_LON_PRECISION,
+    pool=None,
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Look up cached reverse-geocode results for many (lat, lon) points (one DB query for all LRU misses).
+    Returns one dict (city, address, country, cached_at) or None per point, in order.
+    """
+    return await get_geocode_cache().get_many(points, precision=precision, pool=pool)
+
+
 async def get_geocode(
     lat: float,
     lon: float,
@@ -28,37 +305,7 @@ async def get_geocode(
     Look up cached reverse-geocode result for (lat, lon).
     Returns dict with city, address, country, cached_at or None if not found.
     """
-    if pool is None:
-        try:
-            from .db import get_pool
-            pool = await get_pool()
-        except Exception as e:
-            logger.debug("get_geocode: no pool: %s", e)
-            return None
-    lat_r = _round_coord(lat, precision)
-    lon_r = _round_coord(lon, precision)
-    try:
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow(
-                """
-                SELECT city, address, country, cached_at
-                FROM geocode_cache
-                WHERE lat_rounded = $1 AND lng_rounded = $2
-                """,
-                lat_r,
-                lon_r,
-            )
-            if row is None:
-                return None
-            return {
-                "city": row["city"],
-                "address": row["address"],
-                "country": row["country"],
-                "cached_at": row["cached_at"],
-            }
-    except Exception as e:
-        logger.debug("get_geocode failed: %s", e)
-        return None
+    return (await get_many([(lat, lon)], precision=precision, pool=pool))[0]
 
 
 async def set_geocode(
@@ -72,35 +319,15 @@ async def set_geocode(
 ) -> None:
     """
     Upsert a reverse-geocode result into geocode_cache.
-    Call after resolving (lat, lon) via external API.
+    Call after resolving (lat, lon) via external API. Written in bulk (see flush_geocode_writes).
     """
-    if pool is None:
-        try:
-            from .db import get_pool
-            pool = await get_pool()
-        except Exception as e:
-            logger.debug("set_geocode: no pool: %s", e)
-            return
-    lat_r = _round_coord(lat, precision)
-    lon_r = _round_coord(lon, precision)
-    try:
-        async with pool.acquire() as conn:
-            await conn.execute(
-                """
-                INSERT INTO geocode_cache (lat_rounded, lng_rounded, city, address, country, cached_at)
-                VALUES ($1, $2, $3, $4, $5, (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'))
-                ON CONFLICT (lat_rounded, lng_rounded)
-                DO UPDATE SET city = EXCLUDED.city, address = EXCLUDED.address,
-                              country = EXCLUDED.country, cached_at = EXCLUDED.cached_at
-                """,
-                lat_r,
-                lon_r,
-                city or None,
-                address or None,
-                country or None,
-            )
-    except Exception as e:
-        logger.warning("set_geocode failed: %s", e)
+    await get_geocode_cache().set(lat, lon, city, address, country, precision=precision, pool=pool)
+
+
+async def flush_geocode_writes() -> None:
+    """Write pending geocode results now (shutdown, or before reading geocode_cache from elsewhere)."""
+    if _geocode_cache is not None:
+        await _geocode_cache.flush()
 
 
 async def get_or_fetch_geocode(
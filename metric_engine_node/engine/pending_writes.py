@@ -1,18 +1,409 @@
 """
-Plan § 2.6 Scenario 3: When DB is down, queue metric results in memory (max 1000).
-On success flush queue; when full drop oldest and log.
-Plan § 1.2: flush also runs trip accumulation when distance_km and trip_id present.
+Plan § 2.6 Scenario 3: When DB is down, queue metric results and replay them when it is back.
+Items are kept in memory up to pending_memory_max; beyond that they are appended to segment files
+in pending_spill_dir (JSON lines, rotated every pending_segment_max_items). Once anything is on
+disk new items go to disk too, so replay keeps push order. Segments left by a previous run are
+replayed after restart; on shutdown items still in memory are written to a segment (close()).
+When the spill directory passes pending_spill_max_mb the oldest segment is dropped and logged.
+
+Replay (flush) is batched: state updates are coalesced per IMEI, events go in one multi-row insert
+and trip accumulation in one grouped update per chunk (db.write_buffered_chunk). Items carrying a
+trip start/end are written one at a time, in order (plan § 1.2: flush also runs trip accumulation
+when distance_km and trip_id present). Replay is at-least-once: a crash while a segment is being
+replayed replays that segment again.
+
+backlog() / is_backpressured() let the consumer pause while the backlog is above
+pending_backpressure_items.
 """
 import asyncio
+import json
 import logging
+import os
+import time
 from collections import deque
-from typing import Any, Dict, List, Optional
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Deque, Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 MAX_PENDING = 1000
-_pending: deque = deque(maxlen=MAX_PENDING)
-_lock = asyncio.Lock()
+# Plan § 5.1: drain up to this many items per flush for faster recovery
+FLUSH_BATCH_SIZE = 500
+SEGMENT_SUFFIX = ".jsonl"
+# Spilled items are fsynced at most this often (and on segment rotation / close)
+FSYNC_INTERVAL_SEC = 1.0
+
+# (item, segment path it was loaded from, or None for items pushed to memory)
+_Entry = Tuple[Dict[str, Any], Optional[str]]
+
+
+def _json_default(o: Any) -> Any:
+    if isinstance(o, datetime):
+        return {"$dt": o.isoformat()}
+    if isinstance(o, date):
+        return {"$d": o.isoformat()}
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, (set, frozenset, tuple)):
+        return list(o)
+    return str(o)
+
+
+def _json_object_hook(d: Dict[str, Any]) -> Any:
+    if len(d) == 1:
+        if "$dt" in d:
+            return datetime.fromisoformat(d["$dt"])
+        if "$d" in d:
+            return date.fromisoformat(d["$d"])
+    return d
+
+
+class PendingWrites:
+    """Memory queue with append-only segment files behind it."""
+
+    def __init__(
+        self,
+        memory_max: int = MAX_PENDING,
+        spill_dir: Optional[str] = None,
+        segment_max_items: int = 10000,
+        spill_max_bytes: int = 1024 * 1024 * 1024,
+        flush_batch_size: int = FLUSH_BATCH_SIZE,
+        backpressure_items: int = 0,
+    ):
+        self.memory_max = max(1, memory_max)
+        self.spill_dir = spill_dir or None
+        self.segment_max_items = max(1, segment_max_items)
+        self.spill_max_bytes = spill_max_bytes
+        self.flush_batch_size = max(1, flush_batch_size)
+        self.backpressure_items = backpressure_items
+        self._memory: Deque[_Entry] = deque()
+        self._segments: List[str] = []  # closed segments not loaded yet, oldest first
+        self._segment_items: Dict[str, int] = {}  # segment path -> items not written yet
+        self._active: Optional[str] = None
+        self._active_file = None
+        self._active_items = 0
+        self._last_fsync = 0.0
+        self._seq = 0
+        self._lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self.dropped = 0
+        self.replayed = 0
+        if self.spill_dir:
+            self._recover()
+
+    # --- disk tier ---
+
+    def _recover(self) -> None:
+        """Pick up segments left by a previous run (oldest first)."""
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            names = sorted(n for n in os.listdir(self.spill_dir) if n.endswith(SEGMENT_SUFFIX))
+        except OSError as e:
+            logger.error("Pending writes spill dir %s unusable, spilling disabled: %s", self.spill_dir, e)
+            self.spill_dir = None
+            return
+        total = 0
+        for name in names:
+            path = os.path.join(self.spill_dir, name)
+            with open(path, "rb") as f:
+                n = sum(1 for line in f if line.strip())
+            if n == 0:
+                os.remove(path)
+                continue
+            self._segments.append(path)
+            self._segment_items[path] = n
+            total += n
+        if total:
+            logger.warning("Pending writes: %s items in %s segments recovered from %s", total, len(self._segments), self.spill_dir)
+
+    def _new_segment_path(self) -> str:
+        self._seq += 1
+        return os.path.join(self.spill_dir, f"{int(time.time() * 1000):013d}-{self._seq:06d}{SEGMENT_SUFFIX}")
+
+    def _close_active(self) -> None:
+        if self._active is None:
+            return
+        try:
+            self._active_file.flush()
+            os.fsync(self._active_file.fileno())
+        finally:
+            self._active_file.close()
+        self._segments.append(self._active)
+        self._segment_items[self._active] = self._active_items
+        self._active, self._active_file, self._active_items = None, None, 0
+
+    def _spill(self, item: Dict[str, Any]) -> None:
+        if self._active is None:
+            self._active = self._new_segment_path()
+            self._active_file = open(self._active, "a", encoding="utf-8")
+        self._active_file.write(json.dumps(item, default=_json_default) + "\n")
+        self._active_file.flush()
+        self._active_items += 1
+        now = time.monotonic()
+        if now - self._last_fsync >= FSYNC_INTERVAL_SEC:
+            os.fsync(self._active_file.fileno())
+            self._last_fsync = now
+        if self._active_items >= self.segment_max_items:
+            self._close_active()
+            self._enforce_spill_limit()
+
+    def _enforce_spill_limit(self) -> None:
+        """Drop the oldest unloaded segments while the spill directory is over spill_max_bytes."""
+        if self.spill_max_bytes <= 0:
+            return
+        paths = self._segments + ([self._active] if self._active else [])
+        sizes = {p: os.path.getsize(p) for p in paths if os.path.exists(p)}
+        total = sum(sizes.values())
+        while total > self.spill_max_bytes and len(self._segments) > 1:
+            path = self._segments.pop(0)
+            n = self._segment_items.pop(path, 0)
+            total -= sizes.get(path, 0)
+            os.remove(path)
+            self.dropped += n
+            logger.error("Pending writes spill over %s bytes; dropped oldest segment %s (%s items)", self.spill_max_bytes, path, n)
+
+    def _load_next_segment(self) -> None:
+        """Move the oldest segment into memory; its file is removed once all its items are written."""
+        if not self._segments:
+            self._close_active()
+        if not self._segments:
+            return
+        path = self._segments.pop(0)
+        loaded = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line, object_hook=_json_object_hook)
+                except ValueError as e:
+                    # Torn last line after a crash
+                    logger.warning("Pending writes: skipping unreadable line in %s: %s", path, e)
+                    continue
+                self._memory.append((item, path))
+                loaded += 1
+        self._segment_items[path] = loaded
+        if loaded == 0:
+            self._segment_done(path)
+
+    def _segment_done(self, path: str) -> None:
+        self._segment_items.pop(path, None)
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning("Pending writes: could not remove replayed segment %s: %s", path, e)
+
+    def _written(self, entries: List[_Entry]) -> None:
+        for _, path in entries:
+            if path is None:
+                continue
+            left = self._segment_items.get(path, 0) - 1
+            if left <= 0:
+                self._segment_done(path)
+            else:
+                self._segment_items[path] = left
+        self.replayed += len(entries)
+
+    # --- queue ---
+
+    def _disk_items(self) -> int:
+        return sum(self._segment_items.get(p, 0) for p in self._segments) + self._active_items
+
+    def backlog(self) -> int:
+        return len(self._memory) + self._disk_items()
+
+    def is_backpressured(self) -> bool:
+        return self.backpressure_items > 0 and self.backlog() >= self.backpressure_items
+
+    async def push(self, item: Dict[str, Any]) -> None:
+        async with self._lock:
+            if not self._segments and self._active is None and len(self._memory) < self.memory_max:
+                self._memory.append((item, None))
+                return
+            if self.spill_dir:
+                try:
+                    self._spill(item)
+                    return
+                except OSError as e:
+                    logger.error("Pending writes spill failed, keeping in memory: %s", e)
+                    self._memory.append((item, None))
+                    return
+            dropped, _ = self._memory.popleft()
+            self.dropped += 1
+            logger.warning(
+                "Pending writes queue full (max=%s); dropped oldest imei=%s gps_time=%s",
+                self.memory_max,
+                dropped.get("imei"),
+                dropped.get("gps_time"),
+            )
+            self._memory.append((item, None))
+
+    async def flush(self, max_items: Optional[int] = None) -> None:
+        """Replay up to max_items in chunks; stop when the circuit breaker is open."""
+        if self.backlog() == 0 or self._flush_lock.locked():
+            return
+        from .circuit_breaker import CircuitBreakerOpenError
+
+        limit = max_items if max_items is not None else self.flush_batch_size
+        processed = 0
+        async with self._flush_lock:
+            while processed < limit:
+                async with self._lock:
+                    # Fill the chunk from disk, oldest segment first
+                    while len(self._memory) < limit - processed and (self._segments or self._active):
+                        self._load_next_segment()
+                    if not self._memory:
+                        return
+                    batch = [self._memory.popleft() for _ in range(min(limit - processed, len(self._memory)))]
+                try:
+                    await self._write_batch(batch)
+                except CircuitBreakerOpenError:
+                    logger.debug("Flush stopped: circuit breaker open")
+                    return
+                processed += len(batch)
+
+    async def _write_batch(self, batch: List[_Entry]) -> None:
+        """Write batch in order: runs of plain items as one chunk, trip start/end items one by one.
+        Unwritten entries go back to the front before CircuitBreakerOpenError / cancellation propagates."""
+        from .circuit_breaker import CircuitBreakerOpenError
+
+        i = 0
+        while i < len(batch):
+            j = i + 1
+            if not _has_trip_action(batch[i][0]):
+                while j < len(batch) and not _has_trip_action(batch[j][0]):
+                    j += 1
+            run = batch[i:j]
+            written = 0
+            try:
+                if _has_trip_action(run[0][0]):
+                    await _write_one(run[0][0])
+                else:
+                    try:
+                        await self._write_chunk([item for item, _ in run])
+                    except CircuitBreakerOpenError:
+                        raise
+                    except Exception as e:
+                        logger.warning("Pending chunk write failed (%s items), replaying one by one: %s", len(run), e)
+                        for item, _ in run:
+                            await _write_one(item)
+                            written += 1
+                written = len(run)
+            except (CircuitBreakerOpenError, asyncio.CancelledError):
+                # Breaker open or flush cancelled (shutdown timeout): keep what was not written
+                self._written(run[:written])
+                self._memory.extendleft(reversed(batch[i + written:]))
+                raise
+            self._written(run)
+            i = j
+
+    async def _write_chunk(self, items: List[Dict[str, Any]]) -> None:
+        """Coalesce state per IMEI, group trip distance per trip, and write with the events in one transaction."""
+        from .db import write_buffered_chunk
+
+        states: Dict[int, Dict[str, Any]] = {}
+        events: List[Dict[str, Any]] = []
+        trip_distances: Dict[int, Tuple[float, Any]] = {}
+        for item in items:
+            gps_time = item.get("gps_time")
+            state_updates = item.get("state_updates")
+            if state_updates:
+                st = states.setdefault(item["imei"], {
+                    "imei": item["imei"], "updates": {}, "insert_gps_time": None,
+                    "insert_if_missing": None, "vehicle_states": [],
+                })
+                st["updates"].update(state_updates)
+                if gps_time is not None:
+                    st["updates"]["last_processed_gps_time"] = gps_time
+                    if state_updates.get("vehicle_state") is not None:
+                        st["vehicle_states"].append((gps_time, state_updates["vehicle_state"]))
+                if item.get("insert_if_missing") and st["insert_if_missing"] is None:
+                    st["insert_gps_time"] = gps_time
+                    st["insert_if_missing"] = item["insert_if_missing"]
+            trip_id, distance_km = item.get("trip_id"), item.get("distance_km")
+            if trip_id is not None and distance_km is not None and distance_km > 0:
+                total, _ = trip_distances.get(trip_id, (0.0, gps_time))
+                trip_distances[trip_id] = (total + distance_km, gps_time)
+            events.extend(item.get("events") or [])
+        await write_buffered_chunk(list(states.values()), events, trip_distances, [])
+
+    async def close(self) -> None:
+        """Shutdown: write items still in memory to a segment that sorts before the others."""
+        async with self._lock:
+            if not self.spill_dir:
+                if self._memory:
+                    logger.warning("Pending writes: %s items lost on shutdown (spilling disabled)", len(self._memory))
+                return
+            self._close_active()
+            if not self._memory:
+                return
+            loaded = {path for _, path in self._memory if path is not None}
+            existing = sorted(self._segments + list(loaded))
+            if existing:
+                # "<first>-0.jsonl" sorts just before "<first>.jsonl"
+                path = existing[0][: -len(SEGMENT_SUFFIX)] + "-0" + SEGMENT_SUFFIX
+            else:
+                path = self._new_segment_path()
+            with open(path, "w", encoding="utf-8") as f:
+                for item, _ in self._memory:
+                    f.write(json.dumps(item, default=_json_default) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            logger.info("Pending writes: %s items saved to %s", len(self._memory), path)
+            for p in loaded:
+                self._segment_done(p)
+            self._memory.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "memory": len(self._memory),
+            "disk": self._disk_items(),
+            "segments": len(self._segments) + (1 if self._active else 0),
+            "dropped": self.dropped,
+            "replayed": self.replayed,
+            "backpressured": self.is_backpressured(),
+        }
+
+
+def _has_trip_action(item: Dict[str, Any]) -> bool:
+    return bool((item.get("state_updates") or {}).get("_trip_action"))
+
+
+async def _write_one(item: Dict[str, Any]) -> None:
+    """Per-item replay (trip start/end items, and fallback when a chunk fails)."""
+    from .db import update_laststatus_state, insert_metric_events, update_trip_accumulation
+
+    gps_time = item.get("gps_time")
+    state_updates = item.get("state_updates")
+    if state_updates:
+        await update_laststatus_state(
+            item["imei"], dict(state_updates), gps_time=gps_time, insert_if_missing=item.get("insert_if_missing")
+        )
+    trip_id, distance_km = item.get("trip_id"), item.get("distance_km")
+    if trip_id is not None and distance_km is not None and distance_km > 0:
+        await update_trip_accumulation(trip_id, distance_km, gps_time)
+    if item.get("events"):
+        await insert_metric_events(item["events"])
+
+
+_pending_writes: Optional[PendingWrites] = None
+
+
+def get_pending_writes() -> PendingWrites:
+    global _pending_writes
+    if _pending_writes is None:
+        from config import Config
+        me_cfg = Config.get_metric_engine_config()
+        _pending_writes = PendingWrites(
+            memory_max=int(me_cfg.get("pending_memory_max", MAX_PENDING)),
+            spill_dir=me_cfg.get("pending_spill_dir") or None,
+            segment_max_items=int(me_cfg.get("pending_segment_max_items", 10000)),
+            spill_max_bytes=int(float(me_cfg.get("pending_spill_max_mb", 1024)) * 1024 * 1024),
+            flush_batch_size=int(me_cfg.get("pending_flush_batch_size", FLUSH_BATCH_SIZE)),
+            backpressure_items=int(me_cfg.get("pending_backpressure_items", 0)),
+        )
+    return _pending_writes
 
 
 async def push(
@@ -24,71 +415,34 @@ async def push(
     trip_id: Optional[int] = None,
     insert_if_missing: Optional[Dict[str, Any]] = None,
 ) -> None:
-    """Append one record's pending writes. If at capacity, drop oldest and log."""
-    async with _lock:
-        if len(_pending) >= MAX_PENDING:
-            dropped = _pending.popleft()
-            logger.warning(
-                "Pending writes queue full (max=%s); dropped oldest imei=%s gps_time=%s",
-                MAX_PENDING,
-                dropped.get("imei"),
-                dropped.get("gps_time"),
-            )
-        _pending.append({
-            "imei": imei,
-            "state_updates": dict(state_updates) if state_updates else {},
-            "events": list(events) if events else [],
-            "gps_time": gps_time,
-            "distance_km": distance_km,
-            "trip_id": trip_id,
-            "insert_if_missing": dict(insert_if_missing) if insert_if_missing else None,
-        })
-
-
-# Plan § 5.1: drain up to this many items per flush for faster recovery
-FLUSH_BATCH_SIZE = 100
+    """Append one record's pending writes (spills to disk past pending_memory_max)."""
+    await get_pending_writes().push({
+        "imei": imei,
+        "state_updates": dict(state_updates) if state_updates else {},
+        "events": list(events) if events else [],
+        "gps_time": gps_time,
+        "distance_km": distance_km,
+        "trip_id": trip_id,
+        "insert_if_missing": dict(insert_if_missing) if insert_if_missing else None,
+    })
 
 
 async def flush(max_items: Optional[int] = None) -> None:
-    """Drain pending writes (up to max_items per call): update_laststatus_state, update_trip_accumulation, insert_metric_events. Stop on first failure."""
-    from .db import update_laststatus_state, insert_metric_events, update_trip_accumulation
-    from .circuit_breaker import CircuitBreakerOpenError
+    """Replay pending writes (up to max_items per call) in batched chunks. Stop when the DB circuit is open."""
+    await get_pending_writes().flush(max_items)
 
-    limit = max_items if max_items is not None else FLUSH_BATCH_SIZE
-    processed = 0
-    while processed < limit:
-        async with _lock:
-            if not _pending:
-                return
-            item = _pending.popleft()
-        imei = item["imei"]
-        state_updates = item["state_updates"]
-        events = item["events"]
-        gps_time = item["gps_time"]
-        distance_km = item.get("distance_km")
-        trip_id = item.get("trip_id")
-        insert_if_missing = item.get("insert_if_missing")
-        try:
-            if state_updates:
-                await update_laststatus_state(
-                    imei, state_updates, gps_time=gps_time, insert_if_missing=insert_if_missing
-                )
-            if trip_id is not None and distance_km is not None and distance_km > 0:
-                await update_trip_accumulation(trip_id, distance_km, gps_time)
-            if events:
-                await insert_metric_events(events)
-            processed += 1
-        except CircuitBreakerOpenError:
-            async with _lock:
-                _pending.appendleft(item)
-            logger.debug("Flush stopped: circuit breaker open")
-            return
-        except Exception as e:
-            logger.warning("Flush failed for imei=%s: %s; moving to end of queue so others can flush", imei, e)
-            async with _lock:
-                _pending.append(item)
-            return
+
+async def close() -> None:
+    await get_pending_writes().close()
 
 
 def size() -> int:
-    return len(_pending)
+    return get_pending_writes().backlog()
+
+
+def is_backpressured() -> bool:
+    return get_pending_writes().is_backpressured()
+
+
+def get_stats() -> Dict[str, Any]:
+    return get_pending_writes().get_stats()
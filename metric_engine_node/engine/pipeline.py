@@ -2,6 +2,8 @@
 Metric engine pipeline: load config + previous state → run calculators → write state + events.
 Plan § 2.6 / Appendix A: validate record; invalid/partial → invalid_data_queue.
 Plan § 10.2 Phase 2: shadow_mode = calculate and log only, no DB writes or alarm publish.
+State cache (engine/state_cache.py): previous_state and tracker rows come from the in-process
+cache; state_updates are merged there and written behind in batches.
 """
 import logging
 from datetime import datetime, timezone
@@ -23,6 +25,7 @@ from .alarm_publisher import publish_metric_events as publish_metric_events_to_a
 from .calculators.registry import get_applicable_calculators, run_calculators
 from .calculators.base import CalculatorContext, CalculatorResult
 from .pending_writes import push as pending_push, flush as pending_flush
+from .state_cache import get_state_cache
 from .circuit_breaker import CircuitBreakerOpenError
 
 logger = logging.getLogger(__name__)
@@ -95,15 +98,45 @@ def _validate_record(record: Dict[str, Any], imei: int) -> Optional[str]:
     return None
 
 
+# State carried between records of a recalculation run (previous_state_override)
+_OVERRIDE_STATE_KEYS = frozenset((
+    "vehicle_state", "trip_in_progress", "current_trip_id", "current_fence_ids",
+    "driving_session_start", "driving_session_distance", "idle_start_time",
+    "speeding_start_time", "speeding_max_speed", "seatbelt_unbuckled_start",
+    "seatbelt_unbuckled_distance", "temp_violation_start", "humidity_violation_start",
+    "temp_stuck_since", "prev_temp_value", "prev_fuel_level",
+    "last_violation_time", "last_violation_type",
+    "stoppage_start_time", "stoppage_start_lat", "stoppage_start_lon",
+    "rest_start_time",
+    "last_processed_gps_time",
+))
+
+
+def _merge_override_state(
+    previous_state_override: Dict[str, Any], state_updates: Optional[Dict[str, Any]], gps_time: datetime
+) -> None:
+    if not state_updates:
+        return
+    for k, v in state_updates.items():
+        if k in _OVERRIDE_STATE_KEYS:
+            previous_state_override[k] = v
+    previous_state_override["last_processed_gps_time"] = gps_time
+
+
 async def process_record(
     record: Dict[str, Any],
     backfill: bool = False,
     previous_state_override: Optional[Dict[str, Any]] = None,
+    backfill_session: Optional[Any] = None,
+    precomputed: Optional[Dict[str, CalculatorResult]] = None,
 ) -> None:
     """
     Process one trackdata record: load state + config, run calculators, write state + metric_events.
     When backfill=True (recalculation), do not publish to alarm_exchange (plan 9B.2).
     When previous_state_override is provided (recalc), use it instead of DB and merge state_updates into it.
+    When backfill_session is provided (recalc), its preloaded tracker is used and writes are buffered
+    in the session until the caller flushes it (engine/backfill_session.py).
+    precomputed: results of batch calculators for this record (BackfillSession.precompute); not run again.
     Plan § 2.6 / Appendix A: invalid/partial records published to invalid_data_queue.
     """
     imei_raw = record.get("imei")
@@ -137,8 +170,13 @@ async def process_record(
         return
 
     gps_time = _parse_gps_time(record)
+    state_cache = get_state_cache()
+    # Recalculation (override) keeps writing through; live records go through the state cache
+    use_state_cache = state_cache is not None and previous_state_override is None
     if previous_state_override is not None:
         previous_state = dict(previous_state_override)
+    elif use_state_cache:
+        previous_state = await state_cache.get_state(imei)
     else:
         previous_state = await read_laststatus_state(imei)
 
@@ -163,7 +201,12 @@ async def process_record(
             return
 
     config = await _get_config_for_imei(imei)
-    tracker = await _get_tracker(imei)
+    if backfill_session is not None:
+        tracker = backfill_session.tracker
+    elif state_cache is not None:
+        tracker = await state_cache.get_tracker(imei, _get_tracker)
+    else:
+        tracker = await _get_tracker(imei)
 
     # Plan § 10.2 Phase 2: shadow mode — run calculators, log only, no writes
     me_cfg = Config.get_metric_engine_config()
@@ -179,7 +222,7 @@ async def process_record(
         vehicle_id=tracker.get("vehicle_id") if tracker else None,
     )
     calculators = get_applicable_calculators(imei, tracker, config)
-    result = await run_calculators(calculators, ctx)
+    result = await run_calculators(calculators, ctx, precomputed=precomputed)
 
     if shadow_mode:
         logger.info(
@@ -207,11 +250,34 @@ async def process_record(
         if lat is not None and lon is not None:
             insert_if_missing = {"latitude": float(lat), "longitude": float(lon)}
 
+    if backfill_session is not None:
+        dist_km = None
+        if record.get("distance") and effective_trip_id:
+            try:
+                dist_km = float(record.get("distance", 0)) / 1000.0
+                if dist_km <= 0:
+                    dist_km = None
+            except (TypeError, ValueError):
+                pass
+        await backfill_session.add_record(
+            result.state_updates or {}, previous_state, result.events or [],
+            getattr(result, "stoppage_log_entries", []) or [], gps_time,
+            distance_km=dist_km, trip_id=effective_trip_id, insert_if_missing=insert_if_missing,
+        )
+        if previous_state_override is not None:
+            _merge_override_state(previous_state_override, result.state_updates, gps_time)
+        return
+
     if result.state_updates:
         try:
-            await update_laststatus_state(
-                imei, result.state_updates, gps_time=gps_time, insert_if_missing=insert_if_missing
-            )
+            if use_state_cache:
+                await state_cache.apply(
+                    imei, result.state_updates, gps_time=gps_time, insert_if_missing=insert_if_missing
+                )
+            else:
+                await update_laststatus_state(
+                    imei, result.state_updates, gps_time=gps_time, insert_if_missing=insert_if_missing
+                )
         except CircuitBreakerOpenError:
             dist_km = None
             if record.get("distance") and effective_trip_id:
@@ -295,8 +361,9 @@ async def process_record(
                         dist_km = None
                 except (TypeError, ValueError):
                     pass
+            # State already held by the state cache; queue events (and trip accumulation) only
             await pending_push(
-                imei, result.state_updates or {}, result.events, gps_time,
+                imei, {} if use_state_cache else (result.state_updates or {}), result.events, gps_time,
                 distance_km=dist_km, trip_id=effective_trip_id,
                 insert_if_missing=insert_if_missing,
             )
@@ -311,8 +378,9 @@ async def process_record(
                         dist_km = None
                 except (TypeError, ValueError):
                     pass
+            # State already held by the state cache; queue events (and trip accumulation) only
             await pending_push(
-                imei, result.state_updates or {}, result.events, gps_time,
+                imei, {} if use_state_cache else (result.state_updates or {}), result.events, gps_time,
                 distance_km=dist_km, trip_id=effective_trip_id,
                 insert_if_missing=insert_if_missing,
             )
@@ -322,21 +390,8 @@ async def process_record(
                 await publish_metric_events_to_alarm(result.events)
             except Exception as e:
                 logger.warning("Alarm publish failed (non-fatal): %s", e)
-    if previous_state_override is not None and result.state_updates:
-        for k, v in result.state_updates.items():
-            if k in (
-                "vehicle_state", "trip_in_progress", "current_trip_id", "current_fence_ids",
-                "driving_session_start", "driving_session_distance", "idle_start_time",
-                "speeding_start_time", "speeding_max_speed", "seatbelt_unbuckled_start",
-                "seatbelt_unbuckled_distance", "temp_violation_start", "humidity_violation_start",
-                "temp_stuck_since", "prev_temp_value", "prev_fuel_level",
-                "last_violation_time", "last_violation_type",
-                "stoppage_start_time", "stoppage_start_lat", "stoppage_start_lon",
-                "rest_start_time",
-                "last_processed_gps_time",
-            ):
-                previous_state_override[k] = v
-        previous_state_override["last_processed_gps_time"] = gps_time
+    if previous_state_override is not None:
+        _merge_override_state(previous_state_override, result.state_updates, gps_time)
     # Plan § 2.6: after successful writes, flush pending queue
     try:
         await pending_flush()
@@ -2,12 +2,16 @@
 RabbitMQ consumer for Metric Engine Node.
 Consumes from metrics_queue (same routing as trackdata_queue).
 Plan § 2.6: bounded retries (e.g. 3); send to DLQ after max; persist retry count in DB so restarts do not reset.
+Windowed mode (metric_engine.windowed_consumption): messages are taken in windows of up to
+batch_size (or whatever arrived within batch_timeout), grouped by IMEI and the IMEI groups
+processed concurrently, each group in delivery order. Idempotency bookkeeping is one lookup and
+one insert per window, and successes are acked with a single multiple=True ack.
 """
 import asyncio
 import hashlib
 import json
 import logging
-from typing import Dict, Any, Optional, Callable, Awaitable
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
 
 import aio_pika
 from aio_pika import ExchangeType
@@ -20,6 +24,8 @@ from .db import (
     clear_message_retry_count,
     is_message_processed,
     mark_message_processed,
+    get_processed_message_signatures,
+    mark_messages_processed,
 )
 
 logger = logging.getLogger(__name__)
@@ -54,9 +60,19 @@ class MetricEngineConsumer:
         self,
         queue_name: str = "metrics_queue",
         handler: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        on_reconnect: Optional[Callable[[], Awaitable[None]]] = None,
     ):
         self.queue_name = queue_name
         self.handler = handler or default_message_handler
+        # Called after the connection is re-established (unacked messages may be redelivered
+        # to other consumers, so per-IMEI ownership can change; e.g. state cache invalidation)
+        self.on_reconnect = on_reconnect
+        self._connected_once = False
+        me_cfg = Config.get_metric_engine_config()
+        self.window_size = max(1, int(me_cfg.get("batch_size", 100)))
+        self.window_timeout = float(me_cfg.get("batch_timeout", 2.0))
+        self.window_concurrency = max(1, int(me_cfg.get("window_concurrency", 8)))
+        self.windowed = me_cfg.get("windowed_consumption") is True and self.window_size > 1
         self.connection: Optional[aio_pika.Connection] = None
         self.channel: Optional[aio_pika.Channel] = None
         self.queue: Optional[aio_pika.Queue] = None
@@ -83,8 +99,15 @@ class MetricEngineConsumer:
         async def _connect() -> None:
             logger.info("Connecting to RabbitMQ at %s:%s...", host, port)
             self.connection = await aio_pika.connect_robust(url)
+            self.connection.reconnect_callbacks.add(self._on_connection_reconnect)
+            if self._connected_once:
+                self._on_connection_reconnect()
+            self._connected_once = True
             self.channel = await self.connection.channel()
             prefetch = Config.load().get("metric_engine", {}).get("prefetch_count", 50)
+            if self.windowed:
+                # Unacked messages are capped by prefetch: allow a full window plus the next one
+                prefetch = max(prefetch, 2 * self.window_size)
             await self.channel.set_qos(prefetch_count=prefetch)
 
             exchange = await self.channel.declare_exchange(
@@ -122,6 +145,20 @@ class MetricEngineConsumer:
         else:
             await rabbitmq_circuit_breaker.call(_connect)
 
+    def _on_connection_reconnect(self, *args: Any) -> None:
+        """aio_pika reconnect callback (also used when connect() replaces a closed connection)."""
+        if self.on_reconnect is None:
+            return
+        logger.info("RabbitMQ connection re-established; running reconnect hook")
+
+        async def _run() -> None:
+            try:
+                await self.on_reconnect()
+            except Exception as e:
+                logger.warning("Reconnect hook failed: %s", e)
+
+        asyncio.ensure_future(_run())
+
     def _message_signature(self, body: bytes, record: Optional[Dict[str, Any]] = None) -> str:
         """Stable signature for deduplication (plan § 2.9). Prefer message_id from payload, else body hash."""
         if record is not None:
@@ -165,31 +202,166 @@ class MetricEngineConsumer:
             except Exception:
                 pass
         except Exception as e:
-            self._errors += 1
             logger.warning("Handler error: %s", e, exc_info=True)
+            await self._handle_failure(message, signature)
+        finally:
+            self._message_done_event.set()
+
+    async def _handle_failure(self, message: aio_pika.IncomingMessage, signature: str) -> None:
+        """Bounded retries: persist count, requeue or DLQ after max (plan § 2.6)."""
+        self._errors += 1
+        try:
+            from metrics import metric_engine_messages_failed_total
+            metric_engine_messages_failed_total.labels(queue=self.queue_name).inc()
+        except Exception:
+            pass
+        try:
+            retry_count = await get_message_retry_count(signature)
+            if retry_count >= MAX_MESSAGE_RETRIES - 1:
+                logger.warning(
+                    "Message exceeded max retries (%s), sending to DLQ (signature=%s)",
+                    MAX_MESSAGE_RETRIES,
+                    signature[:16],
+                )
+                await message.nack(requeue=False)
+            else:
+                await increment_message_retry_count(signature)
+                await message.nack(requeue=True)
+        except Exception as db_err:
+            logger.warning("Retry count check failed, requeuing: %s", db_err)
+            await message.nack(requeue=True)
+
+    async def _collect_window(self, inbox: "asyncio.Queue") -> List[aio_pika.IncomingMessage]:
+        """Wait for the first message (1s poll so shutdown is noticed), then fill up to window_size within window_timeout."""
+        try:
+            first = await asyncio.wait_for(inbox.get(), timeout=1.0)
+        except asyncio.TimeoutError:
+            return []
+        window = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window_timeout
+        while len(window) < self.window_size:
+            if not inbox.empty():
+                window.append(inbox.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                window.append(await asyncio.wait_for(inbox.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return window
+
+    async def _process_window(self, messages: List[aio_pika.IncomingMessage]) -> None:
+        """Process one window: IMEI groups concurrently (in order within a group), batched bookkeeping, one multiple ack."""
+        parsed: List[Tuple[aio_pika.IncomingMessage, Dict[str, Any], str]] = []
+        for message in messages:
+            try:
+                record = json.loads(message.body.decode("utf-8"))
+            except Exception as e:
+                logger.warning("Failed to parse message: %s", e)
+                await message.nack(requeue=False)
+                self._errors += 1
+                continue
+            parsed.append((message, record, self._message_signature(message.body, record)))
+        if not parsed:
+            return
+
+        # Plan § 2.9: idempotency — one lookup for the window; duplicates inside the window count as processed
+        already = await get_processed_message_signatures([sig for _, _, sig in parsed])
+        groups: Dict[Any, List[Tuple[aio_pika.IncomingMessage, Dict[str, Any], str]]] = {}
+        done: List[aio_pika.IncomingMessage] = []
+        seen = set(already)
+        for item in parsed:
+            if item[2] in seen:
+                done.append(item[0])
+                continue
+            seen.add(item[2])
+            groups.setdefault(item[1].get("imei"), []).append(item)
+
+        succeeded: List[Tuple[aio_pika.IncomingMessage, str]] = []
+        failed: List[Tuple[aio_pika.IncomingMessage, str]] = []
+        semaphore = asyncio.Semaphore(self.window_concurrency)
+
+        async def _run_group(items) -> None:
+            async with semaphore:
+                for message, record, signature in items:
+                    try:
+                        await self.handler(record)
+                        succeeded.append((message, signature))
+                    except Exception as e:
+                        logger.warning("Handler error: %s", e, exc_info=True)
+                        failed.append((message, signature))
+
+        await asyncio.gather(*(_run_group(items) for items in groups.values()))
+
+        for message, signature in failed:
+            await self._handle_failure(message, signature)
+        if succeeded:
+            await mark_messages_processed([sig for _, sig in succeeded])
+            self._processed += len(succeeded)
             try:
-                from metrics import metric_engine_messages_failed_total
-                metric_engine_messages_failed_total.labels(queue=self.queue_name).inc()
+                from metrics import metric_engine_messages_processed_total
+                metric_engine_messages_processed_total.labels(queue=self.queue_name).inc(len(succeeded))
             except Exception:
                 pass
-            # Bounded retries: persist count, DLQ after max (plan § 2.6)
+        done.extend(message for message, _ in succeeded)
+        if done:
+            # Failures were nacked above, so everything up to the highest delivery tag is acked
+            last = max(done, key=lambda m: m.delivery_tag)
             try:
-                retry_count = await get_message_retry_count(signature)
-                if retry_count >= MAX_MESSAGE_RETRIES - 1:
-                    logger.warning(
-                        "Message exceeded max retries (%s), sending to DLQ (signature=%s)",
-                        MAX_MESSAGE_RETRIES,
-                        signature[:16],
-                    )
-                    await message.nack(requeue=False)
-                else:
-                    await increment_message_retry_count(signature)
-                    await message.nack(requeue=True)
-            except Exception as db_err:
-                logger.warning("Retry count check failed, requeuing: %s", db_err)
-                await message.nack(requeue=True)
+                await last.ack(multiple=True)
+            except Exception as e:
+                # e.g. channel replaced by reconnect: messages are redelivered and skipped as processed
+                logger.warning("Window ack failed (%s messages): %s", len(done), e)
+
+    async def _wait_for_backlog(self) -> None:
+        """Backpressure: hold off consuming while pending writes are above pending_backpressure_items."""
+        from .pending_writes import is_backpressured, size as pending_size, flush as pending_flush
+        if not is_backpressured():
+            return
+        logger.warning("Pending writes backlog %s; pausing consumption", pending_size())
+        while self._consuming and is_backpressured():
+            try:
+                await pending_flush()
+            except Exception as e:
+                logger.debug("Pending flush during backpressure failed: %s", e)
+            await asyncio.sleep(1.0)
+        logger.info("Pending writes backlog %s; resuming consumption", pending_size())
+
+    async def _consume_windowed(self) -> None:
+        """Windowed consumption on the current queue until _consuming is False or the connection drops."""
+        inbox: asyncio.Queue = asyncio.Queue()
+        consumer_tag = await self.queue.consume(inbox.put)
+        logger.info(
+            "Windowed consumption: window=%s timeout=%.1fs concurrency=%s",
+            self.window_size, self.window_timeout, self.window_concurrency,
+        )
+        try:
+            while self._consuming:
+                if self.connection is None or self.connection.is_closed:
+                    return
+                await self._wait_for_backlog()
+                window = await self._collect_window(inbox)
+                if not window:
+                    continue
+                self._message_done_event.clear()
+                try:
+                    await self._process_window(window)
+                finally:
+                    self._message_done_event.set()
         finally:
-            self._message_done_event.set()
+            try:
+                await self.queue.cancel(consumer_tag)
+            except Exception as e:
+                logger.debug("Cancel consumer failed: %s", e)
+            # Not yet processed: return to the queue
+            while not inbox.empty():
+                try:
+                    await inbox.get_nowait().nack(requeue=True)
+                except Exception:
+                    pass
 
     async def start_consuming(self) -> None:
         """Consume until _consuming is False."""
@@ -200,10 +372,14 @@ class MetricEngineConsumer:
                     await self.connect(retry=True)
                 if not self.queue:
                     await self.connect(retry=False)
+                if self.windowed:
+                    await self._consume_windowed()
+                    continue
                 async with self.queue.iterator() as queue_iter:
                     async for message in queue_iter:
                         if not self._consuming:
                             break
+                        await self._wait_for_backlog()
                         await self._process_message(message)
             except asyncio.CancelledError:
                 break
@@ -2,6 +2,8 @@
 Recalculation worker (plan § 9B). Polls recalculation_queue and processes PENDING jobs.
 LISTEN config_change (real-time) + poll fallback enqueue jobs; worker processes RECALC_VIOLATIONS, REFRESH_VIEW, REFRESH_VIEWS.
 RECALC_VIOLATIONS: DELETE metric_events then reprocess trackdata and INSERT new events (plan 9B.2).
+Reprocessing runs recalculation_workers IMEIs concurrently; each IMEI pages trackdata by gps_time
+(keyset) and writes its output once per page (engine/backfill_session.py).
 REFRESH_VIEW: refresh one materialized view (reason = view name).
 REFRESH_VIEWS: refresh scoring/analytics MVs (plan Phase 7: driver/vehicle scores via mv_weekly_driver_scores, mv_daily_vehicle_scores).
 Plan § 9B.9: debounce rapid config changes (5 s) to avoid duplicate enqueues.
@@ -69,45 +71,128 @@ async def _reprocess_trackdata_for_imei(
     batch_size: int = 500,
 ) -> int:
     """Fetch trackdata for imei in [date_from, date_to], run pipeline in backfill mode; return records processed.
-    Plan § 4.1: use previous_state_override so recalc uses in-memory state, not current laststatus."""
+    Plan § 4.1: use previous_state_override so recalc uses in-memory state, not current laststatus.
+    Pages are keyset-paginated on gps_time ((imei, gps_time) is the trackdata key), so each page is an
+    index range scan instead of re-reading OFFSET rows; writes are flushed once per page.
+    Batch-capable calculators run once per page (BackfillSession.precompute).
+    The IMEI's state cache entry is flushed and dropped before and after: otherwise the next live
+    record would run on the pre-recalculation state and its write-behind would overwrite the
+    recalculated laststatus (the ownership check passes, last_processed_gps_time is unchanged)."""
     from .pipeline import process_record
+    from .backfill_session import BackfillSession
     from .db import get_pool
+    from .state_cache import get_state_cache
     pool = await get_pool()
-    total = 0
-    offset = 0
-    running_state: Dict[str, Any] = {}
-    while True:
+    state_cache = get_state_cache()
+    if state_cache is not None:
+        await state_cache.flush_and_invalidate(imei)
+    try:
+        session = BackfillSession(imei)
+        await session.preload()
+        total = 0
+        # Keyset lower bound (exclusive); timestamptz has microsecond resolution
+        after = date_from - timedelta(microseconds=1)
+        running_state: Dict[str, Any] = {}
+        while True:
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    SELECT imei, gps_time, server_time, latitude, longitude, altitude, angle, satellites, speed,
+                           status, vendor, ignition, driver_seatbelt, passenger_seatbelt, door_status, passenger_seat,
+                           main_battery, battery_voltage, fuel,
+                           dallas_temperature_1, dallas_temperature_2, dallas_temperature_3, dallas_temperature_4,
+                           ble_temperature_1, ble_temperature_2, ble_temperature_3, ble_temperature_4,
+                           ble_humidity_1, ble_humidity_2, ble_humidity_3, ble_humidity_4,
+                           green_driving_value, dynamic_io, is_valid, reference_id, distance
+                    FROM trackdata
+                    WHERE imei = $1 AND gps_time > $2 AND gps_time <= $3
+                    ORDER BY gps_time
+                    LIMIT $4
+                    """,
+                    imei,
+                    after,
+                    date_to,
+                    batch_size,
+                )
+            if not rows:
+                break
+            records = [dict(row) for row in rows]
+            precomputed = await session.precompute(records, running_state)
+            for record, pre in zip(records, precomputed):
+                await process_record(
+                    record, backfill=True, previous_state_override=running_state, backfill_session=session,
+                    precomputed=pre,
+                )
+                total += 1
+            await session.flush()
+            after = rows[-1]["gps_time"]
+            if len(rows) < batch_size:
+                break
+        return total
+    finally:
+        if state_cache is not None:
+            # Live records handled meanwhile were cached from the state being rewritten
+            state_cache.invalidate(imei)
+
+
+async def _report_progress(job_id: Optional[int], imeis_done: int, imeis_total: int, rows: int) -> None:
+    """Log job progress and store rows processed so far in recalculation_queue.rows_affected."""
+    logger.info("Recalculation job %s: %s/%s IMEIs, %s rows", job_id, imeis_done, imeis_total, rows)
+    if job_id is None:
+        return
+    try:
+        pool = await _get_pool()
         async with pool.acquire() as conn:
-            rows = await conn.fetch(
-                """
-                SELECT imei, gps_time, server_time, latitude, longitude, altitude, angle, satellites, speed,
-                       status, vendor, ignition, driver_seatbelt, passenger_seatbelt, door_status, passenger_seat,
-                       main_battery, battery_voltage, fuel,
-                       dallas_temperature_1, dallas_temperature_2, dallas_temperature_3, dallas_temperature_4,
-                       ble_temperature_1, ble_temperature_2, ble_temperature_3, ble_temperature_4,
-                       ble_humidity_1, ble_humidity_2, ble_humidity_3, ble_humidity_4,
-                       green_driving_value, dynamic_io, is_valid, reference_id, distance
-                FROM trackdata
-                WHERE imei = $1 AND gps_time >= $2 AND gps_time <= $3
-                ORDER BY gps_time
-                LIMIT $4 OFFSET $5
-                """,
-                imei,
-                date_from,
-                date_to,
-                batch_size,
-                offset,
+            await conn.execute(
+                "UPDATE recalculation_queue SET rows_affected = $1 WHERE id = $2 AND status = 'PROCESSING'",
+                rows,
+                job_id,
             )
-        if not rows:
-            break
-        for row in rows:
-            record = dict(row)
-            await process_record(record, backfill=True, previous_state_override=running_state)
-            total += 1
-        offset += len(rows)
-        if len(rows) < batch_size:
-            break
-    return total
+    except Exception as e:
+        logger.debug("Recalculation progress update failed for job %s: %s", job_id, e)
+
+
+async def _reprocess_imeis(
+    job_id: Optional[int],
+    imeis: List[int],
+    date_from: datetime,
+    date_to: datetime,
+    rows_before: int = 0,
+) -> int:
+    """Reprocess IMEIs with a bounded pool of workers (metric_engine.recalculation_workers); return records processed.
+    Each IMEI is handled by one worker, in gps_time order; different IMEIs run concurrently."""
+    from config import Config
+    me_cfg = Config.get_metric_engine_config()
+    batch_size = int(me_cfg.get("recalculation_batch_size", 500))
+    workers = max(1, int(me_cfg.get("recalculation_workers", 3)))
+    progress_interval = float(me_cfg.get("recalculation_progress_interval_sec", 10.0))
+    remaining = list(reversed(imeis))
+    done = {"imeis": 0, "rows": 0}
+    last_report = time.monotonic()
+
+    async def _worker() -> None:
+        nonlocal last_report
+        while remaining:
+            imei = remaining.pop()
+            n = await _reprocess_trackdata_for_imei(imei, date_from, date_to, batch_size=batch_size)
+            done["rows"] += n
+            done["imeis"] += 1
+            if time.monotonic() - last_report >= progress_interval:
+                last_report = time.monotonic()
+                await _report_progress(job_id, done["imeis"], len(imeis), rows_before + done["rows"])
+
+    tasks = [asyncio.ensure_future(_worker()) for _ in range(min(workers, len(imeis)))]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # One IMEI failed (or the job was cancelled): stop the other workers, fail the job
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    if imeis:
+        logger.info("Recalculation job %s: %s IMEIs, %s rows reprocessed", job_id, len(imeis), done["rows"])
+    return done["rows"]
 
 
 async def _imeis_for_vehicle(conn, vehicle_id: Optional[int]) -> List[int]:
@@ -142,6 +227,9 @@ async def process_one_job(conn, row: Dict[str, Any]) -> bool:
         if job_type == "RECALC_FUEL":
             # Plan § 9B.2: calibration change -> delete Fuel events, reprocess trackdata, update trip.fuel_consumed
             if scope_vehicle_id is not None:
+                # Reprocess with the new curve even if the notification was missed
+                from .calibration_cache import invalidate_calibration
+                invalidate_calibration(scope_vehicle_id)
                 imeis = await _imeis_for_vehicle(conn, scope_vehicle_id)
                 for imei in imeis:
                     await conn.execute(
@@ -151,11 +239,7 @@ async def process_one_job(conn, row: Dict[str, Any]) -> bool:
                 now = datetime.now(timezone.utc)
                 date_from = now - timedelta(days=30)
                 date_to = now
-                from config import Config
-                batch_size = int(Config.get_metric_engine_config().get("recalculation_batch_size", 500))
-                for imei in imeis:
-                    n = await _reprocess_trackdata_for_imei(imei, date_from, date_to, batch_size=batch_size)
-                    rows_affected += n
+                rows_affected += await _reprocess_imeis(job_id, imeis, date_from, date_to, rows_affected)
                 from .db import update_trip_fuel_consumed_for_vehicle
                 rows_affected += await update_trip_fuel_consumed_for_vehicle(scope_vehicle_id)
                 try:
@@ -188,11 +272,7 @@ async def process_one_job(conn, row: Dict[str, Any]) -> bool:
                 now = datetime.now(timezone.utc)
                 date_from = now - timedelta(days=30)
                 date_to = now
-                from config import Config
-                batch_size = int(Config.get_metric_engine_config().get("recalculation_batch_size", 500))
-                for imei in imeis:
-                    n = await _reprocess_trackdata_for_imei(imei, date_from, date_to, batch_size=batch_size)
-                    rows_affected += n
+                rows_affected += await _reprocess_imeis(job_id, imeis, date_from, date_to, rows_affected)
                 try:
                     await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_daily_fence_stats")
                 except Exception as e:
@@ -281,13 +361,8 @@ async def process_one_job(conn, row: Dict[str, Any]) -> bool:
                 date_to = datetime.combine(d, datetime.max.time(), tzinfo=timezone.utc) if hasattr(d, "year") else d
             else:
                 date_to = now
-            from config import Config
-            batch_size = int(Config.get_metric_engine_config().get("recalculation_batch_size", 500))
             imeis = await _imeis_for_scope(conn, scope_imei, scope_client_id)
-            rows_affected = 0
-            for imei in imeis:
-                n = await _reprocess_trackdata_for_imei(imei, date_from, date_to, batch_size=batch_size)
-                rows_affected += n
+            rows_affected = await _reprocess_imeis(job_id, imeis, date_from, date_to)
             # Plan § 9B.3: enqueue targeted view refresh when config_key known, else refresh all
             reason = "all"
             if views_to_refresh:
@@ -410,8 +485,30 @@ async def run_listener_loop() -> None:
             def _on_config_change(connection, pid, channel, payload):
                 if config_change_pending:
                     config_change_pending.set()
+                # tr_fence_change payload is 'fence:<fence_id>': drop cached fence polygons
+                if payload and payload.startswith("fence:"):
+                    from .calculators.geofence.fence_index import invalidate_fence_index
+                    invalidate_fence_index()
+                # tr_calibration_change payload is 'calibration:<vehicle_id>': drop that curve
+                elif payload and payload.startswith("calibration:"):
+                    from .calibration_cache import invalidate_calibration
+                    try:
+                        invalidate_calibration(int(payload.split(":", 1)[1]))
+                    except ValueError:
+                        invalidate_calibration()
+                # tr_client_config_change / tr_tracker_config_change: reload that client / tracker config
+                elif payload and payload.startswith(("client_config:", "tracker_config:")):
+                    from .config_snapshot import apply_config_change
+                    apply_config_change(payload)
             await conn.add_listener("config_change", _on_config_change)
             logger.info("LISTEN config_change active")
+            # Notifications may have been missed while disconnected
+            from .calculators.geofence.fence_index import invalidate_fence_index
+            from .calibration_cache import invalidate_calibration
+            from .config_snapshot import poll_config_changes
+            invalidate_fence_index()
+            invalidate_calibration()
+            poll_config_changes()
             reconnect_delay = 5.0
             while not _shutdown:
                 await asyncio.sleep(5.0)
@@ -0,0 +1,142 @@
+"""
+Road speed-limit tile cache for SpeedViolationCalculator (plan § 4 speed by road type).
+Roads are loaded per geohash-6 tile (~1.2 x 0.6 km, same cells as trackdata.geohash_6): the
+first record in a tile loads every road within its half-width of the tile, later records in
+the tile pick the nearest road in process. Tiles without roads are cached too (negative cache).
+LRU eviction by tile; tiles expire after road_tile_cache_ttl_sec since road has no change trigger.
+
+Same result as db.get_road_speed_limit: the nearest road whose linestring is within
+COALESCE(road_width, 20) / 2 metres of the point (ST_DWithin on geography).
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .geo import geohash_bbox, geohash_encode, polyline_distance_m
+
+logger = logging.getLogger(__name__)
+
+GEOHASH_PRECISION = 6
+
+
+class _Road:
+    __slots__ = ("road_type", "speed_limit", "half_width_m", "line")
+
+    def __init__(self, road_type: Any, speed_limit: Any, half_width_m: float, line: List[Tuple[float, float]]):
+        self.road_type = road_type
+        self.speed_limit = speed_limit
+        self.half_width_m = half_width_m
+        self.line = line
+
+
+class RoadTileCache:
+    """geohash-6 tile -> roads near the tile (empty list = no roads)."""
+
+    def __init__(self, max_tiles: int = 5000, ttl_sec: float = 3600.0):
+        self.max_tiles = max(1, max_tiles)
+        self.ttl_sec = ttl_sec
+        self._tiles: "OrderedDict[str, Tuple[List[_Road], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get_speed_limit(
+        self, lat: float, lon: float, geohash_6: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """road_type and speed_limit of the nearest road covering (lat, lon), or None."""
+        tile = geohash_6 if geohash_6 and len(geohash_6) == GEOHASH_PRECISION else geohash_encode(lat, lon, GEOHASH_PRECISION)
+        roads = await self._get_tile(tile)
+        best: Optional[_Road] = None
+        best_d = float("inf")
+        for road in roads:
+            d = polyline_distance_m(lon, lat, [road.line])
+            if d <= road.half_width_m and d < best_d:
+                best, best_d = road, d
+        if best is None:
+            return None
+        return {"road_type": best.road_type, "speed_limit": best.speed_limit}
+
+    async def _get_tile(self, tile: str) -> List[_Road]:
+        now = time.monotonic()
+        cached = self._tiles.get(tile)
+        if cached is not None and now - cached[1] < self.ttl_sec:
+            self._tiles.move_to_end(tile)
+            self.hits += 1
+            return cached[0]
+        self.misses += 1
+        roads = await self._load_tile(tile)
+        self._tiles[tile] = (roads, now)
+        self._tiles.move_to_end(tile)
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return roads
+
+    async def _load_tile(self, tile: str) -> List[_Road]:
+        min_lon, min_lat, max_lon, max_lat = geohash_bbox(tile)
+        from .db import get_pool
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            # && prefilter (0.01 deg > any road half-width) so the road geometry index can be used
+            rows = await conn.fetch(
+                """
+                WITH tile AS (SELECT ST_MakeEnvelope($1, $2, $3, $4, 4326) AS env)
+                SELECT road_type, speed_limit, COALESCE(road_width, 20) / 2.0 AS half_width_m,
+                       ST_AsGeoJSON(road_linestring) AS geojson
+                FROM road, tile
+                WHERE road_linestring IS NOT NULL
+                  AND road_linestring && ST_Expand(tile.env, 0.01)
+                  AND ST_DWithin(road_linestring::geography, tile.env::geography, (COALESCE(road_width, 20) / 2.0)::double precision)
+                """,
+                min_lon,
+                min_lat,
+                max_lon,
+                max_lat,
+            )
+        roads = []
+        for r in rows:
+            try:
+                coords = json.loads(r["geojson"]).get("coordinates") or []
+            except (TypeError, ValueError):
+                continue
+            line = [(float(p[0]), float(p[1])) for p in coords]
+            if line:
+                roads.append(_Road(r["road_type"], r["speed_limit"], float(r["half_width_m"]), line))
+        return roads
+
+    def invalidate_all(self) -> None:
+        self._tiles.clear()
+
+
+_road_cache: Optional[RoadTileCache] = None
+
+
+def get_road_cache() -> Optional[RoadTileCache]:
+    """Process-wide road tile cache, or None when metric_engine.road_tile_cache_enabled is false."""
+    global _road_cache
+    if _road_cache is None:
+        from config import Config
+        me_cfg = Config.get_metric_engine_config()
+        if me_cfg.get("road_tile_cache_enabled") is False:
+            return None
+        _road_cache = RoadTileCache(
+            max_tiles=int(me_cfg.get("road_tile_cache_max_tiles", 5000)),
+            ttl_sec=float(me_cfg.get("road_tile_cache_ttl_sec", 3600.0)),
+        )
+    return _road_cache
+
+
+async def get_road_speed_limit_cached(
+    lat: float, lon: float, geohash_6: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Tile-cached road lookup; falls back to db.get_road_speed_limit when the cache is disabled or fails."""
+    if lat is None or lon is None:
+        return None
+    cache = get_road_cache()
+    if cache is not None:
+        try:
+            return await cache.get_speed_limit(lat, lon, geohash_6)
+        except Exception as e:
+            logger.debug("road tile cache lookup failed: %s", e)
+    from .db import get_road_speed_limit
+    return await get_road_speed_limit(lat, lon)
@@ -0,0 +1,336 @@
+"""
+Per-IMEI state cache with write-behind for the metric engine pipeline.
+The cache is the authority for previous_state: state is loaded from laststatus once per IMEI,
+state_updates are merged in memory and flushed as batched multi-row upserts (plan § 3.5)
+on an interval or when the dirty count reaches a threshold.
+
+Ownership: several metric engine instances share metrics_queue, so an IMEI can move to another
+instance (consumer reconnect / redelivery). Each entry remembers the last_processed_gps_time it
+saw in the DB; at flush time rows whose DB value moved past it were written by another instance
+and the entry is dropped instead of written. On consumer reconnect the whole cache is flushed
+and invalidated. Recalculation rewrites laststatus with the same last_processed_gps_time the
+entry expects, so the worker flushes and drops the IMEI's entry before and after reprocessing.
+
+Trip start/end (_trip_action) is written through: the trip row and current_trip_id must be
+visible to the DB before the next record. At shutdown, entries that cannot be flushed are handed
+to pending_writes (plan § 2.6) so they are retried with the rest of the queue.
+
+Tracker rows (vehicle_id, has_* flags) are cached with a TTL (plan § 2.6: refresh every 5 min).
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .circuit_breaker import CircuitBreakerOpenError
+from .db import (
+    STATE_COLUMNS,
+    read_laststatus_state,
+    update_laststatus_state,
+    write_laststatus_state_batch,
+)
+
+logger = logging.getLogger(__name__)
+
+_STATE_COLUMN_SET = frozenset(STATE_COLUMNS)
+
+
+class _Entry:
+    """Cached laststatus state for one IMEI."""
+
+    __slots__ = ("state", "expected_gps_time", "insert_position", "history")
+
+    def __init__(self, state: Dict[str, Any]):
+        self.state = state
+        # last_processed_gps_time as last seen in (or written to) the DB
+        self.expected_gps_time = state.get("last_processed_gps_time")
+        # (gps_time, lat, lon) for the minimal INSERT when the laststatus row does not exist yet
+        self.insert_position: Optional[tuple] = None
+        # vehicle_state transitions not yet written to laststatus_history
+        self.history: List[Dict[str, Any]] = []
+
+
+class StateCache:
+    """In-process per-IMEI state cache; write-behind to laststatus via write_laststatus_state_batch."""
+
+    def __init__(
+        self,
+        flush_interval: float = 1.0,
+        max_dirty: int = 200,
+        max_entries: int = 100000,
+        tracker_ttl: float = 300.0,
+    ):
+        self.flush_interval = flush_interval
+        self.max_dirty = max(1, max_dirty)
+        self.max_entries = max(1, max_entries)
+        self.tracker_ttl = tracker_ttl
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._dirty: set = set()
+        self._trackers: "OrderedDict[int, tuple]" = OrderedDict()  # imei -> (row, timestamp)
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.ownership_lost = 0
+
+    # --- read path ---
+
+    async def get_state(self, imei: int) -> Dict[str, Any]:
+        """Return a copy of the previous state for imei (loaded from laststatus on miss)."""
+        entry = self._entries.get(imei)
+        if entry is not None:
+            self._entries.move_to_end(imei)
+            self.hits += 1
+            return dict(entry.state)
+        self.misses += 1
+        try:
+            state = await read_laststatus_state(imei, raise_errors=True)
+        except CircuitBreakerOpenError:
+            raise
+        except Exception as e:
+            # Not cached: apply() writes this IMEI through until a read succeeds
+            logger.warning("read_laststatus_state failed for imei=%s: %s", imei, e)
+            return {}
+        entry = self._entries.get(imei)
+        if entry is None:
+            entry = self._entries[imei] = _Entry(state)
+            self._evict()
+        return dict(entry.state)
+
+    async def get_tracker(
+        self,
+        imei: int,
+        loader: Callable[[int], Awaitable[Optional[Dict[str, Any]]]],
+    ) -> Optional[Dict[str, Any]]:
+        """Tracker row for imei, cached for tracker_ttl seconds (None results are not cached)."""
+        cached = self._trackers.get(imei)
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < self.tracker_ttl:
+            return cached[0]
+        row = await loader(imei)
+        if row is not None:
+            self._trackers[imei] = (row, now)
+            self._trackers.move_to_end(imei)
+            while len(self._trackers) > self.max_entries:
+                self._trackers.popitem(last=False)
+        else:
+            self._trackers.pop(imei, None)
+        return row
+
+    # --- write path ---
+
+    async def apply(
+        self,
+        imei: int,
+        updates: Dict[str, Any],
+        gps_time=None,
+        insert_if_missing: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Merge state_updates for imei into the cache (flushed later). Same contract as
+        update_laststatus_state; IMEIs not in the cache and trip actions are written through.
+        """
+        entry = self._entries.get(imei)
+        if entry is None:
+            await update_laststatus_state(imei, updates, gps_time=gps_time, insert_if_missing=insert_if_missing)
+            return
+        if updates.get("_trip_action"):
+            # Trip actions read current_trip_id from the DB: persist cached state first
+            if not await self._flush_imeis([imei]):
+                raise RuntimeError(f"state cache flush failed before trip action for imei={imei}")
+            try:
+                await update_laststatus_state(imei, updates, gps_time=gps_time, insert_if_missing=insert_if_missing)
+            finally:
+                self.invalidate(imei)
+            return
+
+        state = entry.state
+        new_vehicle_state = updates.get("vehicle_state")
+        if new_vehicle_state is not None and new_vehicle_state != state.get("vehicle_state"):
+            entry.history.append({
+                "imei": imei,
+                "gps_time": gps_time,
+                "vehicle_state": new_vehicle_state,
+                "previous_state": state.get("vehicle_state"),
+            })
+        for k, v in updates.items():
+            if k in _STATE_COLUMN_SET:
+                state[k] = v
+        if gps_time is not None:
+            state["last_processed_gps_time"] = gps_time
+        if insert_if_missing:
+            entry.insert_position = (gps_time, insert_if_missing.get("latitude"), insert_if_missing.get("longitude"))
+        self._dirty.add(imei)
+        if len(self._dirty) >= self.max_dirty:
+            await self.flush()
+
+    def invalidate(self, imei: int) -> None:
+        """Drop imei from the cache (unflushed state is discarded)."""
+        self._entries.pop(imei, None)
+        self._dirty.discard(imei)
+
+    async def flush_and_invalidate(self, imei: int) -> None:
+        """Write imei's dirty state, then drop it so the next get_state reloads from laststatus
+        (recalculation rewrites the row behind the cache). Raises if the write fails."""
+        if not await self._flush_imeis([imei]):
+            raise RuntimeError(f"state cache flush failed for imei={imei}")
+        self.invalidate(imei)
+
+    async def invalidate_all(self) -> None:
+        """Flush dirty state, then drop all entries (ownership may have changed, e.g. consumer reconnect)."""
+        await self.flush()
+        async with self._flush_lock:
+            dropped = len(self._entries) - len(self._dirty)
+            for imei in [i for i in self._entries if i not in self._dirty]:
+                del self._entries[imei]
+        logger.info("State cache invalidated: %s entries dropped, %s dirty kept", dropped, len(self._dirty))
+
+    # --- flush ---
+
+    async def flush(self) -> bool:
+        """Write all dirty entries. Returns False if the write failed (entries stay dirty)."""
+        if not self._dirty:
+            return True
+        return await self._flush_imeis(list(self._dirty))
+
+    async def _flush_imeis(self, imeis: List[int]) -> bool:
+        async with self._flush_lock:
+            rows = []
+            taken = []
+            for imei in imeis:
+                entry = self._entries.get(imei)
+                if entry is None or imei not in self._dirty:
+                    continue
+                self._dirty.discard(imei)
+                history, entry.history = entry.history, []
+                state = {k: entry.state.get(k) for k in STATE_COLUMNS}
+                row = {
+                    "imei": imei,
+                    "state": state,
+                    "expected_gps_time": entry.expected_gps_time,
+                    "insert_if_missing": entry.insert_position is not None,
+                }
+                if entry.insert_position is not None:
+                    row["gps_time"], row["latitude"], row["longitude"] = entry.insert_position
+                rows.append(row)
+                taken.append((imei, entry, history))
+            if not rows:
+                return True
+            try:
+                lost = await write_laststatus_state_batch(
+                    rows, [h for _, _, history in taken for h in history]
+                )
+            except Exception as e:
+                logger.warning("State cache flush failed (%s rows, will retry): %s", len(rows), e)
+                for imei, entry, history in taken:
+                    if self._entries.get(imei) is entry:
+                        entry.history[:0] = history
+                        self._dirty.add(imei)
+                return False
+            lost_set = set(lost)
+            for (imei, entry, _), row in zip(taken, rows):
+                if imei in lost_set:
+                    if self._entries.get(imei) is entry:
+                        self.invalidate(imei)
+                    continue
+                entry.expected_gps_time = row["state"].get("last_processed_gps_time")
+                entry.insert_position = None
+            self.flushes += 1
+            self.rows_flushed += len(rows) - len(lost_set)
+            if lost_set:
+                self.ownership_lost += len(lost_set)
+                logger.info(
+                    "State cache: %s IMEIs updated by another instance; dropped cached state (e.g. %s)",
+                    len(lost_set), next(iter(lost_set)),
+                )
+            return True
+
+    def _evict(self) -> None:
+        """LRU eviction of clean entries; dirty entries stay until flushed."""
+        if len(self._entries) <= self.max_entries:
+            return
+        for imei in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if imei not in self._dirty:
+                del self._entries[imei]
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("State cache flush loop error: %s", e)
+
+    def start(self) -> None:
+        """Start the interval flusher (call from the running event loop)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """Stop the flusher and write dirty state; hand anything left to pending_writes."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if await self.flush():
+            return
+        from .pending_writes import push as pending_push
+        for imei in list(self._dirty):
+            entry = self._entries.get(imei)
+            if entry is None:
+                continue
+            gps_time = entry.state.get("last_processed_gps_time")
+            insert_if_missing = None
+            if entry.insert_position is not None:
+                insert_if_missing = {"latitude": entry.insert_position[1], "longitude": entry.insert_position[2]}
+            await pending_push(
+                imei,
+                {k: entry.state.get(k) for k in STATE_COLUMNS},
+                [],
+                gps_time,
+                insert_if_missing=insert_if_missing,
+            )
+        logger.warning("State cache: %s dirty entries moved to pending writes", len(self._dirty))
+        self._dirty.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "dirty": len(self._dirty),
+            "trackers": len(self._trackers),
+            "hits": self.hits,
+            "misses": self.misses,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "ownership_lost": self.ownership_lost,
+        }
+
+
+_state_cache: Optional[StateCache] = None
+
+
+def get_state_cache() -> Optional[StateCache]:
+    """Process-wide state cache, or None when metric_engine.state_cache_enabled is false."""
+    global _state_cache
+    if _state_cache is None:
+        from config import Config
+        me_cfg = Config.get_metric_engine_config()
+        if me_cfg.get("state_cache_enabled") is False:
+            return None
+        _state_cache = StateCache(
+            flush_interval=float(me_cfg.get("state_cache_flush_interval_sec", 1.0)),
+            max_dirty=int(me_cfg.get("state_cache_max_dirty", 200)),
+            max_entries=int(me_cfg.get("state_cache_max_entries", 100000)),
+            tracker_ttl=float(me_cfg.get("tracker_cache_ttl_sec", 300.0)),
+        )
+    return _state_cache
@@ -48,11 +48,11 @@ metric_engine_calculator_events_emitted_total = Counter(
     registry=REGISTRY,
 )
 
-# Histogram: calculator run duration (seconds)
+# Histogram: calculator run duration (seconds), by calculator and DAG stage (registry.run_calculators)
 metric_engine_calculator_duration_seconds = Histogram(
     "metric_engine_calculator_duration_seconds",
     "Duration of each calculator run in seconds",
-    ["calculator"],
+    ["calculator", "stage"],
     buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
     registry=REGISTRY,
 )
@@ -69,6 +69,38 @@ metric_engine_circuit_breaker_state = Gauge(
     ["name"],
     registry=REGISTRY,
 )
+metric_engine_pending_writes = Gauge(
+    "metric_engine_pending_writes",
+    "Pending writes waiting for DB replay, by tier (memory, disk)",
+    ["tier"],
+    registry=REGISTRY,
+)
+metric_engine_pending_writes_dropped = Gauge(
+    "metric_engine_pending_writes_dropped",
+    "Pending writes dropped since start (memory full without spill, or spill over its size limit)",
+    registry=REGISTRY,
+)
+
+# Reverse-geocode cache (engine/geocode_cache.py): hit ratio = memory / all lookups
+metric_engine_geocode_lookups_total = Counter(
+    "metric_engine_geocode_lookups_total",
+    "Geocode lookups by result (memory = LRU hit, db = geocode_cache row, miss = unknown)",
+    ["result"],
+    registry=REGISTRY,
+)
+metric_engine_geocode_duration_seconds = Histogram(
+    "metric_engine_geocode_duration_seconds",
+    "Geocode cache latency by operation (get_many, db_read, db_write)",
+    ["op"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    registry=REGISTRY,
+)
+metric_engine_geocode_cache_entries = Gauge(
+    "metric_engine_geocode_cache_entries",
+    "Geocode cache size by tier (memory = LRU entries, pending = writes not yet upserted)",
+    ["tier"],
+    registry=REGISTRY,
+)
 
 # Internal readiness state (set by run.py)
 _db_ready: bool = False
@@ -105,7 +137,7 @@ async def handle_ready(_request: web.Request) -> web.Response:
 
 
 def _update_prometheus_gauges() -> None:
-    """Update readiness and circuit breaker gauges on each scrape (plan § 12.6)."""
+    """Update readiness, circuit breaker, pending writes and geocode cache gauges on each scrape (plan § 12.6)."""
     metric_engine_ready.set(1 if is_ready() else 0)
     try:
         from engine.circuit_breaker import db_circuit_breaker, rabbitmq_circuit_breaker
@@ -117,6 +149,22 @@ def _update_prometheus_gauges() -> None:
             )
     except Exception as e:
         logger.debug("Could not update circuit breaker gauges: %s", e)
+    try:
+        from engine.pending_writes import get_stats as pending_stats
+        stats = pending_stats()
+        metric_engine_pending_writes.labels(tier="memory").set(stats["memory"])
+        metric_engine_pending_writes.labels(tier="disk").set(stats["disk"])
+        metric_engine_pending_writes_dropped.set(stats["dropped"])
+    except Exception as e:
+        logger.debug("Could not update pending writes gauges: %s", e)
+    try:
+        from engine import geocode_cache
+        if geocode_cache._geocode_cache is not None:
+            stats = geocode_cache._geocode_cache.get_stats()
+            metric_engine_geocode_cache_entries.labels(tier="memory").set(stats["entries"])
+            metric_engine_geocode_cache_entries.labels(tier="pending").set(stats["pending_writes"])
+    except Exception as e:
+        logger.debug("Could not update geocode cache gauges: %s", e)
 
 
 async def handle_metrics(_request: web.Request) -> web.Response:
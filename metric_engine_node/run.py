@@ -19,7 +19,9 @@ from engine.rabbitmq_consumer import MetricEngineConsumer
 from engine.pipeline import process_record
 from engine.calculators.registry import register_all
 from engine.recalculation_worker import run_worker_loop, run_listener_loop, run_scheduled_refresh_loop, set_shutdown
-from engine.pending_writes import flush as pending_flush, size as pending_size
+from engine.pending_writes import flush as pending_flush, size as pending_size, close as pending_close
+from engine.state_cache import get_state_cache
+from engine.geocode_cache import flush_geocode_writes
 from metrics import (
     start_health_server,
     set_db_ready,
@@ -95,7 +97,18 @@ async def main():
 
     # Register calculators and use pipeline handler
     register_all()
-    _consumer = MetricEngineConsumer(queue_name="metrics_queue", handler=process_record)
+    state_cache = get_state_cache()
+    if state_cache is not None:
+        state_cache.start()
+        logger.info(
+            "State cache enabled (flush every %.1fs or %s dirty IMEIs)",
+            state_cache.flush_interval, state_cache.max_dirty,
+        )
+    _consumer = MetricEngineConsumer(
+        queue_name="metrics_queue",
+        handler=process_record,
+        on_reconnect=state_cache.invalidate_all if state_cache is not None else None,
+    )
     try:
         await _consumer.connect(retry=True)
         set_rabbitmq_ready(True)
@@ -153,6 +166,19 @@ async def main():
             await scheduler_task
         except asyncio.CancelledError:
             pass
+        # Write-behind state first; anything it cannot write is moved to pending writes
+        if state_cache is not None:
+            try:
+                await asyncio.wait_for(state_cache.close(), timeout=30.0)
+                logger.info("State cache closed: %s", state_cache.get_stats())
+            except asyncio.TimeoutError:
+                logger.warning("State cache flush timed out after 30s; %s IMEIs may be lost", state_cache.get_stats()["dirty"])
+            except Exception as e:
+                logger.warning("State cache close failed: %s", e)
+        try:
+            await asyncio.wait_for(flush_geocode_writes(), timeout=10.0)
+        except Exception as e:
+            logger.warning("Geocode cache flush failed: %s", e)
         # Plan § 2.9: graceful shutdown — flush pending writes before closing connections
         n = pending_size()
         if n > 0:
@@ -160,9 +186,14 @@ async def main():
             try:
                 await asyncio.wait_for(pending_flush(), timeout=30.0)
             except asyncio.TimeoutError:
-                logger.warning("Pending flush timed out after 30s; %s items may be lost", pending_size())
+                logger.warning("Pending flush timed out after 30s; %s items left", pending_size())
             except Exception as e:
                 logger.warning("Pending flush failed: %s", e)
+        # Whatever could not be written is kept in the spill directory for the next start
+        try:
+            await pending_close()
+        except Exception as e:
+            logger.warning("Pending writes close failed: %s", e)
         await _consumer.disconnect()
         set_rabbitmq_ready(False)
         if _health_runner:
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Parity check: calculate_batch (recalculation, per page) vs calculate (per record).
+
+Synthetic trackdata for one IMEI (random trips with idling, overspeed, harsh status events and
+temperature / humidity excursions, fuel fills and drops) is run through every batch-capable calculator twice:
+  per record: run_calculators on each record, state carried as in recalculation
+              (pipeline._merge_override_state)
+  batch:      run_calculators_batch per page, then run_calculators with the results precomputed
+Merged state_updates and events must be equal for every record, and the carried state at the end;
+floats within FLOAT_REL_TOL (NumPy's vectorized trigonometry can differ from math in the last bit).
+Road speed limits come from config (road lookup disabled) and the fuel calibration curve is fixed
+(CALIBRATION), so no database is needed.
+Also prints the calculator time of both paths: run_calculators over every record vs
+run_calculators_batch over every page (the per-record merge of precomputed results is not timed).
+
+Usage (from metric_engine_node directory):
+  python scripts/check_batch_parity.py
+  python scripts/check_batch_parity.py --records 20000 --page-size 500 --seed 7
+Exit 0 if no mismatches, 1 otherwise.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+# Allow importing config and engine when run from repo root or metric_engine_node
+_metric_engine_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _metric_engine_root not in sys.path:
+    sys.path.insert(0, _metric_engine_root)
+
+from engine.calculators.base import CalculatorContext, RecordFrame  # noqa: E402
+from engine.calculators.registry import (  # noqa: E402
+    get_all,
+    register_all,
+    run_calculators,
+    run_calculators_batch,
+)
+from engine.pipeline import _merge_override_state  # noqa: E402
+
+IMEI = 350000000000001
+CONFIG = {
+    "MAX_SPEED_FILTER": "150",
+    "SPEED_LIMIT_CITY": "60",
+    "SPEED_LIMIT_HIGHWAY": "80",
+    "SPEED_LIMIT_MOTORWAY": "90",
+    "MIN_DURATION_SPEED": "30",
+    "IDLE_MAX": "300",
+    "TEMP_MIN": "-20",
+    "TEMP_MAX": "8",
+    "HUMIDITY_MIN": "20",
+    "HUMIDITY_MAX": "80",
+    "SENSOR_DURATION_THRESHOLD": "120",
+    "FILL_THRESHOLD": "10",
+    "THEFT_THRESHOLD": "8",
+}
+VEHICLE_ID = 1
+# (raw_value_min, raw_value_max, calibrated_liters) in sequence order; raw above 400 is uncalibrated
+CALIBRATION = ((0, 100, 20.0), (100, 250, 35.0), (250, 400, 30.0))
+HARSH_STATUS = ("Harsh Braking", "Harsh Acceleration", "Harsh Cornering")
+FLOAT_REL_TOL = 1e-12
+
+
+def same(a: Any, b: Any) -> bool:
+    """Equal, with floats compared to FLOAT_REL_TOL."""
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=FLOAT_REL_TOL)
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def make_records(n: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    t = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    lat, lon = 24.86, 67.01
+    speed, temp, humidity, fuel = 0, 4.0, 50.0, 300.0
+    mode, mode_left = "parked", 0
+    records = []
+    for _ in range(n):
+        t += timedelta(seconds=rng.choice((5, 10, 30, 60)))
+        if mode_left <= 0:
+            mode, mode_left = rng.choice((("driving", 80), ("idling", 30), ("parked", 40)))
+            mode_left = rng.randint(1, mode_left)
+        mode_left -= 1
+        ignition = mode != "parked"
+        if mode == "driving":
+            speed = max(0, min(140, speed + rng.randint(-15, 15)))
+        else:
+            speed = 0
+        lat += speed * 1e-6 * rng.uniform(-1, 1)
+        lon += speed * 1e-6 * rng.uniform(-1, 1)
+        temp += rng.uniform(-1.5, 1.5)
+        humidity = max(0.0, min(100.0, humidity + rng.uniform(-4, 4)))
+        if rng.random() < 0.005:
+            fuel = min(450.0, fuel + rng.uniform(5, 200))  # fill (sometimes past the calibrated range)
+        elif rng.random() < 0.003:
+            fuel = max(0.0, fuel - rng.uniform(5, 60))  # drop
+        elif mode == "driving":
+            fuel = max(0.0, fuel - rng.uniform(0, 0.3))
+        record = {
+            "imei": IMEI,
+            "gps_time": t,
+            "latitude": round(lat, 6),
+            "longitude": round(lon, 6),
+            "speed": speed,
+            "ignition": ignition if rng.random() > 0.05 else None,
+            "status": rng.choice(HARSH_STATUS) if rng.random() < 0.01 else ("Ignition On" if ignition else "Ignition Off"),
+            "dallas_temperature_1": round(temp, 1) if rng.random() > 0.05 else None,
+            "ble_humidity_1": round(humidity, 1) if rng.random() > 0.05 else None,
+            "green_driving_value": rng.randint(0, 255),
+            "fuel": round(fuel, 1) if rng.random() > 0.05 else None,
+        }
+        records.append(record)
+    return records
+
+
+async def run(records: int, page_size: int, seed: int) -> int:
+    # Config speed limits only: road lookups need the database
+    import engine.road_cache as road_cache
+
+    async def _no_road(lat, lon, geohash_6=None):
+        return None
+
+    road_cache.get_road_speed_limit_cached = _no_road
+
+    # Fixed calibration curve instead of the calibration table
+    import engine.calibration_cache as calibration_cache
+    curve = calibration_cache.CalibrationCurve(CALIBRATION)
+    cache = calibration_cache.CalibrationCache()
+
+    async def _curve(vehicle_id):
+        return curve if vehicle_id == VEHICLE_ID else None
+
+    cache.get_curve = _curve
+    calibration_cache._calibration_cache = cache
+
+    register_all()
+    calculators = [c for c in get_all() if c.supports_batch]
+    print("Batch calculators: %s" % ", ".join(c.name for c in calculators))
+    data = make_records(records, seed)
+    # Position in laststatus when recalculation starts (distance is measured from it)
+    initial_state = {"latitude": data[0]["latitude"], "longitude": data[0]["longitude"]}
+
+    per_record: List[Any] = []
+    state_a: Dict[str, Any] = dict(initial_state)
+    per_record_sec = 0.0
+    for record in data:
+        ctx = CalculatorContext(IMEI, record, record["gps_time"], dict(state_a), CONFIG, vehicle_id=VEHICLE_ID)
+        started = time.perf_counter()
+        result = await run_calculators(calculators, ctx)
+        per_record_sec += time.perf_counter() - started
+        per_record.append(result)
+        _merge_override_state(state_a, result.state_updates, record["gps_time"])
+
+    batched: List[Any] = []
+    state_b: Dict[str, Any] = dict(initial_state)
+    batch_sec = 0.0
+    for start in range(0, len(data), page_size):
+        page = data[start:start + page_size]
+        started = time.perf_counter()
+        frame = RecordFrame(
+            IMEI, page, [r["gps_time"] for r in page], dict(state_b), CONFIG, vehicle_id=VEHICLE_ID
+        )
+        batch = await run_calculators_batch(calculators, frame)
+        batch_sec += time.perf_counter() - started
+        for j, record in enumerate(page):
+            precomputed = {name: results[j] for name, results in batch.items()}
+            ctx = CalculatorContext(IMEI, record, record["gps_time"], dict(state_b), CONFIG, vehicle_id=VEHICLE_ID)
+            result = await run_calculators(calculators, ctx, precomputed=precomputed)
+            batched.append(result)
+            _merge_override_state(state_b, result.state_updates, record["gps_time"])
+
+    mismatches = 0
+    events = 0
+    for i, (a, b) in enumerate(zip(per_record, batched)):
+        events += len(a.events)
+        if not same(a.state_updates, b.state_updates) or not same(a.events, b.events):
+            mismatches += 1
+            if mismatches <= 10:
+                print("MISMATCH row %d gps_time=%s" % (i, data[i]["gps_time"]))
+                print("  per record: %s %s" % (a.state_updates, a.events))
+                print("  batch:      %s %s" % (b.state_updates, b.events))
+    if not same(state_a, state_b):
+        mismatches += 1
+        print("MISMATCH final state\n  per record: %s\n  batch:      %s" % (state_a, state_b))
+    print("Checked %d records (%d events), page size %d: %d mismatches" % (len(data), events, page_size, mismatches))
+    print("Calculator time: per record %.1f ms, batch %.1f ms (%.1fx)" % (
+        per_record_sec * 1000, batch_sec * 1000, per_record_sec / batch_sec if batch_sec else 0.0))
+    return 0 if mismatches == 0 else 1
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="calculate_batch vs calculate parity check")
+    ap.add_argument("--records", type=int, default=5000)
+    ap.add_argument("--page-size", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    sys.exit(asyncio.run(run(args.records, args.page_size, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
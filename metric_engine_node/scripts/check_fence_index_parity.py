@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Parity check: in-process fence index (engine/calculators/geofence/fence_index.py) vs PostGIS.
+
+For each fence, random points around the fence (bbox grown by 3x buffer_distance) are tested
+with the index and with the PostGIS expressions FenceCalculator used per fence:
+  inside    = ST_Contains(polygon, point)
+  in_buffer = ST_DWithin(point::geography, polygon::geography, buffer_distance)
+Points within --tolerance-m of the polygon boundary (inside) or of the buffer distance
+(in_buffer) are reported separately as boundary cases, not mismatches.
+
+Usage (from metric_engine_node directory, database from config.json):
+  python scripts/check_fence_index_parity.py
+  python scripts/check_fence_index_parity.py --client-id 1 --points 500 --tolerance-m 0.5
+Exit 0 if no mismatches, 1 otherwise.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from typing import Optional
+
+# Allow importing config and engine when run from repo root or metric_engine_node
+_metric_engine_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _metric_engine_root not in sys.path:
+    sys.path.insert(0, _metric_engine_root)
+
+from engine.calculators.geofence.fence_index import IndexedFence, _polygons_from_geojson  # noqa: E402
+
+POSTGIS_SQL = """
+SELECT u.i,
+       ST_Contains(f.polygon, pt.p) AS inside,
+       ST_DWithin(pt.p::geography, f.polygon::geography, $4) AS in_buffer,
+       ST_Distance(pt.p::geography, f.polygon::geography) AS distance_m,
+       ST_Distance(pt.p::geography, ST_Boundary(f.polygon)::geography) AS boundary_m
+FROM fence f,
+     unnest($2::float8[], $3::float8[]) WITH ORDINALITY AS u(lon, lat, i),
+     LATERAL (SELECT ST_SetSRID(ST_MakePoint(u.lon, u.lat), 4326) AS p) pt
+WHERE f.fence_id = $1
+ORDER BY u.i
+"""
+
+
+async def run(client_id: Optional[int], points: int, tolerance_m: float, seed: int) -> int:
+    import asyncpg
+    from config import Config
+
+    db = Config.get_database_config()
+    conn = await asyncpg.connect(
+        host=db.get("host", "localhost"),
+        port=int(db.get("port", 5432)),
+        database=db.get("name", "megatechtrackers"),
+        user=db.get("user", "postgres"),
+        password=db.get("password", ""),
+        statement_cache_size=0,  # Required for pgbouncer transaction pooling
+        server_settings={"application_name": "megatechtrackers_metric_engine_fence_parity", "timezone": "UTC"},
+    )
+    rng = random.Random(seed)
+    checked = mismatches = boundary = skipped = 0
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT fence_id, COALESCE(buffer_distance, 50) AS buffer_distance, ST_AsGeoJSON(polygon) AS geojson
+            FROM fence
+            WHERE polygon IS NOT NULL AND ($1::int IS NULL OR client_id = $1)
+            ORDER BY fence_id
+            """,
+            client_id,
+        )
+        for r in rows:
+            polygons = _polygons_from_geojson(r["geojson"])
+            if polygons is None:
+                skipped += 1
+                continue
+            buffer_m = int(r["buffer_distance"] or 50)
+            fence = IndexedFence(r["fence_id"], buffer_m, polygons)
+            x0, y0, x1, y1 = fence.bbox
+            dx, dy = (x1 - x0) * 1.5, (y1 - y0) * 1.5
+            lons = [rng.uniform(x0 - dx, x1 + dx) for _ in range(points)]
+            lats = [rng.uniform(y0 - dy, y1 + dy) for _ in range(points)]
+            results = await conn.fetch(POSTGIS_SQL, r["fence_id"], lons, lats, float(buffer_m))
+            for res in results:
+                lon, lat = lons[res["i"] - 1], lats[res["i"] - 1]
+                inside = fence.contains(lon, lat)
+                in_buffer = inside or fence.distance_m(lon, lat) <= buffer_m
+                checked += 1
+                if inside != res["inside"]:
+                    if (res["boundary_m"] or 0.0) <= tolerance_m:
+                        boundary += 1
+                    else:
+                        mismatches += 1
+                        print(f"MISMATCH inside fence_id={r['fence_id']} lon={lon:.7f} lat={lat:.7f} index={inside} postgis={res['inside']}")
+                if in_buffer != res["in_buffer"]:
+                    if abs((res["distance_m"] or 0.0) - buffer_m) <= tolerance_m:
+                        boundary += 1
+                    else:
+                        mismatches += 1
+                        print(
+                            f"MISMATCH in_buffer fence_id={r['fence_id']} lon={lon:.7f} lat={lat:.7f} "
+                            f"index={in_buffer} postgis={res['in_buffer']} distance_m={res['distance_m']:.2f} buffer_m={buffer_m}"
+                        )
+    finally:
+        await conn.close()
+
+    print(
+        f"fences={len(rows) - skipped} skipped_non_polygon={skipped} points_checked={checked} "
+        f"boundary_cases={boundary} mismatches={mismatches}"
+    )
+    return 1 if mismatches else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the in-process fence index with PostGIS results.")
+    parser.add_argument("--client-id", type=int, default=None, help="Only fences of this client")
+    parser.add_argument("--points", type=int, default=200, help="Random points per fence (default 200)")
+    parser.add_argument("--tolerance-m", type=float, default=0.5, help="Boundary tolerance in metres (default 0.5)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.client_id, args.points, args.tolerance_m, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Check: recalculation followed by a live record keeps the recalculated laststatus state.
+
+The live pipeline keeps previous_state in the in-process state cache (engine/state_cache.py) and
+writes it behind; recalculation (recalculation_worker._reprocess_trackdata_for_imei) rewrites
+laststatus directly. Scenario for one IMEI:
+  1. live records T1..T3 go through the state cache and are flushed
+  2. trackdata is corrected and T1..T3 are recalculated (real worker + BackfillSession)
+  3. one live record T4 goes through the state cache and is flushed
+laststatus must end with the recalculated state plus T4, not the pre-recalculation cache entry
+plus T4 (the write-behind ownership check alone cannot tell: last_processed_gps_time is T3 both
+in the DB and in the cache entry).
+
+laststatus and trackdata are in-memory dicts and the pipeline is reduced to one accumulated state
+column (driving_session_distance += record distance), so no database is needed.
+--without-invalidation skips the worker's state cache invalidation to show the overwrite.
+
+Usage (from metric_engine_node directory):
+  python scripts/check_recalc_state_cache.py
+Exit 0 if the recalculated state is kept, 1 otherwise.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+# Allow importing config and engine when run from repo root or metric_engine_node
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(_here))
+
+import engine.backfill_session as backfill_session  # noqa: E402
+import engine.db as db  # noqa: E402
+import engine.pipeline as pipeline  # noqa: E402
+import engine.recalculation_worker as recalculation_worker  # noqa: E402
+import engine.state_cache as state_cache  # noqa: E402
+
+IMEI = 350000000000002
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+KEY = "driving_session_distance"
+
+# In-memory tables
+LASTSTATUS: Dict[int, Dict[str, Any]] = {}
+TRACKDATA: List[Dict[str, Any]] = []
+
+
+def _at(n: int) -> datetime:
+    return T0 + timedelta(minutes=n)
+
+
+def _updates(state: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+    """The whole 'pipeline': accumulate record distance into one state column."""
+    return {KEY: (state.get(KEY) or 0.0) + record["distance"]}
+
+
+# --- laststatus / trackdata access used by the state cache, worker and BackfillSession ---
+
+async def _read_laststatus_state(imei: int, raise_errors: bool = False) -> Dict[str, Any]:
+    return dict(LASTSTATUS.get(imei, {}))
+
+
+async def _update_laststatus_state(imei, updates, gps_time=None, insert_if_missing=None) -> None:
+    LASTSTATUS.setdefault(imei, {}).update(updates)
+    if gps_time is not None:
+        LASTSTATUS[imei]["last_processed_gps_time"] = gps_time
+
+
+async def _write_laststatus_state_batch(rows: List[Dict[str, Any]], history: List[Dict[str, Any]]) -> List[int]:
+    """Same ownership rule as db._write_laststatus_state_batch_impl."""
+    lost = []
+    for r in rows:
+        in_db = LASTSTATUS.get(r["imei"], {}).get("last_processed_gps_time")
+        ours = r["state"].get("last_processed_gps_time")
+        if in_db is not None and in_db != r.get("expected_gps_time") and (ours is None or in_db >= ours):
+            lost.append(r["imei"])
+            continue
+        LASTSTATUS.setdefault(r["imei"], {}).update(r["state"])
+    return lost
+
+
+async def _write_buffered_chunk(states, events, trip_distances, stoppages) -> None:
+    for st in states:
+        LASTSTATUS.setdefault(st["imei"], {}).update(st["updates"])
+
+
+class _Conn:
+    async def fetch(self, sql: str, imei: int, after: datetime, date_to: datetime, limit: int):
+        rows = [r for r in TRACKDATA if r["imei"] == imei and after < r["gps_time"] <= date_to]
+        return rows[:limit]
+
+
+class _Pool:
+    @asynccontextmanager
+    async def acquire(self):
+        yield _Conn()
+
+
+async def _get_pool():
+    return _Pool()
+
+
+async def _process_record(
+    record: Dict[str, Any],
+    backfill: bool = False,
+    previous_state_override: Optional[Dict[str, Any]] = None,
+    backfill_session: Any = None,
+    precomputed: Any = None,
+) -> None:
+    """Backfill path of pipeline.process_record: override state, output buffered in the session."""
+    previous = dict(previous_state_override)
+    updates = _updates(previous_state_override, record)
+    previous_state_override.update(updates)
+    previous_state_override["last_processed_gps_time"] = record["gps_time"]
+    await backfill_session.add_record(updates, previous, [], [], record["gps_time"], None, None, None)
+
+
+async def _live_record(cache: state_cache.StateCache, record: Dict[str, Any]) -> None:
+    """Live path of pipeline.process_record: previous_state from the cache, write-behind."""
+    state = await cache.get_state(IMEI)
+    await cache.apply(IMEI, _updates(state, record), gps_time=record["gps_time"])
+    await cache.flush()
+
+
+def _patch(without_invalidation: bool) -> state_cache.StateCache:
+    state_cache.read_laststatus_state = _read_laststatus_state
+    state_cache.update_laststatus_state = _update_laststatus_state
+    state_cache.write_laststatus_state_batch = _write_laststatus_state_batch
+    backfill_session.write_buffered_chunk = _write_buffered_chunk
+    db.get_pool = _get_pool
+    pipeline.process_record = _process_record
+
+    async def _no_preload(self) -> None:
+        return None
+
+    async def _no_precompute(self, records, state):
+        return [None] * len(records)
+
+    backfill_session.BackfillSession.preload = _no_preload
+    backfill_session.BackfillSession.precompute = _no_precompute
+
+    cache = state_cache.StateCache()
+    state_cache._state_cache = cache
+    if without_invalidation:
+        async def _keep(imei: int) -> None:
+            return None
+
+        cache.flush_and_invalidate = _keep
+        cache.invalidate = lambda imei: None
+    return cache
+
+
+async def run(without_invalidation: bool) -> int:
+    cache = _patch(without_invalidation)
+
+    # 1. Live records T1..T3 (1 km each) through the state cache
+    for n in (1, 2, 3):
+        record = {"imei": IMEI, "gps_time": _at(n), "distance": 1.0}
+        TRACKDATA.append(record)
+        await _live_record(cache, record)
+    print("After live T1..T3:     laststatus %s = %s" % (KEY, LASTSTATUS[IMEI][KEY]))
+
+    # 2. Trackdata corrected (10 km each), T1..T3 recalculated
+    for record in TRACKDATA:
+        record["distance"] = 10.0
+    await recalculation_worker._reprocess_trackdata_for_imei(IMEI, _at(1), _at(3))
+    recalculated = LASTSTATUS[IMEI][KEY]
+    print("After recalculation:   laststatus %s = %s" % (KEY, recalculated))
+
+    # 3. Next live record T4 (1 km)
+    await _live_record(cache, {"imei": IMEI, "gps_time": _at(4), "distance": 1.0})
+    final = LASTSTATUS[IMEI][KEY]
+    expected = recalculated + 1.0
+    print("After live T4:         laststatus %s = %s (expected %s)" % (KEY, final, expected))
+    if final != expected:
+        print("MISMATCH: the live record ran on the pre-recalculation cached state")
+        return 1
+    print("OK: recalculated state kept")
+    return 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Recalculation vs state cache check")
+    ap.add_argument("--without-invalidation", action="store_true", help="Skip the worker's state cache invalidation")
+    args = ap.parse_args()
+    sys.exit(asyncio.run(run(args.without_invalidation)))
+
+
+if __name__ == "__main__":
+    main()
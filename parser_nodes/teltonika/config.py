@@ -214,8 +214,9 @@ class Config:
                 "max_concurrent_connections": 50000,
                 "backlog": 1000,
                 "connection_reject_timeout": 1.0, "connection_cleanup_timeout": 5.0,
-                "log_raw_packets": True, "raw_packet_max_bytes": 256,
-                "max_packet_size": 10485760
+                "log_raw_packets": False, "raw_packet_max_bytes": 256,
+                "max_packet_size": 10485760,
+                "use_protocol": True
             },
             "async_queues": {
                 "msg_received_capacity": 10000, "msg_parse_capacity": 10000,
@@ -243,7 +244,28 @@ class Config:
                 "cache_max_size": 10000,
                 "inactive_cleanup_hours": 24,
                 "check_db_changes": True,
-                "cleanup_interval_minutes": 60
+                "cleanup_interval_minutes": 60,
+                "listen_notify": True,
+                "listen_host": "",
+                "listen_port": 0,
+                "preload_active_hours": 24
+            },
+            "location_reference": {
+                "index_enabled": True,
+                "cell_size_deg": 0.05,
+                "lru_size": 10000,
+                "refresh_interval_seconds": 60,
+                "full_reload_minutes": 60
+            },
+            "packet_capture": {
+                "enabled": True,
+                "file": "logs/packets.tcap",
+                "file_size_mb": 64,
+                "keep_files": 2,
+                "sample_rate": 0.0,
+                "imeis": [],
+                "control_file": "logs/packet_capture.json",
+                "control_check_seconds": 5
             }
         }
     
@@ -11,10 +11,13 @@ from typing import Optional
 
 from config import Config, ServerParams
 from teltonika_listener.tcp_listener import start_tcp_server, close_tcp_server
+from teltonika_listener.device_protocol import DeviceHandler, DeviceProtocol
 from teltonika_parser.async_rabbitmq_packet_parser import RabbitMQPacketParser
 from teltonika_infrastructure.rabbitmq_producer import get_rabbitmq_producer, close_rabbitmq_producer
 from teltonika_parser.parser_load_monitor import get_load_monitor
 from teltonika_infrastructure.async_ip_table import AsyncGlobalIPTable
+from teltonika_infrastructure.worker_registry import ImeiWorkerRegistry, set_worker_context
+from teltonika_infrastructure.packet_capture import get_packet_capture, close_packet_capture
 from logging_config import setup_logging_from_config
 
 # Configure logging from config.json
@@ -57,23 +60,22 @@ _max_concurrent_connections = ServerParams.get_int('tcp_server.max_concurrent_co
 _total_connections = 0  # Track total connections
 _total_rejected = 0  # Track rejected connections
 _connection_lock = asyncio.Lock()  # Lock for thread-safe connection counter updates
+_log_raw_packets = ServerParams.get_bool('tcp_server.log_raw_packets', False)
 
+# Multi-worker mode (parser_node.workers > 1): set in each forked worker process
+_worker_id = 0
+_worker_count = 1
+_shared_counters = None  # SharedWorkerCounters for node-level load metrics
 
 
 
-async def handle_client_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+
+async def _admit_connection(writer, connection_id: str) -> bool:
     """
-    Handle client connection - modified to publish to RabbitMQ instead of buffer
-    CRITICAL: ACK only after RabbitMQ confirms
+    Count a new connection against tcp_server.max_concurrent_connections.
+    Rejected connections are closed here; accepted ones must be released with _release_connection.
     """
-    global _parser, _load_monitor, _connection_count, _total_connections, _total_rejected
-    
-    client_addr = writer.get_extra_info('peername')
-    if not client_addr:
-        return
-    
-    device_ip, device_port = client_addr
-    connection_id = f"{device_ip}:{device_port}"
+    global _connection_count, _total_connections, _total_rejected
     
     # Connection limit checking with thread-safe counter (matches original implementation)
     async with _connection_lock:
@@ -86,46 +88,161 @@ async def handle_client_connection(reader: asyncio.StreamReader, writer: asyncio
                 await asyncio.wait_for(writer.wait_closed(), timeout=connection_reject_timeout)
             except (asyncio.TimeoutError, OSError, ConnectionError) as e:
                 logger.debug(f"Error waiting for rejected connection to close: {e}")
-            return
+            return False
         
         _connection_count += 1
         _total_connections += 1
         logger.info(f"Client connected: {connection_id} (Active: {_connection_count}/{_max_concurrent_connections}, Total: {_total_connections})")
-    
+    return True
+
+
+async def _open_connection(writer, device_ip: str, device_port: int, connection_id: str) -> None:
+    """Enable TCP keepalive and register an admitted connection (load monitor, IP table)."""
+    # Enable TCP keepalive to keep connection active (matches original implementation)
     try:
-        # Enable TCP keepalive to keep connection active (matches original implementation)
-        try:
-            sock = writer.get_extra_info('socket')
-            if sock:
-                import socket
-                # Enable TCP keepalive
-                sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock = writer.get_extra_info('socket')
+        if sock:
+            import socket
+            # Enable TCP keepalive
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            
+            # Configure keepalive parameters (platform-specific)
+            try:
+                keepalive_idle = ServerParams.get_int('tcp_server.keepalive_idle', 60)
+                keepalive_interval = ServerParams.get_int('tcp_server.keepalive_interval', 10)
+                keepalive_count = ServerParams.get_int('tcp_server.keepalive_count', 3)
                 
-                # Configure keepalive parameters (platform-specific)
-                try:
-                    keepalive_idle = ServerParams.get_int('tcp_server.keepalive_idle', 60)
-                    keepalive_interval = ServerParams.get_int('tcp_server.keepalive_interval', 10)
-                    keepalive_count = ServerParams.get_int('tcp_server.keepalive_count', 3)
-                    
-                    # Linux-specific options
-                    if hasattr(socket, 'TCP_KEEPIDLE'):
-                        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, keepalive_idle)
-                    if hasattr(socket, 'TCP_KEEPINTVL'):
-                        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, keepalive_interval)
-                    if hasattr(socket, 'TCP_KEEPCNT'):
-                        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, keepalive_count)
-                    
-                    logger.debug(f"TCP keepalive enabled for {connection_id}: idle={keepalive_idle}s, interval={keepalive_interval}s, count={keepalive_count}")
-                except (AttributeError, OSError) as e:
-                    logger.debug(f"Could not set advanced keepalive options for {connection_id}: {e} (keepalive still enabled)")
-        except Exception as e:
-            logger.debug(f"Could not enable TCP keepalive for {connection_id}: {e}")
-        
-        _load_monitor.increment_connections()
-        # Register device in IP table
-        await AsyncGlobalIPTable.setIpTable(writer, device_ip, device_port)
-        
-        logger.info(f"New connection from {connection_id}")
+                # Linux-specific options
+                if hasattr(socket, 'TCP_KEEPIDLE'):
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, keepalive_idle)
+                if hasattr(socket, 'TCP_KEEPINTVL'):
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, keepalive_interval)
+                if hasattr(socket, 'TCP_KEEPCNT'):
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, keepalive_count)
+                
+                logger.debug(f"TCP keepalive enabled for {connection_id}: idle={keepalive_idle}s, interval={keepalive_interval}s, count={keepalive_count}")
+            except (AttributeError, OSError) as e:
+                logger.debug(f"Could not set advanced keepalive options for {connection_id}: {e} (keepalive still enabled)")
+    except Exception as e:
+        logger.debug(f"Could not enable TCP keepalive for {connection_id}: {e}")
+    
+    _load_monitor.increment_connections()
+    # Register device in IP table
+    await AsyncGlobalIPTable.setIpTable(writer, device_ip, device_port)
+    
+    logger.info(f"New connection from {connection_id}")
+
+
+async def _login_imei(writer, imei_data: bytes, device_ip: str, device_port: int, connection_id: str) -> Optional[str]:
+    """Validate the login IMEI, register it in the IP table and send the LOGIN ACK. None on failure."""
+    try:
+        imei_string = imei_data[:15].decode('ascii')
+        
+        # Validate and sanitize IMEI input (security - matches original)
+        from teltonika_infrastructure.input_validator import validate_imei
+        validated_imei = validate_imei(imei_string)
+        if not validated_imei:
+            logger.warning(f"Invalid IMEI format from {connection_id}: {imei_string}")
+            return None
+        
+        imei = validated_imei
+        logger.info(f"IMEI received: [{imei}] from {connection_id}")
+    except (ValueError, UnicodeDecodeError) as e:
+        logger.error(f"Error reading IMEI from {connection_id}: {e}")
+        return None
+    # Update IP table with IMEI
+    await AsyncGlobalIPTable.setIpTable(writer, device_ip, device_port, imei=imei)
+    
+    # CRITICAL: Send LOGIN acknowledgment (0x01) - Teltonika devices wait for this before sending data
+    # Note: This is NOT the data ACK - this just confirms device login/authentication
+    try:
+        writer.write(b'\x01')
+        await writer.drain()
+        logger.info(f"✓ LOGIN ACK sent to {connection_id} for IMEI {imei} (device authenticated, waiting for data)")
+    except (ConnectionResetError, ConnectionAbortedError, OSError) as e:
+        logger.warning(f"Connection lost while sending LOGIN ACK to {connection_id}: {e}")
+        return None
+    return imei
+
+
+async def _handle_packet(writer, packet_data, imei: str, device_ip: str, device_port: int, connection_id: str) -> None:
+    """Parse and publish one packet (bytes or memoryview); DATA ACK only if every record was published."""
+    logger.debug(f"Received packet from {connection_id}: {len(packet_data)} bytes")
+    
+    # Raw packets go to the sampled binary capture (packet_capture); hex dumps are debug-only
+    capture = get_packet_capture()
+    if capture is not None:
+        capture.record(imei, packet_data)
+    if _log_raw_packets and logger.isEnabledFor(logging.DEBUG):
+        max_bytes = ServerParams.get_int('tcp_server.raw_packet_max_bytes', 256)
+        truncated = f" (truncated, showing first {max_bytes} of {len(packet_data)} bytes)" if len(packet_data) > max_bytes else ""
+        logger.debug(f"Raw packet from {connection_id} (IMEI: {imei}): {bytes(packet_data[:max_bytes]).hex(' ').upper()}{truncated}")
+    
+    # Update IP table last communication time (matches original)
+    await AsyncGlobalIPTable.updateWriterTime(writer)
+    
+    # Parse and publish to RabbitMQ
+    records, all_published = await _parser.parse_packet_to_rabbitmq(
+        packet_data, imei, device_ip, device_port
+    )
+    
+    if records:
+        logger.debug(f"Parsed {len(records)} records from packet for IMEI {imei}")
+    
+    # CRITICAL: Send DATA ACK only if ALL records published to RabbitMQ successfully
+    # This ensures device won't delete data until it's safely in the queue
+    if all_published and records:
+        num_records = len(records)
+        await _parser.send_ack(writer, num_records)
+        logger.debug(f"✓ DATA ACK sent to device: {num_records} records queued for IMEI {imei}")
+    elif records:
+        # Records parsed but RabbitMQ publish failed - DO NOT send ACK
+        # Device will keep data and retry later
+        logger.warning(f"✗ DATA ACK NOT SENT - RabbitMQ unavailable, {len(records)} records NOT queued for IMEI {imei} (device will retry)")
+    else:
+        # No records parsed (decode error) - still don't ACK
+        logger.warning(f"✗ DATA ACK NOT SENT - No records parsed from packet for IMEI {imei}")
+
+
+async def _release_connection(device_ip: str, device_port: int, connection_id: str) -> None:
+    """Undo _admit_connection/_open_connection once the socket is closed."""
+    global _connection_count
+    
+    # Remove from IP table
+    try:
+        await AsyncGlobalIPTable.removeIpTableByIpAndPort(device_ip, device_port)
+    except Exception as e:
+        logger.warning(f"Error removing from IP table during cleanup: {e}")
+    
+    # Decrement connection count (thread-safe, matches original implementation)
+    async with _connection_lock:
+        _connection_count = max(0, _connection_count - 1)
+        logger.info(f"Client disconnected: {connection_id} (Remaining: {_connection_count}/{_max_concurrent_connections})")
+    
+    # Decrement load monitor connection count
+    _load_monitor.decrement_connections()
+    
+    logger.info(f"Connection closed: {connection_id}")
+
+
+async def handle_client_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Handle client connection - modified to publish to RabbitMQ instead of buffer
+    CRITICAL: ACK only after RabbitMQ confirms
+    (StreamReader path, tcp_server.use_protocol = false; see DeviceConnectionHandler)
+    """
+    client_addr = writer.get_extra_info('peername')
+    if not client_addr:
+        return
+    
+    device_ip, device_port = client_addr
+    connection_id = f"{device_ip}:{device_port}"
+    
+    if not await _admit_connection(writer, connection_id):
+        return
+    
+    try:
+        await _open_connection(writer, device_ip, device_port, connection_id)
         
         # Read IMEI (matches original - no timeout, reads directly)
         # Read IMEI length (2 bytes: 0x00, length)
@@ -139,32 +256,8 @@ async def handle_client_connection(reader: asyncio.StreamReader, writer: asyncio
         
         # Read IMEI
         imei_data = await reader.readexactly(imei_length)
-        try:
-            imei_string = imei_data[:15].decode('ascii')
-            
-            # Validate and sanitize IMEI input (security - matches original)
-            from teltonika_infrastructure.input_validator import validate_imei
-            validated_imei = validate_imei(imei_string)
-            if not validated_imei:
-                logger.warning(f"Invalid IMEI format from {connection_id}: {imei_string}")
-                return
-            
-            imei = validated_imei
-            logger.info(f"IMEI received: [{imei}] from {connection_id}")
-        except (ValueError, UnicodeDecodeError) as e:
-            logger.error(f"Error reading IMEI from {connection_id}: {e}")
-            return
-        # Update IP table with IMEI
-        await AsyncGlobalIPTable.setIpTable(writer, device_ip, device_port, imei=imei)
-        
-        # CRITICAL: Send LOGIN acknowledgment (0x01) - Teltonika devices wait for this before sending data
-        # Note: This is NOT the data ACK - this just confirms device login/authentication
-        try:
-            writer.write(b'\x01')
-            await writer.drain()
-            logger.info(f"✓ LOGIN ACK sent to {connection_id} for IMEI {imei} (device authenticated, waiting for data)")
-        except (ConnectionResetError, ConnectionAbortedError, OSError) as e:
-            logger.warning(f"Connection lost while sending LOGIN ACK to {connection_id}: {e}")
+        imei = await _login_imei(writer, imei_data, device_ip, device_port, connection_id)
+        if not imei:
             return
         
         # Read and process packets (use config timeout, default 30.0 seconds)
@@ -188,41 +281,7 @@ async def handle_client_connection(reader: asyncio.StreamReader, writer: asyncio
                     await AsyncGlobalIPTable.updateWriterTime(writer)
                     continue  # Continue loop to wait for next packet
                 
-                logger.info(f"Received packet from {connection_id}: {len(packet_data)} bytes")
-                
-                # Log raw packet bytes if enabled (matches original)
-                log_raw_packets = ServerParams.get_bool('tcp_server.log_raw_packets', True)
-                if log_raw_packets:
-                    max_bytes = ServerParams.get_int('tcp_server.raw_packet_max_bytes', 256)
-                    packet_to_log = packet_data[:max_bytes] if len(packet_data) > max_bytes else packet_data
-                    hex_dump = ' '.join(f'{b:02X}' for b in packet_to_log)
-                    truncated = f" (truncated, showing first {max_bytes} of {len(packet_data)} bytes)" if len(packet_data) > max_bytes else ""
-                    logger.info(f"Raw packet from {connection_id} (IMEI: {imei}): {hex_dump}{truncated}")
-                
-                # Update IP table last communication time (matches original)
-                await AsyncGlobalIPTable.updateWriterTime(writer)
-                
-                # Parse and publish to RabbitMQ
-                records, all_published = await _parser.parse_packet_to_rabbitmq(
-                    packet_data, imei, device_ip, device_port
-                )
-                
-                if records:
-                    logger.info(f"Parsed {len(records)} records from packet for IMEI {imei}")
-                
-                # CRITICAL: Send DATA ACK only if ALL records published to RabbitMQ successfully
-                # This ensures device won't delete data until it's safely in the queue
-                if all_published and records:
-                    num_records = len(records)
-                    await _parser.send_ack(writer, num_records)
-                    logger.info(f"✓ DATA ACK sent to device: {num_records} records queued for IMEI {imei}")
-                elif records:
-                    # Records parsed but RabbitMQ publish failed - DO NOT send ACK
-                    # Device will keep data and retry later
-                    logger.warning(f"✗ DATA ACK NOT SENT - RabbitMQ unavailable, {len(records)} records NOT queued for IMEI {imei} (device will retry)")
-                else:
-                    # No records parsed (decode error) - still don't ACK
-                    logger.warning(f"✗ DATA ACK NOT SENT - No records parsed from packet for IMEI {imei}")
+                await _handle_packet(writer, packet_data, imei, device_ip, device_port, connection_id)
                 
             except asyncio.TimeoutError:
                 # Check if connection is still alive - if so, continue waiting
@@ -274,21 +333,57 @@ async def handle_client_connection(reader: asyncio.StreamReader, writer: asyncio
         except Exception as e:
             logger.warning(f"Error during connection cleanup for {connection_id}: {e}")
         
-        # Remove from IP table
+        await _release_connection(device_ip, device_port, connection_id)
+
+
+class DeviceConnectionHandler(DeviceHandler):
+    """
+    DeviceProtocol callbacks (tcp_server.use_protocol = true): same admission, login, publish
+    and ACK logic as handle_client_connection, without a reader coroutine per connection.
+    """
+    
+    async def on_connected(self, conn: DeviceProtocol) -> bool:
+        if not conn.peername or _shutdown_event.is_set():
+            return False
+        device_ip, device_port = conn.peername[:2]
+        connection_id = f"{device_ip}:{device_port}"
+        if not await _admit_connection(conn, connection_id):
+            return False
         try:
-            await AsyncGlobalIPTable.removeIpTableByIpAndPort(device_ip, device_port)
+            await _open_connection(conn, device_ip, device_port, connection_id)
         except Exception as e:
-            logger.warning(f"Error removing from IP table during cleanup: {e}")
-        
-        # Decrement connection count (thread-safe, matches original implementation)
-        async with _connection_lock:
-            _connection_count = max(0, _connection_count - 1)
-            logger.info(f"Client disconnected: {connection_id} (Remaining: {_connection_count}/{_max_concurrent_connections})")
-        
-        # Decrement load monitor connection count
-        _load_monitor.decrement_connections()
-        
-        logger.info(f"Connection closed: {connection_id}")
+            # Admitted: DeviceProtocol still calls on_disconnected, which releases the connection
+            logger.error(f"Error in client connection handler: {e}", exc_info=True)
+            conn.close()
+        return True
+    
+    async def on_imei(self, conn: DeviceProtocol, imei_data: bytes) -> Optional[str]:
+        device_ip, device_port = conn.peername[:2]
+        return await _login_imei(conn, imei_data, device_ip, device_port, f"{device_ip}:{device_port}")
+    
+    async def on_ping(self, conn: DeviceProtocol) -> None:
+        await AsyncGlobalIPTable.updateWriterTime(conn)
+    
+    async def on_packet(self, conn: DeviceProtocol, imei: str, packet: memoryview) -> None:
+        if _shutdown_event.is_set():
+            conn.close()
+            return
+        device_ip, device_port = conn.peername[:2]
+        await _handle_packet(conn, packet, imei, device_ip, device_port, f"{device_ip}:{device_port}")
+    
+    async def on_disconnected(self, conn: DeviceProtocol) -> None:
+        device_ip, device_port = conn.peername[:2]
+        await _release_connection(device_ip, device_port, f"{device_ip}:{device_port}")
+
+
+def _device_protocol_factory():
+    """DeviceProtocol factory for loop.create_server (one shared handler)."""
+    handler = DeviceConnectionHandler()
+    idle_timeout = float(ServerParams.get_int('teltonika_protocol.connection_timeout', 300))
+    read_timeout = float(ServerParams.get_int('teltonika_protocol.read_timeout', 30))
+    max_packet_size = ServerParams.get_int('tcp_server.max_packet_size', 10 * 1024 * 1024)
+    buffer_size = ServerParams.get_int('tcp_server.buffer_size', 8192)
+    return lambda: DeviceProtocol(handler, idle_timeout, read_timeout, max_packet_size, buffer_size)
 
 
 async def main():
@@ -304,7 +399,7 @@ async def main():
         # Allow override from environment variable
         node_id = os.environ.get('NODE_ID') or parser_config.get('node_id', 'parser-service-1')
         
-        logger.info(f"Starting Parser Service: {node_id}")
+        logger.info(f"Starting Parser Service: {node_id}" + (f" (worker {_worker_id}/{_worker_count}, pid {os.getpid()})" if _worker_count > 1 else ""))
         logger.info(f"Vendor: {parser_config.get('vendor', 'teltonika')}")
         logger.info(f"Expected trackers: {parser_config.get('expected_trackers', 0)}")
         
@@ -365,6 +460,8 @@ async def main():
         
         # Initialize load monitor
         _load_monitor = get_load_monitor(node_id)
+        if _shared_counters:
+            _load_monitor.attach_shared_counters(_shared_counters, _worker_id)
         try:
             await _load_monitor.start_reporting()
         except asyncio.CancelledError:
@@ -403,6 +500,10 @@ async def main():
                 except Exception as e:
                     logger.warning(f"Database not available at startup: {e}. Command infrastructure will retry connection.")
                 
+                # Nearest location reference index: loads in the background, retries until the database is up
+                from teltonika_database.location_reference_index import start_location_reference_index
+                start_location_reference_index()
+                
                 # Try to verify commands table exists (non-blocking check)
                 try:
                     # Quick check if Command model can be accessed (table exists)
@@ -452,7 +553,11 @@ async def main():
                 # Check for shutdown before starting
                 if _shutdown_event.is_set():
                     raise asyncio.CancelledError("Shutdown requested")
-                await start_tcp_server(ip, port, handle_client_connection)
+                if ServerParams.get_bool('tcp_server.use_protocol', True):
+                    await start_tcp_server(ip, port, reuse_port=_worker_count > 1,
+                                           protocol_factory=_device_protocol_factory())
+                else:
+                    await start_tcp_server(ip, port, handle_client_connection, reuse_port=_worker_count > 1)
             
             # Wrap in retry logic - will retry indefinitely for connection errors
             # But don't retry on CancelledError (shutdown)
@@ -613,6 +718,14 @@ async def main():
         if _parser:
             await _parser.shutdown()
         
+        try:
+            from teltonika_database.location_reference_index import stop_location_reference_index
+            await stop_location_reference_index()
+        except Exception as e:
+            logger.debug(f"Error stopping location reference index: {e}")
+        
+        close_packet_capture()
+        
         # Close database connections (if ORM was initialized)
         try:
             from teltonika_parser.orm_init import close_orm
@@ -632,7 +745,67 @@ def signal_handler(signum, frame):
     _shutdown_event.set()
 
 
+def _run_worker(worker_id: int, worker_count: int, registry: ImeiWorkerRegistry, shared_counters) -> None:
+    """
+    Worker process entry point (multi-worker mode).
+    Runs the full parser service (own event loop, RabbitMQ producer, IP table, caches)
+    on the port shared through SO_REUSEPORT.
+    """
+    global _worker_id, _worker_count, _shared_counters, _max_concurrent_connections
+    _worker_id = worker_id
+    _worker_count = worker_count
+    _shared_counters = shared_counters
+    # tcp_server.max_concurrent_connections is the node limit - split it between workers
+    _max_concurrent_connections = max(1, -(-_max_concurrent_connections // worker_count))
+    set_worker_context(registry, worker_id)
+    
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info(f"Worker {worker_id} shutdown complete")
+
+
+def run_workers(worker_count: int) -> int:
+    """
+    Fork worker_count parser workers sharing the listen port (SO_REUSEPORT).
+    The IMEI -> worker registry and the load counters live in shared memory created
+    here, before forking, so every worker sees the same tables.
+    """
+    from teltonika_listener.worker_pool import run_worker_pool
+    from teltonika_parser.parser_load_monitor import SharedWorkerCounters
+    
+    registry = ImeiWorkerRegistry(ServerParams.get_int('system.initial_capacity', 100000))
+    shared_counters = SharedWorkerCounters(worker_count)
+    logger.info(f"Starting {worker_count} parser workers (SO_REUSEPORT)")
+    
+    def _on_worker_exit(worker_id: int):
+        # Devices of a dead worker reconnect elsewhere - drop its registry entries
+        removed = registry.clear_worker(worker_id)
+        if removed:
+            logger.info(f"Removed {removed} IMEI(s) of worker {worker_id} from worker registry")
+    
+    return run_worker_pool(
+        worker_count,
+        lambda worker_id: _run_worker(worker_id, worker_count, registry, shared_counters),
+        on_worker_exit=_on_worker_exit,
+        stop_timeout=ServerParams.get_float('shutdown.worker_stop_timeout', 10.0)
+    )
+
+
 if __name__ == "__main__":
+    # Multi-worker mode: parser_node.workers (or PARSER_WORKERS env) > 1
+    worker_count = int(os.environ.get('PARSER_WORKERS') or ServerParams.get_int('parser_node.workers', 1))
+    if worker_count > 1:
+        from teltonika_listener.worker_pool import is_supported
+        if not is_supported():
+            logger.warning(f"parser_node.workers={worker_count} requires SO_REUSEPORT and fork - running single process")
+            worker_count = 1
+    
+    if worker_count > 1:
+        sys.exit(run_workers(worker_count))
+    
     # Set up signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
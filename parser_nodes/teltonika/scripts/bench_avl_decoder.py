@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Equivalence check and throughput benchmark for the struct-based AvlDecoder.
+
+1. Golden vectors: the Codec 8/8E/16 examples from teltonika-doc.txt plus a seeded
+   synthetic corpus are decoded by both DataDecoder (ReverseBinaryReader + per-codec
+   decoders) and AvlDecoder; the resulting TcpDataPacket objects must be equal, and
+   the compact records (AvlDecoder compact mode) must convert back to the same AvlData.
+2. Throughput: records/sec for DataDecoder and both AvlDecoder modes on each codec.
+3. Memory: bytes retained per decoded record for the AvlData and CompactAvlData models.
+
+Exits with code 1 if any packet decodes differently.
+
+Usage (from parser_nodes/teltonika):
+  python scripts/bench_avl_decoder.py
+  python scripts/bench_avl_decoder.py --records 25 --seconds 1.0
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+# Allow importing teltonika_codec when run from repo root or parser_nodes/teltonika
+_parser_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _parser_root not in sys.path:
+    sys.path.insert(0, _parser_root)
+
+from teltonika_codec.avl_decoder import AvlDecoder  # noqa: E402
+from teltonika_codec.data_decoder import DataDecoder  # noqa: E402
+from teltonika_codec.reverse_binary_reader import ReverseBinaryReader  # noqa: E402
+from scripts.benchmark_corpus import CODEC_8, CODEC_8E, CODEC_16, build_avl_packet  # noqa: E402
+
+# TCP examples from teltonika-doc.txt (Codec 8 x3, Codec 8E, Codec 16)
+DOC_VECTORS = [
+    "000000000000003608010000016B40D8EA30010000000000000000000000000000000105021503010101425E0F01F10000601A014E0000000000000000010000C7CF",
+    "000000000000002808010000016B40D9AD80010000000000000000000000000000000103021503010101425E100000010000F22A",
+    "000000000000004308020000016B40D57B480100000000000000000000000000000001010101000000000000016B40D5C198010000000000000000000000000000000101010101000000020000252C",
+    "000000000000004A8E010000016B412CEE000100000000000000000000000000000000010005000100010100010011001D00010010015E2C880002000B000000003544C87A000E000000001DD7E06A00000100002994",
+    "000000000000005F10020000016BDBC7833000000000000000000000000000000000000B05040200010000030002000B00270042563A00000000016BDBC7871800000000000000000000000000000000000B05040200010000030002000B00260042563A00000200005FB3",
+]
+
+CODEC_NAMES = {CODEC_8: "Codec 8", CODEC_8E: "Codec 8E", CODEC_16: "Codec 16"}
+
+
+def decode_reference(packet: bytes):
+    """Decode with the ReverseBinaryReader based DataDecoder."""
+    return DataDecoder(ReverseBinaryReader(io.BytesIO(packet))).decode_tcp_data()
+
+
+def decode_struct(packet: bytes):
+    """Decode with the struct based AvlDecoder."""
+    return AvlDecoder(packet).decode_tcp_data()
+
+
+def decode_compact(packet: bytes):
+    """Decode with the struct based AvlDecoder into CompactAvlData records."""
+    return AvlDecoder(packet, compact=True).decode_tcp_data()
+
+
+def golden_corpus():
+    """Yield (name, packet) pairs covering every codec and IO block shape."""
+    for index, vector in enumerate(DOC_VECTORS):
+        yield f"doc[{index}]", bytes.fromhex(vector)
+    io_shapes = [(0, 0, 0, 0), (1, 0, 0, 0), (0, 0, 0, 1), (3, 2, 1, 1), (10, 10, 5, 3), (40, 20, 10, 5)]
+    for codec_id in CODEC_NAMES:
+        for shape_index, io_counts in enumerate(io_shapes):
+            for seed in range(3):
+                variable_io = (seed + shape_index) % 3 if codec_id == CODEC_8E else 0
+                packet = build_avl_packet(codec_id, record_count=1 + seed * 7, io_counts=io_counts,
+                                          variable_io_count=variable_io, seed=seed * 100 + shape_index)
+                yield f"{CODEC_NAMES[codec_id]} io={io_counts} nx={variable_io} seed={seed}", packet
+
+
+def check_equivalence() -> int:
+    """Return the number of packets that decode differently."""
+    failures = 0
+    total = 0
+    for name, packet in golden_corpus():
+        total += 1
+        expected = decode_reference(packet)
+        actual = decode_struct(packet)
+        if expected != actual:
+            failures += 1
+            print(f"MISMATCH {name}:\n  reference={expected}\n  struct   ={actual}")
+            continue
+        compact = [record.to_avl_data() for record in decode_compact(packet).avl_data.data]
+        if compact != expected.avl_data.data:
+            failures += 1
+            print(f"MISMATCH (compact) {name}:\n  reference={expected.avl_data.data}\n  compact  ={compact}")
+    print(f"Equivalence: {total - failures}/{total} packets identical")
+    return failures
+
+
+def measure(decode, packet: bytes, records: int, seconds: float) -> float:
+    """Decode `packet` repeatedly for ~`seconds`; return records/sec."""
+    iterations = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        for _ in range(20):
+            decode(packet)
+        iterations += 20
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+    return iterations * records / (now - start)
+
+
+def retained_bytes_per_record(decode, packet: bytes, records: int, packets: int = 200) -> float:
+    """Bytes still allocated per record while `packets` decoded packets are held in memory."""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        held = [decode(packet) for _ in range(packets)]
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    del held
+    return retained / (packets * records)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="AvlDecoder equivalence check and throughput benchmark")
+    parser.add_argument("--records", type=int, default=25, help="AVL records per benchmark packet")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Measurement time per decoder and codec")
+    args = parser.parse_args()
+
+    if check_equivalence():
+        return 1
+
+    print(f"Throughput ({args.records} records/packet, default IO shape):")
+    for codec_id, codec_name in CODEC_NAMES.items():
+        packet = build_avl_packet(codec_id, record_count=args.records,
+                                  variable_io_count=2 if codec_id == CODEC_8E else 0)
+        reference = measure(decode_reference, packet, args.records, args.seconds)
+        optimized = measure(decode_struct, packet, args.records, args.seconds)
+        compact = measure(decode_compact, packet, args.records, args.seconds)
+        print(f"  {codec_name:<9} DataDecoder {reference:9.0f} rec/s   AvlDecoder {optimized:9.0f} rec/s "
+              f"({optimized / reference:4.1f}x)   compact {compact:9.0f} rec/s ({compact / reference:4.1f}x)")
+
+    print("Retained memory per record (default IO shape):")
+    for codec_id, codec_name in CODEC_NAMES.items():
+        packet = build_avl_packet(codec_id, record_count=args.records)
+        object_graph = retained_bytes_per_record(decode_struct, packet, args.records)
+        compact = retained_bytes_per_record(decode_compact, packet, args.records)
+        print(f"  {codec_name:<9} AvlData {object_graph:7.0f} B   CompactAvlData {compact:7.0f} B   "
+              f"({object_graph / compact:4.1f}x smaller)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+CRC-16 microbenchmark for Teltonika packet validation.
+
+Compares the bitwise reference implementation against the table-driven and
+slicing-by-8 paths on ~1 KB Codec 8E packets, verifies they agree, and fails
+(exit code 1) if CRC.calc_crc16 is not at least --min-speedup times faster.
+
+Usage (from parser_nodes/teltonika):
+  python scripts/bench_crc.py
+  python scripts/bench_crc.py --size 1024 --iterations 2000 --min-speedup 10
+"""
+import argparse
+import os
+import sys
+import timeit
+
+# Allow importing teltonika_codec when run from repo root or parser_nodes/teltonika
+_parser_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _parser_root not in sys.path:
+    sys.path.insert(0, _parser_root)
+
+from teltonika_codec.crc import CRC  # noqa: E402
+from scripts.benchmark_corpus import CODEC_8E, build_packet_of_size  # noqa: E402
+
+
+def _per_call_us(func, iterations: int) -> float:
+    """Best-of-5 time per call in microseconds."""
+    return min(timeit.repeat(func, number=iterations, repeat=5)) / iterations * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark CRC-16 on Codec 8E packets")
+    parser.add_argument("--size", type=int, default=1024, help="Approximate packet size in bytes")
+    parser.add_argument("--iterations", type=int, default=1000, help="Calls per timing run")
+    parser.add_argument("--min-speedup", type=float, default=10.0, help="Required speedup of calc_crc16 over the bitwise reference")
+    args = parser.parse_args()
+
+    packet = build_packet_of_size(CODEC_8E, args.size)
+    data = packet[8:-4]  # CRC covers codec ID .. second record count
+    crc = CRC.DEFAULT
+    polynom = 0xA001
+
+    expected = CRC._calc_crc16(data, 0, len(data), polynom, 0)
+    results = {
+        "table": crc._calc_crc16_table(data, 0),
+        "slice8": crc._calc_crc16_slice8(data, 0),
+        "calc_crc16": crc.calc_crc16(data),
+        "calc_crc16(memoryview)": crc.calc_crc16(memoryview(packet)[8:-4]),
+    }
+    mismatches = {name: value for name, value in results.items() if value != expected}
+    if mismatches:
+        print(f"CRC mismatch: expected 0x{expected:04X}, got {mismatches}")
+        return 1
+
+    print(f"Codec 8E packet: {len(packet)} bytes ({len(data)} CRC bytes), CRC=0x{expected:04X}")
+    reference_iterations = max(1, args.iterations // 10)
+    reference_us = _per_call_us(lambda: CRC._calc_crc16(data, 0, len(data), polynom, 0), reference_iterations)
+    timings = {
+        "bitwise (reference)": reference_us,
+        "table": _per_call_us(lambda: crc._calc_crc16_table(data, 0), args.iterations),
+        "slice8": _per_call_us(lambda: crc._calc_crc16_slice8(data, 0), args.iterations),
+        "calc_crc16": _per_call_us(lambda: crc.calc_crc16(data), args.iterations),
+    }
+    for name, per_call in timings.items():
+        print(f"  {name:<20} {per_call:10.2f} us/packet  {reference_us / per_call:6.1f}x")
+
+    speedup = reference_us / timings["calc_crc16"]
+    if speedup < args.min_speedup:
+        print(f"FAIL: calc_crc16 speedup {speedup:.1f}x is below required {args.min_speedup:.1f}x")
+        return 1
+    print(f"OK: calc_crc16 speedup {speedup:.1f}x (required {args.min_speedup:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
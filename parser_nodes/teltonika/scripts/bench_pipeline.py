@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmark for the Teltonika decode pipeline (no devices, broker or database).
+
+Corpora are built with the mock tracker's packet builder (tools/mock_tracker,
+TeltonikaPacketBuilder.build_avl_packet / build_codec12_response) from a seeded RNG, so every
+run and every commit measures the same bytes. Each corpus is driven in-process through:
+
+  frame    PacketFramer: each packet fed in --chunk-size reads until the frame is complete
+  crc      CRC.DEFAULT.calc_crc16 over the packet data
+  decode   AsyncPacketParser._try_decode_tcp_packet (AvlDecoder, compact records), or
+           _try_decode_codec12 (DataDecoder) for Codec 12
+  format   AsyncPacketParser._format_avl_record_to_dict for every AVL record
+  publish  RabbitMQPacketParser.parse_packet_to_rabbitmq with a stub producer: decode, format,
+           message building and JSON serialisation; the stub confirms every message
+
+Database-backed lookups are replaced: the IO mapping plan for --imei is compiled once from
+teltonika_database/unit_io_mapping.csv, and the nearest location reference lookup returns None
+(see check_location_reference_index.py for the index).
+
+Per corpus and stage it reports records/sec, p50/p99 latency (per packet; per record for
+format) and allocations per record: tracemalloc blocks/bytes still held by the stage's
+outputs (decoded records, formatted dicts, messages) after a pass over the first
+--alloc-packets packets.
+
+Results are written as JSON (--output); --compare BASELINE.json prints the change against an
+earlier run and exits with code 1 if any stage lost more than --threshold of its throughput.
+
+Usage (from parser_nodes/teltonika):
+  python scripts/bench_pipeline.py --output bench-$(git rev-parse --short HEAD).json
+  python scripts/bench_pipeline.py --corpus codec8e_25 --corpus codec12 --rounds 5
+  python scripts/bench_pipeline.py --compare bench-abc1234.json --threshold 0.1
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+# Allow importing config and teltonika_* when run from repo root or parser_nodes/teltonika
+_parser_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _parser_root not in sys.path:
+    sys.path.insert(0, _parser_root)
+_mock_tracker_dir = os.path.join(_parser_root, '..', '..', 'tools', 'mock_tracker')
+if _mock_tracker_dir not in sys.path:
+    sys.path.insert(0, _mock_tracker_dir)
+
+from mock_teltonika_tracker import AVLRecord, GPSData, IOElement, TeltonikaPacketBuilder  # noqa: E402
+from config import Config  # noqa: E402
+from teltonika_codec.crc import CRC  # noqa: E402
+from teltonika_database import location_reference_loader  # noqa: E402
+from teltonika_database.csv_unit_io_mapping_loader import CSVUnitIOMappingLoader  # noqa: E402
+from teltonika_database.io_mapping_plan import IoMappingPlan  # noqa: E402
+from teltonika_listener.packet_framer import PacketFramer  # noqa: E402
+from teltonika_parser import async_packet_parser  # noqa: E402
+from teltonika_parser.async_rabbitmq_packet_parser import RabbitMQPacketParser  # noqa: E402
+
+
+class CorpusSpec(NamedTuple):
+    codec_id: int
+    records_per_packet: int   # 0 for Codec 12 responses
+    extra_io: int             # IO elements added to the mock tracker's default set
+    variable_io: int          # variable length elements (Codec 8E only)
+
+
+B = TeltonikaPacketBuilder
+CORPORA: Dict[str, CorpusSpec] = {
+    'codec8_1': CorpusSpec(B.CODEC_8, 1, 0, 0),          # what the mock tracker sends live
+    'codec8_25': CorpusSpec(B.CODEC_8, 25, 0, 0),
+    'codec8e_25': CorpusSpec(B.CODEC_8E, 25, 0, 2),
+    'codec8e_25_io100': CorpusSpec(B.CODEC_8E, 25, 70, 4),
+    'codec16_25': CorpusSpec(B.CODEC_16, 25, 0, 0),
+    'codec8e_255': CorpusSpec(B.CODEC_8E, 255, 0, 2),    # full buffer flush after a connection gap
+    'codec12': CorpusSpec(B.CODEC_12, 0, 0, 0),
+}
+
+
+class Corpus(NamedTuple):
+    name: str
+    spec: CorpusSpec
+    packets: List[bytes]
+    records: int
+
+
+def _extra_io_elements(rng: random.Random, spec: CorpusSpec) -> List[IOElement]:
+    """Additional IO elements with IDs outside the mock tracker's default set."""
+    wide = spec.codec_id != B.CODEC_8
+    elements = []
+    for index in range(spec.extra_io):
+        size = (1, 2, 4, 8)[index % 4]
+        io_id = (1000 if wide else 100) + index
+        elements.append(IOElement(io_id, rng.randint(0, (1 << (size * 8 - 1)) - 1), size))
+    for index in range(spec.variable_io):
+        value = bytes(rng.getrandbits(8) for _ in range(rng.randint(4, 32)))
+        elements.append(IOElement(2000 + index, value, 0))
+    return elements
+
+
+def build_corpus(name: str, packet_count: int, seed: int) -> Corpus:
+    """Seeded corpus: a vehicle moving around Karachi, records 10 s apart, mock tracker IO set."""
+    spec = CORPORA[name]
+    rng = random.Random(seed)
+    random.seed(seed)  # _default_io_elements uses the random module
+    if spec.codec_id == B.CODEC_12:
+        packets = [B.build_codec12_response(f"Ver:03.27.07_{index} GPS:1 Hw:FMB920 Mod:4 IMEI:{seed}")
+                   for index in range(packet_count)]
+        return Corpus(name, spec, packets, packet_count)
+
+    latitude, longitude = 24.8607, 67.0011
+    timestamp = datetime(2024, 1, 1)
+    packets = []
+    for _ in range(packet_count):
+        records = []
+        for _ in range(spec.records_per_packet):
+            latitude += rng.uniform(-0.001, 0.001)
+            longitude += rng.uniform(-0.001, 0.001)
+            timestamp += timedelta(seconds=10)
+            gps = GPSData(latitude, longitude, rng.randint(0, 50), rng.randint(0, 359),
+                          rng.randint(0, 120), rng.randint(8, 15))
+            state = {'ignition': 1, 'harsh_event': rng.choice((0, 0, 0, 1, 2))}
+            io_elements = TeltonikaPacketBuilder._default_io_elements(state) + _extra_io_elements(rng, spec)
+            event_io_id = 253 if state['harsh_event'] else 1
+            records.append(AVLRecord(gps, timestamp, io_elements, 0, event_io_id))
+        packets.append(B.build_avl_packet(records, spec.codec_id))
+    return Corpus(name, spec, packets, packet_count * spec.records_per_packet)
+
+
+class _StubProducer:
+    """publish_batch of RabbitMQProducer without a broker: serialises and confirms every message."""
+
+    def __init__(self):
+        self.published = 0
+
+    async def publish_batch(self, records, vendor: str = "teltonika", timeout: float = 5.0) -> List[bool]:
+        for record, _ in records:
+            json.dumps(record).encode('utf-8')
+        self.published += len(records)
+        return [True] * len(records)
+
+
+class _StubLoadMonitor:
+    """The ParserNodeLoadMonitor calls made by parse_packet_to_rabbitmq."""
+
+    def increment_messages(self, count: int = 1) -> None:
+        pass
+
+    def record_publish_success(self) -> None:
+        pass
+
+    def record_publish_failure(self) -> None:
+        pass
+
+
+async def _no_location_reference(latitude: float, longitude: float, max_distance_km: float = 50.0,
+                                 use_index: bool = True) -> Optional[Dict[str, Any]]:
+    return None
+
+
+async def _ignore_codec12_response(imei: str, response: Any) -> None:
+    pass
+
+
+def _offline_parser(imei: str) -> RabbitMQPacketParser:
+    """RabbitMQPacketParser wired to the stubs, with the CSV mapping plan of imei."""
+    Config.load()['data_transfer_mode']['mode'] = 'RABBITMQ'
+    location_reference_loader.find_nearest_location_reference = _no_location_reference
+    async_packet_parser.set_codec12_response_handler(_ignore_codec12_response)
+
+    loader = CSVUnitIOMappingLoader(os.path.join(_parser_root, 'teltonika_database', 'unit_io_mapping.csv'))
+    asyncio.run(loader.load_mappings_for_imei(imei))
+    plan = loader.get_mapping_plan(imei) or IoMappingPlan.EMPTY
+
+    async def mapping_plan(_imei: str) -> IoMappingPlan:
+        return plan
+
+    wrapper = RabbitMQPacketParser(_StubProducer(), _StubLoadMonitor())
+    wrapper.parser._get_io_mapping_plan = mapping_plan
+    return wrapper
+
+
+def _percentile(sorted_samples: List[int], fraction: float) -> float:
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index] / 1000.0
+
+
+def _allocations(run: Callable[[], Any], records: int) -> Dict[str, float]:
+    """Blocks and bytes allocated by run() that its return value still holds, per record."""
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot().filter_traces(ignore)
+        held = run()
+        after = tracemalloc.take_snapshot().filter_traces(ignore)
+    finally:
+        tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    del held
+    return {
+        'alloc_blocks_per_record': round(blocks / records, 2),
+        'alloc_bytes_per_record': round(size / records, 1),
+    }
+
+
+def _stage_result(samples: List[int], records: int, latency_unit: str) -> Dict[str, Any]:
+    total_seconds = sum(samples) / 1e9
+    ordered = sorted(samples)
+    return {
+        'records': records,
+        'seconds': round(total_seconds, 6),
+        'records_per_sec': round(records / total_seconds, 1) if total_seconds else None,
+        'latency_unit': latency_unit,
+        'p50_us': round(_percentile(ordered, 0.50), 2),
+        'p99_us': round(_percentile(ordered, 0.99), 2),
+    }
+
+
+def _stage_passes(wrapper: RabbitMQPacketParser, imei: str, codec12: bool, packets: List[bytes],
+                  avl_records: List[Any], chunk_size: int,
+                  loop: asyncio.AbstractEventLoop) -> Dict[str, Callable[..., List[Any]]]:
+    """One pass per stage over packets (avl_records for format); pass a list to collect latencies (ns)."""
+    parser = wrapper.parser
+    clock = time.perf_counter_ns
+    crc16 = CRC.DEFAULT.calc_crc16
+    decode = parser._try_decode_codec12 if codec12 else parser._try_decode_tcp_packet
+    server_time = datetime.now(timezone.utc)
+
+    def frame_pass(samples: Optional[List[int]] = None) -> List[Any]:
+        framer = PacketFramer()
+        frames = []
+        for packet in packets:
+            start = clock()
+            frame = None
+            for offset in range(0, len(packet), chunk_size):
+                framer.feed(packet[offset:offset + chunk_size])
+                frame = framer.next_frame()
+            if samples is not None:
+                samples.append(clock() - start)
+            frames.append(frame)
+        return frames
+
+    def crc_pass(samples: Optional[List[int]] = None) -> List[Any]:
+        results = []
+        for packet in packets:
+            start = clock()
+            results.append(crc16(packet[8:-4]))
+            if samples is not None:
+                samples.append(clock() - start)
+        return results
+
+    def decode_pass(samples: Optional[List[int]] = None) -> List[Any]:
+        results = []
+        for packet in packets:
+            start = clock()
+            results.append(decode(packet))
+            if samples is not None:
+                samples.append(clock() - start)
+        return results
+
+    async def format_records(samples: Optional[List[int]]) -> List[Any]:
+        results = []
+        for record in avl_records:
+            start = clock()
+            results.append(await parser._format_avl_record_to_dict(record, imei, server_time))
+            if samples is not None:
+                samples.append(clock() - start)
+        return results
+
+    async def publish_packets(samples: Optional[List[int]]) -> List[Any]:
+        results = []
+        for packet in packets:
+            start = clock()
+            records, published = await wrapper.parse_packet_to_rabbitmq(packet, imei, '127.0.0.1', 5027)
+            if samples is not None:
+                samples.append(clock() - start)
+            if not published:
+                raise RuntimeError("parse_packet_to_rabbitmq reported a failure")
+            results.append(records)
+        return results
+
+    passes = {
+        'frame': frame_pass,
+        'crc': crc_pass,
+        'decode': decode_pass,
+        'format': lambda samples=None: loop.run_until_complete(format_records(samples)),
+        'publish': lambda samples=None: loop.run_until_complete(publish_packets(samples)),
+    }
+    if codec12:
+        del passes['format']
+    return passes
+
+
+def bench_corpus(corpus: Corpus, wrapper: RabbitMQPacketParser, imei: str,
+                 rounds: int, chunk_size: int, alloc_packets: int) -> Dict[str, Any]:
+    packets = corpus.packets
+    codec12 = corpus.spec.codec_id == B.CODEC_12
+    records_per_packet = corpus.spec.records_per_packet or 1
+    avl_records = [] if codec12 else [
+        record for packet in packets for record in wrapper.parser._try_decode_tcp_packet(packet).avl_data.data
+    ]
+    # tracemalloc slows everything down a lot: allocations are measured on the first packets only
+    alloc_count = min(alloc_packets, len(packets))
+    loop = asyncio.new_event_loop()
+    try:
+        timed = _stage_passes(wrapper, imei, codec12, packets, avl_records, chunk_size, loop)
+        traced = _stage_passes(wrapper, imei, codec12, packets[:alloc_count],
+                               avl_records[:alloc_count * records_per_packet], chunk_size, loop)
+        stages: Dict[str, Dict[str, Any]] = {}
+        for stage, run in timed.items():
+            run()  # warm-up (mapping plan, caches, code paths)
+            samples: List[int] = []
+            for _ in range(rounds):
+                run(samples)
+            latency_unit = 'record' if stage == 'format' else 'packet'
+            result = _stage_result(samples, corpus.records * rounds, latency_unit)
+            result.update(_allocations(traced[stage], alloc_count * records_per_packet))
+            stages[stage] = result
+    finally:
+        loop.close()
+
+    return {
+        'codec_id': f"0x{corpus.spec.codec_id:02X}",
+        'packets': len(packets),
+        'records': corpus.records,
+        'bytes': sum(len(packet) for packet in packets),
+        'stages': stages,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=_parser_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> int:
+    """Print throughput/p99 changes against baseline; return the number of regressions."""
+    regressions = 0
+    print(f"\nAgainst {baseline.get('git_commit') or 'baseline'} ({baseline.get('generated_at')}):")
+    for name, corpus in results['corpora'].items():
+        old_corpus = baseline.get('corpora', {}).get(name)
+        if not old_corpus:
+            continue
+        for stage, result in corpus['stages'].items():
+            old = old_corpus['stages'].get(stage)
+            if not old or not old.get('records_per_sec') or not result.get('records_per_sec'):
+                continue
+            ratio = result['records_per_sec'] / old['records_per_sec']
+            flag = ''
+            if ratio < 1.0 - threshold:
+                regressions += 1
+                flag = '  REGRESSION'
+            print(f"  {name:<18} {stage:<8} {ratio:6.2f}x rec/s   "
+                  f"p99 {old['p99_us']:9.1f} -> {result['p99_us']:9.1f} us{flag}")
+    return regressions
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Offline Teltonika decode pipeline benchmark")
+    ap.add_argument('--corpus', action='append', choices=sorted(CORPORA),
+                    help='Corpus to run (repeatable, default: all)')
+    ap.add_argument('--packets', type=int, default=200, help='Packets per corpus')
+    ap.add_argument('--rounds', type=int, default=3, help='Timed passes over each corpus per stage')
+    ap.add_argument('--alloc-packets', type=int, default=10, help='Packets per corpus traced for allocations')
+    ap.add_argument('--chunk-size', type=int, default=1460, help='Bytes per simulated socket read (frame stage)')
+    ap.add_argument('--seed', type=int, default=1, help='Corpus RNG seed')
+    ap.add_argument('--imei', default='357544375602980', help='IMEI whose unit_io_mapping.csv rows are applied')
+    ap.add_argument('--output', help='Write results to this JSON file')
+    ap.add_argument('--compare', help='Earlier results JSON to compare against')
+    ap.add_argument('--threshold', type=float, default=0.10,
+                    help='Throughput loss (fraction) reported as a regression by --compare')
+    args = ap.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+    wrapper = _offline_parser(args.imei)
+
+    results: Dict[str, Any] = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {'packets': args.packets, 'rounds': args.rounds, 'chunk_size': args.chunk_size,
+                     'alloc_packets': args.alloc_packets, 'seed': args.seed, 'imei': args.imei},
+        'corpora': {},
+    }
+    print(f"{'corpus':<18} {'stage':<8} {'rec/s':>11} {'p50 us':>9} {'p99 us':>9} {'blocks/rec':>10} {'B/rec':>8}")
+    for name in args.corpus or list(CORPORA):
+        corpus = build_corpus(name, args.packets, args.seed)
+        corpus_result = bench_corpus(corpus, wrapper, args.imei, args.rounds, args.chunk_size,
+                                     args.alloc_packets)
+        results['corpora'][name] = corpus_result
+        for stage, result in corpus_result['stages'].items():
+            unit = '/rec' if result['latency_unit'] == 'record' else ''
+            print(f"{name:<18} {stage:<8} {result['records_per_sec']:>11,.0f} {result['p50_us']:>9.1f} "
+                  f"{result['p99_us']:>9.1f}{unit:<4} {result['alloc_blocks_per_record']:>6.1f} "
+                  f"{result['alloc_bytes_per_record']:>8.0f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
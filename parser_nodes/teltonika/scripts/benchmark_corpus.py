@@ -0,0 +1,120 @@
+"""
+Synthetic Teltonika AVL packets for the parser benchmark scripts.
+
+Builds complete TCP frames (preamble + length + data + CRC) for Codec 8, 8E and 16
+with a configurable number of records and IO elements per width, using a seeded RNG
+so every run (and every commit) benchmarks exactly the same bytes.
+"""
+import random
+import struct
+from typing import Optional, Sequence
+
+CODEC_8 = 0x08
+CODEC_8E = 0x8E
+CODEC_16 = 0x10
+
+# Default IO element counts per width (1, 2, 4, 8 bytes) - roughly an FMB920 periodic record
+DEFAULT_IO_COUNTS = (10, 10, 5, 3)
+
+
+def crc16(data: bytes, polynom: int = 0xA001) -> int:
+    """Bitwise CRC-16 (independent of teltonika_codec so packets are built without the code under test)."""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ polynom
+            else:
+                crc >>= 1
+    return crc & 0xFFFF
+
+
+def _build_record(rng: random.Random, codec_id: int, timestamp_ms: int,
+                  io_counts: Sequence[int], variable_io_count: int) -> bytes:
+    """Build a single AVL record for the given codec."""
+    wide_ids = codec_id in (CODEC_8E, CODEC_16)
+    id_format = '>H' if wide_ids else '>B'
+    count_format = '>H' if codec_id == CODEC_8E else '>B'
+
+    record = struct.pack('>QB', timestamp_ms, rng.randint(0, 2))
+    record += struct.pack(
+        '>iihhBh',
+        rng.randint(-1800000000, 1800000000),  # longitude x10^7
+        rng.randint(-900000000, 900000000),    # latitude x10^7
+        rng.randint(-100, 3000),               # altitude
+        rng.randint(0, 359),                   # angle
+        rng.randint(0, 20),                    # satellites
+        rng.randint(0, 180),                   # speed
+    )
+
+    next_id = 1
+    ids = []
+    for _ in range(sum(io_counts) + variable_io_count):
+        ids.append(next_id)
+        next_id += rng.randint(1, 3)
+    event_id = ids[0] if ids else 0
+    total = len(ids)
+
+    if codec_id == CODEC_8E:
+        record += struct.pack('>HH', event_id, total)
+    elif codec_id == CODEC_16:
+        record += struct.pack('>HBB', event_id, rng.randint(0, 5), total)
+    else:
+        record += struct.pack('>BB', event_id & 0xFF, total)
+
+    id_iter = iter(ids)
+    for width, value_format in zip((1, 2, 4, 8), ('>b', '>h', '>i', '>q')):
+        count = io_counts[(1, 2, 4, 8).index(width)]
+        record += struct.pack(count_format, count)
+        bound = 1 << (width * 8 - 1)
+        for _ in range(count):
+            io_id = next(id_iter)
+            record += struct.pack(id_format, io_id & (0xFFFF if wide_ids else 0xFF))
+            record += struct.pack(value_format, rng.randint(-bound, bound - 1))
+
+    if codec_id == CODEC_8E:
+        record += struct.pack('>H', variable_io_count)
+        for _ in range(variable_io_count):
+            value = bytes(rng.getrandbits(8) for _ in range(rng.randint(1, 16)))
+            record += struct.pack('>HH', next(id_iter), len(value)) + value
+
+    return record
+
+
+def build_avl_packet(codec_id: int = CODEC_8E, record_count: int = 1,
+                     io_counts: Sequence[int] = DEFAULT_IO_COUNTS,
+                     variable_io_count: int = 0, seed: int = 0,
+                     start_timestamp_ms: Optional[int] = None) -> bytes:
+    """
+    Build a complete Teltonika TCP AVL packet.
+
+    Args:
+        codec_id: CODEC_8, CODEC_8E or CODEC_16
+        record_count: Number of AVL records (1-255)
+        io_counts: IO element counts for 1/2/4/8-byte values
+        variable_io_count: Number of variable-length (NX) elements, Codec 8E only
+        seed: RNG seed
+        start_timestamp_ms: Timestamp of the first record (ms since epoch)
+
+    Returns:
+        Packet bytes ready for DataDecoder / the TCP listener
+    """
+    if codec_id not in (CODEC_8, CODEC_8E, CODEC_16):
+        raise ValueError(f"Unsupported codec ID: {codec_id}")
+
+    rng = random.Random(seed)
+    timestamp_ms = start_timestamp_ms if start_timestamp_ms is not None else 1700000000000
+    records = b''.join(
+        _build_record(rng, codec_id, timestamp_ms + i * 1000, io_counts, variable_io_count)
+        for i in range(record_count)
+    )
+    data = bytes([codec_id, record_count]) + records + bytes([record_count])
+    return struct.pack('>II', 0, len(data)) + data + struct.pack('>I', crc16(data))
+
+
+def build_packet_of_size(codec_id: int, target_size: int, seed: int = 0) -> bytes:
+    """Build a packet with as many default records as fit in roughly target_size bytes."""
+    single_record_size = len(build_avl_packet(codec_id, 2, seed=seed)) - len(build_avl_packet(codec_id, 1, seed=seed))
+    record_count = max(1, min(255, round((target_size - 15) / single_record_size)))
+    return build_avl_packet(codec_id, record_count, seed=seed)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Parity check: in-process location reference index vs PostGIS.
+
+Loads teltonika_database/location_reference_index.py from the database, then looks up random
+points (jittered around existing references and spread over their bounding box) with the index
+and with the PostGIS query find_nearest_location_reference runs when the index is not loaded.
+A different reference_id is a tie, not a mismatch, when both rows are equally near by the KNN
+ordering (planar lon/lat degrees); distances must agree within --tolerance-m.
+Also prints the index lookup time per point (LRU off).
+
+Usage (from parser_nodes/teltonika, database from config.json):
+  python scripts/check_location_reference_index.py
+  python scripts/check_location_reference_index.py --points 2000 --max-distance-km 50 --seed 7
+Exit 0 if no mismatches, 1 otherwise.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+
+# Allow importing config and teltonika_database when run from repo root or parser_nodes/teltonika
+_parser_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _parser_root not in sys.path:
+    sys.path.insert(0, _parser_root)
+
+from teltonika_parser.orm_init import init_orm, close_orm  # noqa: E402
+from teltonika_database.location_reference_index import LocationReferenceIndex  # noqa: E402
+from teltonika_database.location_reference_loader import find_nearest_location_reference  # noqa: E402
+
+
+async def run(points: int, max_distance_km: float, tolerance_m: float, seed: int) -> int:
+    await init_orm(retry=False)
+    try:
+        index = LocationReferenceIndex()
+        await index.load()
+        refs = list(index._points.values())
+        if not refs:
+            print("location_reference is empty")
+            return 1
+        rng = random.Random(seed)
+        lons = [r[0] for r in refs]
+        lats = [r[1] for r in refs]
+        queries = []
+        for i in range(points):
+            if i % 2 == 0:
+                lon, lat, _ = rng.choice(refs)
+                queries.append((lat + rng.gauss(0, 0.05), lon + rng.gauss(0, 0.05)))
+            else:
+                queries.append((rng.uniform(min(lats) - 1, max(lats) + 1), rng.uniform(min(lons) - 1, max(lons) + 1)))
+        queries = [(max(-90.0, min(90.0, lat)), max(-180.0, min(180.0, lon))) for lat, lon in queries]
+
+        started = time.perf_counter()
+        indexed = [index._search(lat, lon, max_distance_km * 1000) for lat, lon in queries]
+        per_lookup_us = (time.perf_counter() - started) / len(queries) * 1e6
+
+        mismatches = ties = 0
+        for (lat, lon), a in zip(queries, indexed):
+            b = await find_nearest_location_reference(lat, lon, max_distance_km=max_distance_km, use_index=False)
+            if a is None or b is None:
+                ok = a is None and b is None
+                # Nearest right at the distance limit may fall on either side
+                if not ok:
+                    d = (a or b)['distance']
+                    ok = abs(d - max_distance_km * 1000) <= tolerance_m
+            elif a['reference_id'] == b['reference_id']:
+                ok = abs(a['distance'] - b['distance']) <= tolerance_m
+            else:
+                pa = index._points[a['reference_id']]
+                pb = index._points.get(b['reference_id'])
+                ok = pb is not None and math.isclose(
+                    math.hypot(pa[0] - lon, pa[1] - lat), math.hypot(pb[0] - lon, pb[1] - lat), abs_tol=1e-9
+                )
+                ties += ok
+            if not ok:
+                mismatches += 1
+                if mismatches <= 10:
+                    print("MISMATCH lat=%.6f lon=%.6f\n  index:   %s\n  postgis: %s" % (lat, lon, a, b))
+        print(
+            "Checked %d points against %d references: %d mismatches, %d ties, index %.1f us/lookup"
+            % (len(queries), len(refs), mismatches, ties, per_lookup_us)
+        )
+        return 0 if mismatches == 0 else 1
+    finally:
+        await close_orm()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Location reference index vs PostGIS parity check")
+    ap.add_argument("--points", type=int, default=1000)
+    ap.add_argument("--max-distance-km", type=float, default=50.0)
+    ap.add_argument("--tolerance-m", type=float, default=0.5)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    sys.exit(asyncio.run(run(args.points, args.max_distance_km, args.tolerance_m, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Inspect and replay packet capture files (teltonika_infrastructure/packet_capture.py).
+
+  dump    one line per packet (time, IMEI, size) with a hex dump, or JSON lines (--format json)
+  replay  decode every packet with the parser's decoders (AvlDecoder compact mode, Codec 12
+          decoder) and report codec, record count and decode errors; --records prints the
+          decoded AVL records as JSON lines
+
+Usage (from parser_nodes/teltonika):
+  python scripts/packet_capture_tool.py dump logs/packets.tcap --imei 356307042441013 --limit 20
+  python scripts/packet_capture_tool.py dump logs/packets.tcap --format json > packets.jsonl
+  python scripts/packet_capture_tool.py replay logs/packets.tcap --records
+Exit code of replay is 1 if any packet failed to decode.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Tuple
+
+# Allow importing config and teltonika_* when run from repo root or parser_nodes/teltonika
+_parser_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _parser_root not in sys.path:
+    sys.path.insert(0, _parser_root)
+
+from teltonika_codec.avl_decoder import CODEC12_ID, AvlDecoder  # noqa: E402
+from teltonika_codec.data_decoder import DataDecoder  # noqa: E402
+from teltonika_codec.reverse_binary_reader import ReverseBinaryReader  # noqa: E402
+from teltonika_infrastructure.packet_capture import CaptureRecord, read_capture  # noqa: E402
+
+
+def _selected(args) -> Iterator[CaptureRecord]:
+    count = 0
+    for record in read_capture(args.file):
+        if args.imei and record.imei != args.imei:
+            continue
+        if args.limit and count >= args.limit:
+            return
+        count += 1
+        yield record
+
+
+def _time(record: CaptureRecord) -> str:
+    return datetime.fromtimestamp(record.time_us / 1e6, tz=timezone.utc).isoformat()
+
+
+def dump(args) -> int:
+    for record in _selected(args):
+        payload = record.payload
+        if args.format == 'json':
+            print(json.dumps({
+                'time': _time(record), 'imei': record.imei, 'length': len(payload), 'hex': payload.hex(),
+            }))
+            continue
+        print(f"{_time(record)} IMEI={record.imei or '?'} {len(payload)} bytes")
+        shown = payload[:args.max_bytes] if args.max_bytes else payload
+        for offset in range(0, len(shown), 16):
+            print(f"  {offset:06X}  {shown[offset:offset + 16].hex(' ').upper()}")
+        if len(shown) < len(payload):
+            print(f"  ... {len(payload) - len(shown)} more bytes")
+    return 0
+
+
+def _io_values(io_element: Any) -> Iterator[Tuple[int, Any]]:
+    """(id, value) pairs of a CompactIoElement, or of an IoElement (Codec 7)."""
+    if hasattr(io_element, 'iter_raw'):
+        return io_element.iter_raw()
+    return ((prop.id, prop.array_value if prop.array_value is not None else prop.value)
+            for prop in io_element.properties)
+
+
+def _avl_record_json(record: Any) -> Dict[str, Any]:
+    gps = record.gps_element
+    io_element = record.io_element
+    return {
+        'time': record.date_time.isoformat(),
+        'priority': record.priority,
+        'longitude': gps.x,
+        'latitude': gps.y,
+        'altitude': gps.altitude,
+        'angle': gps.angle,
+        'satellites': gps.satellites,
+        'speed': gps.speed,
+        'event_id': io_element.event_id,
+        'io': {str(io_id): (value.hex() if isinstance(value, bytes) else value)
+               for io_id, value in _io_values(io_element)},
+    }
+
+
+def replay(args) -> int:
+    packets = records = failures = 0
+    for capture in _selected(args):
+        packets += 1
+        payload = capture.payload
+        try:
+            if len(payload) > 8 and payload[8] == CODEC12_ID:
+                response = DataDecoder(ReverseBinaryReader(io.BytesIO(payload))).decode_codec12()
+                summary = f"codec=0x0C response={response.response_text[:60]!r}"
+            else:
+                packet = AvlDecoder(payload, compact=True).decode_tcp_data()
+                avl_records = packet.avl_data.data
+                records += len(avl_records)
+                summary = f"codec=0x{packet.codec_id:02X} records={len(avl_records)}"
+                if args.records:
+                    for avl_record in avl_records:
+                        print(json.dumps({'imei': capture.imei, **_avl_record_json(avl_record)}, default=str))
+        except Exception as e:
+            failures += 1
+            summary = f"DECODE ERROR {type(e).__name__}: {e}"
+        if not args.records:
+            print(f"{_time(capture)} IMEI={capture.imei or '?'} {len(payload)} bytes {summary}")
+    print(f"Replayed {packets} packets: {records} AVL records, {failures} decode failures", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Packet capture dump / replay")
+    sub = ap.add_subparsers(dest='command', required=True)
+    for name in ('dump', 'replay'):
+        p = sub.add_parser(name)
+        p.add_argument('file')
+        p.add_argument('--imei', help='Only packets from this IMEI')
+        p.add_argument('--limit', type=int, default=0, help='Stop after this many packets')
+        if name == 'dump':
+            p.add_argument('--format', choices=('hex', 'json'), default='hex')
+            p.add_argument('--max-bytes', type=int, default=0, help='Hex dump at most this many bytes per packet')
+        else:
+            p.add_argument('--records', action='store_true', help='Print decoded AVL records as JSON lines')
+    args = ap.parse_args()
+    sys.exit(dump(args) if args.command == 'dump' else replay(args))
+
+
+if __name__ == '__main__':
+    main()
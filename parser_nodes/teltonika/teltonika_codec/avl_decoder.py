@@ -0,0 +1,279 @@
+"""
+Zero-copy AVL decoder for Codec 8, 8E and 16.
+
+Decodes straight from a memoryview with precompiled big-endian struct.Struct
+objects and unpack_from offsets, instead of one ReverseBinaryReader call (and a
+Python byte swap) per field. The fixed part of every record (timestamp, priority,
+GPS element, event ID, property count, N1 count) is unpacked in one call, and each
+N1/N2/N4/N8 block is unpacked in one call together with the count of the next block.
+
+Produces the same AvlDataCollection / TcpDataPacket objects as the per-codec
+decoders, including their signed/unsigned interpretation of every field.
+Codec 7 is delegated to the ReverseBinaryReader based Codec7 decoder.
+
+With compact=True records are decoded into CompactAvlData (__slots__ objects with
+array-backed IO properties) instead, which is what the parser uses on its hot path.
+"""
+import io
+import struct
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Tuple, Union
+
+from .crc import CRC
+from .reverse_binary_reader import ReverseBinaryReader
+from .codecs.codec7 import Codec7
+from .models.avl_data import AvlData
+from .models.avl_data_collection import AvlDataCollection
+from .models.avl_data_priority import AvlDataPriority
+from .models.compact_avl_data import CompactAvlData, CompactGpsElement, CompactIoElement
+from .models.gps_element import GpsElement
+from .models.io_element import IoElement
+from .models.io_property import IoProperty
+from .models.tcp_data_packet import TcpDataPacket
+
+
+AVL_EPOCH = datetime(1970, 1, 1, 0, 0, 0, 0)
+
+CODEC7_ID = 0x07
+CODEC8_ID = 0x08
+CODEC8E_ID = 0x8E
+CODEC12_ID = 0x0C
+CODEC16_ID = 0x10
+
+# preamble, data length, codec ID
+_PACKET_HEADER = struct.Struct('>iiB')
+_CRC = struct.Struct('>i')
+# X (variable-length) element header for Codec 8E: property ID, value length
+_NX_HEADER = struct.Struct('>hh')
+_NX_HEADER_UNSIGNED = struct.Struct('>HH')
+
+# Value format per IO width in bytes (all signed, matching read_sbyte/read_int16/32/64)
+_VALUE_FORMATS = ((1, 'b'), (2, 'h'), (4, 'i'), (8, 'q'))
+
+_PRIORITY_NAMES = {priority.value: priority.name for priority in AvlDataPriority}
+
+
+class _CodecLayout(NamedTuple):
+    """Field formats that differ between Codec 8, 8E and 16."""
+    record_header: struct.Struct  # timestamp .. N1 count
+    id_format: str                # IO property ID
+    count_format: str             # N1/N2/N4/N8(/NX) counts
+    has_origin_type: bool         # Codec 16 generation type byte
+    has_variable_io: bool         # Codec 8E NX block
+
+
+def _make_layouts(unsigned: bool) -> Dict[int, _CodecLayout]:
+    """
+    Build the per-codec layouts.
+
+    Record header: timestamp(q) priority(B) lon(i) lat(i) altitude(h) angle(h) satellites(B)
+    speed(h), followed by the codec specific event ID / [origin type] / property count / N1 count.
+
+    The default layouts read 2-byte IDs and counts as signed, exactly like the per-codec
+    decoders (read_int16). The compact layouts read them unsigned so they fit array('H').
+    """
+    wide = 'H' if unsigned else 'h'
+    return {
+        CODEC8_ID: _CodecLayout(struct.Struct('>qBiihhBh' 'BBB'), 'B', 'B', False, False),
+        CODEC8E_ID: _CodecLayout(struct.Struct('>qBiihhBh' + wide * 3), wide, wide, False, True),
+        CODEC16_ID: _CodecLayout(struct.Struct('>qBiihhBh' + wide + 'BBB'), wide, 'B', True, False),
+    }
+
+
+_LAYOUTS = _make_layouts(unsigned=False)
+_COMPACT_LAYOUTS = _make_layouts(unsigned=True)
+
+# Compiled IO block structs keyed by (codec ID, compact, width index, element count)
+_block_structs: Dict[Tuple[int, bool, int, int], struct.Struct] = {}
+
+
+def _get_block_struct(codec_id: int, compact: bool, width_index: int, count: int) -> struct.Struct:
+    """
+    Get (compiling on first use) the struct for an IO block of `count` elements.
+
+    The struct also covers the count field of the following block (or the NX count
+    for Codec 8E), so walking a record costs one unpack_from call per block.
+    """
+    key = (codec_id, compact, width_index, count)
+    block = _block_structs.get(key)
+    if block is None:
+        layout = (_COMPACT_LAYOUTS if compact else _LAYOUTS)[codec_id]
+        value_format = _VALUE_FORMATS[width_index][1]
+        is_last = width_index == len(_VALUE_FORMATS) - 1
+        trailing_count = layout.count_format if (not is_last or layout.has_variable_io) else ''
+        block = struct.Struct('>' + (layout.id_format + value_format) * count + trailing_count)
+        _block_structs[key] = block
+    return block
+
+
+class AvlDecoder:
+    """Decoder for Teltonika TCP AVL packets operating directly on a memoryview."""
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview], compact: bool = False):
+        """
+        Initialize decoder with the raw packet (preamble + length + data + CRC).
+
+        Args:
+            buffer: Packet bytes
+            compact: Produce CompactAvlData records (array-backed IO properties, unsigned
+                2-byte IDs) instead of the AvlData object graph. Codec 7 always produces AvlData.
+        """
+        if buffer is None:
+            raise ValueError("buffer cannot be None")
+        self._buffer = memoryview(buffer)
+        self._compact = compact
+        self._layouts = _COMPACT_LAYOUTS if compact else _LAYOUTS
+
+    def decode_tcp_data(self) -> TcpDataPacket:
+        """
+        Decode AVL TCP data packet.
+
+        Returns:
+            TcpDataPacket with AVL data
+
+        Raises:
+            ValueError: If codec is unsupported or CRC doesn't match
+            struct.error: If the packet is truncated
+        """
+        buffer = self._buffer
+        preamble, length, codec_id = _PACKET_HEADER.unpack_from(buffer, 0)
+        if length < 0:
+            raise ValueError(f"Invalid data length: {length}")
+        crc = _CRC.unpack_from(buffer, 8 + length)[0]
+
+        if preamble != 0:
+            raise ValueError("Unable to decode. Missing package prefix.")
+
+        if crc != CRC.DEFAULT.calc_crc16(buffer[8:8 + length]):
+            raise ValueError("CRC does not match the expected.")
+
+        if codec_id in self._layouts:
+            avl_data_collection = self.decode_avl_data_collection(8)
+        elif codec_id == CODEC7_ID:
+            reader = ReverseBinaryReader(io.BytesIO(buffer.tobytes()))
+            reader.position = 8
+            avl_data_collection = Codec7(reader).decode_avl_data_collection()
+        elif codec_id == CODEC12_ID:
+            raise ValueError(
+                f"Codec 12 detected. Use decode_codec12() method instead of decode_tcp_data() "
+                f"for GPRS command/response packets."
+            )
+        else:
+            raise ValueError(f"Unsupported codec ID: {codec_id}")
+
+        return TcpDataPacket.create(preamble, length, crc, codec_id, avl_data_collection)
+
+    def decode_avl_data_collection(self, offset: int) -> AvlDataCollection:
+        """
+        Decode the AVL data collection starting at the codec ID byte.
+
+        Args:
+            offset: Position of the codec ID byte (8 for a full TCP packet)
+        """
+        buffer = self._buffer
+        codec_id = buffer[offset]
+        data_count = buffer[offset + 1]
+        layout = self._layouts.get(codec_id)
+        if layout is None:
+            raise ValueError(f"Unsupported codec ID: {codec_id}")
+
+        decode_record = self._decode_compact_avl_data if self._compact else self._decode_avl_data
+        position = offset + 2
+        data = []
+        for _ in range(data_count):
+            avl_data, position = decode_record(codec_id, layout, position)
+            data.append(avl_data)
+
+        return AvlDataCollection.create(codec_id, data_count, data)
+
+    def _decode_avl_data(self, codec_id: int, layout: _CodecLayout, position: int) -> Tuple[AvlData, int]:
+        """Decode single AVL record; returns the record and the position after it."""
+        buffer = self._buffer
+        header = layout.record_header
+        fields = header.unpack_from(buffer, position)
+        position += header.size
+
+        timestamp, priority_value, longitude, latitude, altitude, angle, satellites, speed = fields[:8]
+        if layout.has_origin_type:
+            event_id, origin_type, properties_count, count = fields[8:]
+        else:
+            event_id, properties_count, count = fields[8:]
+            origin_type = None
+
+        priority = _PRIORITY_NAMES.get(priority_value)
+        if priority is None:
+            raise ValueError(f"{priority_value} is not a valid AvlDataPriority")
+
+        properties: List[IoProperty] = []
+        for width_index in range(len(_VALUE_FORMATS)):
+            block = _get_block_struct(codec_id, False, width_index, count)
+            values = block.unpack_from(buffer, position)
+            position += block.size
+            if len(values) & 1:
+                # Odd length: the last value is the count of the next block
+                count = values[-1]
+                values = values[:-1]
+            if values:
+                properties.extend(map(IoProperty, values[0::2], values[1::2]))
+
+        if layout.has_variable_io:
+            for _ in range(count):
+                property_id, element_length = _NX_HEADER.unpack_from(buffer, position)
+                position += _NX_HEADER.size
+                value = bytes(buffer[position:position + max(element_length, 0)])
+                position += len(value)
+                properties.append(IoProperty.create_array(property_id, value))
+
+        gps_element = GpsElement(x=longitude, y=latitude, altitude=altitude, angle=angle,
+                                 satellites=satellites, speed=speed)
+        io_element = IoElement(event_id, properties_count, properties, origin_type)
+        date_time = AVL_EPOCH + timedelta(milliseconds=timestamp)
+        return AvlData(priority, date_time, gps_element, io_element), position
+
+    def _decode_compact_avl_data(self, codec_id: int, layout: _CodecLayout,
+                                 position: int) -> Tuple[CompactAvlData, int]:
+        """Decode single AVL record into CompactAvlData; returns the record and the position after it."""
+        buffer = self._buffer
+        header = layout.record_header
+        fields = header.unpack_from(buffer, position)
+        position += header.size
+
+        timestamp, priority_value, longitude, latitude, altitude, angle, satellites, speed = fields[:8]
+        if layout.has_origin_type:
+            event_id, origin_type, properties_count, count = fields[8:]
+        else:
+            event_id, properties_count, count = fields[8:]
+            origin_type = None
+
+        priority = _PRIORITY_NAMES.get(priority_value)
+        if priority is None:
+            raise ValueError(f"{priority_value} is not a valid AvlDataPriority")
+
+        ids = array('H')
+        values = array('q')
+        for width_index in range(len(_VALUE_FORMATS)):
+            block = _get_block_struct(codec_id, True, width_index, count)
+            block_values = block.unpack_from(buffer, position)
+            position += block.size
+            if len(block_values) & 1:
+                count = block_values[-1]
+                block_values = block_values[:-1]
+            if block_values:
+                ids.extend(block_values[0::2])
+                values.extend(block_values[1::2])
+
+        array_properties = None
+        if layout.has_variable_io and count:
+            array_properties = []
+            for _ in range(count):
+                property_id, element_length = _NX_HEADER_UNSIGNED.unpack_from(buffer, position)
+                position += _NX_HEADER_UNSIGNED.size
+                value = bytes(buffer[position:position + element_length])
+                position += len(value)
+                array_properties.append((property_id, value))
+
+        gps_element = CompactGpsElement(longitude, latitude, altitude, angle, satellites, speed)
+        io_element = CompactIoElement(event_id, properties_count, ids, values, array_properties, origin_type)
+        date_time = AVL_EPOCH + timedelta(milliseconds=timestamp)
+        return CompactAvlData(priority, date_time, gps_element, io_element), position
@@ -23,6 +23,40 @@ OPERATOR_CODE_PROPERTY_ID = 202
 ALARM_PROPERTY_ID = 204
 
 
+class _PriorityValue:
+    """
+    Priority value that is not defined in GhAvlDataPriority.
+    
+    In C#, casting an integer to an enum works even if the value is not defined and
+    ToString() returns the integer; this mimics that for comparison and .name.
+    Defined once at module level (not per decoded record).
+    """
+    __slots__ = ('value',)
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def __eq__(self, other):
+        if isinstance(other, GhAvlDataPriority):
+            return self.value == other.value
+        return self.value == other
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    def __hash__(self):
+        return hash(self.value)
+    
+    def __str__(self):
+        # Match C# ToString() behavior - returns integer as string if not a defined enum value
+        return str(self.value)
+    
+    @property
+    def name(self):
+        # For AvlData.create() which uses priority.name
+        return str(self.value)
+
+
 class GpsElementExt:
     """Extended GPS element with IO properties."""
     def __init__(self, gps: GpsElement, io: IoElement):
@@ -69,23 +103,6 @@ class Codec7:
         except ValueError:
             # Value doesn't exist in enum (e.g., 2 when only 1 and 10 are defined)
             # In C#, this would still work - enum variable holds the integer value
-            # Create a custom class that behaves like enum for comparison and ToString()
-            class _PriorityValue:
-                def __init__(self, value):
-                    self.value = value
-                def __eq__(self, other):
-                    if isinstance(other, GhAvlDataPriority):
-                        return self.value == other.value
-                    return self.value == other
-                def __ne__(self, other):
-                    return not self.__eq__(other)
-                def __str__(self):
-                    # Match C# ToString() behavior - returns integer as string if not a defined enum value
-                    return str(self.value)
-                @property
-                def name(self):
-                    # For AvlData.create() which uses priority.name
-                    return str(self.value)
             priority = _PriorityValue(priority_value)
         
         # Extract timestamp (remaining 30 bits)
@@ -1,25 +1,96 @@
 """CRC-16 calculation for packet validation."""
+import struct
+from typing import List, Union
+
+# Buffers at least this long are processed 8 bytes per step (slicing-by-8);
+# shorter buffers use the single-table loop, which has less setup overhead.
+SLICE8_MIN_LENGTH = 64
+
+_unpack_8_bytes = struct.Struct('8B').iter_unpack
 
 
 class CRC:
-    """CRC-16 calculator with configurable polynomial."""
-    
+    """CRC-16 calculator with configurable polynomial.
+
+    Uses a precomputed 256-entry lookup table (reflected, LSB-first) instead of
+    shifting bit by bit, plus seven derived tables for the slicing-by-8 path
+    used on larger buffers (e.g. Codec 8E packets with many records).
+    """
+
     DEFAULT = None  # Will be initialized below
-    
+
     def __init__(self, polynom: int):
-        """Initialize CRC with polynomial."""
+        """Initialize CRC with polynomial and build its lookup tables."""
         self._polynom = polynom & 0xFFFF
-    
-    def calc_crc16(self, buffer: bytes) -> int:
+        self._table = self._build_table(self._polynom)
+        self._slice_tables = self._build_slice_tables(self._table)
+
+    @staticmethod
+    def _build_table(polynom: int) -> List[int]:
+        """Build the 256-entry table: CRC of each single byte value with preset 0."""
+        table = []
+        for value in range(256):
+            crc = value
+            for _ in range(8):
+                if crc & 0x0001:
+                    crc = (crc >> 1) ^ polynom
+                else:
+                    crc >>= 1
+            table.append(crc)
+        return table
+
+    @staticmethod
+    def _build_slice_tables(table: List[int]) -> List[List[int]]:
+        """
+        Build the tables for slicing-by-8.
+
+        Table k gives the CRC contribution of a byte followed by k zero bytes,
+        so eight input bytes can be folded in with eight independent lookups.
+        """
+        tables = [table]
+        for _ in range(7):
+            previous = tables[-1]
+            tables.append([(crc >> 8) ^ table[crc & 0xFF] for crc in previous])
+        return tables
+
+    def calc_crc16(self, buffer: Union[bytes, bytearray, memoryview]) -> int:
         """Calculate CRC-16 for the entire buffer."""
-        return self._calc_crc16(buffer, 0, len(buffer), self._polynom, 0)
-    
+        if len(buffer) >= SLICE8_MIN_LENGTH:
+            return self._calc_crc16_slice8(buffer, 0)
+        return self._calc_crc16_table(buffer, 0)
+
+    def _calc_crc16_table(self, buffer: Union[bytes, bytearray, memoryview], preset: int) -> int:
+        """Calculate CRC-16 one byte per step using the lookup table."""
+        table = self._table
+        crc = preset & 0xFFFF
+        for data in buffer:
+            crc = (crc >> 8) ^ table[(crc ^ data) & 0xFF]
+        return crc
+
+    def _calc_crc16_slice8(self, buffer: Union[bytes, bytearray, memoryview], preset: int) -> int:
+        """Calculate CRC-16 eight bytes per step (slicing-by-8) over a memoryview."""
+        t0, t1, t2, t3, t4, t5, t6, t7 = self._slice_tables
+        view = memoryview(buffer)
+        aligned = len(view) - (len(view) & 7)
+
+        crc = preset & 0xFFFF
+        for b0, b1, b2, b3, b4, b5, b6, b7 in _unpack_8_bytes(view[:aligned]):
+            crc = (
+                t7[(crc ^ b0) & 0xFF] ^ t6[(crc >> 8) ^ b1] ^
+                t5[b2] ^ t4[b3] ^ t3[b4] ^ t2[b5] ^ t1[b6] ^ t0[b7]
+            )
+
+        # Remaining 0-7 bytes
+        for data in view[aligned:]:
+            crc = (crc >> 8) ^ t0[(crc ^ data) & 0xFF]
+        return crc
+
     @staticmethod
     def _calc_crc16(buffer: bytes, offset: int, buf_len: int, polynom: int, preset: int) -> int:
-        """Calculate CRC-16 with specified parameters."""
+        """Calculate CRC-16 with specified parameters (bitwise reference implementation)."""
         preset &= 0xFFFF
         polynom &= 0xFFFF
-        
+
         crc = preset
         for i in range(buf_len):
             data = buffer[(i + offset) % len(buffer)] & 0xFF
@@ -29,10 +100,9 @@ class CRC:
                     crc = (crc >> 1) ^ polynom
                 else:
                     crc = crc >> 1
-        
+
         return crc & 0xFFFF
 
 
 # Initialize default CRC instance
 CRC.DEFAULT = CRC(0xA001)
-
@@ -1,7 +1,8 @@
 """AVL data collection model."""
 from dataclasses import dataclass
-from typing import List
+from typing import List, Union
 from .avl_data import AvlData
+from .compact_avl_data import CompactAvlData
 
 
 @dataclass
@@ -9,10 +10,10 @@ class AvlDataCollection:
     """Collection of AVL data."""
     codec_id: int
     data_count: int
-    data: List[AvlData]
+    data: List[Union[AvlData, CompactAvlData]]
     
     @staticmethod
-    def create(codec_id: int, data_count: int, data: List[AvlData]) -> 'AvlDataCollection':
+    def create(codec_id: int, data_count: int, data: List[Union[AvlData, CompactAvlData]]) -> 'AvlDataCollection':
         """Create AVL data collection."""
         return AvlDataCollection(
             codec_id=codec_id,
@@ -0,0 +1,83 @@
+"""Compact AVL record model.
+
+Memory-lean alternative to the AvlData / GpsElement / IoElement / IoProperty object
+graph: __slots__ classes, with integer IO properties stored as parallel
+array('H') ids and array('q') values instead of one IoProperty object per IO.
+Variable-length (Codec 8E NX) properties are kept as (id, bytes) pairs.
+"""
+from array import array
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple, Union
+
+from .avl_data import AvlData
+from .gps_element import GpsElement
+from .io_element import IoElement
+from .io_property import IoProperty
+
+
+class CompactGpsElement:
+    """GPS element containing coordinates and related data."""
+    __slots__ = ('x', 'y', 'altitude', 'angle', 'satellites', 'speed')
+
+    def __init__(self, x: float, y: float, altitude: int, angle: int, satellites: int, speed: int):
+        self.x = x  # Longitude
+        self.y = y  # Latitude
+        self.altitude = altitude
+        self.angle = angle
+        self.satellites = satellites
+        self.speed = speed
+
+    def to_gps_element(self) -> GpsElement:
+        """Convert to the dataclass GpsElement."""
+        return GpsElement(x=self.x, y=self.y, altitude=self.altitude, angle=self.angle,
+                          satellites=self.satellites, speed=self.speed)
+
+
+class CompactIoElement:
+    """IO element with array-backed properties."""
+    __slots__ = ('event_id', 'properties_count', 'origin_type', 'ids', 'values', 'array_properties')
+
+    def __init__(self, event_id: int, properties_count: int, ids: array, values: array,
+                 array_properties: Optional[List[Tuple[int, bytes]]] = None,
+                 origin_type: Optional[int] = None):
+        self.event_id = event_id
+        self.properties_count = properties_count
+        self.ids = ids        # array('H')
+        self.values = values  # array('q'), parallel to ids
+        self.array_properties = array_properties
+        self.origin_type = origin_type
+
+    def iter_raw(self) -> Iterator[Tuple[int, Union[int, bytes]]]:
+        """Iterate (io_id, value) pairs in wire order; NX values are bytes."""
+        yield from zip(self.ids, self.values)
+        if self.array_properties:
+            yield from self.array_properties
+
+    @property
+    def properties(self) -> List[IoProperty]:
+        """Materialize IoProperty objects (compatibility/debugging - not for the hot path)."""
+        result = [IoProperty(io_id, value) for io_id, value in zip(self.ids, self.values)]
+        if self.array_properties:
+            result.extend(IoProperty.create_array(io_id, value) for io_id, value in self.array_properties)
+        return result
+
+    def to_io_element(self) -> IoElement:
+        """Convert to the dataclass IoElement."""
+        return IoElement.create(self.event_id, self.properties_count, self.properties, self.origin_type)
+
+
+class CompactAvlData:
+    """AVL data containing priority, timestamp, GPS and IO elements."""
+    __slots__ = ('priority', 'date_time', 'gps_element', 'io_element')
+
+    def __init__(self, priority: str, date_time: datetime,
+                 gps_element: CompactGpsElement, io_element: CompactIoElement):
+        self.priority = priority
+        self.date_time = date_time
+        self.gps_element = gps_element
+        self.io_element = io_element
+
+    def to_avl_data(self) -> AvlData:
+        """Convert to the dataclass AvlData object graph."""
+        return AvlData.create(self.priority, self.date_time,
+                              self.gps_element.to_gps_element(), self.io_element.to_io_element())
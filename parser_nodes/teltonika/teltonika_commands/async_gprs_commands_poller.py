@@ -13,6 +13,7 @@ from config import Config, ServerParams
 from teltonika_database.sqlalchemy_base import get_session, init_sqlalchemy
 from teltonika_commands.out_command import OutCommand, GPRSCommandsBuffer
 from teltonika_infrastructure.async_ip_table import AsyncGlobalIPTable
+from teltonika_infrastructure.worker_registry import get_worker_registry, get_worker_id
 
 logger = logging.getLogger(__name__)
 
@@ -96,6 +97,12 @@ class AsyncGPRSCommandsPoller:
             ip_table = await AsyncGlobalIPTable.get_instance()
             connected_imeis = await ip_table.get_all_imeis()
             
+            # Multi-worker mode: only claim commands for devices whose current connection
+            # is held by THIS worker (a reconnected device may have moved to another worker)
+            registry = get_worker_registry()
+            if registry and connected_imeis:
+                connected_imeis = registry.filter_owned(connected_imeis, get_worker_id())
+            
             if not connected_imeis:
                 # No devices connected to this parser, skip polling
                 return []
@@ -9,6 +9,7 @@ from typing import Optional, Dict, List
 from dataclasses import dataclass
 
 from teltonika_database.unit_io_mapping_loader import UnitIOMapping
+from teltonika_database.io_mapping_plan import IoMappingPlan, compile_mapping_plan
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +27,7 @@ class CSVUnitIOMappingLoader:
         self.mapping_file = mapping_file
         self._all_mappings: Dict[str, Dict[int, List[UnitIOMapping]]] = {}  # imei -> io_id -> list of mappings
         self._mappings_cache: Dict[str, Dict[int, List[UnitIOMapping]]] = {}  # imei -> io_id -> list of mappings (cached)
+        self._mapping_plans: Dict[str, IoMappingPlan] = {}  # imei -> compiled plan
         self._file_loaded = False
     
     def _load_all_mappings_from_csv(self):
@@ -219,6 +221,7 @@ class CSVUnitIOMappingLoader:
             # Get mappings for this IMEI from loaded data
             if imei in self._all_mappings:
                 self._mappings_cache[imei] = self._all_mappings[imei].copy()
+                self._mapping_plans[imei] = compile_mapping_plan(self._mappings_cache[imei])
                 total_mappings = sum(len(v) for v in self._mappings_cache[imei].values())
                 logger.info(f"Loaded {total_mappings} Unit IO mappings from CSV for IMEI {imei}")
                 return True
@@ -226,6 +229,7 @@ class CSVUnitIOMappingLoader:
                 logger.debug(f"No Unit IO mappings found in CSV for IMEI {imei}")
                 # Cache empty dict to avoid repeated lookups
                 self._mappings_cache[imei] = {}
+                self._mapping_plans[imei] = IoMappingPlan.EMPTY
                 return True
             
         except Exception as e:
@@ -256,6 +260,22 @@ class CSVUnitIOMappingLoader:
         mappings_by_io = self._mappings_cache.get(imei, {})
         return mappings_by_io.get(io_id, [])
     
+    def get_mapping_plan(self, imei: str) -> Optional[IoMappingPlan]:
+        """
+        Get the compiled mapping plan for a Unit IMEI.
+        Mimics database loader interface.
+        
+        Args:
+            imei: Unit IMEI string (must be in cache)
+            
+        Returns:
+            IoMappingPlan, or None if mappings for the Unit IMEI are not loaded
+        """
+        plan = self._mapping_plans.get(imei)
+        if plan is None:
+            logger.warning(f"Unit IO mappings for Unit IMEI {imei} not loaded. Call load_mappings_for_imei() first.")
+        return plan
+    
     def has_mappings_for_imei(self, imei: str) -> bool:
         """
         Check if Unit IMEI has any Unit IO mappings loaded.
@@ -283,7 +303,9 @@ class CSVUnitIOMappingLoader:
         if imei:
             if imei in self._mappings_cache:
                 del self._mappings_cache[imei]
+                self._mapping_plans.pop(imei, None)
                 logger.debug(f"Cleared Unit IO mapping cache for Unit IMEI {imei} (CSV)")
         else:
             self._mappings_cache.clear()
+            self._mapping_plans.clear()
             logger.debug("Cleared all Unit IO mapping caches (CSV)")
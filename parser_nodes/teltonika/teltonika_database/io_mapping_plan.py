@@ -0,0 +1,231 @@
+"""
+Precompiled Unit IO mapping plans for Teltonika Gateway
+
+The loaders keep each IMEI's mappings as io_id -> List[UnitIOMapping]. Applying those
+directly means re-checking targets, multipliers, decimal places, temperature error codes
+and alarm time windows for every IO of every record.
+
+An IoMappingPlan is compiled once when an IMEI's mappings are (re)loaded: an immutable
+io_id-indexed dispatch table whose entries already hold the target columns, multipliers,
+format specs, status texts, alarm flags and parsed time windows. The packet parser applies
+it to a record in a single pass over the IO values.
+"""
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+# Unit IO mapping target values
+TARGET_COLUMN = 0
+TARGET_STATUS = 1
+TARGET_BOTH = 2
+TARGET_JSONB = 3
+
+IO_TYPE_DIGITAL = 2
+
+
+def calculate_decimal_places(multiplier: float) -> int:
+    """
+    Calculate number of decimal places needed based on multiplier.
+    Examples:
+    - multiplier 1.0 -> 0 decimal places
+    - multiplier 0.1 -> 1 decimal place
+    - multiplier 0.01 -> 2 decimal places
+    - multiplier 0.001 -> 3 decimal places
+    """
+    if not multiplier:
+        return 0
+
+    # Convert to string to count decimal places
+    multiplier_str = f"{multiplier:.10f}".rstrip('0').rstrip('.')
+    if '.' in multiplier_str:
+        return len(multiplier_str.split('.')[1])
+    return 0
+
+
+def check_temperature_error_code(raw_value: float, sensor_type: str) -> Optional[str]:
+    """Check if raw temperature value is an error code and return error message (following original logic)."""
+    if sensor_type == 'dallas':
+        # Dallas Temperature error codes
+        if raw_value == 850 or raw_value == 5000:
+            return "Sensor not ready"
+        elif raw_value == 2000:
+            return "Value read error"
+        elif raw_value == 3000:
+            return "Not connected"
+        elif raw_value == 4000:
+            return "ID failed"
+    elif sensor_type == 'ble':
+        # BLE Temperature error codes
+        if raw_value == 4000:
+            return "Abnormal sensor state"
+        elif raw_value == 3000:
+            return "Sensor not found"
+        elif raw_value == 2000:
+            return "Failed sensor data parsing"
+
+    return None
+
+
+def parse_time_window(start_time_str: str, end_time_str: str) -> Optional[Tuple[int, int]]:
+    """
+    Parse an alarm time window into seconds of day.
+
+    Args:
+        start_time_str: Start time in HH:MM:SS format (e.g., "3:00:00")
+        end_time_str: End time in HH:MM:SS format (e.g., "6:00:00")
+
+    Returns:
+        (start_seconds, end_seconds), or None if the window cannot be parsed
+    """
+    def parse_time(time_str: str) -> int:
+        parts = time_str.split(':')
+        if len(parts) == 3:
+            return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+        return 0
+
+    try:
+        return parse_time(start_time_str), parse_time(end_time_str)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class ColumnAction(NamedTuple):
+    """Write a formatted IO value into a trackdata column (target 0 or 2)."""
+    column_name: str
+    multiplier: Optional[float]        # None when no multiplier applies (missing, 0 or 1.0)
+    format_spec: Optional[str]         # e.g. '.2f'; None formats as integer
+    temperature_sensor: Optional[str]  # 'dallas'/'ble' for analog temperature IOs (error code check)
+
+    def format(self, raw_value: float) -> str:
+        """
+        Format IO value based on IO type and multiplier.
+
+        Returns:
+            Formatted string value, or empty string if error code detected or value is 0
+        """
+        calculated_value = raw_value * self.multiplier if self.multiplier is not None else raw_value
+        if calculated_value == 0:
+            return ""
+        if self.temperature_sensor and check_temperature_error_code(raw_value, self.temperature_sensor):
+            return ""  # Empty for error codes
+        if self.format_spec is None:
+            return str(int(calculated_value))
+        return format(calculated_value, self.format_spec)
+
+
+class JsonbAction(NamedTuple):
+    """Store an IO value (after multiplier) in dynamic_io (target 3)."""
+    key: str
+    multiplier: Optional[float]
+
+    def value(self, raw_value: float) -> float:
+        return raw_value * self.multiplier if self.multiplier is not None else raw_value
+
+
+class StatusAction(NamedTuple):
+    """Status text and alarm settings for a digital IO value (target 1 or 2)."""
+    status: str
+    is_alarm: bool
+    is_sms: bool
+    is_email: bool
+    is_call: bool
+    window: Optional[Tuple[int, int]]  # (start, end) seconds of day; None = unparseable
+
+    def in_window(self, gps_datetime: datetime) -> bool:
+        """Check if GPS datetime time component (UTC) is within the alarm time window."""
+        if self.window is None:
+            return False
+        start_total_sec, end_total_sec = self.window
+        gps_total_sec = gps_datetime.hour * 3600 + gps_datetime.minute * 60 + gps_datetime.second
+        if start_total_sec > end_total_sec:
+            # Window spans midnight (e.g., 22:00:00 to 6:00:00)
+            return gps_total_sec >= start_total_sec or gps_total_sec <= end_total_sec
+        return start_total_sec <= gps_total_sec <= end_total_sec
+
+
+class IoPlanEntry(NamedTuple):
+    """Everything to do for one IO ID."""
+    columns: Tuple[ColumnAction, ...]
+    jsonb: Tuple[JsonbAction, ...]
+    status_by_value: Mapping[int, StatusAction]  # int(raw value) -> first matching status mapping
+
+
+class IoMappingPlan:
+    """Immutable io_id -> IoPlanEntry dispatch table for one IMEI."""
+
+    __slots__ = ('entries', 'has_mappings', 'mapping_count')
+
+    EMPTY: 'IoMappingPlan' = None  # Will be initialized below
+
+    def __init__(self, entries: Dict[int, IoPlanEntry], mapping_count: int):
+        self.entries: Mapping[int, IoPlanEntry] = MappingProxyType(entries)
+        self.mapping_count = mapping_count
+        self.has_mappings = mapping_count > 0
+
+    def __repr__(self) -> str:
+        return f"IoMappingPlan(io_ids={len(self.entries)}, mappings={self.mapping_count})"
+
+
+def _compile_column_action(mapping) -> ColumnAction:
+    """Precompute multiplier and format spec (matches the per-record formatting rules)."""
+    io_multiplier = mapping.io_multiplier
+    multiplier = io_multiplier if (io_multiplier and io_multiplier != 1.0) else None
+
+    temperature_sensor = None
+    if mapping.io_type == IO_TYPE_DIGITAL:
+        # Digital IOs: integer UNLESS a multiplier was applied
+        format_spec = f".{calculate_decimal_places(multiplier)}f" if multiplier is not None else None
+    else:
+        # Analog IOs: precision follows the multiplier (e.g. 0.001 -> 3 decimals)
+        decimal_places = calculate_decimal_places(io_multiplier)
+        format_spec = f".{decimal_places}f" if decimal_places else None
+        io_name_lower = (mapping.io_name or '').lower()
+        if 'temperature' in io_name_lower:
+            temperature_sensor = 'dallas' if 'dallas' in io_name_lower else 'ble'
+
+    return ColumnAction(mapping.column_name, multiplier, format_spec, temperature_sensor)
+
+
+def compile_mapping_plan(mappings_by_io: Dict[int, List]) -> IoMappingPlan:
+    """
+    Compile io_id -> List[UnitIOMapping] into an IoMappingPlan.
+
+    Mapping order is preserved: columns/JSONB keys written later still win, and the first
+    status mapping matching a value still determines the status.
+    """
+    entries: Dict[int, IoPlanEntry] = {}
+    mapping_count = 0
+
+    for io_id, mappings in mappings_by_io.items():
+        if not mappings:
+            continue
+        mapping_count += len(mappings)
+        columns = []
+        jsonb = []
+        status_by_value: Dict[int, StatusAction] = {}
+
+        for mapping in mappings:
+            target = mapping.target
+            if target in (TARGET_COLUMN, TARGET_BOTH) and mapping.column_name:
+                columns.append(_compile_column_action(mapping))
+            if target == TARGET_JSONB and mapping.column_name:
+                io_multiplier = mapping.io_multiplier
+                multiplier = io_multiplier if (io_multiplier and io_multiplier != 1.0) else None
+                jsonb.append(JsonbAction(mapping.column_name, multiplier))
+            if (target in (TARGET_STATUS, TARGET_BOTH) and mapping.io_type == IO_TYPE_DIGITAL
+                    and mapping.value is not None):
+                status_by_value.setdefault(int(mapping.value), StatusAction(
+                    status=f"{mapping.io_name} {mapping.value_name}",
+                    is_alarm=bool(mapping.is_alarm),
+                    is_sms=bool(mapping.is_sms),
+                    is_email=bool(mapping.is_email),
+                    is_call=bool(mapping.is_call),
+                    window=parse_time_window(mapping.start_time, mapping.end_time),
+                ))
+
+        entries[io_id] = IoPlanEntry(tuple(columns), tuple(jsonb), MappingProxyType(status_by_value))
+
+    return IoMappingPlan(entries, mapping_count)
+
+
+IoMappingPlan.EMPTY = IoMappingPlan({}, 0)
@@ -0,0 +1,280 @@
+"""
+In-process nearest location reference index for Teltonika Gateway
+
+Every valid AVL record looks up its nearest location_reference. Answering that with a PostGIS
+KNN query costs one database round trip per GPS point across the whole fleet.
+
+LocationReferenceIndex keeps the references in memory, bucketed by a uniform lat/lon grid
+(cell_size_deg). A lookup scans the query cell and then rings of neighbouring cells until
+no unscanned cell can hold a closer point. It returns the same row the PostGIS query picks:
+  nearest:  smallest planar distance in lon/lat degrees (what geom <-> point orders by)
+  distance: great-circle metres on the ST_DistanceSphere sphere (radius 6371008 m)
+  limit:    max_distance_km applies to that distance; farther nearest points give None
+Repeated points (parked vehicles) are answered from a small LRU.
+
+The index is loaded in the background at startup and refreshed by id watermark
+(location_reference has no updated column): new ids are merged every
+refresh_interval_seconds, and a full reload every full_reload_minutes picks up edits and
+deletes. Until the first load succeeds, find_nearest_location_reference uses PostGIS.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from config import ServerParams
+
+logger = logging.getLogger(__name__)
+
+# ST_DistanceSphere default radius (PostGIS 3)
+EARTH_RADIUS_M = 6371008.0
+
+_LOAD_SQL = text("""
+    SELECT id, ST_X(geom) AS longitude, ST_Y(geom) AS latitude, reference
+    FROM location_reference
+    WHERE geom IS NOT NULL AND id > :after_id
+    ORDER BY id
+""")
+
+# (longitude, latitude, id) per grid cell
+Cell = List[Tuple[float, float, int]]
+
+
+def distance_sphere(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in metres (haversine, same sphere as ST_DistanceSphere)."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _search_radius_deg(latitude: float, max_distance_m: float) -> float:
+    """Largest |dlat| or |dlon| (degrees) of any point within max_distance_m, or inf."""
+    delta = max_distance_m / EARTH_RADIUS_M
+    if delta >= math.pi / 2:
+        return math.inf
+    cos_lat = math.cos(math.radians(latitude))
+    if math.sin(delta) >= cos_lat:
+        return math.inf  # cap contains a pole: any longitude
+    return math.degrees(max(delta, math.asin(math.sin(delta) / cos_lat)))
+
+
+class LocationReferenceIndex:
+    """Grid-bucketed location_reference points with nearest-neighbour lookup."""
+
+    def __init__(self):
+        self._cell_deg = ServerParams.get_float('location_reference.cell_size_deg', 0.05)
+        self._lru_size = ServerParams.get_int('location_reference.lru_size', 10000)
+        self._refresh_seconds = ServerParams.get_float('location_reference.refresh_interval_seconds', 60)
+        self._full_reload_seconds = ServerParams.get_float('location_reference.full_reload_minutes', 60) * 60
+        self._cells: Dict[Tuple[int, int], Cell] = {}
+        self._points: Dict[int, Tuple[float, float, str]] = {}  # id -> (longitude, latitude, reference)
+        self._bounds: Optional[Tuple[int, int, int, int]] = None  # min/max cell row, min/max cell column
+        self._watermark = 0
+        self._loaded_at: Optional[float] = None
+        self._lru: OrderedDict = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._lookups = 0
+        self._lru_hits = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._loaded_at is not None
+
+    def _cell_of(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self._cell_deg), math.floor(longitude / self._cell_deg)
+
+    def _add(self, cells: Dict[Tuple[int, int], Cell], points: Dict[int, Tuple[float, float, str]],
+             ref_id: int, longitude: float, latitude: float, reference: str) -> None:
+        points[ref_id] = (longitude, latitude, reference)
+        cells.setdefault(self._cell_of(latitude, longitude), []).append((longitude, latitude, ref_id))
+
+    @staticmethod
+    def _bounds_of(cells: Dict[Tuple[int, int], Cell]) -> Optional[Tuple[int, int, int, int]]:
+        if not cells:
+            return None
+        rows = [key[0] for key in cells]
+        cols = [key[1] for key in cells]
+        return min(rows), max(rows), min(cols), max(cols)
+
+    async def _fetch(self, after_id: int) -> List[Any]:
+        from teltonika_database.sqlalchemy_base import get_session
+
+        async with get_session() as session:
+            result = await session.execute(_LOAD_SQL, {"after_id": after_id})
+            return result.fetchall()
+
+    async def load(self) -> None:
+        """Full reload: build new structures off to the side, then swap them in."""
+        started = time.monotonic()
+        rows = await self._fetch(0)
+        cells: Dict[Tuple[int, int], Cell] = {}
+        points: Dict[int, Tuple[float, float, str]] = {}
+        for row in rows:
+            self._add(cells, points, row.id, row.longitude, row.latitude, row.reference)
+        self._cells = cells
+        self._points = points
+        self._bounds = self._bounds_of(cells)
+        self._watermark = max(points) if points else 0
+        self._lru.clear()
+        self._loaded_at = time.monotonic()
+        logger.info(
+            f"Location reference index loaded: {len(points)} references in {len(cells)} cells "
+            f"({self._loaded_at - started:.2f}s)"
+        )
+
+    async def refresh(self) -> int:
+        """Merge references with id above the watermark; returns the number added."""
+        rows = await self._fetch(self._watermark)
+        for row in rows:
+            self._add(self._cells, self._points, row.id, row.longitude, row.latitude, row.reference)
+        if rows:
+            self._watermark = max(self._watermark, rows[-1].id)
+            self._bounds = self._bounds_of(self._cells)
+            self._lru.clear()
+            logger.debug(f"Location reference index: merged {len(rows)} new references (watermark={self._watermark})")
+        return len(rows)
+
+    def nearest(self, latitude: float, longitude: float,
+                max_distance_km: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Same result shape as find_nearest_location_reference (distance in metres)."""
+        self._lookups += 1
+        key = (round(latitude, 6), round(longitude, 6), max_distance_km)
+        lru = self._lru
+        if key in lru:
+            lru.move_to_end(key)
+            self._lru_hits += 1
+            return lru[key]
+        max_distance_m = max_distance_km * 1000 if max_distance_km else None
+        result = self._search(latitude, longitude, max_distance_m)
+        lru[key] = result
+        if len(lru) > self._lru_size:
+            lru.popitem(last=False)
+        return result
+
+    def _search(self, latitude: float, longitude: float,
+                max_distance_m: Optional[float]) -> Optional[Dict[str, Any]]:
+        if self._bounds is None:
+            return None
+        cells = self._cells
+        cell_deg = self._cell_deg
+        radius = _search_radius_deg(latitude, max_distance_m) if max_distance_m else math.inf
+        row0, col0 = self._cell_of(latitude, longitude)
+        min_row, max_row, min_col, max_col = self._bounds
+        # Rings beyond this many cells cover nothing (outside the occupied bounds)
+        last_ring = max(row0 - min_row, max_row - row0, col0 - min_col, max_col - col0, 0)
+
+        best_d2 = math.inf
+        best_id = None
+        ring = 0
+        while ring <= last_ring:
+            if 8 * ring > len(cells):
+                # Sparse grid: scanning every occupied cell is cheaper than walking empty rings
+                for cell in cells.values():
+                    for lon, lat, ref_id in cell:
+                        d2 = (lon - longitude) ** 2 + (lat - latitude) ** 2
+                        if d2 < best_d2 or (d2 == best_d2 and ref_id < best_id):
+                            best_d2, best_id = d2, ref_id
+                break
+            if ring == 0:
+                keys = ((row0, col0),)
+            else:
+                top, bottom = row0 - ring, row0 + ring
+                keys = [(top, col) for col in range(col0 - ring, col0 + ring + 1)]
+                keys += [(bottom, col) for col in range(col0 - ring, col0 + ring + 1)]
+                keys += [(row, col0 - ring) for row in range(top + 1, bottom)]
+                keys += [(row, col0 + ring) for row in range(top + 1, bottom)]
+            for cell_key in keys:
+                cell = cells.get(cell_key)
+                if cell is None:
+                    continue
+                for lon, lat, ref_id in cell:
+                    d2 = (lon - longitude) ** 2 + (lat - latitude) ** 2
+                    if d2 < best_d2 or (d2 == best_d2 and ref_id < best_id):
+                        best_d2, best_id = d2, ref_id
+            # Every unscanned cell is at least ring * cell_deg away in latitude or longitude
+            reach = ring * cell_deg
+            if best_d2 <= reach * reach or reach > radius:
+                break
+            ring += 1
+
+        if best_id is None:
+            return None
+        lon, lat, reference = self._points[best_id]
+        distance = distance_sphere(latitude, longitude, lat, lon)
+        if max_distance_m and distance > max_distance_m:
+            return None
+        return {'reference_id': best_id, 'distance': distance, 'reference': reference}
+
+    def start(self) -> None:
+        """Start background load + refresh (no-op if already running)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _refresh_loop(self) -> None:
+        from teltonika_database.sqlalchemy_base import is_connection_error
+
+        while True:
+            try:
+                if not self.ready or time.monotonic() - self._loaded_at >= self._full_reload_seconds:
+                    await self.load()
+                else:
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if is_connection_error(e) or isinstance(e, RuntimeError):
+                    logger.debug(f"Location reference index refresh failed (database not available): {e}")
+                else:
+                    logger.warning(f"Location reference index refresh failed: {e}", exc_info=True)
+            await asyncio.sleep(self._refresh_seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'ready': self.ready,
+            'references': len(self._points),
+            'cells': len(self._cells),
+            'watermark': self._watermark,
+            'lru_entries': len(self._lru),
+            'lookups': self._lookups,
+            'lru_hits': self._lru_hits,
+        }
+
+
+_index: Optional[LocationReferenceIndex] = None
+
+
+def get_location_reference_index() -> Optional[LocationReferenceIndex]:
+    """Process-wide index, or None when location_reference.index_enabled is false."""
+    global _index
+    if not ServerParams.get_bool('location_reference.index_enabled', True):
+        return None
+    if _index is None:
+        _index = LocationReferenceIndex()
+    return _index
+
+
+def start_location_reference_index() -> None:
+    index = get_location_reference_index()
+    if index is not None:
+        index.start()
+
+
+async def stop_location_reference_index() -> None:
+    if _index is not None:
+        await _index.stop()
@@ -1,6 +1,7 @@
 """
-Location reference lookup service using PostGIS
+Location reference lookup service
 Finds nearest location reference and calculates distance for GPS coordinates
+(in-process index when loaded, PostGIS otherwise)
 """
 import logging
 from typing import Optional, Dict, Any
@@ -8,6 +9,7 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .sqlalchemy_base import get_session
+from .location_reference_index import get_location_reference_index
 
 logger = logging.getLogger(__name__)
 
@@ -15,15 +17,20 @@ logger = logging.getLogger(__name__)
 async def find_nearest_location_reference(
     latitude: float,
     longitude: float,
-    max_distance_km: Optional[float] = None 
+    max_distance_km: Optional[float] = None,
+    use_index: bool = True
 ) -> Optional[Dict[str, Any]]:
     """
-    Find the nearest location reference using PostGIS KNN operator.
+    Find the nearest location reference.
+    
+    Answered from the in-process LocationReferenceIndex once it is loaded; until then (or with
+    use_index=False) from PostGIS with the KNN operator.
     
     Args:
         latitude: GPS latitude coordinate
         longitude: GPS longitude coordinate
         max_distance_km: Optional maximum distance in kilometers (if None, finds nearest regardless of distance)
+        use_index: Use the in-process index when it is ready
         
     Returns:
         Dict with 'reference_id', 'distance' (in meters), and 'reference' (text), or None if not found
@@ -37,51 +44,36 @@ async def find_nearest_location_reference(
             logger.warning(f"Invalid GPS coordinates: lat={latitude}, lon={longitude}")
             return None
         
+        if use_index:
+            index = get_location_reference_index()
+            if index is not None and index.ready:
+                return index.nearest(latitude, longitude, max_distance_km)
+        
         async with get_session() as session:
             # Create point geometry for the GPS coordinate using parameters
             # PostGIS uses (longitude, latitude) order, SRID 4326 (WGS84)
             # Use ST_SetSRID(ST_MakePoint(:lon, :lat), 4326) with parameters to avoid SQL injection
             
-            # Build query with KNN operator (<->) for nearest neighbor search
-            if max_distance_km:
-                # Filter by distance first, then find nearest
-                max_distance_m = max_distance_km * 1000
-                query = text("""
-                    SELECT 
-                        id as reference_id,
-                        ST_DistanceSphere(geom, ST_SetSRID(ST_MakePoint(:longitude, :latitude), 4326)) as distance,
-                        reference
-                    FROM location_reference
-                    WHERE geom IS NOT NULL
-                        AND ST_DWithin(geom, ST_SetSRID(ST_MakePoint(:longitude, :latitude), 4326), :max_distance)
-                    ORDER BY geom <-> ST_SetSRID(ST_MakePoint(:longitude, :latitude), 4326)
-                    LIMIT 1
-                """)
-                result = await session.execute(query, {
-                    "longitude": longitude,
-                    "latitude": latitude,
-                    "max_distance": max_distance_m
-                })
-            else:
-                # Find nearest regardless of distance
-                query = text("""
-                    SELECT 
-                        id as reference_id,
-                        ST_DistanceSphere(geom, ST_SetSRID(ST_MakePoint(:longitude, :latitude), 4326)) as distance,
-                        reference
-                    FROM location_reference
-                    WHERE geom IS NOT NULL
-                    ORDER BY geom <-> ST_SetSRID(ST_MakePoint(:longitude, :latitude), 4326)
-                    LIMIT 1
-                """)
-                result = await session.execute(query, {
-                    "longitude": longitude,
-                    "latitude": latitude
-                })
+            # KNN operator (<->) for nearest neighbor search. The distance limit is checked on the
+            # nearest row's sphere distance: ST_DWithin on geometry(4326) would compare degrees.
+            query = text("""
+                SELECT 
+                    id as reference_id,
+                    ST_DistanceSphere(geom, ST_SetSRID(ST_MakePoint(:longitude, :latitude), 4326)) as distance,
+                    reference
+                FROM location_reference
+                WHERE geom IS NOT NULL
+                ORDER BY geom <-> ST_SetSRID(ST_MakePoint(:longitude, :latitude), 4326)
+                LIMIT 1
+            """)
+            result = await session.execute(query, {
+                "longitude": longitude,
+                "latitude": latitude
+            })
             
             row = result.fetchone()
             
-            if row:
+            if row and (not max_distance_km or row.distance <= max_distance_km * 1000):
                 return {
                     'reference_id': row.reference_id,
                     'distance': row.distance,  # Distance in meters
@@ -3,22 +3,46 @@ Database-based Unit IO Mapping Loader for Teltonika Gateway
 Loads Unit IO mappings from database, cached by Unit IMEI
 Implements Phase 1: Database change detection + TTL fallback
 Implements Phase 2: LRU cache with size limit + inactive device cleanup
+
+Change detection is event driven: tr_unit_io_mapping_change (schema.sql) sends
+pg_notify('io_mapping_change', 'unit_io_mapping:<imei>') for every change, and the loader keeps a
+LISTEN connection that bumps a per-IMEI generation counter. A cache entry remembers the generation
+it was loaded at, so a cache hit costs no query while notifications are being received; a changed
+IMEI is reloaded on its next packet. While LISTEN is not connected the loader falls back to the
+per-lookup MAX(updateddate) check (check_db_changes). Each time LISTEN (re)connects, mappings of all
+recently active IMEIs (laststatus) are bulk-loaded in one query, which also covers cold starts.
 """
 import logging
 import asyncio
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple
 from dataclasses import dataclass
 from collections import OrderedDict
 
 from teltonika_parser.orm_init import init_orm
 from teltonika_database.models import UnitIOMapping as UnitIOMappingModel
 from teltonika_database.sqlalchemy_base import get_session
-from sqlalchemy import select, func
-from config import ServerParams
+from teltonika_database.io_mapping_plan import IoMappingPlan, compile_mapping_plan
+from sqlalchemy import select, func, text
+from config import Config, ServerParams
 
 logger = logging.getLogger(__name__)
 
+# pg_notify channel of tr_unit_io_mapping_change (payload 'unit_io_mapping:<imei>')
+IO_MAPPING_CHANNEL = 'io_mapping_change'
+
+# Mappings of the most recently active IMEIs of this vendor (LEFT JOIN: IMEIs without mappings are cached too)
+_PRELOAD_SQL = text("""
+    SELECT a.imei AS active_imei, m.*
+    FROM (
+        SELECT imei FROM laststatus
+        WHERE vendor = :vendor AND updateddate >= :since
+        ORDER BY updateddate DESC
+        LIMIT :limit
+    ) a
+    LEFT JOIN unit_io_mapping m ON m.imei = a.imei
+""")
+
 
 @dataclass
 class UnitIOMapping:
@@ -46,6 +70,7 @@ class CacheMetadata:
     cached_at: datetime  # When mappings were loaded
     last_access: datetime  # Last time mappings were accessed
     max_updateddate: Optional[datetime]  # MAX(updateddate) from database at load time
+    generation: Tuple[int, int] = (0, 0)  # (global, IMEI) change generation when the load started
 
 
 class DatabaseUnitIOMappingLoader:
@@ -61,8 +86,15 @@ class DatabaseUnitIOMappingLoader:
         # LRU cache: OrderedDict maintains insertion order (most recent at end)
         self._mappings_cache: OrderedDict[str, Dict[int, List[UnitIOMapping]]] = OrderedDict()  # imei -> io_id -> list of mappings
         self._cache_metadata: Dict[str, CacheMetadata] = {}  # imei -> cache metadata
+        self._mapping_plans: Dict[str, IoMappingPlan] = {}  # imei -> compiled plan (rebuilt on reload)
         self._orm_initialized = False
         self._cleanup_task: Optional[asyncio.Task] = None
+        self._listener_task: Optional[asyncio.Task] = None
+        
+        # Change generations: bumped per IMEI by notifications, globally when notifications may have been missed
+        self._imei_generations: Dict[str, int] = {}
+        self._global_generation = 0
+        self._listening = False
         
         # Load configuration
         self._cache_ttl_minutes = ServerParams.get_int('unit_io_mapping.cache_ttl_minutes', 30)
@@ -70,10 +102,13 @@ class DatabaseUnitIOMappingLoader:
         self._inactive_cleanup_hours = ServerParams.get_int('unit_io_mapping.inactive_cleanup_hours', 24)
         self._check_db_changes = ServerParams.get_bool('unit_io_mapping.check_db_changes', True)
         self._cleanup_interval_minutes = ServerParams.get_int('unit_io_mapping.cleanup_interval_minutes', 60)
+        self._listen_notify = ServerParams.get_bool('unit_io_mapping.listen_notify', True)
+        self._preload_active_hours = ServerParams.get_int('unit_io_mapping.preload_active_hours', 24)
         
         logger.info(f"Parser Unit IO Mapping Cache Config: TTL={self._cache_ttl_minutes}min, MaxSize={self._cache_max_size}, "
                    f"InactiveCleanup={self._inactive_cleanup_hours}h, CheckDBChanges={self._check_db_changes}, "
-                   f"CleanupInterval={self._cleanup_interval_minutes}min")
+                   f"CleanupInterval={self._cleanup_interval_minutes}min, ListenNotify={self._listen_notify}, "
+                   f"PreloadActive={self._preload_active_hours}h")
     
     async def _ensure_orm_initialized(self):
         """Ensure SQLAlchemy is initialized. Parser service uses read-only connection to unit_io_mapping table. Will retry if database unavailable."""
@@ -83,8 +118,9 @@ class DatabaseUnitIOMappingLoader:
                 await init_orm(retry=True)  # Retry indefinitely
                 logger.debug("Using parser ORM (read-only) for Unit IO mapping loader")
                 self._orm_initialized = True
-                # Start cleanup task
+                # Start cleanup task and change listener (which also preloads active IMEIs)
                 self._start_cleanup_task()
+                self._start_change_listener()
             except Exception as e:
                 # Check if this is a connection error (pgbouncer cannot connect, etc.)
                 error_str = str(e).lower()
@@ -140,6 +176,135 @@ class DatabaseUnitIOMappingLoader:
             except Exception as e:
                 logger.error(f"Error in Unit IO mapping cache cleanup task: {e}", exc_info=True)
     
+    def _start_change_listener(self):
+        """Start the LISTEN task (or, with listen_notify off, just the one-off preload)."""
+        try:
+            loop = asyncio.get_event_loop()
+            if loop.is_running():
+                if self._listener_task is None or self._listener_task.done():
+                    work = self._listen_for_changes() if self._listen_notify else self._preload_active_imeis()
+                    self._listener_task = asyncio.create_task(work)
+        except RuntimeError:
+            # No event loop running, listener will be started when ORM is initialized
+            pass
+    
+    def _generation_of(self, imei: str) -> Tuple[int, int]:
+        return self._global_generation, self._imei_generations.get(imei, 0)
+    
+    def invalidate(self, imei: Optional[str] = None):
+        """
+        Mark cached mappings as changed; they are reloaded on next access.
+        
+        Args:
+            imei: Unit IMEI whose mappings changed. If None, all cached IMEIs are invalidated.
+        """
+        if imei:
+            self._imei_generations[imei] = self._imei_generations.get(imei, 0) + 1
+        else:
+            self._global_generation += 1
+    
+    def _on_change_notification(self, connection, pid, channel, payload):
+        """asyncpg listener: tr_unit_io_mapping_change payload is 'unit_io_mapping:<imei>'."""
+        table, _, key = (payload or '').partition(':')
+        if table == 'unit_io_mapping' and key:
+            logger.debug(f"Unit IO mappings changed for Unit IMEI {key}")
+            self.invalidate(key)
+        else:
+            # TRUNCATE or unknown payload
+            self.invalidate()
+    
+    def _on_listener_terminated(self, connection):
+        self._listening = False
+    
+    async def _connect_listener(self):
+        """Dedicated session connection for LISTEN (PgBouncer transaction pooling does not deliver NOTIFY)."""
+        import asyncpg
+        db = Config.get_database_config()
+        return await asyncpg.connect(
+            host=ServerParams.get('unit_io_mapping.listen_host') or db.get('host', 'localhost'),
+            port=ServerParams.get_int('unit_io_mapping.listen_port', 0) or int(db.get('port', 5432)),
+            database=db.get('name', 'tracking_db'),
+            user=db.get('user', 'postgres'),
+            password=db.get('password', ''),
+            command_timeout=None,  # No timeout for long-lived LISTEN connection
+            statement_cache_size=0,
+            server_settings={'application_name': 'megatechtrackers_parser_io_mapping_listen', 'timezone': 'UTC'},
+        )
+    
+    async def _listen_for_changes(self):
+        """LISTEN io_mapping_change; reconnects when the connection drops so notifications are not lost."""
+        reconnect_delay = 5.0
+        preloaded = False
+        while True:
+            conn = None
+            try:
+                conn = await self._connect_listener()
+                await conn.add_listener(IO_MAPPING_CHANNEL, self._on_change_notification)
+                conn.add_termination_listener(self._on_listener_terminated)
+                # Notifications may have been missed while not listening
+                self.invalidate()
+                self._listening = True
+                logger.info(f"LISTEN {IO_MAPPING_CHANNEL} active (Unit IO mapping cache hits need no query)")
+                preloaded = True
+                await self._preload_active_imeis()
+                reconnect_delay = 5.0
+                while not conn.is_closed():
+                    await asyncio.sleep(5.0)
+                logger.warning(f"LISTEN {IO_MAPPING_CHANNEL} connection closed; reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._listening = False
+                logger.warning(f"Unit IO mapping change listener error: {e}; reconnecting in {reconnect_delay:.0f}s")
+                if not preloaded:
+                    # Cold start without LISTEN: still preload once
+                    preloaded = True
+                    await self._preload_active_imeis()
+                await asyncio.sleep(reconnect_delay)
+                reconnect_delay = min(reconnect_delay * 2, 60.0)
+            finally:
+                self._listening = False
+                if conn is not None and not conn.is_closed():
+                    try:
+                        await conn.close()
+                    except Exception:
+                        pass
+    
+    async def _preload_active_imeis(self):
+        """Load mappings of all IMEIs active within preload_active_hours in a single query. Never raises."""
+        if self._preload_active_hours <= 0:
+            return
+        # Generations before the query: a change notified while it runs makes the entry stale again
+        global_generation = self._global_generation
+        imei_generations = dict(self._imei_generations)
+        started = datetime.now(timezone.utc)
+        try:
+            vendor = Config.load().get('parser_node', {}).get('vendor', 'teltonika')
+            async with get_session() as session:
+                result = await session.execute(_PRELOAD_SQL, {
+                    'vendor': vendor,
+                    'since': started - timedelta(hours=self._preload_active_hours),
+                    'limit': self._cache_max_size,
+                })
+                rows = result.fetchall()
+        except Exception as e:
+            logger.warning(f"Unit IO mapping preload failed: {e}")
+            return
+        
+        rows_by_imei: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            db_mapping = dict(row._mapping)
+            mappings = rows_by_imei.setdefault(str(db_mapping.pop('active_imei')), [])
+            if db_mapping.get('id') is not None:
+                mappings.append(db_mapping)
+        
+        for imei, db_mappings in rows_by_imei.items():
+            self._store_mappings(imei, db_mappings, (global_generation, imei_generations.get(imei, 0)))
+        self._enforce_cache_size_limit()
+        elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+        logger.info(f"Preloaded Unit IO mappings for {len(rows_by_imei)} active Unit IMEIs "
+                    f"({len(rows)} rows, {elapsed:.2f}s)")
+    
     async def _cleanup_inactive_devices(self):
         """Remove mappings for devices inactive longer than configured hours."""
         if self._inactive_cleanup_hours <= 0:
@@ -162,6 +327,7 @@ class DatabaseUnitIOMappingLoader:
             del self._mappings_cache[imei]
         if imei in self._cache_metadata:
             del self._cache_metadata[imei]
+        self._mapping_plans.pop(imei, None)
     
     def _enforce_cache_size_limit(self):
         """Enforce cache size limit using LRU eviction."""
@@ -170,6 +336,7 @@ class DatabaseUnitIOMappingLoader:
             imei, _ = self._mappings_cache.popitem(last=False)
             if imei in self._cache_metadata:
                 del self._cache_metadata[imei]
+            self._mapping_plans.pop(imei, None)
             logger.debug(f"Evicted IMEI {imei} from Unit IO mapping cache (LRU)")
     
     def _touch_cache_entry(self, imei: str):
@@ -200,7 +367,14 @@ class DatabaseUnitIOMappingLoader:
             logger.debug(f"Unit IO mapping cache for IMEI {imei} expired (TTL: {self._cache_ttl_minutes}min)")
             return True
         
-        # Check database changes (if enabled)
+        # Change notifications are being received: the generation tells whether mappings changed
+        if self._listening:
+            if metadata.generation != self._generation_of(imei):
+                logger.debug(f"Unit IO mapping cache for IMEI {imei} is stale (change notified)")
+                return True
+            return False
+        
+        # Check database changes (if enabled) - fallback while LISTEN is not connected
         if self._check_db_changes:
             try:
                 await self._ensure_orm_initialized()
@@ -227,6 +401,127 @@ class DatabaseUnitIOMappingLoader:
         
         return False
     
+    def _store_mappings(self, imei: str, db_mappings: List[Dict[str, Any]], generation: Tuple[int, int]) -> int:
+        """
+        Convert unit_io_mapping rows of one IMEI to UnitIOMapping entries, compile the plan and cache them.
+        An IMEI without rows is cached as empty to avoid repeated queries.
+        
+        Returns:
+            Number of UnitIOMapping entries cached
+        """
+        # Get MAX(updateddate) for cache metadata
+        max_updateddate = max((mapping.get('updateddate') for mapping in db_mappings if mapping.get('updateddate')), default=None)
+        
+        # Convert database models to UnitIOMapping dataclass
+        mappings_by_io: Dict[int, List[UnitIOMapping]] = {}
+        
+        for db_mapping in db_mappings:
+            # Convert time fields to string format
+            start_time = db_mapping.get('start_time')
+            end_time = db_mapping.get('end_time')
+            start_time_str = start_time.strftime('%H:%M:%S') if start_time else '00:00:00'
+            end_time_str = end_time.strftime('%H:%M:%S') if end_time else '23:59:59'
+            
+            # Parse column_name with pipe separator (like CSV loader)
+            column_name = db_mapping.get('column_name') or ''
+            column_names = [c.strip() for c in column_name.split('|')]
+            valid_column_names = [c for c in column_names if c and c != 'status' and c != '']
+            
+            # Get mapping fields
+            io_id = db_mapping.get('io_id')
+            target = db_mapping.get('target')
+            
+            # Create mapping for status events if target includes status (1 or 2)
+            if target in [1, 2]:
+                mapping = UnitIOMapping(
+                    imei=imei,
+                    io_id=io_id,
+                    io_multiplier=db_mapping.get('io_multiplier', 1.0),
+                    io_type=db_mapping.get('io_type', 0),
+                    io_name=db_mapping.get('io_name', ''),
+                    value_name=db_mapping.get('value_name') or '',
+                    value=db_mapping.get('value'),
+                    target=target,
+                    column_name="",  # Status events don't need column_name
+                    start_time=start_time_str,
+                    end_time=end_time_str,
+                    is_alarm=bool(db_mapping.get('is_alarm', 0)),
+                    is_sms=bool(db_mapping.get('is_sms', 0)),
+                    is_email=bool(db_mapping.get('is_email', 0)),
+                    is_call=bool(db_mapping.get('is_call', 0))
+                )
+                
+                if io_id not in mappings_by_io:
+                    mappings_by_io[io_id] = []
+                mappings_by_io[io_id].append(mapping)
+            
+            # Create mappings for column values (target = 0 or 2, and has valid column names)
+            if target in [0, 2] and valid_column_names:
+                for col_name in valid_column_names:
+                    col_name = col_name.strip()
+                    if not col_name:
+                        continue
+                    
+                    mapping = UnitIOMapping(
+                        imei=imei,
+                        io_id=io_id,
+                        io_multiplier=db_mapping.get('io_multiplier', 1.0),
+                        io_type=db_mapping.get('io_type', 0),
+                        io_name=db_mapping.get('io_name', ''),
+                        value_name=db_mapping.get('value_name') or '',
+                        value=db_mapping.get('value'),
+                        target=target,
+                        column_name=col_name,
+                        start_time=start_time_str,
+                        end_time=end_time_str,
+                        is_alarm=bool(db_mapping.get('is_alarm', 0)),
+                        is_sms=bool(db_mapping.get('is_sms', 0)),
+                        is_email=bool(db_mapping.get('is_email', 0)),
+                        is_call=bool(db_mapping.get('is_call', 0))
+                    )
+                    
+                    if io_id not in mappings_by_io:
+                        mappings_by_io[io_id] = []
+                    mappings_by_io[io_id].append(mapping)
+            
+            # Handle JSONB (target = 3)
+            if target == 3 and column_name:
+                mapping = UnitIOMapping(
+                    imei=imei,
+                    io_id=io_id,
+                    io_multiplier=db_mapping.get('io_multiplier', 1.0),
+                    io_type=db_mapping.get('io_type', 0),
+                    io_name=db_mapping.get('io_name', ''),
+                    value_name=db_mapping.get('value_name') or '',
+                    value=db_mapping.get('value'),
+                    target=target,
+                    column_name=column_name,
+                    start_time=start_time_str,
+                    end_time=end_time_str,
+                    is_alarm=bool(db_mapping.get('is_alarm', 0)),
+                    is_sms=bool(db_mapping.get('is_sms', 0)),
+                    is_email=bool(db_mapping.get('is_email', 0)),
+                    is_call=bool(db_mapping.get('is_call', 0))
+                )
+                
+                if io_id not in mappings_by_io:
+                    mappings_by_io[io_id] = []
+                mappings_by_io[io_id].append(mapping)
+        
+        # Cache the mappings AFTER all mappings are processed
+        now = datetime.now(timezone.utc)
+        self._mappings_cache[imei] = mappings_by_io
+        self._mapping_plans[imei] = compile_mapping_plan(mappings_by_io) if mappings_by_io else IoMappingPlan.EMPTY
+        self._cache_metadata[imei] = CacheMetadata(
+            cached_at=now,
+            last_access=now,
+            max_updateddate=max_updateddate,
+            generation=generation
+        )
+        # Move to end (most recently used)
+        self._mappings_cache.move_to_end(imei)
+        return sum(len(v) for v in mappings_by_io.values())
+    
     async def load_mappings_for_imei(self, imei: str) -> bool:
         """
         Load Unit IO mappings for a specific IMEI from database and cache them.
@@ -264,6 +559,9 @@ class DatabaseUnitIOMappingLoader:
             # Enforce cache size limit (LRU eviction)
             self._enforce_cache_size_limit()
             
+            # Generation before the query: a change notified while it runs makes the entry stale again
+            generation = self._generation_of(imei)
+            
             # Query database for Unit IO mappings for this Unit IMEI using SQLAlchemy Core
             table = UnitIOMappingModel.__table__
             async with get_session() as session:
@@ -272,135 +570,13 @@ class DatabaseUnitIOMappingLoader:
                 db_mappings_rows = result.fetchall()
                 # Convert rows to dict-like objects for compatibility
                 db_mappings = [dict(row._mapping) for row in db_mappings_rows]
-                
-                # Get MAX(updateddate) for cache metadata
-                max_updateddate = None
-                if db_mappings:
-                    # Get max updateddate from the fetched records
-                    max_updateddate = max((mapping.get('updateddate') for mapping in db_mappings if mapping.get('updateddate')), default=None)
-                
-                if not db_mappings:
-                    logger.debug(f"No Unit IO mappings found in database for Unit IMEI {imei}")
-                    # Cache empty dict to avoid repeated queries
-                    self._mappings_cache[imei] = {}
-                    self._cache_metadata[imei] = CacheMetadata(
-                        cached_at=datetime.now(timezone.utc),
-                        last_access=datetime.now(timezone.utc),
-                        max_updateddate=max_updateddate
-                    )
-                    # Move to end (most recently used)
-                    self._mappings_cache.move_to_end(imei)
-                    return True
-                
-                # Convert database models to UnitIOMapping dataclass
-                mappings_by_io: Dict[int, List[UnitIOMapping]] = {}
-                
-                for db_mapping in db_mappings:
-                    # Convert time fields to string format
-                    start_time = db_mapping.get('start_time')
-                    end_time = db_mapping.get('end_time')
-                    start_time_str = start_time.strftime('%H:%M:%S') if start_time else '00:00:00'
-                    end_time_str = end_time.strftime('%H:%M:%S') if end_time else '23:59:59'
-                    
-                    # Parse column_name with pipe separator (like CSV loader)
-                    column_name = db_mapping.get('column_name') or ''
-                    column_names = [c.strip() for c in column_name.split('|')]
-                    valid_column_names = [c for c in column_names if c and c != 'status' and c != '']
-                    
-                    # Get mapping fields
-                    io_id = db_mapping.get('io_id')
-                    target = db_mapping.get('target')
-                    
-                    # Create mapping for status events if target includes status (1 or 2)
-                    if target in [1, 2]:
-                        mapping = UnitIOMapping(
-                            imei=imei,
-                            io_id=io_id,
-                            io_multiplier=db_mapping.get('io_multiplier', 1.0),
-                            io_type=db_mapping.get('io_type', 0),
-                            io_name=db_mapping.get('io_name', ''),
-                            value_name=db_mapping.get('value_name') or '',
-                            value=db_mapping.get('value'),
-                            target=target,
-                            column_name="",  # Status events don't need column_name
-                            start_time=start_time_str,
-                            end_time=end_time_str,
-                            is_alarm=bool(db_mapping.get('is_alarm', 0)),
-                            is_sms=bool(db_mapping.get('is_sms', 0)),
-                            is_email=bool(db_mapping.get('is_email', 0)),
-                            is_call=bool(db_mapping.get('is_call', 0))
-                        )
-                        
-                        if io_id not in mappings_by_io:
-                            mappings_by_io[io_id] = []
-                        mappings_by_io[io_id].append(mapping)
-                    
-                    # Create mappings for column values (target = 0 or 2, and has valid column names)
-                    if target in [0, 2] and valid_column_names:
-                        for col_name in valid_column_names:
-                            col_name = col_name.strip()
-                            if not col_name:
-                                continue
-                            
-                            mapping = UnitIOMapping(
-                                imei=imei,
-                                io_id=io_id,
-                                io_multiplier=db_mapping.get('io_multiplier', 1.0),
-                                io_type=db_mapping.get('io_type', 0),
-                                io_name=db_mapping.get('io_name', ''),
-                                value_name=db_mapping.get('value_name') or '',
-                                value=db_mapping.get('value'),
-                                target=target,
-                                column_name=col_name,
-                                start_time=start_time_str,
-                                end_time=end_time_str,
-                                is_alarm=bool(db_mapping.get('is_alarm', 0)),
-                                is_sms=bool(db_mapping.get('is_sms', 0)),
-                                is_email=bool(db_mapping.get('is_email', 0)),
-                                is_call=bool(db_mapping.get('is_call', 0))
-                            )
-                            
-                            if io_id not in mappings_by_io:
-                                mappings_by_io[io_id] = []
-                            mappings_by_io[io_id].append(mapping)
-                    
-                    # Handle JSONB (target = 3)
-                    if target == 3 and column_name:
-                        mapping = UnitIOMapping(
-                            imei=imei,
-                            io_id=io_id,
-                            io_multiplier=db_mapping.get('io_multiplier', 1.0),
-                            io_type=db_mapping.get('io_type', 0),
-                            io_name=db_mapping.get('io_name', ''),
-                            value_name=db_mapping.get('value_name') or '',
-                            value=db_mapping.get('value'),
-                            target=target,
-                            column_name=column_name,
-                            start_time=start_time_str,
-                            end_time=end_time_str,
-                            is_alarm=bool(db_mapping.get('is_alarm', 0)),
-                            is_sms=bool(db_mapping.get('is_sms', 0)),
-                            is_email=bool(db_mapping.get('is_email', 0)),
-                            is_call=bool(db_mapping.get('is_call', 0))
-                        )
-                        
-                        if io_id not in mappings_by_io:
-                            mappings_by_io[io_id] = []
-                        mappings_by_io[io_id].append(mapping)
-                
-                # Cache the mappings AFTER all mappings are processed
-                self._mappings_cache[imei] = mappings_by_io
-                self._cache_metadata[imei] = CacheMetadata(
-                    cached_at=datetime.now(timezone.utc),
-                    last_access=datetime.now(timezone.utc),
-                    max_updateddate=max_updateddate
-                )
-                # Move to end (most recently used)
-                self._mappings_cache.move_to_end(imei)
-                
-                total_mappings = sum(len(v) for v in mappings_by_io.values())
+            
+            total_mappings = self._store_mappings(imei, db_mappings, generation)
+            if not db_mappings:
+                logger.debug(f"No Unit IO mappings found in database for Unit IMEI {imei}")
+            else:
                 logger.info(f"Loaded {total_mappings} Unit IO mappings from database for Unit IMEI {imei}")
-                return True
+            return True
                 
         except Exception as e:
             # Check if this is a connection error (pgbouncer cannot connect, etc.)
@@ -459,6 +635,27 @@ class DatabaseUnitIOMappingLoader:
         mappings_by_io = self._mappings_cache.get(imei, {})
         return mappings_by_io.get(io_id, [])
     
+    def get_mapping_plan(self, imei: str) -> Optional[IoMappingPlan]:
+        """
+        Get the compiled mapping plan for a Unit IMEI.
+        The plan is compiled when mappings are (re)loaded and dropped with the cache entry.
+        Updates last_access timestamp (LRU).
+        
+        Args:
+            imei: Unit IMEI string (must be in cache)
+            
+        Returns:
+            IoMappingPlan, or None if mappings for the Unit IMEI are not loaded
+        """
+        plan = self._mapping_plans.get(imei)
+        if plan is None:
+            logger.warning(f"Unit IO mappings for Unit IMEI {imei} not loaded. Call load_mappings_for_imei() first.")
+            return None
+        
+        # Update last_access (LRU)
+        self._touch_cache_entry(imei)
+        return plan
+    
     def has_mappings_for_imei(self, imei: str) -> bool:
         """
         Check if Unit IMEI has any Unit IO mappings loaded.
@@ -489,6 +686,7 @@ class DatabaseUnitIOMappingLoader:
         else:
             self._mappings_cache.clear()
             self._cache_metadata.clear()
+            self._mapping_plans.clear()
             logger.debug("Cleared all Unit IO mapping caches")
     
     def get_cache_stats(self) -> Dict[str, Any]:
@@ -516,7 +714,8 @@ class DatabaseUnitIOMappingLoader:
             'cache_max_size': self._cache_max_size,
             'cache_ttl_minutes': self._cache_ttl_minutes,
             'inactive_cleanup_hours': self._inactive_cleanup_hours,
-            'check_db_changes': self._check_db_changes
+            'check_db_changes': self._check_db_changes,
+            'listening': self._listening
         }
 
 
@@ -8,6 +8,8 @@ import time
 from typing import Dict, Optional, Tuple, Any
 from dataclasses import dataclass
 
+from teltonika_infrastructure.worker_registry import get_worker_registry, get_worker_id
+
 logger = logging.getLogger(__name__)
 
 
@@ -82,6 +84,7 @@ class AsyncIPTables:
                 if imei:
                     device.imei = imei
                     self._imei_to_device[imei] = device
+                    self._register_worker(imei)
                 logger.debug(f"Updated device in AsyncIPTable: {ip_address}:{port}, imei={imei}")
             else:
                 # Register new device
@@ -99,12 +102,19 @@ class AsyncIPTables:
                 
                 if imei:
                     self._imei_to_device[imei] = device
+                    self._register_worker(imei)
                 
                 self.total_connections += 1
                 self.current_connections += 1
                 
                 logger.info(f"Registered new device in AsyncIPTable: {ip_address}:{port}, imei={imei}, total={self.current_connections}")
     
+    def _register_worker(self, imei: str):
+        """Record this worker as IMEI's connection owner (multi-worker mode only)."""
+        registry = get_worker_registry()
+        if registry:
+            registry.register(imei, get_worker_id())
+    
     async def getWriterByImei(self, imei: str) -> Optional[Any]:
         """
         Get StreamWriter by IMEI
@@ -145,7 +155,13 @@ class AsyncIPTables:
                     del self._writer_to_device[device.writer]
                 
                 if device.imei and device.imei in self._imei_to_device:
-                    del self._imei_to_device[device.imei]
+                    # Only drop the IMEI entry if it still points to this connection
+                    # (device may have reconnected with a new writer)
+                    if self._imei_to_device[device.imei] is device:
+                        del self._imei_to_device[device.imei]
+                        registry = get_worker_registry()
+                        if registry:
+                            registry.unregister(device.imei, get_worker_id())
                 
                 if key in self._ip_port_to_device:
                     del self._ip_port_to_device[key]
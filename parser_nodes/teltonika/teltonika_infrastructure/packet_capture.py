@@ -0,0 +1,278 @@
+"""
+Sampled raw packet capture for Teltonika Gateway
+
+Replaces per-packet INFO hex dumps (tcp_server.log_raw_packets) as the way to see what devices
+actually sent. Selected packets are written unmodified into a memory-mapped ring file in a compact
+binary format; scripts/packet_capture_tool.py renders captures as hex/JSON and replays them into
+the decoder.
+
+Selection (checked per packet, cheap when nothing is captured):
+  - packets from IMEIs in `imeis` are always captured
+  - other packets with probability `sample_rate` (0 = none, 1 = all)
+Both, plus `enabled`, can be changed at runtime by writing a JSON object to `control_file`
+(e.g. {"sample_rate": 0.01, "imeis": ["356307042441013"]}); it is re-read when its mtime
+changes, at most every control_check_seconds. Keys not in the file keep their config.json values.
+
+File format (big-endian), fixed size, allocated when the first packet is captured:
+  header (64 bytes): magic b'TCAP', version u16, flags u16, capacity u64 (data area bytes),
+                     head u64, tail u64, live records u64, total records written u64
+  data area:         records [payload length u32][capture time us u64][IMEI u64][payload];
+                     a length of 0xFFFFFFFF (or fewer than 4 bytes left) wraps to offset 0
+When the ring is full the oldest records are overwritten. An existing file is rotated to
+<file>.1 .. <file>.<keep_files> when capture (re)opens it, so the previous run is kept.
+With several worker processes each one writes <file stem>-w<worker id><ext>.
+"""
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import time
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Union
+
+from config import ServerParams
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'TCAP'
+VERSION = 1
+_FILE_HEADER = struct.Struct('>4sHHQQQQQ')
+FILE_HEADER_SIZE = 64
+_RECORD_HEADER = struct.Struct('>IQQ')
+RECORD_HEADER_SIZE = _RECORD_HEADER.size
+_WRAP = 0xFFFFFFFF
+
+
+class CaptureRecord(NamedTuple):
+    """One captured packet."""
+    time_us: int      # capture time, microseconds since the epoch (UTC)
+    imei: str         # '' if unknown
+    payload: bytes    # raw frame as received (preamble + length + data + CRC)
+
+
+class _Ring:
+    """Header fields and record layout shared by the writer and the reader."""
+
+    def __init__(self, buffer: Union[mmap.mmap, bytes]):
+        self.buffer = buffer
+        magic, version, _flags, capacity, head, tail, live, written = _FILE_HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a packet capture file (bad magic/version)")
+        self.capacity = capacity
+        self.head = head
+        self.tail = tail
+        self.live = live
+        self.written = written
+
+    def write_header(self) -> None:
+        _FILE_HEADER.pack_into(self.buffer, 0, MAGIC, VERSION, 0, self.capacity,
+                               self.head, self.tail, self.live, self.written)
+
+    def length_at(self, offset: int) -> Optional[int]:
+        """Payload length of the record at offset, or None for a wrap point."""
+        if self.capacity - offset < 4:
+            return None
+        length = struct.unpack_from('>I', self.buffer, FILE_HEADER_SIZE + offset)[0]
+        return None if length == _WRAP else length
+
+    def records(self) -> Iterator[CaptureRecord]:
+        """Live records, oldest first."""
+        offset = self.tail
+        for _ in range(self.live):
+            length = self.length_at(offset)
+            if length is None:
+                offset = 0
+                length = self.length_at(0)
+            start = FILE_HEADER_SIZE + offset
+            _, time_us, imei = _RECORD_HEADER.unpack_from(self.buffer, start)
+            payload = bytes(self.buffer[start + RECORD_HEADER_SIZE:start + RECORD_HEADER_SIZE + length])
+            yield CaptureRecord(time_us, str(imei) if imei else '', payload)
+            offset += RECORD_HEADER_SIZE + length
+
+
+class PacketCapture:
+    """Filters packets and appends the selected ones to the capture ring."""
+
+    def __init__(self):
+        self._path = ServerParams.get('packet_capture.file', os.path.join('logs', 'packets.tcap'))
+        from teltonika_infrastructure.worker_registry import get_worker_id, get_worker_registry
+        if get_worker_registry() is not None:
+            stem, ext = os.path.splitext(self._path)
+            self._path = f"{stem}-w{get_worker_id()}{ext}"
+        self._capacity = max(ServerParams.get_int('packet_capture.file_size_mb', 64), 1) * 1024 * 1024
+        self._keep_files = ServerParams.get_int('packet_capture.keep_files', 2)
+        self._control_file = ServerParams.get('packet_capture.control_file', os.path.join('logs', 'packet_capture.json'))
+        self._control_check_seconds = ServerParams.get_float('packet_capture.control_check_seconds', 5.0)
+        self._defaults: Dict[str, Any] = {
+            'enabled': ServerParams.get_bool('packet_capture.enabled', True),
+            'sample_rate': ServerParams.get_float('packet_capture.sample_rate', 0.0),
+            'imeis': ServerParams.get('packet_capture.imeis', []) or [],
+        }
+        self._control_mtime: Optional[float] = None
+        self._next_control_check = 0.0
+        self._apply_settings(self._defaults)
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._ring: Optional[_Ring] = None
+        self.captured = 0
+
+    def _apply_settings(self, settings: Dict[str, Any]) -> None:
+        self._enabled = bool(settings.get('enabled', True))
+        self._sample_rate = min(max(float(settings.get('sample_rate') or 0.0), 0.0), 1.0)
+        self._imeis = frozenset(str(imei) for imei in settings.get('imeis') or ())
+
+    def _check_control(self, now: float) -> None:
+        """Re-read the control file if it changed (called at most every control_check_seconds)."""
+        self._next_control_check = now + self._control_check_seconds
+        try:
+            mtime = os.stat(self._control_file).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._control_mtime:
+            return
+        self._control_mtime = mtime
+        settings = dict(self._defaults)
+        if mtime is not None:
+            try:
+                with open(self._control_file, 'r', encoding='utf-8') as f:
+                    settings.update(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring packet capture control file {self._control_file}: {e}")
+                return
+        self._apply_settings(settings)
+        logger.info(
+            f"Packet capture: enabled={self._enabled}, sample_rate={self._sample_rate}, "
+            f"imeis={len(self._imeis)} (file {self._path})"
+        )
+
+    def record(self, imei: str, packet: Union[bytes, memoryview]) -> bool:
+        """Capture the packet if it passes the IMEI/sampling filter. Never raises."""
+        now = time.monotonic()
+        if now >= self._next_control_check:
+            self._check_control(now)
+        if not self._enabled:
+            return False
+        if imei not in self._imeis:
+            rate = self._sample_rate
+            if rate <= 0.0 or (rate < 1.0 and random.random() >= rate):
+                return False
+        try:
+            self._append(imei, packet)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Packet capture disabled after write error on {self._path}: {e}")
+            self._enabled = False
+            self._defaults['enabled'] = False
+            self.close()
+            return False
+        self.captured += 1
+        return True
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self._path) and self._keep_files > 0:
+            for index in range(self._keep_files - 1, 0, -1):
+                older = f"{self._path}.{index}"
+                if os.path.exists(older):
+                    os.replace(older, f"{self._path}.{index + 1}")
+            os.replace(self._path, f"{self._path}.1")
+        self._file = open(self._path, 'w+b')
+        self._file.truncate(FILE_HEADER_SIZE + self._capacity)
+        self._mmap = mmap.mmap(self._file.fileno(), FILE_HEADER_SIZE + self._capacity)
+        _FILE_HEADER.pack_into(self._mmap, 0, MAGIC, VERSION, 0, self._capacity, 0, 0, 0, 0)
+        self._ring = _Ring(self._mmap)
+        logger.info(f"Packet capture file opened: {self._path} ({self._capacity // (1024 * 1024)} MB ring)")
+
+    def _evict_oldest(self) -> None:
+        ring = self._ring
+        length = ring.length_at(ring.tail)
+        if length is None:
+            ring.tail = 0
+            return
+        ring.tail += RECORD_HEADER_SIZE + length
+        ring.live -= 1
+        if ring.tail >= ring.capacity:
+            ring.tail = 0
+
+    def _append(self, imei: str, packet: Union[bytes, memoryview]) -> None:
+        if self._ring is None:
+            self._open()
+        ring = self._ring
+        size = RECORD_HEADER_SIZE + len(packet)
+        if size > ring.capacity:
+            raise ValueError(f"packet of {len(packet)} bytes exceeds the capture file size")
+        while True:
+            if ring.live == 0:
+                ring.head = ring.tail = 0
+            if ring.head + size > ring.capacity:
+                if ring.live and ring.tail >= ring.head:
+                    # Records after head run up to the wrap point: drop them first
+                    self._evict_oldest()
+                    continue
+                if ring.capacity - ring.head >= 4:
+                    struct.pack_into('>I', self._mmap, FILE_HEADER_SIZE + ring.head, _WRAP)
+                ring.head = 0
+                continue
+            if ring.live and ring.head <= ring.tail < ring.head + size:
+                self._evict_oldest()
+                continue
+            break
+        start = FILE_HEADER_SIZE + ring.head
+        _RECORD_HEADER.pack_into(self._mmap, start, len(packet), time.time_ns() // 1000,
+                                 int(imei) if imei and imei.isdigit() else 0)
+        self._mmap[start + RECORD_HEADER_SIZE:start + size] = packet
+        ring.head += size
+        ring.live += 1
+        ring.written += 1
+        ring.write_header()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            try:
+                self._mmap.flush()
+                self._mmap.close()
+            except (OSError, ValueError) as e:
+                logger.debug(f"Error closing packet capture mmap: {e}")
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._ring = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        ring = self._ring
+        return {
+            'enabled': self._enabled,
+            'sample_rate': self._sample_rate,
+            'imeis': len(self._imeis),
+            'captured': self.captured,
+            'live_records': ring.live if ring else 0,
+            'file': self._path,
+        }
+
+
+def read_capture(path: str) -> Iterator[CaptureRecord]:
+    """Records of a capture file, oldest first (the file may be in use by a running parser)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    yield from _Ring(data).records()
+
+
+_capture: Optional[PacketCapture] = None
+
+
+def get_packet_capture() -> Optional[PacketCapture]:
+    """Process-wide capture, or None when packet_capture.enabled is false in config."""
+    global _capture
+    if _capture is None:
+        if not ServerParams.get_bool('packet_capture.enabled', True):
+            return None
+        _capture = PacketCapture()
+    return _capture
+
+
+def close_packet_capture() -> None:
+    if _capture is not None:
+        _capture.close()
@@ -5,7 +5,7 @@ Publishes parsed tracking data to RabbitMQ with publisher confirms
 import asyncio
 import logging
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timezone
 import aio_pika
 from aio_pika import ExchangeType, DeliveryMode
@@ -159,34 +159,25 @@ class RabbitMQProducer:
             return False
         return self._connected
     
-    async def publish_tracking_record(
-        self,
-        record: Dict[str, Any],
-        vendor: str = "teltonika",
-        record_type: str = "trackdata",
-        timeout: float = 5.0
-    ) -> bool:
+    async def _ensure_connected(self) -> bool:
         """
-        Publish tracking record to RabbitMQ with publisher confirms.
-        CRITICAL: Returns False immediately if RabbitMQ is unavailable.
-        This ensures device won't receive ACK if data couldn't be queued.
+        Make sure connection, channel and exchange are usable, reconnecting if needed.
+        The ready state is checked without the lock, so concurrent publishers only
+        serialize on _connection_lock when a reconnect is actually required.
         
-        Args:
-            record: Tracking record dictionary
-            vendor: Vendor name (teltonika, calamp, concox, etc.)
-            record_type: Record type (trackdata, alarm, event)
-            timeout: Timeout for publisher confirm (seconds)
-            
         Returns:
-            bool: True if message was confirmed by RabbitMQ, False otherwise
+            bool: True if publishing can proceed, False if RabbitMQ is unavailable
         """
-        # FAST FAIL: If shutting down, immediately return False
-        if self._shutting_down:
-            logger.warning("RabbitMQ producer shutting down - publish rejected")
-            return False
+        # FAST PATH: connection, channel and exchange are usable - no lock needed
+        if self.is_ready():
+            return True
         
-        # Check connection and reconnect if needed (with lock to prevent race conditions)
+        # SLOW PATH: reconnect/recreate under lock to prevent concurrent connection attempts
         async with self._connection_lock:
+            # Another publisher may have reconnected while we waited for the lock
+            if self.is_ready():
+                return True
+            
             # With connect_robust, connection might be reconnecting automatically
             # Check if we have a valid connection with exchange and channel
             needs_reconnect = False
@@ -291,6 +282,38 @@ class RabbitMQProducer:
                     self._connected = False
                     return False
         
+        return True
+    
+    async def publish_tracking_record(
+        self,
+        record: Dict[str, Any],
+        vendor: str = "teltonika",
+        record_type: str = "trackdata",
+        timeout: float = 5.0
+    ) -> bool:
+        """
+        Publish tracking record to RabbitMQ with publisher confirms.
+        CRITICAL: Returns False immediately if RabbitMQ is unavailable.
+        This ensures device won't receive ACK if data couldn't be queued.
+        
+        Args:
+            record: Tracking record dictionary
+            vendor: Vendor name (teltonika, calamp, concox, etc.)
+            record_type: Record type (trackdata, alarm, event)
+            timeout: Timeout for publisher confirm (seconds)
+            
+        Returns:
+            bool: True if message was confirmed by RabbitMQ, False otherwise
+        """
+        # FAST FAIL: If shutting down, immediately return False
+        if self._shutting_down:
+            logger.warning("RabbitMQ producer shutting down - publish rejected")
+            return False
+        
+        # Check connection and reconnect if needed (lock only taken when not ready)
+        if not await self._ensure_connected():
+            return False
+        
         # Final check before publish - if connection dropped during lock acquisition
         if not self.is_ready():
             logger.error("✗ RabbitMQ not ready after connection check - publish failed")
@@ -300,19 +323,7 @@ class RabbitMQProducer:
         routing_key = f"tracking.{vendor}.{record_type}"
         
         try:
-            # Create message
-            message_body = json.dumps(record).encode('utf-8')
-            
-            # Priority: High for alarms, normal for others
-            priority = 10 if record_type == "alarm" else 0
-            
-            # Publish with persistent delivery mode and priority
-            message = aio_pika.Message(
-                message_body,
-                delivery_mode=DeliveryMode.PERSISTENT,
-                priority=priority,
-                timestamp=datetime.now(timezone.utc)
-            )
+            message = self._build_message(record, record_type)
             
             # Publish and wait for confirmation with timeout
             # This timeout ensures we don't hang if RabbitMQ becomes unavailable during publish
@@ -348,6 +359,104 @@ class RabbitMQProducer:
             logger.error(f"✗ Failed to publish to RabbitMQ: {e}", exc_info=True)
             return False
     
+    async def publish_batch(
+        self,
+        records: List[Tuple[Dict[str, Any], str]],
+        vendor: str = "teltonika",
+        timeout: float = 5.0
+    ) -> List[bool]:
+        """
+        Publish several tracking records (e.g. all records of one AVL packet) with publisher confirms.
+        All messages are sent on the confirm-mode channel back to back and their confirms are
+        awaited together, so a packet costs about one broker round trip instead of one per record.
+        CRITICAL: A record only counts as published when its confirm arrived within timeout;
+        the caller must not ACK the device unless every result is True.
+        
+        Args:
+            records: List of (record, record_type) tuples, record_type = trackdata, event or alarm
+            vendor: Vendor name (teltonika, calamp, concox, etc.)
+            timeout: Timeout for all publisher confirms of the batch (seconds)
+            
+        Returns:
+            List[bool]: Per-record result (same order as records), True if confirmed by RabbitMQ
+        """
+        if not records:
+            return []
+        
+        # FAST FAIL: If shutting down, immediately reject the whole batch
+        if self._shutting_down:
+            logger.warning("RabbitMQ producer shutting down - publish rejected")
+            return [False] * len(records)
+        
+        if not await self._ensure_connected():
+            return [False] * len(records)
+        
+        # Final check before publish - if connection dropped during the connection check
+        if not self.is_ready():
+            logger.error("✗ RabbitMQ not ready after connection check - publish failed")
+            self._publish_failures += len(records)
+            return [False] * len(records)
+        
+        try:
+            messages = [self._build_message(record, record_type) for record, record_type in records]
+        except Exception as e:
+            self._publish_failures += len(records)
+            logger.error(f"✗ Failed to publish batch to RabbitMQ: {e}", exc_info=True)
+            return [False] * len(records)
+        
+        # Publish everything before awaiting any confirm (tasks start in order, so
+        # the messages go out in record order)
+        exchange = self.exchange
+        tasks = [
+            asyncio.ensure_future(exchange.publish(message, routing_key=f"tracking.{vendor}.{record_type}"))
+            for message, (_, record_type) in zip(messages, records)
+        ]
+        
+        # Wait for all confirms together; anything not confirmed within timeout is a failure
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        
+        results = []
+        connection_lost = bool(pending)
+        for task, (record, record_type) in zip(tasks, records):
+            confirmed = False
+            if task in done:
+                error = task.exception()
+                if error is None:
+                    confirmed = bool(task.result())
+                    if not confirmed:
+                        logger.warning(f"✗ Publisher confirm failed for tracking.{vendor}.{record_type}")
+                elif isinstance(error, (ConnectionError, OSError, aio_pika.exceptions.AMQPError)):
+                    connection_lost = True
+                    logger.error(f"✗ RabbitMQ connection error during batch publish: {error}")
+                else:
+                    logger.error(f"✗ Failed to publish to RabbitMQ: {error}")
+            results.append(confirmed)
+        
+        confirmed_count = sum(results)
+        self._publish_successes += confirmed_count
+        self._publish_failures += len(results) - confirmed_count
+        
+        if pending:
+            logger.error(f"✗ RabbitMQ publish timeout ({timeout}s) for {len(pending)}/{len(records)} "
+                         f"batch messages - connection may be down")
+        if connection_lost:
+            self._connected = False  # Mark as disconnected so next publish triggers reconnect
+        else:
+            logger.debug(f"✓ Published batch of {confirmed_count}/{len(records)} messages")
+        
+        return results
+    
+    def _build_message(self, record: Dict[str, Any], record_type: str) -> aio_pika.Message:
+        """Create persistent message for record (high priority for alarms, normal for others)."""
+        return aio_pika.Message(
+            json.dumps(record).encode('utf-8'),
+            delivery_mode=DeliveryMode.PERSISTENT,
+            priority=10 if record_type == "alarm" else 0,
+            timestamp=datetime.now(timezone.utc)
+        )
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get producer statistics"""
         total = self._publish_successes + self._publish_failures
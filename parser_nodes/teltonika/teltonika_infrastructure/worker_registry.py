@@ -0,0 +1,162 @@
+"""
+IMEI -> worker registry for multi-worker parser mode
+Shared-memory table telling which worker process holds a device's connection
+
+In multi-worker mode (parser_node.workers > 1) every worker has its own AsyncIPTables,
+so a StreamWriter can only be used by the process that accepted the connection. When a
+device reconnects it may land on another worker while the previous worker still has a
+stale entry; the registry records the latest owner so GPRS commands are only claimed
+(and sent) by the worker that actually holds the device's writer.
+
+The table is allocated by the supervisor before forking (multiprocessing.Array), so
+all workers share it without a manager process. Open addressing with linear probing;
+IMEIs are stored as integers.
+"""
+import logging
+import multiprocessing
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = 0
+_DELETED = -1
+
+
+class ImeiWorkerRegistry:
+    """Fixed-size shared IMEI -> worker ID table (create before forking workers)."""
+
+    def __init__(self, capacity: int):
+        """
+        Initialize registry
+
+        Args:
+            capacity: Expected number of connected devices per node (table is sized 2x)
+        """
+        self._size = max(16, int(capacity) * 2)
+        self._lock = multiprocessing.Lock()
+        self._keys = multiprocessing.Array('q', self._size, lock=False)
+        self._workers = multiprocessing.Array('i', self._size, lock=False)
+        logger.info(f"ImeiWorkerRegistry initialized: slots={self._size}")
+
+    @staticmethod
+    def _to_key(imei: str) -> Optional[int]:
+        try:
+            key = int(imei)
+        except (TypeError, ValueError):
+            return None
+        return key if key > 0 else None
+
+    def _find(self, key: int) -> int:
+        """Return slot index of key, or -1 (caller holds the lock)."""
+        keys = self._keys
+        size = self._size
+        index = key % size
+        for _ in range(size):
+            slot_key = keys[index]
+            if slot_key == key:
+                return index
+            if slot_key == _EMPTY:
+                return -1
+            index = (index + 1) % size
+        return -1
+
+    def register(self, imei: str, worker_id: int) -> bool:
+        """
+        Record worker_id as the owner of IMEI (replaces any previous owner).
+
+        Returns:
+            True if registered, False if IMEI is invalid or the table is full
+        """
+        key = self._to_key(imei)
+        if key is None:
+            return False
+
+        with self._lock:
+            index = self._find(key)
+            if index < 0:
+                # First empty or deleted slot on the probe sequence
+                keys = self._keys
+                index = key % self._size
+                for _ in range(self._size):
+                    if keys[index] in (_EMPTY, _DELETED):
+                        break
+                    index = (index + 1) % self._size
+                else:
+                    logger.warning(f"ImeiWorkerRegistry full ({self._size} slots), cannot register IMEI {imei}")
+                    return False
+                keys[index] = key
+            self._workers[index] = worker_id
+            return True
+
+    def unregister(self, imei: str, worker_id: int) -> None:
+        """Remove IMEI if it is still owned by worker_id (device may have moved to another worker)."""
+        key = self._to_key(imei)
+        if key is None:
+            return
+
+        with self._lock:
+            index = self._find(key)
+            if index >= 0 and self._workers[index] == worker_id:
+                self._keys[index] = _DELETED
+
+    def get_worker(self, imei: str) -> Optional[int]:
+        """Get worker ID currently holding IMEI's connection, or None if not registered."""
+        key = self._to_key(imei)
+        if key is None:
+            return None
+
+        with self._lock:
+            index = self._find(key)
+            return self._workers[index] if index >= 0 else None
+
+    def filter_owned(self, imeis: Iterable[str], worker_id: int) -> List[str]:
+        """Return the IMEIs (from imeis) that are owned by worker_id."""
+        result = []
+        with self._lock:
+            for imei in imeis:
+                key = self._to_key(imei)
+                if key is None:
+                    continue
+                index = self._find(key)
+                if index >= 0 and self._workers[index] == worker_id:
+                    result.append(imei)
+        return result
+
+    def clear_worker(self, worker_id: int) -> int:
+        """
+        Remove all IMEIs owned by worker_id (e.g. after the worker process died).
+
+        Returns:
+            Number of entries removed
+        """
+        removed = 0
+        with self._lock:
+            keys = self._keys
+            workers = self._workers
+            for index in range(self._size):
+                if keys[index] not in (_EMPTY, _DELETED) and workers[index] == worker_id:
+                    keys[index] = _DELETED
+                    removed += 1
+        return removed
+
+
+# Worker context of this process (None/0 in single-process mode)
+_registry: Optional[ImeiWorkerRegistry] = None
+_worker_id: int = 0
+
+
+def set_worker_context(registry: Optional[ImeiWorkerRegistry], worker_id: int) -> None:
+    """Set registry and worker ID for this process (called in each worker after fork)."""
+    global _registry, _worker_id
+    _registry = registry
+    _worker_id = worker_id
+
+
+def get_worker_registry() -> Optional[ImeiWorkerRegistry]:
+    """Get shared registry (None in single-process mode)."""
+    return _registry
+
+
+def get_worker_id() -> int:
+    """Get worker ID of this process (0 in single-process mode)."""
+    return _worker_id
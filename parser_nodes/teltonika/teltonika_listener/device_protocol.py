@@ -0,0 +1,245 @@
+"""
+asyncio.Protocol connection engine for Teltonika devices.
+
+The StreamReader path costs every connection a waiting coroutine plus an asyncio.wait_for
+task/timer for each read (1-byte peek, 7-byte header, body), even while the device is idle.
+With tens of thousands of long-lived device sockets per node, that overhead dominates idle CPU.
+
+DeviceProtocol frames the byte stream itself (PacketFramer) as data arrives:
+- An idle connection has no task and a single timer. The timer is re-armed lazily from the
+  last receive time rather than rescheduled on every read.
+- When a complete IMEI handshake, ping or packet is buffered, reading is paused and one task
+  runs the DeviceHandler callbacks for everything buffered. The task then exits and reading
+  resumes, so packets of one connection are still handled strictly in order.
+- Packets reach the handler as memoryview slices of the connection buffer (valid until the
+  callback returns).
+
+The protocol doubles as the connection's writer (write / drain / close / is_closing /
+wait_closed / get_extra_info), so the IP table, ACKs and GPRS command sender use it exactly
+like an asyncio.StreamWriter.
+
+Timeouts (one timer): teltonika_protocol.read_timeout while a partial packet is buffered,
+teltonika_protocol.connection_timeout otherwise. The connection is closed when it expires.
+"""
+import asyncio
+import logging
+from typing import Any, Optional
+
+from teltonika_listener.packet_framer import PING_FRAME, FramingError, PacketFramer
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceHandler:
+    """Connection callbacks used by DeviceProtocol (all run in the connection's task)."""
+
+    async def on_connected(self, conn: "DeviceProtocol") -> bool:
+        """Accept (True) or reject (False, connection is closed) a new connection."""
+        return True
+
+    async def on_imei(self, conn: "DeviceProtocol", imei_data: bytes) -> Optional[str]:
+        """Validate the login IMEI and send the login ACK; None closes the connection."""
+        raise NotImplementedError
+
+    async def on_ping(self, conn: "DeviceProtocol") -> None:
+        pass
+
+    async def on_packet(self, conn: "DeviceProtocol", imei: str, packet: memoryview) -> None:
+        raise NotImplementedError
+
+    async def on_disconnected(self, conn: "DeviceProtocol") -> None:
+        """Called once after connection loss for connections accepted by on_connected."""
+        pass
+
+
+class DeviceProtocol(asyncio.Protocol):
+    """One device socket: framing, in-order packet handling and the writer interface."""
+
+    def __init__(self, handler: DeviceHandler, idle_timeout: float, read_timeout: float,
+                 max_packet_size: int, retain_size: int = 8192):
+        self._handler = handler
+        self._idle_timeout = idle_timeout
+        self._read_timeout = read_timeout
+        self._framer = PacketFramer(max_packet_size, retain_size)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.transport: Optional[asyncio.Transport] = None
+        self.peername: Any = None
+        self.imei: Optional[str] = None
+        self._accepted: Optional[bool] = None
+        self._task: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._last_receive = 0.0
+        self._lost = False
+        self._closed: Optional[asyncio.Future] = None
+        self._write_paused = False
+        self._drain_waiter: Optional[asyncio.Future] = None
+
+    # ── asyncio.Protocol ────────────────────────────────────────────────
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._loop = asyncio.get_running_loop()
+        self.transport = transport
+        self.peername = transport.get_extra_info('peername')
+        self._closed = self._loop.create_future()
+        self._last_receive = self._loop.time()
+        self._timer = self._loop.call_at(self._last_receive + self._idle_timeout, self._on_timer)
+        self._schedule()
+
+    def data_received(self, data: bytes) -> None:
+        self._last_receive = self._loop.time()
+        self._framer.feed(data)
+        self._schedule()
+
+    def eof_received(self) -> bool:
+        return False  # close the transport
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._lost = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(None)
+        waiter, self._drain_waiter = self._drain_waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_exception(ConnectionResetError("Connection lost"))
+        if self._task is None and self._accepted:
+            self._task = self._loop.create_task(self._disconnected())
+
+    def pause_writing(self) -> None:
+        self._write_paused = True
+
+    def resume_writing(self) -> None:
+        self._write_paused = False
+        waiter, self._drain_waiter = self._drain_waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    # ── StreamWriter interface ──────────────────────────────────────────
+
+    def write(self, data: bytes) -> None:
+        self.transport.write(data)
+
+    async def drain(self) -> None:
+        if self._lost:
+            raise ConnectionResetError("Connection lost")
+        if self._write_paused:
+            if self._drain_waiter is None:
+                self._drain_waiter = self._loop.create_future()
+            await self._drain_waiter
+
+    def is_closing(self) -> bool:
+        return self.transport is None or self.transport.is_closing()
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+
+    async def wait_closed(self) -> None:
+        if self._closed is not None:
+            await asyncio.shield(self._closed)
+
+    def get_extra_info(self, name: str, default: Any = None) -> Any:
+        return self.transport.get_extra_info(name, default) if self.transport is not None else default
+
+    # ── Processing ──────────────────────────────────────────────────────
+
+    def _schedule(self) -> None:
+        """Start the connection task unless it is already running (it picks up new frames)."""
+        if self._task is None and not self._lost:
+            self.transport.pause_reading()
+            self._task = self._loop.create_task(self._process())
+
+    async def _process(self) -> None:
+        handler = self._handler
+        framer = self._framer
+        try:
+            if self._accepted is None:
+                self._accepted = False
+                if not await handler.on_connected(self):
+                    self.close()
+                    return
+                self._accepted = True
+            while not self._lost and not self.is_closing():
+                if self.imei is None:
+                    imei_data = framer.next_imei()
+                    if imei_data is None:
+                        break
+                    self.imei = await handler.on_imei(self, imei_data)
+                    if not self.imei:
+                        self.close()
+                        break
+                    continue
+                frame = framer.next_frame()
+                if frame is None:
+                    break
+                if frame is PING_FRAME:
+                    await handler.on_ping(self)
+                    continue
+                try:
+                    await handler.on_packet(self, self.imei, frame)
+                finally:
+                    try:
+                        frame.release()
+                    except BufferError:
+                        pass  # still exported by a live decoder object; freed with it
+        except FramingError as e:
+            logger.error(f"Closing connection {self._connection_id()}: {e}")
+            self.close()
+        except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError) as e:
+            logger.info(f"Connection error from {self._connection_id()}: {e}")
+            self.close()
+        except asyncio.CancelledError:
+            self.close()
+            raise
+        except Exception as e:
+            logger.error(f"Error handling connection {self._connection_id()}: {e}", exc_info=True)
+            self.close()
+        finally:
+            if self._lost and self._accepted:
+                await self._disconnected()
+            else:
+                self._task = None
+                if not self.is_closing():
+                    self.transport.resume_reading()
+                    if self._framer.buffered:
+                        self._arm_read_timeout()
+
+    async def _disconnected(self) -> None:
+        self._accepted = False  # on_disconnected runs once
+        try:
+            await self._handler.on_disconnected(self)
+        except Exception as e:
+            logger.warning(f"Error during connection cleanup for {self._connection_id()}: {e}")
+
+    def _arm_read_timeout(self) -> None:
+        """A partial packet is buffered: make sure the timer fires by the read deadline."""
+        deadline = self._last_receive + self._read_timeout
+        if self._timer is None or self._timer.when() > deadline:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = self._loop.call_at(deadline, self._on_timer)
+
+    def _on_timer(self) -> None:
+        """Single per-connection timer: close on expiry, otherwise re-arm for the remaining time."""
+        self._timer = None
+        if self._lost:
+            return
+        now = self._loop.time()
+        if self._task is not None:
+            # Handling a packet (reading paused): not idle
+            self._timer = self._loop.call_at(now + self._idle_timeout, self._on_timer)
+            return
+        timeout = self._read_timeout if self._framer.buffered else self._idle_timeout
+        deadline = self._last_receive + timeout
+        if now < deadline:
+            self._timer = self._loop.call_at(deadline, self._on_timer)
+            return
+        what = "partial packet" if self._framer.buffered else "no data"
+        logger.info(f"Closing idle connection {self._connection_id()} (IMEI: {self.imei}): {what} for {timeout:.0f}s")
+        self.close()
+
+    def _connection_id(self) -> str:
+        if self.peername:
+            return f"{self.peername[0]}:{self.peername[1]}"
+        return "unknown"
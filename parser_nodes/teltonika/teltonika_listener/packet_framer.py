@@ -0,0 +1,132 @@
+"""
+Teltonika TCP framing over a reusable per-connection buffer.
+
+A device connection carries the IMEI handshake (2-byte length + ASCII IMEI), then a stream of
+0xFF pings and length-prefixed AVL/Codec 12 packets:
+  4 bytes preamble (0x00000000) | 4 bytes data length | data | 4 bytes CRC
+
+PacketFramer appends received bytes to one bytearray and tracks the unconsumed region by
+offsets, so a partial packet is completed by later reads without concatenating bytes objects.
+Complete packets are handed out as memoryview slices of that buffer.
+
+A frame view is only valid until the next feed(): feed() moves the unconsumed tail to the front
+of the buffer when space runs out. Callers process (or copy) each frame before feeding more data;
+DeviceProtocol pauses reading while a frame is being handled. Growing allocates a new bytearray
+instead of resizing, so a view that is still referenced never blocks the buffer.
+"""
+import logging
+import struct
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# preamble, data length
+_HEADER = struct.Struct('>II')
+HEADER_SIZE = 8
+CRC_SIZE = 4
+PING = 0xFF
+
+# Returned by next_frame() for a 0xFF ping byte
+PING_FRAME = b'\xff'
+
+_INITIAL_BUFFER_SIZE = 1024
+
+
+class FramingError(Exception):
+    """The stream cannot be framed (invalid IMEI handshake)."""
+
+
+class PacketFramer:
+    """IMEI handshake and packet framing for one device connection."""
+
+    __slots__ = ('_buffer', '_start', '_end', '_max_packet_size', '_retain_size', 'skipped_bytes')
+
+    def __init__(self, max_packet_size: int = 10 * 1024 * 1024, retain_size: int = 8192):
+        """
+        Args:
+            max_packet_size: Largest accepted data length (larger headers are resynchronised past)
+            retain_size: Buffer size kept once a large packet has been consumed
+        """
+        self._buffer = bytearray(_INITIAL_BUFFER_SIZE)
+        self._start = 0
+        self._end = 0
+        self._max_packet_size = max_packet_size
+        self._retain_size = max(retain_size, _INITIAL_BUFFER_SIZE)
+        self.skipped_bytes = 0
+
+    @property
+    def buffered(self) -> int:
+        """Bytes received but not yet framed."""
+        return self._end - self._start
+
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        """Append received bytes. Invalidates frames handed out earlier."""
+        size = len(data)
+        if not size:
+            return
+        buffer = self._buffer
+        start, end = self._start, self._end
+        if start == end:
+            start = end = 0
+            if len(buffer) > self._retain_size:
+                buffer = self._buffer = bytearray(max(_INITIAL_BUFFER_SIZE, size))
+        if end + size > len(buffer):
+            used = end - start
+            if used + size <= len(buffer):
+                buffer[:used] = buffer[start:end]
+            else:
+                grown = bytearray(max(2 * len(buffer), used + size))
+                grown[:used] = buffer[start:end]
+                buffer = self._buffer = grown
+            start, end = 0, used
+        buffer[end:end + size] = data
+        self._start, self._end = start, end + size
+
+    def next_imei(self) -> Optional[bytes]:
+        """IMEI bytes of the login handshake, or None until it has fully arrived."""
+        start, end = self._start, self._end
+        if end - start < 2:
+            return None
+        imei_length = self._buffer[start + 1]
+        # Validate IMEI length to prevent buffer overflow (security)
+        if imei_length < 1 or imei_length > 20:
+            raise FramingError(f"Invalid IMEI length: {imei_length} (expected 1-20)")
+        if end - start < 2 + imei_length:
+            return None
+        self._start = start + 2 + imei_length
+        return bytes(self._buffer[start + 2:self._start])
+
+    def next_frame(self) -> Union[memoryview, bytes, None]:
+        """
+        Next complete packet (memoryview), PING_FRAME for a ping, or None if more data is needed.
+
+        Bytes that cannot start a packet (non-zero preamble, data length above max_packet_size)
+        are skipped one at a time until the stream resynchronises; they are counted in
+        skipped_bytes.
+        """
+        buffer = self._buffer
+        position, end = self._start, self._end
+        skipped = 0
+        try:
+            while position < end:
+                if buffer[position] == PING:
+                    self._start = position + 1
+                    return PING_FRAME
+                if end - position < HEADER_SIZE:
+                    break
+                preamble, length = _HEADER.unpack_from(buffer, position)
+                if preamble != 0 or length > self._max_packet_size:
+                    position += 1
+                    skipped += 1
+                    continue
+                total = HEADER_SIZE + length + CRC_SIZE
+                if end - position < total:
+                    break
+                self._start = position + total
+                return memoryview(buffer)[position:position + total]
+            self._start = position
+            return None
+        finally:
+            if skipped:
+                self.skipped_bytes += skipped
+                logger.warning(f"Skipped {skipped} bytes without a valid packet header (resynchronising)")
@@ -48,19 +48,23 @@ async def close_tcp_server() -> None:
 
 
 
-async def start_tcp_server(ip: str = None, port: int = None, handler=None) -> None:
+async def start_tcp_server(ip: str = None, port: int = None, handler=None, reuse_port: bool = False,
+                           protocol_factory=None) -> None:
     """
     Start the TCP server with a custom connection handler.
     
     Args:
         ip: IP address to bind to (optional, uses config if not provided)
         port: Port to bind to (optional, uses config if not provided)
-        handler: Connection handler function (required)
+        handler: Stream connection handler function (reader, writer)
+        reuse_port: Bind with SO_REUSEPORT so several worker processes share the port
+                    (the kernel load-balances new connections between them)
+        protocol_factory: asyncio.Protocol factory (e.g. DeviceProtocol); used instead of handler
     
     Raises:
-        ValueError: If handler is not provided
+        ValueError: If neither handler nor protocol_factory is provided
     """
-    if not handler:
+    if not handler and not protocol_factory:
         raise ValueError("Handler is required. Current architecture uses direct processing via custom handler.")
     
     # Use provided handler (for RabbitMQ integration)
@@ -69,14 +73,25 @@ async def start_tcp_server(ip: str = None, port: int = None, handler=None) -> No
     bind_port = port or server_config.get('tcp_port', 5027)
     backlog = ServerParams.get_int('tcp_server.backlog', 1000)
     
-    logger.info(f"Starting TCP server on {bind_ip}:{bind_port} with custom handler...")
+    mode = "protocol" if protocol_factory else "custom handler"
+    logger.info(f"Starting TCP server on {bind_ip}:{bind_port} with {mode}{' (SO_REUSEPORT)' if reuse_port else ''}...")
     global _server_instance
-    _server_instance = await asyncio.start_server(
-        handler,
-        bind_ip,
-        bind_port,
-        backlog=backlog
-    )
+    if protocol_factory:
+        _server_instance = await asyncio.get_running_loop().create_server(
+            protocol_factory,
+            bind_ip,
+            bind_port,
+            backlog=backlog,
+            reuse_port=reuse_port or None
+        )
+    else:
+        _server_instance = await asyncio.start_server(
+            handler,
+            bind_ip,
+            bind_port,
+            backlog=backlog,
+            reuse_port=reuse_port or None
+        )
     addr = _server_instance.sockets[0].getsockname()
     logger.info(f"TCP Server listening on {addr}")
     
@@ -0,0 +1,113 @@
+"""
+Multi-process worker pool for the parser node
+Forks N worker processes that share the listen port through SO_REUSEPORT
+
+Each worker runs its own event loop, RabbitMQ producer, AsyncIPTables and mapping
+caches, so decoding, CRC and formatting scale across cores inside one container.
+The supervisor only forks, forwards shutdown signals and restarts workers that died.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def is_supported() -> bool:
+    """Multi-worker mode needs SO_REUSEPORT and fork (Linux/BSD, not Windows)."""
+    return hasattr(socket, 'SO_REUSEPORT') and 'fork' in multiprocessing.get_all_start_methods()
+
+
+def _worker_entry(worker_target: Callable[[int], None], worker_id: int):
+    """Worker process entry point: drop the supervisor's signal handlers, then run the worker."""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    worker_target(worker_id)
+
+
+def run_worker_pool(
+    worker_count: int,
+    worker_target: Callable[[int], None],
+    on_worker_exit: Optional[Callable[[int], None]] = None,
+    restart_delay: float = 1.0,
+    stop_timeout: float = 10.0
+) -> int:
+    """
+    Fork worker_count workers and supervise them until SIGINT/SIGTERM.
+    
+    Args:
+        worker_count: Number of worker processes
+        worker_target: Called as worker_target(worker_id) in each forked worker
+        on_worker_exit: Called as on_worker_exit(worker_id) in the supervisor after a worker exited
+        restart_delay: Seconds to wait before restarting a worker that exited unexpectedly
+        stop_timeout: Seconds to wait for workers on shutdown before killing them
+        
+    Returns:
+        Process exit code
+    """
+    ctx = multiprocessing.get_context('fork')
+    workers: Dict[int, multiprocessing.Process] = {}
+    stop_deadline: Optional[float] = None
+    
+    def _spawn(worker_id: int):
+        process = ctx.Process(
+            target=_worker_entry,
+            args=(worker_target, worker_id),
+            name=f"parser-worker-{worker_id}"
+        )
+        process.start()
+        workers[worker_id] = process
+        logger.info(f"Started parser worker {worker_id} (pid {process.pid})")
+    
+    def _handle_signal(signum, frame):
+        nonlocal stop_deadline
+        if stop_deadline is None:
+            logger.info(f"Received signal {signum}, stopping {len(workers)} parser workers...")
+            stop_deadline = time.monotonic() + stop_timeout
+        # Forward to workers - each runs its own graceful shutdown
+        for process in workers.values():
+            if process.is_alive():
+                try:
+                    os.kill(process.pid, signum)
+                except OSError:
+                    pass
+    
+    for worker_id in range(worker_count):
+        _spawn(worker_id)
+    
+    signal.signal(signal.SIGINT, _handle_signal)
+    signal.signal(signal.SIGTERM, _handle_signal)
+    
+    while workers:
+        for worker_id, process in list(workers.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            del workers[worker_id]
+            if on_worker_exit:
+                try:
+                    on_worker_exit(worker_id)
+                except Exception as e:
+                    logger.warning(f"Error cleaning up after worker {worker_id}: {e}")
+            if stop_deadline is None:
+                logger.error(f"Parser worker {worker_id} (pid {process.pid}) exited with code "
+                             f"{process.exitcode}, restarting in {restart_delay}s")
+                time.sleep(restart_delay)
+                if stop_deadline is None:
+                    _spawn(worker_id)
+        
+        if stop_deadline is not None and time.monotonic() > stop_deadline:
+            for worker_id, process in workers.items():
+                if process.is_alive():
+                    logger.warning(f"Parser worker {worker_id} (pid {process.pid}) did not stop in {stop_timeout}s, killing")
+                    process.kill()
+            stop_deadline = time.monotonic() + stop_timeout
+        
+        time.sleep(0.2)
+    
+    logger.info("All parser workers stopped")
+    return 0
@@ -13,6 +13,7 @@ import logging
 from typing import Dict, List
 
 from teltonika_infrastructure.async_queue import AsyncTeltonikaDataQueues
+from teltonika_listener.packet_framer import PING_FRAME, PacketFramer
 from config import ServerParams
 
 logger = logging.getLogger(__name__)
@@ -31,7 +32,7 @@ class AsyncPacketAnalyzer:
     def __init__(self):
         """Initialize async packet analyzer"""
         self.running = False
-        self._partial_buffers: Dict[str, bytearray] = {}
+        self._framers: Dict[str, PacketFramer] = {}  # ip:port -> framer holding a partial packet
         logger.info("AsyncPacketAnalyzer initialized")
     
     def split_multiple_packets(self, data: bytes, ip: str = "unknown", port: int = 0) -> List[bytes]:
@@ -78,70 +79,31 @@ class AsyncPacketAnalyzer:
         Returns:
             List of complete packets
         """
-        packets = []
         key = f"{ip}:{port}"
+        framer = self._framers.get(key)
+        if framer is None:
+            max_packet_size = ServerParams.get_int('tcp_server.max_packet_size', 10 * 1024 * 1024)  # 10MB default
+            framer = self._framers[key] = PacketFramer(max_packet_size)
+        elif framer.buffered:
+            logger.debug(f"Combining partial buffer ({framer.buffered} bytes) with new data ({len(data)} bytes) for {key}")
+        framer.feed(data)
         
-        # Prepend any previously saved partial buffer
-        if key in self._partial_buffers:
-            prefix = self._partial_buffers.pop(key)
-            if prefix:
-                data = bytes(prefix + data)
-                logger.debug(f"Combined partial buffer ({len(prefix)} bytes) with new data ({len(data)-len(prefix)} bytes) for {key}")
-        
-        i = 0
-        max_packet_size = ServerParams.get_int('tcp_server.max_packet_size', 10 * 1024 * 1024)  # 10MB default
-        
-        while i < len(data):
-            # Teltonika TCP protocol format:
-            # - First byte: 0xFF (ping) or data start
-            # - If 0xFF: skip (ping packet)
-            # - Otherwise: 4 bytes preamble (0x00000000), 4 bytes length, then data + 4 bytes CRC
-            
-            if data[i] == 0xFF:
-                # Ping packet - skip
-                i += 1
-                continue
-            
-            # Need at least 8 bytes for preamble (4) + length (4)
-            if i + 8 > len(data):
-                # Incomplete header - save for next read
-                self._partial_buffers[key] = bytearray(data[i:])
-                logger.debug(f"Incomplete header saved for {key}: {len(data[i:])} bytes")
+        # Same framing as DeviceProtocol: pings skipped, invalid headers resynchronised byte by byte
+        packets = []
+        while True:
+            frame = framer.next_frame()
+            if frame is None:
                 break
-            
-            # Read preamble (4 bytes, should be 0x00000000)
-            preamble = int.from_bytes(data[i:i+4], byteorder='big', signed=False)
-            if preamble != 0:
-                # Invalid preamble - skip byte and try again
-                logger.warning(f"Invalid preamble at offset {i} from {key}: 0x{preamble:08X}, skipping byte")
-                i += 1
+            if frame is PING_FRAME:
                 continue
-            
-            # Read length (4 bytes, big-endian)
-            length = int.from_bytes(data[i+4:i+8], byteorder='big', signed=False)
-            
-            # IMPROVEMENT: Validate length to prevent DoS
-            if length < 0 or length > max_packet_size:
-                logger.error(f"Invalid packet length from {key}: {length} bytes (max: {max_packet_size})")
-                # Skip this byte and try to recover
-                i += 1
-                continue
-            
-            # Calculate total packet size: 4 (preamble) + 4 (length) + length (data) + 4 (CRC)
-            total_packet_size = 8 + length + 4
-            
-            if i + total_packet_size > len(data):
-                # Incomplete packet - save for next read
-                self._partial_buffers[key] = bytearray(data[i:])
-                logger.debug(f"Incomplete packet saved for {key}: need {total_packet_size} bytes, have {len(data[i:])} bytes")
-                break
-            
-            # Extract complete packet
-            packet = data[i:i + total_packet_size]
-            packets.append(packet)
-            logger.debug(f"Extracted packet from {key}: {total_packet_size} bytes (data length: {length})")
-            i += total_packet_size
+            # Copy: frames are only valid until the next feed()
+            packets.append(bytes(frame))
+            logger.debug(f"Extracted packet from {key}: {len(frame)} bytes (data length: {len(frame) - 12})")
         
+        if framer.buffered:
+            logger.debug(f"Incomplete packet saved for {key}: {framer.buffered} bytes")
+        else:
+            del self._framers[key]
         return packets
     
     async def process_packets(self):
@@ -204,9 +166,9 @@ class AsyncPacketAnalyzer:
                 elif len(split_packets) == 0:
                     # Check if we have a partial buffer (might be incomplete packet)
                     key = f"{ip}:{port}"
-                    if key in self._partial_buffers:
+                    if key in self._framers:
                         partial_buffers_count += 1
-                        logger.debug(f"No complete packets extracted from {len(data)} bytes from {ip}:{port} (partial buffer: {len(self._partial_buffers[key])} bytes)")
+                        logger.debug(f"No complete packets extracted from {len(data)} bytes from {ip}:{port} (partial buffer: {self._framers[key].buffered} bytes)")
                     else:
                         logger.warning(f"No packets extracted from {len(data)} bytes from {ip}:{port} (might be incomplete or invalid)")
                         packets_failed += 1
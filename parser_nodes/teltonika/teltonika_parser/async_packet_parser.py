@@ -7,7 +7,7 @@ import asyncio
 import logging
 import struct
 import json
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime, timedelta, timezone
 import sys
 import os
@@ -19,12 +19,62 @@ from teltonika_infrastructure.async_queue import AsyncTeltonikaDataQueues
 from teltonika_infrastructure.async_ip_table import AsyncGlobalIPTable
 from teltonika_infrastructure.async_synchronized_buffer import async_synchronized_buffer
 from teltonika_codec.data_decoder import DataDecoder
+from teltonika_codec.avl_decoder import AvlDecoder
 from teltonika_codec.reverse_binary_reader import ReverseBinaryReader
 from teltonika_codec.models.tcp_data_packet import TcpDataPacket
 from teltonika_codec.models.codec12_response import Codec12Response
+from teltonika_codec.models.compact_avl_data import CompactIoElement
+from teltonika_database.io_mapping_plan import IoMappingPlan
 
 logger = logging.getLogger(__name__)
 
+# Base record structure - all schema columns in database order
+# Column order matches trackdata table: imei, server_time, gps_time, latitude, longitude, ...
+# Columns will be populated dynamically from Unit IO mapping (not hard-coded logic)
+_BASE_RECORD_TEMPLATE: Dict[str, Any] = {
+    'imei': None,
+    'server_time': None,
+    'gps_time': None,
+    'latitude': 0.0,
+    'longitude': 0.0,
+    'altitude': 0,
+    'angle': 0,
+    'satellites': 0,
+    'speed': 0,
+    'status': 'Normal',  # Will be updated from event_id mapping below (DEFAULT_STATUS)
+    'passenger_seat': '',
+    'main_battery': '',
+    'battery_voltage': '',
+    'fuel': '',
+    'dallas_temperature_1': '',
+    'dallas_temperature_2': '',
+    'dallas_temperature_3': '',
+    'dallas_temperature_4': '',
+    'ble_humidity_1': '',
+    'ble_humidity_2': '',
+    'ble_humidity_3': '',
+    'ble_humidity_4': '',
+    'ble_temperature_1': '',
+    'ble_temperature_2': '',
+    'ble_temperature_3': '',
+    'ble_temperature_4': '',
+    'green_driving_value': '',
+    'dynamic_io': '{}',
+    'is_valid': 0
+}
+
+# io_id -> ('io_<dec>', 'io_<HEX>') keys for io_data (built once per IO ID)
+_io_data_keys: Dict[int, Tuple[str, str]] = {}
+
+
+def _get_io_data_keys(io_id: int) -> Tuple[str, str]:
+    """Get the decimal and hex io_data keys for an IO ID (e.g. io_239 / io_EF)."""
+    keys = _io_data_keys.get(io_id)
+    if keys is None:
+        keys = (f'io_{io_id}', f'io_{io_id:02X}')
+        _io_data_keys[io_id] = keys
+    return keys
+
 # Codec 12 response handler callback (set by GPRS command sender)
 # Called when a Codec 12 response is received from a device
 _codec12_response_handler = None
@@ -82,12 +132,27 @@ class AsyncPacketParser:
             logger.warning(f"Could not get database Unit IO mapping loader for IMEI {imei}: {e}. Unit IO mapping will be skipped.")
             return None
     
+    async def _get_io_mapping_plan(self, imei: str) -> IoMappingPlan:
+        """
+        Get the compiled Unit IO mapping plan for IMEI (loading mappings if needed).
+        
+        Returns:
+            IoMappingPlan, or IoMappingPlan.EMPTY if the loader or the mappings are unavailable
+        """
+        unit_io_mapping_loader = await self._get_unit_io_mapping_loader(imei)
+        if not unit_io_mapping_loader:
+            return IoMappingPlan.EMPTY
+        plan = unit_io_mapping_loader.get_mapping_plan(imei)
+        return plan if plan is not None else IoMappingPlan.EMPTY
+    
     def _try_decode_tcp_packet(self, packet_bytes: bytes) -> Optional[TcpDataPacket]:
         """
         Try to decode TCP packet from raw bytes (AVL data only).
         
-        Decodes Teltonika protocol packet using ReverseBinaryReader and DataDecoder.
-        Handles all supported AVL codecs (7, 8, 8E, 16).
+        Decodes Teltonika protocol packet using AvlDecoder (struct/memoryview based).
+        Handles all supported AVL codecs (7, 8, 8E, 16); Codec 7 is delegated to the
+        ReverseBinaryReader based decoder. Codec 8/8E/16 records are decoded into the
+        compact CompactAvlData model (array-backed IO properties).
         
         Note: For Codec 12 (GPRS commands), use _try_decode_codec12() instead. Unit IO mapping is applied in _format_avl_record_to_dict().
         
@@ -101,10 +166,7 @@ class AsyncPacketParser:
             No exceptions raised - all errors are caught and logged
         """
         try:
-            import io
-            reader = ReverseBinaryReader(io.BytesIO(packet_bytes))
-            decoder = DataDecoder(reader)
-            return decoder.decode_tcp_data()
+            return AvlDecoder(packet_bytes, compact=True).decode_tcp_data()
         except Exception as e:
             packet_size = len(packet_bytes) if packet_bytes else 0
             logger.error(
@@ -227,7 +289,7 @@ class AsyncPacketParser:
             response = struct.pack('>I', num_accepted)
             writer.write(response)
             await writer.drain()
-            logger.info(f"✓ ACK sent: {num_accepted} elements accepted")
+            logger.debug(f"✓ ACK sent: {num_accepted} elements accepted")
         
         except Exception as e:
             imei = getattr(writer, '_imei', 'unknown') if writer else 'unknown'
@@ -265,46 +327,23 @@ class AsyncPacketParser:
         # Calculate is_valid: 0 if both lat and lon are zero, else 1
         is_valid = IS_VALID_FALSE if (latitude == INVALID_GPS_LATITUDE and longitude == INVALID_GPS_LONGITUDE) else IS_VALID_TRUE
         
-        # Base record structure - initialize all schema columns in database order
-        # Column order matches trackdata table: imei, server_time, gps_time, latitude, longitude, ...
-        # Columns will be populated dynamically from Unit IO mapping (not hard-coded logic)
-        base_record = {
-            'imei': imei,
-            'server_time': server_time.isoformat(),
-            'gps_time': gps_time.isoformat() if gps_time else server_time.isoformat(),
-            'latitude': latitude,
-            'longitude': longitude,
-            'altitude': altitude,
-            'angle': angle,
-            'satellites': satellites,
-            'speed': speed,
-            'status': 'Normal',  # Will be updated from event_id mapping below (DEFAULT_STATUS)
-            'passenger_seat': '',
-            'main_battery': '',
-            'battery_voltage': '',
-            'fuel': '',
-            'dallas_temperature_1': '',
-            'dallas_temperature_2': '',
-            'dallas_temperature_3': '',
-            'dallas_temperature_4': '',
-            'ble_humidity_1': '',
-            'ble_humidity_2': '',
-            'ble_humidity_3': '',
-            'ble_humidity_4': '',
-            'ble_temperature_1': '',
-            'ble_temperature_2': '',
-            'ble_temperature_3': '',
-            'ble_temperature_4': '',
-            'green_driving_value': '',
-            'dynamic_io': '{}',
-            'is_valid': is_valid
-        }
+        base_record = _BASE_RECORD_TEMPLATE.copy()
+        base_record['imei'] = imei
+        base_record['server_time'] = server_time.isoformat()
+        base_record['gps_time'] = gps_time.isoformat() if gps_time else base_record['server_time']
+        base_record['latitude'] = latitude
+        base_record['longitude'] = longitude
+        base_record['altitude'] = altitude
+        base_record['angle'] = angle
+        base_record['satellites'] = satellites
+        base_record['speed'] = speed
+        base_record['is_valid'] = is_valid
         
         # Complete IO element processing with Unit IO mapping
         io_element = getattr(record, "io_element", None)
-        io_data_dict = {}
         dynamic_io = {}
         event_status = 'Normal'  # Default status (following original logic)
+        status_action = None  # Status mapping that created the status (for alarm check)
         
         if io_element:
             io_data = {}
@@ -312,87 +351,44 @@ class AsyncPacketParser:
             # Get event_id (the IO that triggered this AVL record)
             event_id = io_element.event_id if io_element else ""
             
-            # Get database Unit IO mapping loader and ensure mappings are loaded for this IMEI
-            unit_io_mapping_loader = await self._get_unit_io_mapping_loader(imei)
+            # Get the compiled Unit IO mapping plan for this IMEI (loads mappings if needed)
+            plan = await self._get_io_mapping_plan(imei)
+            plan_entries = plan.entries
+            
+            # Flatten IO properties to (io_id, raw_value) pairs once (works for both record models)
+            io_values = self._get_io_values(io_element)
             
             # Determine status from event_id (Teltonika protocol logic)
-            # Note: event_id can be 0 (integer), so we check if io_element exists and has properties
-            # Since event_id is only set when io_element exists, we just need to check io_element
-            status_mapping = None  # Store the mapping that created the status for alarm check
-            if io_element and io_element.properties:
-                # Find the IO property that matches the event_id
-                # event_id can be 0, so we need to handle it as an integer comparison
-                for prop in io_element.properties:
-                    if prop.id == event_id:
-                        raw_value = self._get_io_value(prop)
-                        if unit_io_mapping_loader and raw_value is not None:
-                            mappings = unit_io_mapping_loader.get_mappings_for_io(event_id, imei)
-                            
-                            # Find matching mapping for status event
-                            for mapping in mappings:
-                                if mapping.target in [1, 2] and mapping.io_type == 2:  # Digital
-                                    if mapping.value is not None:
-                                        # Compare values (handle both int and float)
-                                        # For digital IOs, exact match is expected
-                                        if int(raw_value) == int(mapping.value):
-                                            event_status = f"{mapping.io_name} {mapping.value_name}"
-                                            status_mapping = mapping  # Store for alarm check
-                                            break
-                        break
-            
-            # Process all IO properties for column values, JSONB, and io_properties string
-            if io_element and io_element.properties:
-                for prop in io_element.properties:
-                    io_id = prop.id
-                    raw_value = self._get_io_value(prop)
-                    
-                    # Store raw IO data for database purposes (not in original, but needed for database)
-                    if io_id is not None:
-                        io_data[f'io_{io_id}'] = raw_value
-                        io_data[f'io_{io_id:02X}'] = raw_value  # Hex format (e.g., io_EF for 239)
-                        io_data_dict[f'io_{io_id}'] = raw_value
-                    
-                    # Get mappings for this IO ID
-                    mappings = unit_io_mapping_loader.get_mappings_for_io(io_id, imei) if unit_io_mapping_loader else []
-                    
-                    for mapping in mappings:
-                        # Process column values (target = 0 or 2)
-                        if mapping.target in [0, 2] and mapping.column_name:
-                            if raw_value is not None:
-                                # Apply multiplier if present and non-zero (for analog IOs or IOs with multiplier)
-                                # Digital IOs (io_type=2) typically don't have multipliers, but if one is specified, apply it
-                                if mapping.io_multiplier and mapping.io_multiplier != 1.0:
-                                    calculated_value = raw_value * mapping.io_multiplier
-                                else:
-                                    calculated_value = raw_value
-                                
-                                column_name = mapping.column_name
-                                
-                                # Only process if column exists in base_record (schema column)
-                                # This ensures we only populate known schema columns
-                                if column_name in base_record:
-                                    # Format value based on IO type and multiplier (not hard-coded column names)
-                                    formatted_value = self._format_io_value(
-                                        calculated_value, 
-                                        mapping.io_type, 
-                                        mapping.io_multiplier,
-                                        raw_value,
-                                        mapping.io_name
-                                    )
-                                    
-                                    if formatted_value is not None:
-                                        base_record[column_name] = formatted_value
-                        
-                        # Process JSONB (target = 3)
-                        if mapping.target == 3 and mapping.column_name:
-                            if raw_value is not None:
-                                # Apply multiplier if present and non-zero (for analog IOs or IOs with multiplier)
-                                # Digital IOs (io_type=2) typically don't have multipliers, but if one is specified, apply it
-                                if mapping.io_multiplier and mapping.io_multiplier != 1.0:
-                                    calculated_value = raw_value * mapping.io_multiplier
-                                else:
-                                    calculated_value = raw_value
-                                dynamic_io[mapping.column_name] = calculated_value
+            # event_id can be 0, so we need to handle it as an integer comparison
+            for io_id, raw_value in io_values:
+                if io_id == event_id:
+                    entry = plan_entries.get(io_id)
+                    if entry is not None and raw_value is not None:
+                        # For digital IOs, exact match is expected
+                        status_action = entry.status_by_value.get(int(raw_value))
+                        if status_action is not None:
+                            event_status = status_action.status
+                    break
+            
+            # Process all IO properties for column values, JSONB, and io_data in one pass
+            for io_id, raw_value in io_values:
+                # Store raw IO data for database purposes (decimal and hex keys, e.g. io_239 / io_EF)
+                dec_key, hex_key = _get_io_data_keys(io_id)
+                io_data[dec_key] = raw_value
+                io_data[hex_key] = raw_value
+                
+                entry = plan_entries.get(io_id)
+                if entry is None or raw_value is None:
+                    continue
+                
+                # Column values (target = 0 or 2) - only known schema columns are populated
+                for action in entry.columns:
+                    if action.column_name in base_record:
+                        base_record[action.column_name] = action.format(raw_value)
+                
+                # JSONB (target = 3)
+                for action in entry.jsonb:
+                    dynamic_io[action.key] = action.value(raw_value)
             
             if io_data:
                 base_record['io_data'] = json.dumps(io_data)
@@ -402,7 +398,7 @@ class AsyncPacketParser:
             # put all IOs from io_data into dynamic_io.
             # NOTE: Original code has similar fallback logic in async_save_to_csv.py (lines 242-257).
             # This implementation moves the fallback to the parser for earlier handling in the pipeline.
-            if not dynamic_io and io_data and (not unit_io_mapping_loader or not unit_io_mapping_loader.has_mappings_for_imei(imei)):
+            if not dynamic_io and io_data and not plan.has_mappings:
                 # Put all Unit IOs into dynamic_io when no mappings exist for this Unit IMEI
                 dynamic_io = {k: v for k, v in io_data.items() if k.startswith('io_')}
                 logger.debug(f"No Unit IO mappings found for Unit IMEI {imei}, storing all IOs in dynamic_io: {len(dynamic_io)} IOs")
@@ -415,14 +411,14 @@ class AsyncPacketParser:
         # Add alarm fields to base_record if it's an alarm
         # (We create ONE record with all fields, then select columns when saving)
         base_record['is_alarm'] = 0
-        if event_status != 'Normal' and status_mapping and status_mapping.is_alarm:
+        if event_status != 'Normal' and status_action and status_action.is_alarm:
             # Check if GPS time is within the time window (StartTime/EndTime)
             # gps_time from device is UTC
-            if self._is_time_in_window(gps_time, status_mapping.start_time, status_mapping.end_time):
+            if status_action.in_window(gps_time):
                 base_record['is_alarm'] = 1
-                base_record['is_sms'] = 1 if status_mapping.is_sms else 0
-                base_record['is_email'] = 1 if status_mapping.is_email else 0
-                base_record['is_call'] = 1 if status_mapping.is_call else 0
+                base_record['is_sms'] = 1 if status_action.is_sms else 0
+                base_record['is_email'] = 1 if status_action.is_email else 0
+                base_record['is_call'] = 1 if status_action.is_call else 0
         
         # Find nearest location reference and calculate distance
         base_record['reference_id'] = None
@@ -443,72 +439,25 @@ class AsyncPacketParser:
         records.append(base_record)
         return records
     
-    def _calculate_decimal_places(self, multiplier: float) -> int:
-        """
-        Calculate number of decimal places needed based on multiplier.
-        Examples:
-        - multiplier 1.0 -> 0 decimal places
-        - multiplier 0.1 -> 1 decimal place
-        - multiplier 0.01 -> 2 decimal places
-        - multiplier 0.001 -> 3 decimal places
-        """
-        if multiplier == 0:
-            return 0
-        
-        # Convert to string to count decimal places
-        multiplier_str = f"{multiplier:.10f}".rstrip('0').rstrip('.')
-        if '.' in multiplier_str:
-            return len(multiplier_str.split('.')[1])
-        return 0
-    
-    def _format_io_value(self, calculated_value: float, io_type: int, io_multiplier: float, 
-                         raw_value: float, io_name: str) -> Optional[str]:
+    def _get_io_values(self, io_element: Any) -> List[Tuple[int, Optional[float]]]:
         """
-        Format IO value based on IO type and multiplier (not hard-coded column names).
+        Flatten an IO element into (io_id, raw_value) pairs in wire order.
         
-        Args:
-            calculated_value: Value after applying multiplier (if multiplier was applied) or raw value
-            io_type: 2=Digital, 3=Analog
-            io_multiplier: Multiplier used to calculate the value
-            raw_value: Raw value before multiplier (for error code checking)
-            io_name: IO name from mapping (for temperature error code detection)
-            
-        Returns:
-            Formatted string value, or empty string if error code detected or value is 0
+        Adapter over both record models: a CompactIoElement (AvlDecoder compact mode) is read
+        straight from its id/value arrays without creating IoProperty objects; an IoElement
+        (Codec 7) goes through _get_io_value() per property.
         """
-        if calculated_value == 0:
-            return ""
-        
-        # Digital IOs (io_type=2): format as integer UNLESS multiplier was applied
-        # If multiplier was applied (and != 1.0), format with decimals
-        if io_type == 2:
-            # If multiplier was applied, format with decimals based on multiplier precision
-            if io_multiplier and io_multiplier != 1.0:
-                decimal_places = self._calculate_decimal_places(io_multiplier)
-                return f"{calculated_value:.{decimal_places}f}"
-            else:
-                return str(int(calculated_value))
-        
-        # Analog IOs (io_type=3): format based on multiplier precision
-        # Check for temperature error codes based on io_name pattern (not column name)
-        io_name_lower = io_name.lower()
-        if 'temperature' in io_name_lower:
-            # Determine sensor type from io_name
-            sensor_type = 'dallas' if 'dallas' in io_name_lower else 'ble'
-            error_msg = self._check_temperature_error_code(raw_value, sensor_type)
-            if error_msg:
-                return ""  # Empty for error codes
-        
-        # Calculate decimal places from multiplier
-        # This ensures precision matches the multiplier (e.g., 0.001 -> 3 decimals, 0.1 -> 1 decimal)
-        decimal_places = self._calculate_decimal_places(io_multiplier)
-        
-        # Format with appropriate precision based on multiplier
-        if decimal_places == 0:
-            return str(int(calculated_value))
-        else:
-            # Use the calculated precision from multiplier, not hard-coded .1f
-            return f"{calculated_value:.{decimal_places}f}"
+        if isinstance(io_element, CompactIoElement):
+            io_values = [(io_id, float(value)) for io_id, value in zip(io_element.ids, io_element.values)]
+            if io_element.array_properties:
+                io_values.extend(
+                    (io_id, self._array_value_to_float(value) if value else None)
+                    for io_id, value in io_element.array_properties
+                )
+            return io_values
+        if not io_element.properties:
+            return []
+        return [(prop.id, self._get_io_value(prop)) for prop in io_element.properties]
     
     def _get_io_value(self, prop: Any) -> Optional[float]:
         """Extract numeric value from IO property (Teltonika protocol logic)."""
@@ -525,96 +474,33 @@ class AsyncPacketParser:
             
             # Try to get array_value (for multi-byte values)
             if hasattr(prop, 'array_value') and prop.array_value:
-                # For array values, interpret as bytes and convert to number
-                try:
-                    if len(prop.array_value) == 1:
-                        return float(prop.array_value[0])
-                    elif len(prop.array_value) == 2:
-                        # Big-endian 16-bit
-                        return float((prop.array_value[0] << 8) | prop.array_value[1])
-                    elif len(prop.array_value) == 4:
-                        # Big-endian 32-bit
-                        return float((prop.array_value[0] << 24) | (prop.array_value[1] << 16) | 
-                                     (prop.array_value[2] << 8) | prop.array_value[3])
-                    elif len(prop.array_value) == 8:
-                        # Big-endian 64-bit
-                        return float((prop.array_value[0] << 56) | (prop.array_value[1] << 48) |
-                                     (prop.array_value[2] << 40) | (prop.array_value[3] << 32) |
-                                     (prop.array_value[4] << 24) | (prop.array_value[5] << 16) |
-                                     (prop.array_value[6] << 8) | prop.array_value[7])
-                except (ValueError, TypeError, IndexError):
-                    return None
+                return self._array_value_to_float(prop.array_value)
             
             return None
         except Exception:
             return None
     
-    def _check_temperature_error_code(self, raw_value: float, sensor_type: str) -> Optional[str]:
-        """Check if raw temperature value is an error code and return error message (following original logic)."""
-        if sensor_type == 'dallas':
-            # Dallas Temperature error codes
-            if raw_value == 850 or raw_value == 5000:
-                return "Sensor not ready"
-            elif raw_value == 2000:
-                return "Value read error"
-            elif raw_value == 3000:
-                return "Not connected"
-            elif raw_value == 4000:
-                return "ID failed"
-        elif sensor_type == 'ble':
-            # BLE Temperature error codes
-            if raw_value == 4000:
-                return "Abnormal sensor state"
-            elif raw_value == 3000:
-                return "Sensor not found"
-            elif raw_value == 2000:
-                return "Failed sensor data parsing"
-        
-        return None
-    
-    def _is_time_in_window(self, gps_datetime: datetime, start_time_str: str, end_time_str: str) -> bool:
-        """
-        Check if GPS datetime time component is within the start_time and end_time window.
-        
-        Args:
-            gps_datetime: GPS datetime (UTC from device)
-            start_time_str: Start time in HH:MM:SS format (e.g., "3:00:00")
-            end_time_str: End time in HH:MM:SS format (e.g., "6:00:00")
-        
-        Returns:
-            True if GPS time is within the window, False otherwise
-        """
+    def _array_value_to_float(self, array_value: bytes) -> Optional[float]:
+        """Interpret a variable-length IO value (1, 2, 4 or 8 bytes, big-endian) as a number."""
         try:
-            # Parse time strings (handle both "HH:MM:SS" and "H:MM:SS" formats)
-            def parse_time(time_str: str) -> tuple[int, int, int]:
-                parts = time_str.split(':')
-                if len(parts) == 3:
-                    return int(parts[0]), int(parts[1]), int(parts[2])
-                return 0, 0, 0
-            
-            start_hour, start_min, start_sec = parse_time(start_time_str)
-            end_hour, end_min, end_sec = parse_time(end_time_str)
-            
-            # Get GPS time components (UTC from device)
-            gps_hour = gps_datetime.hour
-            gps_min = gps_datetime.minute
-            gps_sec = gps_datetime.second
-            
-            # Convert to seconds for easier comparison
-            gps_total_sec = gps_hour * 3600 + gps_min * 60 + gps_sec
-            start_total_sec = start_hour * 3600 + start_min * 60 + start_sec
-            end_total_sec = end_hour * 3600 + end_min * 60 + end_sec
-            
-            # Handle time window that spans midnight (e.g., 22:00:00 to 6:00:00)
-            if start_total_sec > end_total_sec:
-                # Window spans midnight
-                return gps_total_sec >= start_total_sec or gps_total_sec <= end_total_sec
-            else:
-                # Normal window within same day
-                return start_total_sec <= gps_total_sec <= end_total_sec
-        except Exception as e:
-            logger.warning(f"Error checking time window: {e}")
-            return False
+            if len(array_value) == 1:
+                return float(array_value[0])
+            elif len(array_value) == 2:
+                # Big-endian 16-bit
+                return float((array_value[0] << 8) | array_value[1])
+            elif len(array_value) == 4:
+                # Big-endian 32-bit
+                return float((array_value[0] << 24) | (array_value[1] << 16) | 
+                             (array_value[2] << 8) | array_value[3])
+            elif len(array_value) == 8:
+                # Big-endian 64-bit
+                return float((array_value[0] << 56) | (array_value[1] << 48) |
+                             (array_value[2] << 40) | (array_value[3] << 32) |
+                             (array_value[4] << 24) | (array_value[5] << 16) |
+                             (array_value[6] << 8) | array_value[7])
+        except (ValueError, TypeError, IndexError):
+            return None
+        return None
     
     async def _parse_and_process_packet(self, packet_data: Dict[str, Any]) -> Dict[str, int]:
         """
@@ -4,6 +4,7 @@ Wraps AsyncPacketParser to publish to RabbitMQ or save to CSV based on mode
 """
 import asyncio
 import logging
+import uuid
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timezone
 
@@ -129,9 +130,11 @@ class RabbitMQPacketParser:
                     logger.error("RabbitMQ producer not initialized but mode requires RabbitMQ")
                     return records, False
                 
-                all_published = True
                 parser_node_id = Config.load().get('parser_node', {}).get('node_id', 'unknown')
                 
+                # Build every message of the packet first, then publish them as one batch
+                # (confirms awaited together instead of one broker round trip per message)
+                messages = []
                 for record in records:
                     # Determine which queues this record should go to
                     # Logic:
@@ -144,7 +147,6 @@ class RabbitMQPacketParser:
                     is_event = record.get('status', 'Normal') != 'Normal'
                     
                     # Format message according to plan (standardized format)
-                    import uuid
                     base_message = {
                         "vendor": self.vendor,
                         "vendor_version": "1.0",
@@ -158,61 +160,35 @@ class RabbitMQPacketParser:
                         }
                     }
                     
-                    # Publish to trackdata_queue (always)
-                    message = {
-                        **base_message,
-                        "message_id": str(uuid.uuid4()),
-                        "record_type": "trackdata"
-                    }
-                    published = await self.rabbitmq_producer.publish_tracking_record(
-                        record=message,
-                        vendor=self.vendor,
-                        record_type="trackdata",
-                        timeout=5.0
-                    )
-                    if published:
-                        self.load_monitor.record_publish_success()
-                    else:
-                        self.load_monitor.record_publish_failure()
-                        all_published = False
-                    
-                    # Publish to events_queue if status != 'Normal'
+                    # trackdata_queue (always), events_queue if status != 'Normal', alarms_queue if is_alarm == 1
+                    record_types = ["trackdata"]
                     if is_event:
-                        message = {
-                            **base_message,
-                            "message_id": str(uuid.uuid4()),
-                            "record_type": "event"
-                        }
-                        published = await self.rabbitmq_producer.publish_tracking_record(
-                            record=message,
-                            vendor=self.vendor,
-                            record_type="event",
-                            timeout=5.0
-                        )
-                        if published:
-                            self.load_monitor.record_publish_success()
-                        else:
-                            self.load_monitor.record_publish_failure()
-                            all_published = False
-                    
-                    # Publish to alarms_queue if is_alarm == 1
+                        record_types.append("event")
                     if is_alarm:
+                        record_types.append("alarm")
+                    
+                    for record_type in record_types:
                         message = {
                             **base_message,
                             "message_id": str(uuid.uuid4()),
-                            "record_type": "alarm"
+                            "record_type": record_type
                         }
-                        published = await self.rabbitmq_producer.publish_tracking_record(
-                            record=message,
-                            vendor=self.vendor,
-                            record_type="alarm",
-                            timeout=5.0
-                        )
-                        if published:
-                            self.load_monitor.record_publish_success()
-                        else:
-                            self.load_monitor.record_publish_failure()
-                            all_published = False
+                        messages.append((message, record_type))
+                
+                results = await self.rabbitmq_producer.publish_batch(
+                    messages,
+                    vendor=self.vendor,
+                    timeout=5.0
+                )
+                
+                # All-or-nothing: device only gets ACK if every message was confirmed
+                all_published = True
+                for published in results:
+                    if published:
+                        self.load_monitor.record_publish_success()
+                    else:
+                        self.load_monitor.record_publish_failure()
+                        all_published = False
                 
                 # Update metrics
                 self.load_monitor.increment_messages(len(records))
@@ -4,6 +4,7 @@ Tracks and reports parser service load metrics
 """
 import asyncio
 import logging
+import multiprocessing
 import os
 import psutil
 from datetime import datetime, timezone
@@ -14,6 +15,37 @@ from config import Config, ServerParams
 
 logger = logging.getLogger(__name__)
 
+# Counters shared between workers in multi-worker mode (summed into the node's metrics)
+WORKER_COUNTER_FIELDS = (
+    'active_connections', 'total_connections', 'total_rejected', 'messages_processed',
+    'total_packets', 'total_records', 'total_errors', 'publish_successes', 'publish_failures'
+)
+
+
+class SharedWorkerCounters:
+    """
+    Per-worker counter snapshots in shared memory (create before forking workers).
+    Each worker writes only its own row; the reporting worker sums all rows.
+    """
+    
+    def __init__(self, worker_count: int):
+        self.worker_count = worker_count
+        self._values = multiprocessing.Array('q', worker_count * len(WORKER_COUNTER_FIELDS), lock=False)
+    
+    def store(self, worker_id: int, monitor: 'ParserNodeLoadMonitor'):
+        """Store monitor's current counters as worker_id's snapshot."""
+        offset = worker_id * len(WORKER_COUNTER_FIELDS)
+        for i, field in enumerate(WORKER_COUNTER_FIELDS):
+            self._values[offset + i] = getattr(monitor, field)
+    
+    def totals(self) -> Dict[str, int]:
+        """Sum of all workers' latest snapshots."""
+        field_count = len(WORKER_COUNTER_FIELDS)
+        return {
+            field: sum(self._values[w * field_count + i] for w in range(self.worker_count))
+            for i, field in enumerate(WORKER_COUNTER_FIELDS)
+        }
+
 
 class ParserNodeLoadMonitor:
     """Monitor and report parser service load metrics"""
@@ -33,6 +65,10 @@ class ParserNodeLoadMonitor:
         self.start_time = datetime.now(timezone.utc)
         self._report_task: Optional[asyncio.Task] = None
         
+        # Multi-worker mode: counters of all workers are aggregated, worker 0 reports for the node
+        self._shared_counters: Optional[SharedWorkerCounters] = None
+        self._worker_id = 0
+        
         # Load configuration
         load_config = Config.load().get('load_monitoring', {})
         self.enabled = load_config.get('enabled', True)
@@ -45,6 +81,14 @@ class ParserNodeLoadMonitor:
         # Get max connections from config
         self.max_connections = ServerParams.get_int('tcp_server.max_concurrent_connections', 5000)
     
+    def attach_shared_counters(self, shared_counters: SharedWorkerCounters, worker_id: int):
+        """
+        Share this worker's counters with the other workers of the node.
+        Snapshots are stored every report interval, so node totals lag by at most one interval.
+        """
+        self._shared_counters = shared_counters
+        self._worker_id = worker_id
+    
     def increment_connections(self):
         """Increment active connection count"""
         self.active_connections += 1
@@ -106,6 +150,11 @@ class ParserNodeLoadMonitor:
         while True:
             try:
                 await asyncio.sleep(self.report_interval)
+                if self._shared_counters:
+                    self._shared_counters.store(self._worker_id, self)
+                    if self._worker_id != 0:
+                        # Only worker 0 reports (node totals); others just publish their snapshot
+                        continue
                 await self.report_metrics()
             except asyncio.CancelledError:
                 break
@@ -113,28 +162,33 @@ class ParserNodeLoadMonitor:
                 logger.error(f"Error in periodic reporting: {e}", exc_info=True)
     
     async def report_metrics(self) -> Dict[str, Any]:
-        """Report metrics to monitoring server"""
+        """Report metrics to monitoring server (node totals in multi-worker mode)"""
+        counters = self._get_counters()
+        publish_successes = counters['publish_successes']
+        publish_failures = counters['publish_failures']
         metrics = {
             "node_id": self.node_id,
             "vendor": self.vendor,
             "timestamp": datetime.now(timezone.utc).isoformat() + "Z",
-            "active_connections": self.active_connections,
-            "total_connections": self.total_connections,
-            "total_rejected": self.total_rejected,
+            "active_connections": counters['active_connections'],
+            "total_connections": counters['total_connections'],
+            "total_rejected": counters['total_rejected'],
             "max_connections": self.max_connections,
-            "connection_utilization": (self.active_connections / self.max_connections * 100) if self.max_connections > 0 else 0,
-            "messages_per_second": self._calculate_mps(),
-            "total_packets": self.total_packets,
-            "total_records": self.total_records,
-            "total_errors": self.total_errors,
-            "total_messages": self.messages_processed,
+            "connection_utilization": (counters['active_connections'] / self.max_connections * 100) if self.max_connections > 0 else 0,
+            "messages_per_second": self._calculate_mps(counters['messages_processed']),
+            "total_packets": counters['total_packets'],
+            "total_records": counters['total_records'],
+            "total_errors": counters['total_errors'],
+            "total_messages": counters['messages_processed'],
             "cpu_usage": psutil.cpu_percent(interval=0.1),
             "memory_usage_mb": psutil.virtual_memory().used / 1024 / 1024,
             "memory_usage_percent": psutil.virtual_memory().percent,
-            "publish_success_rate": self._calculate_success_rate(),
-            "total_published": self.publish_successes,
-            "error_rate": self.publish_failures / max(self.publish_successes + self.publish_failures, 1) * 100
+            "publish_success_rate": self._calculate_success_rate(publish_successes, publish_failures),
+            "total_published": publish_successes,
+            "error_rate": publish_failures / max(publish_successes + publish_failures, 1) * 100
         }
+        if self._shared_counters:
+            metrics["workers"] = self._shared_counters.worker_count
         
         # Send to monitoring API
         if self.api_endpoint:
@@ -155,18 +209,24 @@ class ParserNodeLoadMonitor:
         
         return metrics
     
-    def _calculate_mps(self) -> float:
+    def _get_counters(self) -> Dict[str, int]:
+        """Counters of this process, or summed over all workers in multi-worker mode"""
+        if self._shared_counters:
+            return self._shared_counters.totals()
+        return {field: getattr(self, field) for field in WORKER_COUNTER_FIELDS}
+    
+    def _calculate_mps(self, messages_processed: int) -> float:
         """Calculate messages per second"""
         elapsed = (datetime.now(timezone.utc) - self.start_time).total_seconds()
         if elapsed > 0:
-            return self.messages_processed / elapsed
+            return messages_processed / elapsed
         return 0.0
     
-    def _calculate_success_rate(self) -> float:
+    def _calculate_success_rate(self, publish_successes: int, publish_failures: int) -> float:
         """Calculate publish success rate"""
-        total = self.publish_successes + self.publish_failures
+        total = publish_successes + publish_failures
         if total > 0:
-            return (self.publish_successes / total) * 100
+            return (publish_successes / total) * 100
         return 100.0
 
 
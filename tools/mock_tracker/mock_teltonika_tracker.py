@@ -78,13 +78,26 @@ class IOElement:
     """IO Element with property ID and value."""
     property_id: int
     value: int
-    size: int  # 1, 2, 4, or 8 bytes
+    size: int  # 1, 2, 4, or 8 bytes (0 = variable length bytes value, Codec 8E only)
+
+
+@dataclass
+class AVLRecord:
+    """One AVL record of a data packet."""
+    gps: GPSData
+    timestamp: datetime
+    io_elements: List[IOElement]
+    priority: int = 0
+    event_io_id: Optional[int] = None
 
 
 class TeltonikaPacketBuilder:
-    """Builds valid Teltonika Codec 8 packets."""
+    """Builds valid Teltonika Codec 8, 8E, 16 and 12 packets."""
     
     CODEC_8 = 0x08
+    CODEC_8E = 0x8E
+    CODEC_12 = 0x0C
+    CODEC_16 = 0x10
     EPOCH = datetime(1970, 1, 1)
     
     @classmethod
@@ -104,9 +117,10 @@ class TeltonikaPacketBuilder:
         timestamp: Optional[datetime] = None,
         io_elements: Optional[List[IOElement]] = None,
         priority: int = 0,
-        event_io_id: int = None
+        event_io_id: int = None,
+        codec_id: int = CODEC_8
     ) -> bytes:
-        """Build a Codec 8 data packet.
+        """Build a data packet with one AVL record (Codec 8 unless codec_id says otherwise).
         
         Packet structure:
         - Preamble (4 bytes): 0x00000000
@@ -129,6 +143,7 @@ class TeltonikaPacketBuilder:
                         - 155/156: GeoFence
                         - 253: Harsh driving
                         - etc.
+            codec_id: CODEC_8, CODEC_8E or CODEC_16
         """
         if timestamp is None:
             timestamp = datetime.now(timezone.utc).replace(tzinfo=None)
@@ -136,13 +151,47 @@ class TeltonikaPacketBuilder:
         if io_elements is None:
             io_elements = cls._default_io_elements({})
         
+        return cls.build_avl_packet(
+            [AVLRecord(gps, timestamp, io_elements, priority, event_io_id)], codec_id
+        )
+    
+    @classmethod
+    def build_avl_packet(cls, records: List[AVLRecord], codec_id: int = CODEC_8) -> bytes:
+        """Build a data packet carrying several AVL records (1-255), e.g. a flushed record buffer.
+        
+        Codec differences (IO element section):
+        - Codec 8:  1-byte event ID, counts and IO IDs
+        - Codec 8E: 2-byte event ID, counts and IO IDs, plus variable length (size 0) elements
+        - Codec 16: 2-byte event ID and IO IDs, 1-byte generation type and counts
+        """
+        if codec_id not in (cls.CODEC_8, cls.CODEC_8E, cls.CODEC_16):
+            raise ValueError(f"Unsupported AVL codec ID: {codec_id:#x}")
+        if not 1 <= len(records) <= 255:
+            raise ValueError(f"A packet carries 1-255 AVL records, got {len(records)}")
+        
         # Build AVL data
-        avl_data = cls._build_avl_data(gps, timestamp, io_elements, priority, event_io_id)
+        avl_data = b''.join(
+            cls._build_avl_data(r.gps, r.timestamp, r.io_elements, r.priority, r.event_io_id, codec_id)
+            for r in records
+        )
         
         # Build data section: codec_id + count + avl_data + count
-        data_count = 1  # One AVL record
-        data_section = bytes([cls.CODEC_8, data_count]) + avl_data + bytes([data_count])
-        
+        data_count = len(records)
+        data_section = bytes([codec_id, data_count]) + avl_data + bytes([data_count])
+        return cls._frame(data_section)
+    
+    @classmethod
+    def build_codec12_response(cls, response_text: str) -> bytes:
+        """Build a Codec 12 GPRS command response packet (type 0x06), as sent after a command."""
+        response = response_text.encode('ascii')
+        data_section = (
+            bytes([cls.CODEC_12, 1, 0x06]) + struct.pack('>I', len(response)) + response + bytes([1])
+        )
+        return cls._frame(data_section)
+    
+    @classmethod
+    def _frame(cls, data_section: bytes) -> bytes:
+        """Add preamble, data length and CRC to a data section."""
         # Calculate CRC on data section (without preamble and length)
         crc = calc_crc16(data_section)
         
@@ -160,7 +209,8 @@ class TeltonikaPacketBuilder:
         timestamp: datetime,
         io_elements: List[IOElement],
         priority: int,
-        event_io_id: int = None
+        event_io_id: int = None,
+        codec_id: int = CODEC_8
     ) -> bytes:
         """Build single AVL data record."""
         # Timestamp (8 bytes) - milliseconds since epoch
@@ -174,7 +224,7 @@ class TeltonikaPacketBuilder:
         gps_bytes = cls._build_gps_element(gps)
         
         # IO element (with event_io_id to set correct status)
-        io_bytes = cls._build_io_element(io_elements, event_io_id)
+        io_bytes = cls._build_io_element(io_elements, event_io_id, codec_id)
         
         return timestamp_bytes + priority_byte + gps_bytes + io_bytes
     
@@ -198,22 +248,27 @@ class TeltonikaPacketBuilder:
         )
     
     @classmethod
-    def _build_io_element(cls, io_elements: List[IOElement], event_io_id: int = None) -> bytes:
+    def _build_io_element(cls, io_elements: List[IOElement], event_io_id: int = None,
+                          codec_id: int = CODEC_8) -> bytes:
         """Build IO element section.
         
         Args:
             io_elements: List of IO elements to include in packet
             event_io_id: The IO ID that triggered this event (determines status in parser).
                          If None, uses first IO element's ID.
+            codec_id: CODEC_8, CODEC_8E or CODEC_16 (field widths, see build_avl_packet)
         """
         # Filter out elements with None values
         valid_elements = [e for e in io_elements if e.value is not None]
+        if codec_id != cls.CODEC_8E:
+            valid_elements = [e for e in valid_elements if e.size != 0]
         
         # Group by size
         io_1byte = [e for e in valid_elements if e.size == 1]
         io_2byte = [e for e in valid_elements if e.size == 2]
         io_4byte = [e for e in valid_elements if e.size == 4]
         io_8byte = [e for e in valid_elements if e.size == 8]
+        io_variable = [e for e in valid_elements if e.size == 0]
         
         # Event IO ID - determines which IO triggered this AVL record
         # This is CRITICAL for the parser to set the correct status!
@@ -225,27 +280,42 @@ class TeltonikaPacketBuilder:
         # Total IO count
         total_count = len(valid_elements)
         
-        result = bytes([event_id, total_count])
+        # Field widths per codec
+        if codec_id == cls.CODEC_8E:
+            count_format, id_format = '>H', '>H'
+            result = struct.pack('>HH', event_id, total_count)
+        elif codec_id == cls.CODEC_16:
+            count_format, id_format = '>B', '>H'
+            result = struct.pack('>HBB', event_id, 0, total_count)  # generation type 0 = on exit
+        else:
+            count_format, id_format = '>B', '>B'
+            result = bytes([event_id, total_count])
         
         # 1-byte IO elements
-        result += bytes([len(io_1byte)])
+        result += struct.pack(count_format, len(io_1byte))
         for e in io_1byte:
-            result += bytes([e.property_id, int(e.value) & 0xFF])
+            result += struct.pack(id_format, e.property_id) + bytes([int(e.value) & 0xFF])
         
         # 2-byte IO elements
-        result += bytes([len(io_2byte)])
+        result += struct.pack(count_format, len(io_2byte))
         for e in io_2byte:
-            result += bytes([e.property_id]) + struct.pack('>H', int(e.value) & 0xFFFF)
+            result += struct.pack(id_format, e.property_id) + struct.pack('>H', int(e.value) & 0xFFFF)
         
         # 4-byte IO elements
-        result += bytes([len(io_4byte)])
+        result += struct.pack(count_format, len(io_4byte))
         for e in io_4byte:
-            result += bytes([e.property_id]) + struct.pack('>I', int(e.value) & 0xFFFFFFFF)
+            result += struct.pack(id_format, e.property_id) + struct.pack('>I', int(e.value) & 0xFFFFFFFF)
         
         # 8-byte IO elements
-        result += bytes([len(io_8byte)])
+        result += struct.pack(count_format, len(io_8byte))
         for e in io_8byte:
-            result += bytes([e.property_id]) + struct.pack('>Q', int(e.value))
+            result += struct.pack(id_format, e.property_id) + struct.pack('>Q', int(e.value))
+        
+        # Variable length IO elements (Codec 8E only)
+        if codec_id == cls.CODEC_8E:
+            result += struct.pack('>H', len(io_variable))
+            for e in io_variable:
+                result += struct.pack('>HH', e.property_id, len(e.value)) + bytes(e.value)
         
         return result
     